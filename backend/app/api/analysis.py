@@ -1,10 +1,17 @@
 
-from fastapi import APIRouter, HTTPException, Depends
+import asyncio
+import json
+
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from typing import Dict, Any, Optional
 
 from app.core.analysis.rule_engine import engine
 from app.core.auth import get_current_user
+from app.core.config import settings
+from app.core.executor import run_engine
+from app.core.narrative import narrative_jobs, STATUS_PENDING
 
 router = APIRouter()
 
@@ -18,6 +25,77 @@ async def startup_event():
     """应用启动时加载规则库"""
     engine.load_rules()
 
+@router.get("/search", summary="规则库全文检索")
+async def search(
+    q: str = Query("", max_length=100, description="检索词"),
+    prefix: Optional[str] = Query(None, max_length=100, description="键前缀，如 bazi:theory:"),
+    limit: int = Query(10, ge=1, le=50, description="返回条数"),
+    current_user = Depends(get_current_user)
+):
+    """
+    按字 n-gram 倒排索引检索规则库，结果按 BM25 相关度排序
+    """
+    if not q.strip() and not prefix:
+        raise HTTPException(status_code=400, detail="检索词与键前缀不能同时为空")
+    engine.load_rules()
+    hits = engine.search_hits(q, prefix=prefix, limit=limit)
+    return {
+        "success": True,
+        "data": [{"key": h.key, "score": h.score, "content": h.content} for h in hits]
+    }
+
+# SSE 心跳间隔（秒），防止代理断开空闲连接
+NARRATIVE_HEARTBEAT = 10.0
+
+
+@router.get("/narrative/{job_id}", summary="断语任务状态")
+async def narrative_status(job_id: str, current_user = Depends(get_current_user)):
+    """
+    查询排盘接口返回的断语任务（extra_info.ai_analysis_job）
+
+    status 为 pending / done / failed；done 时带 content 与 structured
+    """
+    state = await narrative_jobs.get(job_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="断语任务不存在或已过期")
+    return {"success": True, "data": {"id": job_id, **state}}
+
+
+@router.get("/narrative/{job_id}/stream", summary="断语任务订阅（SSE）")
+async def narrative_stream(job_id: str, current_user = Depends(get_current_user)):
+    """
+    以 Server-Sent Events 推送断语
+
+    生成完成时发送 done（或 failed）事件后关闭；等待期间定期发送心跳注释，
+    超过 NARRATIVE_STREAM_TIMEOUT 仍未完成时发送 timeout 事件，客户端可改为轮询
+    """
+    state = await narrative_jobs.get(job_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="断语任务不存在或已过期")
+
+    async def events():
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.NARRATIVE_STREAM_TIMEOUT
+        current = state
+        while current is not None and current.get("status") == STATUS_PENDING:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                yield f"event: timeout\ndata: {json.dumps({'id': job_id})}\n\n"
+                return
+            yield ": keep-alive\n\n"
+            current = await narrative_jobs.wait(job_id, min(NARRATIVE_HEARTBEAT, remaining))
+        if current is None:
+            yield f"event: failed\ndata: {json.dumps({'id': job_id, 'error': '断语任务已过期'}, ensure_ascii=False)}\n\n"
+            return
+        payload = json.dumps({"id": job_id, **current}, ensure_ascii=False)
+        yield f"event: {current['status']}\ndata: {payload}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.post("/analyze", summary="大数据智能分析")
 async def analyze(request: AnalysisRequest, current_user = Depends(get_current_user)):
     """
@@ -27,18 +105,9 @@ async def analyze(request: AnalysisRequest, current_user = Depends(get_current_u
         # 确保规则已加载
         engine.load_rules()
         
-        result = ""
-        from app.core.analysis.intelligent_analyst import analysis_service
-        
-        result = ""
-        if request.type == "bazi":
-            result = analysis_service.analyze_bazi(request.data)
-        elif request.type == "ziwei":
-            result = analysis_service.analyze_ziwei(request.data)
-        elif request.type == "yijing":
-             result = analysis_service.analyze_yijing(request.data)
-        else:
+        if request.type not in ("bazi", "ziwei", "yijing"):
             raise HTTPException(status_code=400, detail="不支持的分析类型")
+        result = await run_engine(f"analysis.{request.type}", request.data)
             
         return {
             "success": True, 
@@ -2,15 +2,24 @@
 玄心理命 - 八字命理API
 """
 
+import json
+
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.database import get_db
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Optional, List
 from datetime import date
 
-from app.core.bazi import analyze_bazi, calculate_sizhu, Gender
+from app.core.bazi import (
+    calculate_sizhu, calculate_sizhu_batch,
+    iter_lifetime_timeline, LIFETIME_YEARS,
+    locate, to_gender, dayun_layer, liunian_layer, compose
+)
 from app.core.auth import get_current_user, TokenData
+from app.core.executor import run_engine
+from app.core.narrative import narrative_jobs
 
 router = APIRouter()
 
@@ -44,6 +53,54 @@ class QuickBaZiRequest(BaseModel):
     hour: int = Field(..., ge=0, le=23)
 
 
+# 批量排盘单次最大条数
+BATCH_PAIPAN_MAX_SIZE = 10000
+
+
+class BatchBaZiRequest(BaseModel):
+    """批量排盘请求（按列传入）"""
+    year: List[int] = Field(..., min_length=1, max_length=BATCH_PAIPAN_MAX_SIZE, description="公历年份数组")
+    month: List[int] = Field(..., min_length=1, max_length=BATCH_PAIPAN_MAX_SIZE, description="公历月份数组")
+    day: List[int] = Field(..., min_length=1, max_length=BATCH_PAIPAN_MAX_SIZE, description="公历日数组")
+    hour: List[int] = Field(..., min_length=1, max_length=BATCH_PAIPAN_MAX_SIZE, description="出生时辰数组(24小时制)")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "year": [1990, 1985],
+                "month": [5, 11],
+                "day": [15, 22],
+                "hour": [10, 23]
+            }
+        }
+
+
+# 时间线单次最大跨度（年）
+TIMELINE_MAX_YEARS = 150
+
+
+class TimelineRequest(BaseModel):
+    """终身大运流年时间线请求"""
+    year: int = Field(..., ge=1900, le=2100, description="公历年份")
+    month: int = Field(..., ge=1, le=12, description="公历月份")
+    day: int = Field(..., ge=1, le=31, description="公历日")
+    hour: int = Field(..., ge=0, le=23, description="出生时辰(24小时制)")
+    gender: str = Field(default="男", description="性别：男/女")
+    start_year: Optional[int] = Field(None, description="起始年份（默认出生年）")
+    end_year: Optional[int] = Field(None, description=f"结束年份（含，默认出生后{LIFETIME_YEARS}年）")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "year": 1990,
+                "month": 5,
+                "day": 15,
+                "hour": 10,
+                "gender": "女"
+            }
+        }
+
+
 @router.post("/analyze", summary="八字完整分析")
 async def analyze(
     request: BaZiRequest, 
@@ -56,140 +113,60 @@ async def analyze(
     包含：四柱排盘、五行分析、十神分析、格局判断、大运流年、神煞分析
     """
     try:
-        # 1. 计算分析结果
+        # 1. 计算分析结果：命盘、大运、流年三层分别缓存后拼装
         from app.core.cache import cache, CacheService
-        cache_key = CacheService.bazi_key(request.year, request.month, request.day, request.hour)
+        from app.core.config import settings
+        target_year = request.target_year or date.today().year
+        sizhu, qiyun_age = locate(request.year, request.month, request.day, request.hour, request.gender)
+        bazi = sizhu.bazi
         
-        result = None
-        # 尝试从缓存获取
-        try:
-            result = await cache.get(cache_key)
-        except Exception:
-            pass
-            
-        if not result:
-            result = analyze_bazi(
-                year=request.year,
-                month=request.month,
-                day=request.day,
-                hour=request.hour,
-                gender=request.gender,
-                target_year=request.target_year
-            )
-            # 存入缓存
-            try:
-                await cache.set(cache_key, result, expire=3600)
-            except Exception:
-                pass
+        # 命盘层按四柱缓存，未命中时同键并发只计算一次
+        core = await cache.get_or_compute(
+            CacheService.bazi_core_key(bazi),
+            lambda: run_engine("bazi.core", bazi),
+            expire=settings.CACHE_ENGINE_EXPIRE
+        )
+        # 大运、流年层只是查表，直接在本进程计算
+        gender = to_gender(request.gender).value
+        dayun = await cache.get_or_compute(
+            CacheService.bazi_dayun_key(bazi, gender, qiyun_age),
+            lambda: dayun_layer(bazi, gender, qiyun_age),
+            expire=settings.CACHE_ENGINE_EXPIRE
+        )
+        liunian = await cache.get_or_compute(
+            CacheService.bazi_liunian_key(bazi, request.year, target_year),
+            lambda: liunian_layer(bazi, request.year, target_year, core["xi_yong_shen"]),
+            expire=settings.CACHE_ENGINE_EXPIRE
+        )
+        # 拼装出的顶层字典为新对象，子对象与缓存共享，只可追加顶层字段
+        result = compose(core, dayun, liunian, request.year, request.month, request.day,
+                         request.hour, request.gender, target_year)
+        
+        # 断语：已缓存则附上，否则后台生成
+        await narrative_jobs.attach("bazi", result)
         
         # 2. 保存到数据库 (新增逻辑)
         from app.core.user_service import HistoryService
-        from app.core.database import BirthInfo
-        from sqlalchemy import select
-        
-        # 查找或创建出生信息
-        # 注意：这里简化逻辑，暂不复用旧的BirthInfo，每次都存新的或按需查找
-        # 为了统计准确，即使是同一个生辰，每次点击分析也算一次记录
-        
-        # 先简单创建一个BirthInfo记录关联到这次分析(或者查找已有的)
-        birth_info_result = await db.execute(
-            select(BirthInfo).where(
-                BirthInfo.user_id == current_user.user_id,
-                BirthInfo.birth_year == request.year,
-                BirthInfo.birth_month == request.month,
-                BirthInfo.birth_day == request.day,
-                BirthInfo.birth_hour == request.hour,
-                BirthInfo.gender == request.gender
-            )
+
+        # 查找或创建出生信息（单条 upsert），同一生辰复用同一条
+        history_service = HistoryService(db)
+        birth_info_id = await history_service.resolve_birth_info(
+            user_id=current_user.user_id,
+            name=f"八字-{request.year}{request.month:02d}{request.day:02d}",
+            birth_year=request.year,
+            birth_month=request.month,
+            birth_day=request.day,
+            birth_hour=request.hour,
+            gender=request.gender,
+            is_lunar=False, # 默认公历
+            timezone="Asia/Shanghai"
         )
-        birth_info = birth_info_result.scalar_one_or_none()
-        
-        if not birth_info:
-            birth_info = BirthInfo(
-                user_id=current_user.user_id,
-                name=f"八字-{request.year}{request.month:02d}{request.day:02d}",
-                birth_year=request.year,
-                birth_month=request.month,
-                birth_day=request.day,
-                birth_hour=request.hour,
-                gender=request.gender,
-                is_lunar=False, # 默认公历
-                timezone="Asia/Shanghai" 
-            )
-            db.add(birth_info)
-            await db.commit()
-            await db.refresh(birth_info)
-            
-            # --- AI Analysis Data Prep ---
-            try:
-                ai_data = {}
-                if result:
-                    # 1. Basic Info
-                    if "basic_info" in result:
-                        ai_data["day_master"] = result["basic_info"].get("day_master")
-                        # sizhu.month is like "壬午", take 2nd char
-                        sz = result["basic_info"].get("sizhu", {})
-                        m_str = sz.get("month", "")
-                        if m_str and len(m_str) >= 2:
-                            ai_data["month"] = {"zhi": m_str[1]}
-                            
-                    # 2. Wuxing
-                    if "wuxing" in result:
-                        ai_data["wuxing_scores"] = result["wuxing"].get("scores", {})
-                        
-                    # 3. Shishen (Personality)
-                    if "personality" in result:
-                        # dominant_shishen is list of [name, count]
-                        dom = result["personality"].get("dominant_shishen", [])
-                        ai_data["shishen_profile"] = {"dominant": [x[0] for x in dom]}
-                        
-                    # 4. Geju
-                    if "geju" in result:
-                        ai_data["geju"] = result["geju"].get("main_geju")
-                        
-                    # 5. Dayun
-                    if "dayun_liunian" in result:
-                        cur_dy = result["dayun_liunian"].get("current_dayun", {})
-                        dy_gz = cur_dy.get("ganzhi", "")
-                        if dy_gz and len(dy_gz) >= 2:
-                             from app.core.bazi.shishen import get_shishen
-                             dy_gan = dy_gz[0]
-                             dy_zhi = dy_gz[1]
-                             
-                             # 计算大运天干十神
-                             dy_shishen = get_shishen(result["basic_info"]["day_master"], dy_gan)
-                             
-                             ai_data["current_dayun"] = {
-                                 "gan": dy_gan, 
-                                 "zhi": dy_zhi,
-                                 "shishen": dy_shishen
-                             }
-                    
-                    # 6. Shensha
-                    if "shensha" in result:
-                         all_ss = result["shensha"].get("all_shensha", [])
-                         ai_data["shensha"] = [s.get("name") for s in all_ss]
-                
-                if ai_data.get("day_master"):
-                    from app.core.analysis.intelligent_analyst import analysis_service
-                    ai_report = analysis_service.analyze_bazi(ai_data)
-                    
-                    if "extra_info" not in result:
-                        result["extra_info"] = {}
-                    # result["extra_info"]["ai_analysis"] = ai_report
-                    result["extra_info"]["ai_analysis"] = ai_report.get("content", "")
-                    result["extra_info"]["ai_analysis_structured"] = ai_report.get("structured", {})
-            except Exception as e:
-                print(f"Bazi AI Analysis failed: {e}")
-                # Don't fail the whole request
-            # -----------------------------
 
         # 保存分析记录
-        history_service = HistoryService(db)
         await history_service.save_analysis(
             user_id=current_user.user_id,
             analysis_type="bazi",
-            birth_info_id=birth_info.id,
+            birth_info_id=birth_info_id,
             result_data=result
         )
         
@@ -230,6 +207,66 @@ async def paipan(request: QuickBaZiRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/paipan/batch", summary="批量排盘")
+async def paipan_batch(request: BatchBaZiRequest):
+    """
+    批量排盘
+    
+    一次计算多条出生时间的四柱八字，返回顺序与输入一致
+    """
+    if any(y < 1900 or y > 2100 for y in request.year):
+        raise HTTPException(status_code=400, detail="年份需在1900-2100之间")
+    
+    try:
+        batch = calculate_sizhu_batch(request.year, request.month, request.day, request.hour)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {
+        "success": True,
+        "data": {
+            "count": len(batch),
+            "items": batch.to_records()
+        }
+    }
+
+
+@router.post("/timeline/stream", summary="终身大运流年时间线（流式）")
+async def timeline_stream(
+    request: TimelineRequest,
+    current_user: TokenData = Depends(get_current_user)
+):
+    """
+    终身大运流年时间线（需要登录）
+    
+    以 NDJSON 逐年返回：流年干支、十神、评级、所在大运、流年神煞，
+    客户端可边接收边渲染
+    """
+    start_year = request.start_year if request.start_year is not None else request.year
+    end_year = request.end_year if request.end_year is not None else request.year + LIFETIME_YEARS - 1
+    if end_year < start_year:
+        raise HTTPException(status_code=400, detail="结束年份不能早于起始年份")
+    if end_year - start_year + 1 > TIMELINE_MAX_YEARS:
+        raise HTTPException(status_code=400, detail=f"时间线跨度不能超过{TIMELINE_MAX_YEARS}年")
+    
+    try:
+        sizhu = calculate_sizhu(request.year, request.month, request.day, request.hour)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    gender = to_gender(request.gender)
+    timeline = iter_lifetime_timeline(
+        sizhu, gender, request.year, request.month, request.day,
+        birth_hour=request.hour, start_year=start_year, end_year=end_year
+    )
+    
+    def ndjson():
+        for record in timeline:
+            yield json.dumps(record, ensure_ascii=False) + "\n"
+    
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+
 @router.get("/wuxing/{wuxing}", summary="五行信息查询")
 async def get_wuxing_info(wuxing: str):
     """
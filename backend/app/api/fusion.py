@@ -7,10 +7,10 @@ from pydantic import BaseModel, Field
 from typing import Dict, List, Optional, Any
 from datetime import datetime
 
+from ..core.config import settings
+from ..core.executor import run_engine
+from ..core.optimization import cache_response
 from ..fusion import (
-    FusionAnalyzer,
-    quick_fusion_analysis,
-    generate_report,
     map_mbti_to_wuxing,
     get_wuxing_psychology,
     get_shishen_psychology,
@@ -78,7 +78,8 @@ async def quick_fusion(request: QuickFusionRequest):
     根据有限的输入数据进行快速分析
     """
     try:
-        result = quick_fusion_analysis(
+        result = await run_engine(
+            "fusion.quick",
             mbti_type=request.mbti_type,
             wuxing_scores=request.wuxing_scores,
             shishen_pattern=request.shishen_pattern
@@ -99,9 +100,8 @@ async def full_fusion_analysis(request: FullFusionRequest):
     整合所有可用数据进行综合分析
     """
     try:
-        analyzer = FusionAnalyzer()
-        
-        result = analyzer.analyze(
+        result = await run_engine(
+            "fusion",
             bazi_data=request.bazi_data,
             ziwei_data=request.ziwei_data,
             mbti_type=request.mbti_type,
@@ -132,9 +132,8 @@ async def generate_fusion_report(request: FullFusionRequest):
     返回Markdown格式的完整报告
     """
     try:
-        analyzer = FusionAnalyzer()
-        
-        fusion_result = analyzer.analyze(
+        fusion_result = await run_engine(
+            "fusion",
             bazi_data=request.bazi_data,
             ziwei_data=request.ziwei_data,
             mbti_type=request.mbti_type,
@@ -158,7 +157,7 @@ async def generate_fusion_report(request: FullFusionRequest):
             "analysis_time": fusion_result.analysis_time
         }
         
-        report_md = generate_report(result_dict, format="markdown")
+        report_md = await run_engine("fusion.report", result_dict, format="markdown")
         
         return {
             "success": True,
@@ -227,6 +226,7 @@ async def analyze_shishen_psychology(shishen_pattern: Dict[str, int]):
 
 
 @router.get("/mappings")
+@cache_response(expire=settings.CACHE_ENGINE_EXPIRE, key_prefix="fusion", raw_response=True)
 async def get_all_mappings():
     """获取所有映射关系"""
     return {
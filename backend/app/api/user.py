@@ -3,13 +3,16 @@
 历史记录、收藏、设置管理
 """
 
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 
 from ..core.database import get_db, async_session
-from ..core.user_service import UserService, HistoryService, FavoriteService, SettingsService
+from ..core.user_service import (
+    UserService, HistoryService, FavoriteService, SettingsService, FAVORITE_CHECK_LIMIT
+)
+from ..core.result_store import result_store
 from ..core.auth import get_current_user  # 假设已有
 
 router = APIRouter(prefix="/user", tags=["用户中心"])
@@ -32,6 +35,17 @@ class FavoriteRequest(BaseModel):
     note: Optional[str] = None
 
 
+class FavoriteItem(BaseModel):
+    """收藏项"""
+    item_type: str
+    item_id: int
+
+
+class FavoriteCheckRequest(BaseModel):
+    """批量检查收藏"""
+    items: List[FavoriteItem] = Field(..., max_length=FAVORITE_CHECK_LIMIT)
+
+
 class SettingsUpdate(BaseModel):
     """设置更新"""
     theme: Optional[str] = None
@@ -112,19 +126,28 @@ async def get_user_stats(current_user: Any = Depends(get_current_user)):
 @router.get("/history/analyses")
 async def get_analysis_history(
     analysis_type: Optional[str] = None,
-    limit: int = 20,
-    offset: int = 0,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
     current_user: Any = Depends(get_current_user)
 ):
-    """获取命理分析历史"""
+    """
+    获取命理分析历史
+    
+    列表只含摘要，完整结果见详情接口；翻页请传上一页返回的 next_cursor
+    """
     async with async_session() as db:
         service = HistoryService(db)
-        records = await service.get_user_analyses(
-            current_user.user_id, 
-            analysis_type=analysis_type,
-            limit=limit, 
-            offset=offset
-        )
+        try:
+            records, next_cursor = await service.get_user_analyses(
+                current_user.user_id, 
+                analysis_type=analysis_type,
+                limit=limit, 
+                offset=offset,
+                cursor=cursor
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
         return {
             "success": True,
@@ -133,11 +156,12 @@ async def get_analysis_history(
                     "id": r.id,
                     "type": r.analysis_type,
                     "birth_info_id": r.birth_info_id,
-                    "result_data": r.result_data,
+                    "summary": r.summary,
                     "created_at": r.created_at.isoformat()
                 }
                 for r in records
-            ]
+            ],
+            "next_cursor": next_cursor
         }
 
 
@@ -153,6 +177,7 @@ async def get_analysis_detail(
         
         if not record:
             raise HTTPException(status_code=404, detail="记录不存在")
+        result_data = await result_store.resolve(db, record.analysis_type, record)
         
         return {
             "success": True,
@@ -160,7 +185,7 @@ async def get_analysis_detail(
                 "id": record.id,
                 "type": record.analysis_type,
                 "birth_info_id": record.birth_info_id,
-                "result_data": record.result_data,
+                "result_data": result_data,
                 "created_at": record.created_at.isoformat()
             }
         }
@@ -185,19 +210,24 @@ async def delete_analysis(
 @router.get("/history/divinations")
 async def get_divination_history(
     method: Optional[str] = None,
-    limit: int = 20,
-    offset: int = 0,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
     current_user: Any = Depends(get_current_user)
 ):
-    """获取占卜历史"""
+    """获取占卜历史（列表只含摘要，翻页传 next_cursor）"""
     async with async_session() as db:
         service = HistoryService(db)
-        records = await service.get_user_divinations(
-            current_user.user_id,
-            method=method,
-            limit=limit,
-            offset=offset
-        )
+        try:
+            records, next_cursor = await service.get_user_divinations(
+                current_user.user_id,
+                method=method,
+                limit=limit,
+                offset=offset,
+                cursor=cursor
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
         return {
             "success": True,
@@ -206,11 +236,12 @@ async def get_divination_history(
                     "id": r.id,
                     "method": r.method,
                     "question": r.question,
-                    "result_data": r.result_data,
+                    "summary": r.summary,
                     "created_at": r.created_at.isoformat()
                 }
                 for r in records
-            ]
+            ],
+            "next_cursor": next_cursor
         }
 
 
@@ -226,6 +257,7 @@ async def get_divination_detail(
         
         if not record:
             raise HTTPException(status_code=404, detail="记录不存在")
+        result_data = await result_store.resolve(db, "yijing", record, question=record.question)
         
         return {
             "success": True,
@@ -233,7 +265,7 @@ async def get_divination_detail(
                 "id": record.id,
                 "method": record.method,
                 "question": record.question,
-                "result_data": record.result_data,
+                "result_data": result_data,
                 "created_at": record.created_at.isoformat()
             }
         }
@@ -242,19 +274,24 @@ async def get_divination_detail(
 @router.get("/history/psychology")
 async def get_psychology_history(
     test_type: Optional[str] = None,
-    limit: int = 20,
-    offset: int = 0,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
     current_user: Any = Depends(get_current_user)
 ):
-    """获取心理测试历史"""
+    """获取心理测试历史（列表只含摘要，翻页传 next_cursor）"""
     async with async_session() as db:
         service = HistoryService(db)
-        records = await service.get_user_psychology_tests(
-            current_user.user_id,
-            test_type=test_type,
-            limit=limit,
-            offset=offset
-        )
+        try:
+            records, next_cursor = await service.get_user_psychology_tests(
+                current_user.user_id,
+                test_type=test_type,
+                limit=limit,
+                offset=offset,
+                cursor=cursor
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
         return {
             "success": True,
@@ -262,11 +299,27 @@ async def get_psychology_history(
                 {
                     "id": r.id,
                     "test_type": r.test_type,
-                    "result_data": r.result_data,
+                    "summary": r.summary,
                     "created_at": r.created_at.isoformat()
                 }
                 for r in records
-            ]
+            ],
+            "next_cursor": next_cursor
+        }
+
+
+@router.get("/history/psychology/latest")
+async def get_latest_psychology_results(
+    current_user: Any = Depends(get_current_user)
+):
+    """获取最新的各类心理测试结果（需声明在 /{record_id} 之前）"""
+    async with async_session() as db:
+        service = HistoryService(db)
+        results = await service.get_latest_psychology_results(current_user.user_id)
+        
+        return {
+            "success": True,
+            "data": results
         }
 
 
@@ -294,35 +347,25 @@ async def get_psychology_detail(
         }
 
 
-@router.get("/history/psychology/latest")
-async def get_latest_psychology_results(
-    current_user: Any = Depends(get_current_user)
-):
-    """获取最新的各类心理测试结果"""
-    async with async_session() as db:
-        service = HistoryService(db)
-        results = await service.get_latest_psychology_results(current_user.user_id)
-        
-        return {
-            "success": True,
-            "data": results
-        }
-
-
 @router.get("/history/fusions")
 async def get_fusion_history(
-    limit: int = 20,
-    offset: int = 0,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
     current_user: Any = Depends(get_current_user)
 ):
-    """获取融合分析历史"""
+    """获取融合分析历史（列表不含融合结果，翻页传 next_cursor）"""
     async with async_session() as db:
         service = HistoryService(db)
-        records = await service.get_user_fusions(
-            current_user.user_id,
-            limit=limit,
-            offset=offset
-        )
+        try:
+            records, next_cursor = await service.get_user_fusions(
+                current_user.user_id,
+                limit=limit,
+                offset=offset,
+                cursor=cursor
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
         return {
             "success": True,
@@ -331,11 +374,11 @@ async def get_fusion_history(
                     "id": r.id,
                     "title": r.title,
                     "confidence": r.confidence,
-                    "fusion_result": r.fusion_result, 
                     "created_at": r.created_at.isoformat()
                 }
                 for r in records
-            ]
+            ],
+            "next_cursor": next_cursor
         }
 
 
@@ -463,6 +506,28 @@ async def check_favorite(
         return {"success": True, "is_favorited": is_favorited}
 
 
+@router.post("/favorites/check")
+async def check_favorites(
+    data: FavoriteCheckRequest,
+    current_user: Any = Depends(get_current_user)
+):
+    """批量检查是否已收藏（一个列表页一次请求），按请求顺序返回"""
+    async with async_session() as db:
+        service = FavoriteService(db)
+        flags = await service.check_favorites(
+            current_user.user_id,
+            [(item.item_type, item.item_id) for item in data.items]
+        )
+        
+        return {
+            "success": True,
+            "data": [
+                {"item_type": item.item_type, "item_id": item.item_id, "is_favorited": flag}
+                for item, flag in zip(data.items, flags)
+            ]
+        }
+
+
 # ==================== 用户设置 ====================
 
 @router.get("/settings")
@@ -500,23 +565,3 @@ async def update_settings(
             "success": True,
             "message": "设置更新成功"
         }
-
-
-# ==================== 辅助函数 ====================
-
-def _get_psychology_summary(test_type: str, result_data: Optional[Dict]) -> str:
-    """获取心理测试结果摘要"""
-    if not result_data:
-        return ""
-    
-    if test_type == "mbti":
-        return result_data.get("type_code", "")
-    elif test_type == "big5":
-        scores = result_data.get("scores", {})
-        return f"O:{scores.get('O', 0)} C:{scores.get('C', 0)} E:{scores.get('E', 0)}"
-    elif test_type == "archetype":
-        return result_data.get("primary", {}).get("name", "")
-    elif test_type == "enneagram":
-        return f"{result_data.get('primary_type', '')}号"
-    
-    return ""
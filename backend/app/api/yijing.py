@@ -11,43 +11,17 @@ from datetime import datetime
 
 from app.core.yijing import (
     meihua_by_time, meihua_by_numbers, meihua_by_text,
-    liuyao_by_coins, analyze_hexagram, divine,
+    liuyao_by_coins, divine,
     BAGUA, SIXTY_FOUR_GUA
 )
 from app.core.auth import get_current_user, TokenData
+from app.core.executor import run_engine
+from app.core.narrative import narrative_jobs
 # from app.core.analysis.rule_engine import engine (Removed)
 
 router = APIRouter()
 
 
-def _attach_ai_analysis(result: dict):
-    """附加大数据分析"""
-    try:
-        # Prepare data for rule engine
-        # result['original_hexagram'] contains 'name', 'upper', 'lower' etc.
-        # result['dong_yao'] is index (1-6)
-        # result['changed_gua'] contains the transformed hexagram info
-        
-        main_gua = result.get("main_gua", result.get("original_hexagram", {}))
-        
-        hex_data = {
-            "main_gua": main_gua,
-            "dong_yao": result.get("dong_yao"),
-            "changed_gua": result.get("changed_gua", {})
-        }
-        
-        from app.core.analysis.intelligent_analyst import analysis_service
-        ai_report = analysis_service.analyze_yijing(hex_data)
-        if ai_report:
-           if "extra_info" not in result:
-               result["extra_info"] = {}
-           result["extra_info"]["ai_analysis"] = ai_report.get("content", "")
-           result["extra_info"]["ai_analysis_structured"] = ai_report.get("structured", {})
-    except Exception as e:
-        print(f"Yijing AI Analysis failed: {e}")
-
-
-
 class MeihuaTimeRequest(BaseModel):
     """梅花易数时间起卦请求"""
     question: Optional[str] = Field(None, description="问题（可选）")
@@ -121,10 +95,10 @@ async def meihua_time(
             dt = None
         
         hexagram = meihua_by_time(dt)
-        result = analyze_hexagram(hexagram, request.question or "")
+        result = await run_engine("yijing", hexagram, request.question or "")
 
-        # Attach AI Analysis
-        _attach_ai_analysis(result)
+        # 断语：已缓存则附上，否则后台生成
+        await narrative_jobs.attach("yijing", result)
         
         # 保存记录
         from app.core.user_service import HistoryService
@@ -154,10 +128,10 @@ async def meihua_number(
     """
     try:
         hexagram = meihua_by_numbers(request.number1, request.number2)
-        result = analyze_hexagram(hexagram, request.question or "")
+        result = await run_engine("yijing", hexagram, request.question or "")
 
-        # Attach AI Analysis
-        _attach_ai_analysis(result)
+        # 断语：已缓存则附上，否则后台生成
+        await narrative_jobs.attach("yijing", result)
         
         # 保存记录
         from app.core.user_service import HistoryService
@@ -187,10 +161,10 @@ async def meihua_text(
     """
     try:
         hexagram = meihua_by_text(request.text)
-        result = analyze_hexagram(hexagram, request.question or request.text)
+        result = await run_engine("yijing", hexagram, request.question or request.text)
         
-        # Attach AI Analysis
-        _attach_ai_analysis(result)
+        # 断语：已缓存则附上，否则后台生成
+        await narrative_jobs.attach("yijing", result)
         
         # 保存记录
         from app.core.user_service import HistoryService
@@ -220,10 +194,10 @@ async def liuyao(
     """
     try:
         hexagram = liuyao_by_coins()
-        result = analyze_hexagram(hexagram, request.question or "")
+        result = await run_engine("yijing", hexagram, request.question or "")
 
-        # Attach AI Analysis
-        _attach_ai_analysis(result)
+        # 断语：已缓存则附上，否则后台生成
+        await narrative_jobs.attach("yijing", result)
         
         # 保存记录
         from app.core.user_service import HistoryService
@@ -8,9 +8,11 @@ from app.core.database import get_db
 from pydantic import BaseModel, Field
 from typing import Optional
 
-from app.core.ziwei import analyze_ziwei, MAIN_STAR_TRAITS
+from app.core.ziwei import MAIN_STAR_TRAITS
 from app.core.auth import get_current_user, TokenData
 from app.core.auth import get_current_user, TokenData
+from app.core.executor import run_engine
+from app.core.narrative import narrative_jobs
 # from app.core.analysis.rule_engine import engine (Removed)
 
 router = APIRouter()
@@ -68,68 +70,40 @@ async def analyze(
     try:
         # 1. 计算结果
         from app.core.cache import cache, CacheService
+        from app.core.config import settings
         cache_key = CacheService.ziwei_key(
             request.year_gan, request.year_zhi, 
             request.lunar_month, request.lunar_day, 
             request.birth_hour_zhi
         )
         
-        result = None
-        try:
-            result = await cache.get(cache_key)
-        except Exception:
-            pass
-            
-        if not result:
-            result = analyze_ziwei(
+        result = await cache.get_or_compute(
+            cache_key,
+            lambda: run_engine(
+                "ziwei",
                 year_gan=request.year_gan,
                 year_zhi=request.year_zhi,
                 lunar_month=request.lunar_month,
                 lunar_day=request.lunar_day,
                 birth_hour_zhi=request.birth_hour_zhi
-            )
-            try:
-                await cache.set(cache_key, result, expire=3600)
-            except Exception:
-                pass
-            except Exception:
-                pass
+            ),
+            expire=settings.CACHE_ENGINE_EXPIRE
+        )
+        
+        # 缓存中的对象为进程内共享，追加字段前先复制
+        result = dict(result)
+        if "extra_info" in result:
+            result["extra_info"] = dict(result["extra_info"])
                 
-        # --- Big Data / AI Analysis ---
-        try:
-            # Extract features for Rule Engine
-            # result['palaces'] should contain the list of palaces
-            # We look for the one where "is_body" or "name" == "命宫" (usually index 0 or labeled)
-            
-            features = []
-            if result and "palaces" in result:
-                for palace in result["palaces"]:
-                    if palace.get("name") == "命宫":
-                        # Extract major stars
-                        for star in palace.get("major_stars", []):
-                            features.append({"star": star["name"], "palace": "命宫"})
-            
-            # Call Analysis Service
-            # Local import to avoid circular dependency if any, or just for clarity
-            from app.core.analysis.intelligent_analyst import analysis_service
-            ai_report = analysis_service.analyze_ziwei({"features": features})
-            if "extra_info" not in result:
-                result["extra_info"] = {}
-            # result["extra_info"]["ai_analysis"] = ai_report
-            result["extra_info"]["ai_analysis"] = ai_report.get("content", "")
-            result["extra_info"]["ai_analysis_structured"] = ai_report.get("structured", {})
-            
-        except Exception as e:
-            print(f"AI Analysis failed: {e}")
-            # Do not fail the whole request
-            pass
-        # -----------------------------
+        # 断语：已缓存则附上，否则后台生成
+        await narrative_jobs.attach("ziwei", result)
+        
         # 由于手动输入没有具体年份，我们创建一个特殊的BirthInfo或者仅记录分析
-        # 这里为了统计，我们创建一个标记性的BirthInfo，年份设为0
+        # 这里为了统计，我们创建一个标记性的BirthInfo，年份设为0（同一农历月日复用同一条）
         from app.core.user_service import HistoryService
-        from app.core.database import BirthInfo
         
-        birth_info = BirthInfo(
+        history_service = HistoryService(db)
+        birth_info_id = await history_service.resolve_birth_info(
             user_id=current_user.user_id,
             name=f"紫微排盘-{request.year_gan}{request.year_zhi}年",
             birth_year=0, # 标记为无特定年份
@@ -139,15 +113,11 @@ async def analyze(
             gender="未知",
             is_lunar=True
         )
-        db.add(birth_info)
-        await db.commit()
-        await db.refresh(birth_info)
         
-        history_service = HistoryService(db)
         await history_service.save_analysis(
             user_id=current_user.user_id,
             analysis_type="ziwei",
-            birth_info_id=birth_info.id,
+            birth_info_id=birth_info_id,
             result_data=result
         )
         
@@ -190,7 +160,8 @@ async def analyze_from_solar(
         }
         birth_hour_zhi = DI_ZHI[hour_zhi_map[request.hour]]
         
-        result = analyze_ziwei(
+        result = await run_engine(
+            "ziwei",
             year_gan=year_gz.gan,
             year_zhi=year_gz.zhi,
             lunar_month=lunar_month,
@@ -198,81 +169,33 @@ async def analyze_from_solar(
             birth_hour_zhi=birth_hour_zhi
         )
         
+        # 断语：已缓存则附上，否则后台生成
+        await narrative_jobs.attach("ziwei", result)
+        
         # 保存到数据库
         from app.core.user_service import HistoryService
-        from app.core.database import BirthInfo
-        from sqlalchemy import select
         
-        # 查找或创建出生信息
-        birth_info_result = await db.execute(
-            select(BirthInfo).where(
-                BirthInfo.user_id == current_user.user_id,
-                BirthInfo.birth_year == request.year,
-                BirthInfo.birth_month == request.month,
-                BirthInfo.birth_day == request.day,
-                BirthInfo.birth_hour == request.hour,
-                BirthInfo.is_lunar == False
-            )
+        # 查找或创建出生信息（单条 upsert）
+        history_service = HistoryService(db)
+        birth_info_id = await history_service.resolve_birth_info(
+            user_id=current_user.user_id,
+            name=f"紫微-{request.year}{request.month:02d}{request.day:02d}",
+            birth_year=request.year,
+            birth_month=request.month,
+            birth_day=request.day,
+            birth_hour=request.hour,
+            gender="未知",
+            is_lunar=False,
+            timezone="Asia/Shanghai"
         )
-        birth_info = birth_info_result.scalar_one_or_none()
-        
-        if not birth_info:
-            birth_info = BirthInfo(
-                user_id=current_user.user_id,
-                name=f"紫微-{request.year}{request.month:02d}{request.day:02d}",
-                birth_year=request.year,
-                birth_month=request.month,
-                birth_day=request.day,
-                birth_hour=request.hour,
-                gender="未知",
-                is_lunar=False,
-                timezone="Asia/Shanghai"
-            )
-            db.add(birth_info)
-            await db.commit()
-            await db.refresh(birth_info)
             
-        history_service = HistoryService(db)
         await history_service.save_analysis(
             user_id=current_user.user_id,
             analysis_type="ziwei",
-            birth_info_id=birth_info.id,
+            birth_info_id=birth_info_id,
             result_data=result
         )
         
-        # --- Big Data / AI Analysis ---
-        try:
-            # Extract features for Rule Engine
-            features = []
-            palaces_list = []
-            if result and "chart_data" in result and "palaces" in result["chart_data"]:
-                 palaces_list = result["chart_data"]["palaces"]
-            elif result and "palaces" in result: 
-                 palaces_list = result["palaces"]
-            
-            for palace in palaces_list:
-                p_name = palace.get("name")
-                # stars.main is a list of dicts or objects
-                stars_main = palace.get("stars", {}).get("main", [])
-                for star in stars_main:
-                    s_name = star.get("name") if isinstance(star, dict) else star
-                    features.append({"star": s_name, "palace": p_name})
-            
-            # Call Analysis Service
-            from app.core.analysis.intelligent_analyst import analysis_service
-            ai_report = analysis_service.analyze_ziwei({"features": features})
-            
-            if "extra_info" not in result:
-                result["extra_info"] = {}
-                
-            result["extra_info"]["ai_analysis"] = ai_report.get("content", "")
-            result["extra_info"]["ai_analysis_structured"] = ai_report.get("structured", {})
-            
-        except Exception as e:
-            print(f"AI Analysis failed: {e}")
-            pass
-        # -----------------------------
-
         return {"success": True, "data": result}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,298 @@
+"""
+玄心理命 - 计算准入控制
+
+计算执行器的 worker 数固定，突发流量下请求会在进程池前无限排队，
+排在后面的请求即使最终完成也早已超时。准入控制在请求进入路由前决定
+放行、排队还是直接拒绝（503 + Retry-After），让排队时延保持有界。
+
+- 代价模型：每个端点（及后台任务）按实际运行引擎时消耗的 CPU 时间维护
+  指数滑动平均；计算由 run_engine 在 worker 内计时后记到当前准入单元。
+  命中缓存、未运行引擎的完成不计入平均，命中率再高的端点遇到一批未命中
+  时仍按计算代价排队。从未运行过引擎的端点（排盘、静态查询等）与计算
+  代价低于 ADMISSION_FREE_COST 的端点不占名额；新端点按
+  ADMISSION_DEFAULT_COST 计，完成一次后自动归类
+- 名额：同时在途的计算单元不超过 slots，其余按优先级进入有界队列，
+  普通请求先于低优先级任务（断语后台生成）出队
+- 拒绝：队列已满、按队列中的预计代价估算的等待超过 ADMISSION_MAX_WAIT，
+  或处于 CoDel 丢弃状态时新到的请求直接拒绝
+- CoDel：出队时记录排队时延，持续 interval 秒都高于 target 即进入丢弃
+  状态，拒绝新排队请求并丢弃队首已超时的等待者；时延回落到 target 以下
+  即恢复。低优先级任务另有更小的队列上限，过载时最先被舍弃
+"""
+
+import asyncio
+import contextvars
+import math
+import os
+import re
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+from .config import settings
+from .logging import logger
+
+
+# 优先级
+PRIORITY_NORMAL = 0
+PRIORITY_LOW = 1
+
+# 路径中含数字的段（记录编号、任务编号）归为同一端点
+_ID_SEGMENT = re.compile(r"/[^/]*\d[^/]*")
+
+# 当前准入单元累计的引擎 CPU 时间
+_current_cost: contextvars.ContextVar[Optional[List[float]]] = contextvars.ContextVar(
+    "admission_cost", default=None
+)
+
+
+class ComputeOverloaded(Exception):
+    """计算资源过载，请求被拒绝"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"计算资源繁忙，请 {retry_after:.0f} 秒后重试")
+        self.retry_after = retry_after
+
+
+def endpoint_key(method: str, path: str) -> str:
+    """端点标识：方法 + 归并编号段后的路径"""
+    return f"{method} {_ID_SEGMENT.sub('/{}', path)}"
+
+
+def charge(cpu_seconds: float) -> None:
+    """把引擎 CPU 时间记到当前准入单元（不在准入单元内时忽略）"""
+    cost = _current_cost.get()
+    if cost is not None:
+        cost[0] += cpu_seconds
+
+
+class AdmissionController:
+    """
+    准入控制器
+
+    Args:
+        slots: 同时在途的计算单元数
+        queue_limit: 等待队列上限
+        low_queue_limit: 低优先级等待上限
+        target_delay: CoDel 目标排队时延（秒）
+        interval: 时延持续高于目标多久进入丢弃状态（秒）
+        max_wait: 预计等待超过该值直接拒绝（秒）
+        free_cost: 运行引擎时的平均代价低于该值的端点不占名额（CPU 秒）
+        default_cost: 尚无测量值的端点的代价（CPU 秒）
+        alpha: 代价滑动平均系数
+        max_endpoints: 最多记录的端点数
+    """
+
+    def __init__(self, slots: int, queue_limit: int = 64, low_queue_limit: int = 8,
+                 target_delay: float = 0.1, interval: float = 0.5, max_wait: float = 2.0,
+                 free_cost: float = 0.0002, default_cost: float = 0.05,
+                 alpha: float = 0.2, max_endpoints: int = 1024):
+        self.slots = max(1, slots)
+        self.queue_limit = queue_limit
+        self.low_queue_limit = low_queue_limit
+        self.target_delay = target_delay
+        self.interval = interval
+        self.max_wait = max_wait
+        self.free_cost = free_cost
+        self.default_cost = default_cost
+        self.alpha = alpha
+        self.max_endpoints = max_endpoints
+
+        # 运行引擎时的代价；_seen 为已完成过的端点（未在 costs 中即从未运行引擎）
+        self.costs: "OrderedDict[str, float]" = OrderedDict()
+        self._seen: "OrderedDict[str, None]" = OrderedDict()
+        self.in_flight = 0
+        # 各优先级的等待者：(入队时间, 预计代价, future)
+        self._queues: Tuple[Deque[Tuple[float, float, asyncio.Future]], ...] = (deque(), deque())
+        self._queued_cost = 0.0
+
+        # CoDel 状态
+        self._first_above = 0.0
+        self.dropping = False
+
+        self.admitted = 0
+        self.bypassed = 0
+        self.queued = 0
+        self.rejected = 0
+        self.dropped = 0
+
+    # ==================== 代价模型 ====================
+
+    def cost(self, key: str) -> float:
+        """端点运行引擎时的预计代价（CPU 秒）；从未运行过引擎的为 0"""
+        if key in self.costs:
+            return self.costs[key]
+        return 0.0 if key in self._seen else self.default_cost
+
+    def is_free(self, key: str) -> bool:
+        return self.cost(key) < self.free_cost
+
+    def observe(self, key: str, cpu_seconds: float) -> None:
+        """记录一次完成；未运行引擎（如命中缓存）的只记为已见"""
+        self._seen[key] = None
+        self._seen.move_to_end(key)
+        if cpu_seconds > 0:
+            previous = self.costs.pop(key, None)
+            if previous is None:
+                self.costs[key] = cpu_seconds
+            else:
+                self.costs[key] = previous + self.alpha * (cpu_seconds - previous)
+        while len(self._seen) > self.max_endpoints:
+            self.costs.pop(self._seen.popitem(last=False)[0], None)
+
+    # ==================== 名额 ====================
+
+    def _waiting(self) -> int:
+        return sum(len(q) for q in self._queues)
+
+    def predicted_wait(self, cost: float = 0.0) -> float:
+        """按队列中的预计代价估算新请求的等待时间（秒）"""
+        return (self._queued_cost + cost) / self.slots
+
+    def retry_after(self) -> float:
+        """建议客户端重试的间隔（秒）"""
+        return max(1.0, math.ceil(self.predicted_wait() + self.interval))
+
+    def _reject(self) -> ComputeOverloaded:
+        self.rejected += 1
+        return ComputeOverloaded(self.retry_after())
+
+    def _observe_delay(self, sojourn: float, now: float) -> None:
+        """CoDel：按出队时的排队时延更新丢弃状态"""
+        if sojourn < self.target_delay:
+            self._first_above = 0.0
+            if self.dropping:
+                self.dropping = False
+                logger.info("Admission queue delay back under target")
+        elif self._first_above == 0.0:
+            self._first_above = now + self.interval
+        elif now >= self._first_above and not self.dropping:
+            self.dropping = True
+            logger.warning(
+                f"Admission queue delay {sojourn * 1000:.0f}ms above target for "
+                f"{self.interval}s, shedding load"
+            )
+
+    async def acquire(self, cost: float, priority: int = PRIORITY_NORMAL) -> None:
+        """
+        取得名额
+
+        Raises:
+            ComputeOverloaded: 被拒绝
+        """
+        if self.in_flight < self.slots and not self._waiting():
+            self.in_flight += 1
+            self.admitted += 1
+            self._observe_delay(0.0, time.monotonic())
+            return
+
+        waiting = self._waiting()
+        if self.dropping or waiting >= self.queue_limit:
+            raise self._reject()
+        if priority == PRIORITY_LOW and len(self._queues[PRIORITY_LOW]) >= self.low_queue_limit:
+            raise self._reject()
+        if self.predicted_wait(cost) > self.max_wait:
+            raise self._reject()
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (time.monotonic(), cost, future)
+        self._queues[priority].append(entry)
+        self._queued_cost += cost
+        self.queued += 1
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                # 已分到名额但调用方已取消：归还
+                self.release()
+            else:
+                self._discard(priority, entry)
+            raise
+
+    def _discard(self, priority: int, entry: Tuple[float, float, asyncio.Future]) -> None:
+        try:
+            self._queues[priority].remove(entry)
+        except ValueError:
+            return
+        self._queued_cost -= entry[1]
+
+    def release(self) -> None:
+        """归还名额并唤醒等待者"""
+        self.in_flight -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        now = time.monotonic()
+        while self.in_flight < self.slots:
+            queue = next((q for q in self._queues if q), None)
+            if queue is None:
+                break
+            enqueued, cost, future = queue.popleft()
+            self._queued_cost -= cost
+            if future.done():
+                continue
+            sojourn = now - enqueued
+            self._observe_delay(sojourn, now)
+            if self.dropping and sojourn > self.target_delay:
+                self.dropped += 1
+                future.set_exception(self._reject())
+                continue
+            self.in_flight += 1
+            self.admitted += 1
+            future.set_result(None)
+        if not self._waiting():
+            self._queued_cost = 0.0
+
+    # ==================== 准入单元 ====================
+
+    @asynccontextmanager
+    async def admit(self, key: str, priority: int = PRIORITY_NORMAL) -> AsyncIterator[None]:
+        """
+        准入单元：按端点代价取得名额（免费端点直接放行），
+        期间 run_engine 消耗的 CPU 时间计入该端点的代价
+
+        Raises:
+            ComputeOverloaded: 被拒绝
+        """
+        free = self.is_free(key)
+        if free:
+            self.bypassed += 1
+        else:
+            await self.acquire(self.cost(key), priority)
+        spent = [0.0]
+        token = _current_cost.set(spent)
+        try:
+            yield
+        finally:
+            _current_cost.reset(token)
+            if not free:
+                self.release()
+            self.observe(key, spent[0])
+
+    def stats(self) -> Dict[str, Any]:
+        """准入统计"""
+        return {
+            "slots": self.slots,
+            "in_flight": self.in_flight,
+            "waiting": self._waiting(),
+            "dropping": self.dropping,
+            "admitted": self.admitted,
+            "bypassed": self.bypassed,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "dropped": self.dropped,
+            "costs_ms": {key: round(value * 1000, 3) for key, value in self.costs.items()}
+        }
+
+
+admission = AdmissionController(
+    slots=settings.ADMISSION_SLOTS or 2 * (settings.COMPUTE_WORKERS or os.cpu_count() or 1),
+    queue_limit=settings.ADMISSION_QUEUE_LIMIT,
+    low_queue_limit=settings.ADMISSION_LOW_QUEUE_LIMIT,
+    target_delay=settings.ADMISSION_TARGET_DELAY,
+    interval=settings.ADMISSION_INTERVAL,
+    max_wait=settings.ADMISSION_MAX_WAIT,
+    free_cost=settings.ADMISSION_FREE_COST,
+    default_cost=settings.ADMISSION_DEFAULT_COST
+)
@@ -0,0 +1,162 @@
+"""
+玄心理命 - 编译后的规则库
+
+把 app/data/rules 下的 JSON 规则编译为可 mmap 的二进制文件：
+
+    文件头  "<4sHHI"   魔数 YTRC、版本、保留、条目数
+    索引    N × "<IIII" 键偏移、键长、值偏移、值长（按键的 UTF-8 字节序排列）
+    字符串堆            键与值的 UTF-8 字节
+
+加载时不解析，查找为索引上的二分；多个 worker 通过页缓存共享同一份内存。
+写入先落临时文件再 os.replace，读者要么看到旧文件、要么看到完整的新文件。
+"""
+
+import json
+import mmap
+import os
+import struct
+from typing import Dict, Iterator, Optional, Tuple
+
+
+CORPUS_MAGIC = b"YTRC"
+CORPUS_VERSION = 1
+CORPUS_FILENAME = "corpus.bin"
+
+_HEADER = struct.Struct("<4sHHI")
+_ENTRY = struct.Struct("<IIII")
+
+
+def load_rules_json(rules_dir: str) -> Dict[str, str]:
+    """读取目录下全部 JSON 规则文件并合并（按文件名顺序，后者覆盖前者）"""
+    rules: Dict[str, str] = {}
+    for filename in sorted(os.listdir(rules_dir)):
+        if filename.endswith(".json"):
+            with open(os.path.join(rules_dir, filename), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                rules.update(data)
+    return rules
+
+
+def encode_corpus(rules: Dict[str, str]) -> bytes:
+    """编码为二进制规则库"""
+    items = sorted(
+        (key.encode("utf-8"), str(value).encode("utf-8")) for key, value in rules.items()
+    )
+    heap_start = _HEADER.size + _ENTRY.size * len(items)
+    index = bytearray()
+    heap = bytearray()
+    for key, value in items:
+        key_off = heap_start + len(heap)
+        heap += key
+        value_off = heap_start + len(heap)
+        heap += value
+        index += _ENTRY.pack(key_off, len(key), value_off, len(value))
+    return _HEADER.pack(CORPUS_MAGIC, CORPUS_VERSION, 0, len(items)) + bytes(index) + bytes(heap)
+
+
+def write_corpus(rules: Dict[str, str], path: str) -> None:
+    """原子写入编译后的规则库"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(encode_corpus(rules))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def compile_rules_dir(rules_dir: str, output: Optional[str] = None) -> str:
+    """
+    编译规则目录
+
+    Args:
+        rules_dir: JSON 规则所在目录
+        output: 输出路径，默认为目录下的 corpus.bin
+
+    Returns:
+        输出路径
+    """
+    output = output or os.path.join(rules_dir, CORPUS_FILENAME)
+    write_corpus(load_rules_json(rules_dir), output)
+    return output
+
+
+class CompiledCorpus:
+    """mmap 方式打开的只读规则库"""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.path = path
+        # 用于判断文件是否被替换
+        self.signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+        magic, version, _, count = _HEADER.unpack_from(self._mm, 0)
+        if magic != CORPUS_MAGIC or version != CORPUS_VERSION:
+            raise ValueError(f"规则库格式不匹配: {path}")
+        self._count = count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _entry(self, i: int) -> Tuple[int, int, int, int]:
+        return _ENTRY.unpack_from(self._mm, _HEADER.size + _ENTRY.size * i)
+
+    def _key_bytes(self, i: int) -> bytes:
+        key_off, key_len, _, _ = self._entry(i)
+        return self._mm[key_off:key_off + key_len]
+
+    def get(self, key: str) -> Optional[str]:
+        """按键精确查找"""
+        target = key.encode("utf-8")
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key_bytes(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._count:
+            key_off, key_len, value_off, value_len = self._entry(lo)
+            if self._mm[key_off:key_off + key_len] == target:
+                return self._mm[value_off:value_off + value_len].decode("utf-8")
+        return None
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def items(self) -> Iterator[Tuple[str, str]]:
+        """按键序遍历"""
+        return self._iter_from(0)
+
+    def prefix_items(self, prefix: str) -> Iterator[Tuple[str, str]]:
+        """遍历以 prefix 开头的条目（UTF-8 字节序下同前缀的键是连续的一段）"""
+        target = prefix.encode("utf-8")
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key_bytes(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        for key, value in self._iter_from(lo):
+            if not key.startswith(prefix):
+                break
+            yield key, value
+
+    def _iter_from(self, start: int) -> Iterator[Tuple[str, str]]:
+        for i in range(start, self._count):
+            key_off, key_len, value_off, value_len = self._entry(i)
+            yield (self._mm[key_off:key_off + key_len].decode("utf-8"),
+                   self._mm[value_off:value_off + value_len].decode("utf-8"))
+
+    def is_stale(self) -> bool:
+        """磁盘上的文件是否已被替换"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return False
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size) != self.signature
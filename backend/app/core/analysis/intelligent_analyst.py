@@ -1,10 +1,32 @@
 
 import logging
-from typing import Dict, List, Optional, Any, Callable, Union
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Any, Callable, Tuple, Union
 from dataclasses import dataclass
 
 logger = logging.getLogger(__name__)
 
+# 每个分析器缓存的断语条数（按特征指纹）
+ANALYSIS_CACHE_SIZE = 2048
+
+_PLACEHOLDER = re.compile(r"\{(\d)\}")
+
+
+def _compile_template(template: str) -> Tuple[str, "re.Pattern"]:
+    """
+    把规则键模板拆成扫描前缀和解析余下部分的正则
+    "bazi:theory:day_master:{0}:month:{1}" -> ("bazi:theory:day_master:", 对整键的正则)
+    """
+    parts = _PLACEHOLDER.split(template)
+    literals = parts[0::2]
+    count = len(parts) // 2
+    pattern = re.escape(literals[0])
+    for i, literal in enumerate(literals[1:]):
+        pattern += "(.+)" if i == count - 1 else "(.+?)"
+        pattern += re.escape(literal)
+    return literals[0], re.compile(pattern)
+
 @dataclass
 class AnalyticItem:
     """分析条目"""
@@ -13,14 +35,99 @@ class AnalyticItem:
     category: str = "general"
 
 class BaseAnalyst:
-    """分析器基类"""
-    
+    """
+    分析器基类
+
+    断语只取决于少数离散特征（日主、月支、格局、星曜、卦名等）。规则源加载或
+    热替换后，LOOKUPS 中的每条回退链被一次性编译为"特征 → 规则文本"的查找表；
+    analyze 先把输入归约为特征指纹，相同指纹直接命中缓存，首次生成也只做查表。
+    """
+
+    # 查找表名 → 规则键模板回退链（靠前的优先，空值视为缺失）
+    LOOKUPS: Dict[str, Tuple[str, ...]] = {}
+
     def __init__(self):
         self.rule_provider: Optional[Callable[[str], Optional[str]]] = None
-        
+        self.rule_source = None
+        self._tables: Dict[str, Dict[Any, str]] = {}
+        self._generation = None
+        self._compiled = False
+        self._render_cached = lru_cache(maxsize=ANALYSIS_CACHE_SIZE)(self._render)
+
     def set_rule_provider(self, provider: Callable[[str], Optional[str]]):
         """设置规则提供者 (通常是 RuleEngine.match)"""
         self.rule_provider = provider
+
+    def set_rule_source(self, source):
+        """
+        设置规则源 (通常是 RuleEngine)
+        需提供 match(key)、scan(prefix) 与 generation（规则变化时递增）。
+        """
+        self.rule_source = source
+        self._compiled = False
+        self.set_rule_provider(source.match)
+
+    def compile_table(self, templates: Tuple[str, ...]) -> Dict[Any, str]:
+        """
+        把一条回退链编译为查找表
+        单占位符的模板以该值为键，多占位符以元组为键。
+        """
+        table: Dict[Any, str] = {}
+        for template in reversed(templates):
+            prefix, pattern = _compile_template(template)
+            for key, value in self.rule_source.scan(prefix):
+                match = pattern.fullmatch(key)
+                if match and value:
+                    args = match.groups()
+                    table[args[0] if len(args) == 1 else args] = value
+        return table
+
+    def compile_tables(self) -> Dict[str, Dict[Any, str]]:
+        """编译全部查找表（子类可在此派生组合表）"""
+        if self.rule_source is None:
+            return {name: {} for name in self.LOOKUPS}
+        return {name: self.compile_table(chain) for name, chain in self.LOOKUPS.items()}
+
+    def lookup_tables(self) -> Dict[str, Dict[Any, str]]:
+        """当前规则版本的查找表，规则源变化后重新编译并清空断语缓存"""
+        generation = self.rule_source.generation if self.rule_source is not None else None
+        if not self._compiled or generation != self._generation:
+            self._tables = self.compile_tables()
+            self._generation = generation
+            self._compiled = True
+            self._render_cached.cache_clear()
+        return self._tables
+
+    def fingerprint(self, data: Dict[str, Any]) -> Tuple:
+        """把输入归约为决定断语的特征元组"""
+        raise NotImplementedError
+
+    def render(self, tables: Dict[str, Dict[Any, str]], features: Tuple) -> Dict[str, Any]:
+        """按特征与查找表生成断语"""
+        raise NotImplementedError
+
+    def _render(self, generation, features: Tuple) -> Dict[str, Any]:
+        return self.render(self._tables, features)
+
+    def analyze(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        self.lookup_tables()
+        features = self.fingerprint(data)
+        try:
+            hash(features)
+        except TypeError:
+            # 特征中含不可哈希的值，跳过缓存
+            result = self.render(self._tables, features)
+        else:
+            result = self._render_cached(self._generation, features)
+        # 缓存中的结果被多次返回，交出副本
+        return {
+            "content": result["content"],
+            "structured": {k: list(v) for k, v in result["structured"].items()},
+        }
+
+    def cache_info(self):
+        """断语缓存命中统计"""
+        return self._render_cached.cache_info()
         
     def get_rule(self, keys: Union[str, List[str]]) -> Optional[str]:
         """
@@ -116,25 +223,108 @@ class BaseAnalyst:
 
 class BaziAnalyst(BaseAnalyst):
     """八字智能分析器"""
-    
-    def analyze(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        items = []
-        
-        # 提取基础数据
-        day_master = data.get("day_master", "未知")
+
+    LOOKUPS = {
+        "day_master": ("bazi:theory:day_master:{0}:general",),
+        "month": ("bazi:theory:day_master:{0}:month:{1}",),
+        "season": ("bazi:theory:season:{0}_{1}",),
+        "geju": ("bazi:theory:geju:{0}",),
+        "dominant": ("bazi:theory:shishen:dominant:{0}",),
+        "excess": ("bazi:theory:wuxing:excess:{0}",),
+        "deficiency": ("bazi:theory:wuxing:deficiency:{0}",),
+        "dayun": ("bazi:theory:shishen:dayun:{0}",),
+        "dayun_gan": ("bazi:theory:day_master:{0}:dayun_gan:{1}",),
+        "dayun_zhi": ("bazi:theory:day_master:{0}:dayun_zhi:{1}",),
+        # 流年十神缺少专门规则时退回通用十神描述
+        "liunian": ("bazi:theory:shishen:liunian:{0}", "bazi:theory:shishen:dominant:{0}"),
+        "shensha": ("bazi:theory:shensha:{0}",),
+        "wealth": ("bazi:theory:shishen:wealth:{0}",),
+        "relationship": ("bazi:theory:shishen:relationship:{0}",),
+    }
+
+    SEASONS = {
+        "寅": "spring", "卯": "spring", "辰": "spring",
+        "巳": "summer", "午": "summer", "未": "summer",
+        "申": "autumn", "酉": "autumn", "戌": "autumn",
+        "亥": "winter", "子": "winter", "丑": "winter"
+    }
+
+    def compile_tables(self) -> Dict[str, Dict[Any, str]]:
+        tables = super().compile_tables()
+
+        # --- SERVICE LAYER LOGIC: FALLBACK ---
+        # 当季得失：L1 日主+月支精确匹配 (Classic: Di Tian Sui)，
+        # 否则 L2 按日主五行与季节降级 (General Season Theory)，标题随来源不同
+        relation = {
+            key: f"**【当季得失】**\n{theory}" for key, theory in tables.pop("month").items()
+        }
+        season = tables.pop("season")
+        for dm in "甲乙丙丁戊己庚辛壬癸":
+            wx_en = self._wuxing_cn_to_en(self._get_wuxing(dm))
+            for month, name in self.SEASONS.items():
+                theory = season.get((wx_en, name))
+                if theory and (dm, month) not in relation:
+                    relation[(dm, month)] = f"**【五行季节论】**\n{theory}"
+        tables["month_relation"] = relation
+
+        # 五行建议表改以中文五行为键
+        for name in ("excess", "deficiency"):
+            by_en = tables[name]
+            tables[name] = {
+                cn: by_en[en] for cn in "木火土金水"
+                if (en := self._wuxing_cn_to_en(cn)) in by_en
+            }
+        return tables
+
+    def fingerprint(self, data: Dict[str, Any]) -> Tuple:
         # 兼容不同数据结构：data['month'] 可能是 dict 或 str
         month_data = data.get("month", {})
         month_zhi = month_data.get("zhi", "未知") if isinstance(month_data, dict) else "未知"
-        
-        # 提取更多数据用于深入分析
-        wuxing_scores = data.get("wuxing_scores", {})
-        shishen_profile = data.get("shishen_profile", {}) # Expecting dict like {'dominant': [...]}
-        geju = data.get("geju", "未知格局")
-        dayun = data.get("current_dayun", {})  # Expecting {'gan': '...', 'zhi': '...'}
-        shensha = data.get("shensha", []) # Expecting list of names
-        
+
+        # 五行只取最旺、最弱
+        strongest = weakest = None
+        wuxing_scores = data.get("wuxing_scores", {})  # 假设 {'木': 10, '火': 50 ...}
+        if wuxing_scores:
+            sorted_wx = sorted(wuxing_scores.items(), key=lambda x: x[1], reverse=True)
+            strongest, weakest = sorted_wx[0][0], sorted_wx[-1][0]
+
+        # 大运 (流年只在有大运时展示)
+        dayun = None
+        dy_info = data.get("current_dayun", {}) or {}  # Expecting {'gan': '...', 'zhi': '...'}
+        dy_gan = dy_info.get("gan")
+        dy_zhi = dy_info.get("zhi")
+        if dy_gan and dy_zhi:
+            dy_shishen = dy_info.get("shishen")  # Computed in API
+            if dy_shishen:
+                # Clean up shishen string just in case (e.g. remove spaces)
+                dy_shishen = dy_shishen.strip()
+            liunian = None
+            ln_info = data.get("current_liunian", {})
+            if ln_info and ln_info.get("year"):
+                liunian = (
+                    ln_info.get("year", ""), ln_info.get("gan", ""), ln_info.get("zhi", ""),
+                    ln_info.get("shishen", ""), ln_info.get("rating", "平"),
+                )
+            dayun = (dy_gan, dy_zhi, dy_shishen, liunian)
+
+        shishen_profile = data.get("shishen_profile", {})  # Expecting dict like {'dominant': [...]}
+        return (
+            data.get("day_master", "未知"),
+            month_zhi,
+            data.get("geju", "未知格局"),
+            tuple(shishen_profile.get("dominant") or ()),
+            strongest,
+            weakest,
+            dayun,
+            tuple(data.get("shensha") or ()),  # Expecting list of names
+        )
+
+    def render(self, tables: Dict[str, Dict[Any, str]], features: Tuple) -> Dict[str, Any]:
+        items = []
+        day_master, month_zhi, geju, dominant_shishens, strongest, weakest, dayun, shensha = features
+
         # --- 1. 本命特质 (Day Master) ---
-        dm_desc = self.get_rule([f"bazi:theory:day_master:{day_master}:general"])
+        dm_desc = tables["day_master"].get(day_master)
         if dm_desc:
             items.append(AnalyticItem(
                 content=f"**【本命特质】**\n{dm_desc}", 
@@ -149,12 +339,12 @@ class BaziAnalyst(BaseAnalyst):
             ))
 
         # --- 2. 当季得失 (Seasonal Effect) ---
-        relation = self._check_month_relation(day_master, month_zhi)
+        relation = tables["month_relation"].get((day_master, month_zhi))
         if relation:
             items.append(AnalyticItem(content=relation, weight=9.5, category="core"))
             
         # --- 3. 格局事业 (Structure/Geju) ---
-        geju_desc = self.get_rule([f"bazi:theory:geju:{geju}"])
+        geju_desc = tables["geju"].get(geju)
         if geju_desc:
             items.append(AnalyticItem(
                 content=f"**【格局事业】**\n格局：{geju}。\n{geju_desc}",
@@ -169,14 +359,9 @@ class BaziAnalyst(BaseAnalyst):
             ))
 
         # --- 4. 性格优劣 (Dominant Shishen) ---
-        # 假设 shishen_profile 包含 prominent 列表
-        dominant_shishens = shishen_profile.get("dominant", [])
+        dominant = tables["dominant"]
         if dominant_shishens:
-            traits = []
-            for shishen in dominant_shishens:
-                trait = self.get_rule([f"bazi:theory:shishen:dominant:{shishen}"])
-                if trait:
-                    traits.append(trait)
+            traits = [dominant[s] for s in dominant_shishens if s in dominant]
             
             if traits:
                 items.append(AnalyticItem(
@@ -187,19 +372,13 @@ class BaziAnalyst(BaseAnalyst):
         
         # --- 5. 五行平衡 (Wuxing Balance) ---
         # 简单的过旺/过弱检查
-        # 假设 wuxing_scores 是 {'木': 10, '火': 50 ...}
-        if wuxing_scores:
+        if strongest is not None:
             advice = []
-            sorted_wx = sorted(wuxing_scores.items(), key=lambda x: x[1], reverse=True)
-            if sorted_wx:
-                strongest = sorted_wx[0][0]
-                weakest = sorted_wx[-1][0]
-                
-                excess_rule = self.get_rule([f"bazi:theory:wuxing:excess:{self._wuxing_cn_to_en(strongest)}"])
-                deficiency_rule = self.get_rule([f"bazi:theory:wuxing:deficiency:{self._wuxing_cn_to_en(weakest)}"])
-                
-                if excess_rule: advice.append(excess_rule)
-                if deficiency_rule: advice.append(deficiency_rule)
+            excess_rule = tables["excess"].get(strongest)
+            deficiency_rule = tables["deficiency"].get(weakest)
+            
+            if excess_rule: advice.append(excess_rule)
+            if deficiency_rule: advice.append(deficiency_rule)
                 
             if advice:
                 items.append(AnalyticItem(
@@ -209,54 +388,35 @@ class BaziAnalyst(BaseAnalyst):
                 ))
 
         # --- 6. 大运分析 (Da Yun) ---
-        dy_info = dayun if dayun else {}
-        dy_gan = dy_info.get("gan")
-        dy_zhi = dy_info.get("zhi")
-        dy_shishen = dy_info.get("shishen") # Computed in API
-
-        if dy_gan and dy_zhi:
+        if dayun:
+             dy_gan, dy_zhi, dy_shishen, liunian = dayun
              content = f"**【当前大运】 ({dy_gan}{dy_zhi}运)**\n"
              
-             rule_found = False
              # 1. 尝试查找具体的大运十神规则
-             if dy_shishen:
-                 # Clean up shishen string just in case (e.g. remove spaces)
-                 dy_shishen = dy_shishen.strip()
-                 dy_rule = self.get_rule([f"bazi:theory:shishen:dayun:{dy_shishen}"])
-                 if dy_rule:
-                     content += dy_rule + "\n"
-                     rule_found = True
-             
-             if not rule_found:
+             dy_rule = tables["dayun"].get(dy_shishen) if dy_shishen else None
+             if dy_rule:
+                 content += dy_rule + "\n"
+             else:
                  content += f"行{dy_gan}{dy_zhi}运，天干为{dy_gan}，地支为{dy_zhi}。此运势对个人的影响需结合流年来看。\n"
 
                  # 2. 尝试查找具体的日主大运规则 (Fallback)
-                 dy_desc_gan = self.get_rule([f"bazi:theory:day_master:{day_master}:dayun_gan:{dy_gan}"])
+                 dy_desc_gan = tables["dayun_gan"].get((day_master, dy_gan))
                  if dy_desc_gan: content += f"\n{dy_desc_gan}\n"
              
              # 3. 地支规则
-             dy_desc_zhi = self.get_rule([f"bazi:theory:day_master:{day_master}:dayun_zhi:{dy_zhi}"])
+             dy_desc_zhi = tables["dayun_zhi"].get((day_master, dy_zhi))
              if dy_desc_zhi: content += f"\n{dy_desc_zhi}\n"
              
              # --- 流年分析 (Liu Nian) ---
-             ln_info = data.get("current_liunian", {})
-             if ln_info and ln_info.get("year"):
-                 ln_gan = ln_info.get("gan", "")
-                 ln_zhi = ln_info.get("zhi", "")
-                 ln_shishen = ln_info.get("shishen", "")
-                 ln_year = ln_info.get("year", "")
-                 ln_rating = ln_info.get("rating", "平")
+             if liunian:
+                 ln_year, ln_gan, ln_zhi, ln_shishen, ln_rating = liunian
                  
                  content += f"\n\n**【当前流年】 ({ln_year} {ln_gan}{ln_zhi}年)**\n"
                  content += f"流年十神：{ln_shishen}。运势评级：{ln_rating}。\n"
                  
                  if ln_shishen:
                      content += f"流年行{ln_shishen}运，重点在于应对该十神带来的机遇与挑战。\n"
-                     # 尝试查找流年十神规则（如果 corpus 有的话，目前复用大运规则的一般描述，或者通用十神描述）
-                     ln_rule = self.get_rule([
-                        f"bazi:theory:shishen:liunian:{ln_shishen}", # Specific Liunian
-                        f"bazi:theory:shishen:dominant:{ln_shishen}" # Fallback to general traits
-                     ])
+                     ln_rule = tables["liunian"].get(ln_shishen)
                      if ln_rule:
                          # 提取第一段或者简要描述，避免太长
                          short_desc = ln_rule.split('\n')[0]
@@ -266,15 +426,9 @@ class BaziAnalyst(BaseAnalyst):
 
         # --- 7. 神煞解读 (Shen Sha) ---
         if shensha:
-            ss_descs = []
-            for ss in shensha:
-                 # Map common names or use direct name
-                 # Example: '天乙贵人' -> 'tian_yi_gui_ren' mapping might be needed or key uses CN
-                 # Let's try direct CN key first for simplicity or pinyin
-                 # 暂定使用中文key，如果为了规范可以转拼音，这里先假设 corpus 用中文key
-                 desc = self.get_rule([f"bazi:theory:shensha:{ss}"])
-                 if desc:
-                     ss_descs.append(f"- **{ss}**：{desc}")
+            # 暂定使用中文key，假设 corpus 用中文key
+            shensha_rules = tables["shensha"]
+            ss_descs = [f"- **{ss}**：{shensha_rules[ss]}" for ss in shensha if ss in shensha_rules]
             
             if ss_descs:
                 items.append(AnalyticItem(
@@ -287,16 +441,7 @@ class BaziAnalyst(BaseAnalyst):
         wealth_shishens = ["正财", "偏财"]
         wealth_items = [s for s in dominant_shishens if s in wealth_shishens]
         if wealth_items:
-            wealth_descs = []
-            for ws in wealth_items:
-                w_desc = self.get_rule([f"bazi:theory:shishen:wealth:{ws}"])
-                if w_desc:
-                    wealth_descs.append(w_desc)
-                else:
-                    # 使用通用十神描述作为降级
-                    general = self.get_rule([f"bazi:theory:shishen:dominant:{ws}"])
-                    if general:
-                        wealth_descs.append(f"**{ws}**：{general}")
+            wealth_descs = self._shishen_descs(wealth_items, tables["wealth"], dominant)
             
             if wealth_descs:
                 items.append(AnalyticItem(
@@ -316,16 +461,7 @@ class BaziAnalyst(BaseAnalyst):
         social_shishens = ["比肩", "劫财", "伤官", "食神"]
         social_items = [s for s in dominant_shishens if s in social_shishens]
         if social_items:
-            social_descs = []
-            for ss in social_items:
-                s_desc = self.get_rule([f"bazi:theory:shishen:relationship:{ss}"])
-                if s_desc:
-                    social_descs.append(s_desc)
-                else:
-                    # 降级到通用十神
-                    general = self.get_rule([f"bazi:theory:shishen:dominant:{ss}"])
-                    if general:
-                        social_descs.append(f"**{ss}**：{general}")
+            social_descs = self._shishen_descs(social_items, tables["relationship"], dominant)
             
             if social_descs:
                 items.append(AnalyticItem(
@@ -339,35 +475,17 @@ class BaziAnalyst(BaseAnalyst):
             "content": self.generate_narrative(items),
             "structured": self.generate_structured(items)
         }
-    
-    def _check_month_relation(self, dm: str, month: str) -> Optional[str]:
-        # --- SERVICE LAYER LOGIC: FALLBACK ---
-        
-        # 1. 尝试 L1 精确匹配 (Classic: Di Tian Sui)
-        specific_key = f"bazi:theory:day_master:{dm}:month:{month}"
-        theory = self.get_rule([specific_key])
-        if theory:
-            return f"**【当季得失】**\n{theory}"
-
-        # 2. 尝试 L2 降级匹配 (General Season Theory)
-        dm_wx = self._get_wuxing(dm)
-        season_map = {
-            "寅": "spring", "卯": "spring", "辰": "spring",
-            "巳": "summer", "午": "summer", "未": "summer",
-            "申": "autumn", "酉": "autumn", "戌": "autumn",
-            "亥": "winter", "子": "winter", "丑": "winter"
-        }
-        
-        season = season_map.get(month, "unknown")
-        wx_en = self._wuxing_cn_to_en(dm_wx)
-        
-        if wx_en and season != "unknown":
-            fallback_key = f"bazi:theory:season:{wx_en}_{season}"
-            theory = self.get_rule([fallback_key])
-            if theory:
-                return f"**【五行季节论】**\n{theory}" 
-                
-        return None
+
+    def _shishen_descs(self, shishens: List[str], specific: Dict[Any, str],
+                       general: Dict[Any, str]) -> List[str]:
+        """专项十神描述，缺失时降级为带名称的通用十神描述"""
+        descs = []
+        for s in shishens:
+            if s in specific:
+                descs.append(specific[s])
+            elif s in general:
+                descs.append(f"**{s}**：{general[s]}")
+        return descs
 
     def _get_wuxing(self, stems: str) -> Optional[str]:
         mapping = {
@@ -382,50 +500,62 @@ class BaziAnalyst(BaseAnalyst):
 
 class ZiweiAnalyst(BaseAnalyst):
     """紫微智能分析器"""
-    
-    def analyze(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        items = []
-        features = data.get("features", [])
-        
-        # 宫位 -> 维度映射
-        palace_map = {
-            "命宫": "core",           # 核心/命宫
-            "官禄宫": "career",       # 事业
-            "财帛宫": "wealth",       # 财运
-            "夫妻宫": "love",         # 婚姻
-            "迁移宫": "travel",       # 出行/人际
-            "福德宫": "spirit",       # 精神/福德
-            "疾厄宫": "health"        # 健康
-        }
 
-        # 1. 遍历所有特征，按宫位归类
-        palace_stars = {}
-        for f in features:
+    LOOKUPS = {
+        "star": ("ziwei:theory:star:{0}",),
+        "star_palace": ("ziwei:theory:star:{0}:{1}",),
+        "dual": ("ziwei:theory:dual:{0}_{1}",),
+    }
+
+    # 宫位 -> 维度映射
+    PALACE_MAP = {
+        "命宫": "core",           # 核心/命宫
+        "官禄宫": "career",       # 事业
+        "财帛宫": "wealth",       # 财运
+        "夫妻宫": "love",         # 婚姻
+        "迁移宫": "travel",       # 出行/人际
+        "福德宫": "spirit",       # 精神/福德
+        "疾厄宫": "health"        # 健康
+    }
+
+    def fingerprint(self, data: Dict[str, Any]) -> Tuple:
+        # 只保留有宫位和星曜的特征，顺序决定同宫星曜的先后
+        pairs = []
+        for f in data.get("features", []):
             palace = f.get("palace")
             star = f.get("star")
             if palace and star:
-                if palace not in palace_stars:
-                    palace_stars[palace] = []
-                palace_stars[palace].append(star)
+                pairs.append((palace, star))
+        return tuple(pairs)
+
+    def render(self, tables: Dict[str, Dict[Any, str]], features: Tuple) -> Dict[str, Any]:
+        items = []
+        star_rules = tables["star"]
+        star_palace_rules = tables["star_palace"]
+
+        # 1. 遍历所有特征，按宫位归类
+        palace_stars = {}
+        for palace, star in features:
+            if palace not in palace_stars:
+                palace_stars[palace] = []
+            palace_stars[palace].append(star)
 
         # 2. 针对关键宫位进行分析
-        for palace, category in palace_map.items():
+        for palace, category in self.PALACE_MAP.items():
             stars = palace_stars.get(palace, [])
             if not stars:
                 continue
 
             # 2.1 单星分析
-            star_descs = []
             for star in stars:
-                desc = self.get_rule([f"ziwei:theory:star:{star}"])
+                desc = star_rules.get(star)
                 if desc:
                     # 简单处理：如果是命宫，权重高；其他宫位稍低
                     weight = 10.0 if category == "core" else 8.5
                     
                     # 针对非命宫，尝试寻找特定宫位的星曜解释 (如果有的话)，否则通用解释
                     # fallback: ziwei:theory:star:{star}:{palace} -> ziwei:theory:star:{star}
-                    specific_desc = self.get_rule([f"ziwei:theory:star:{star}:{palace}"])
-                    final_desc = specific_desc if specific_desc else desc
+                    final_desc = star_palace_rules.get((star, palace), desc)
                     
                     items.append(AnalyticItem(
                         content=f"**【{palace}】**\n{star}：{final_desc}",
@@ -439,8 +569,7 @@ class ZiweiAnalyst(BaseAnalyst):
                 sorted_stars = sorted(stars)
                 # 尝试查找前两颗主星的组合
                 if len(sorted_stars) >= 2:
-                    key = f"ziwei:theory:dual:{sorted_stars[0]}_{sorted_stars[1]}"
-                    dual_desc = self.get_rule([key])
+                    dual_desc = tables["dual"].get((sorted_stars[0], sorted_stars[1]))
                     if dual_desc:
                         items.append(AnalyticItem(
                             content=f"**【双星格局】**\n{dual_desc}",
@@ -476,20 +605,37 @@ class YijingAnalyst(BaseAnalyst):
     # 五行生克关系
     WUXING_SHENG = {"木": "火", "火": "土", "土": "金", "金": "水", "水": "木"}
     WUXING_KE = {"木": "土", "土": "水", "水": "火", "火": "金", "金": "木"}
-    
-    def analyze(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        items = []
-        
+
+    LOOKUPS = {
+        "gua": ("yijing:theory:gua:{0}",),
+        "bagua": ("yijing:theory:bagua:{0}",),
+        "relation": ("yijing:theory:relation:{0}",),
+        "yao": ("yijing:theory:yao:{0}",),
+    }
+
+    def compile_tables(self) -> Dict[str, Dict[Any, str]]:
+        tables = super().compile_tables()
+        # 动爻以整数传入
+        tables["yao"] = {int(k): v for k, v in tables["yao"].items() if k.isdigit()}
+        return tables
+
+    def fingerprint(self, data: Dict[str, Any]) -> Tuple:
         main_gua = data.get("main_gua", {})
-        dong_yao = data.get("dong_yao")  # int 1-6 or None
         changed_gua = data.get("changed_gua", {})
-        
-        gua_name = main_gua.get("name", "未知")
-        upper_gua = main_gua.get("upper", {}).get("name", "")
-        lower_gua = main_gua.get("lower", {}).get("name", "")
+        return (
+            main_gua.get("name", "未知"),
+            main_gua.get("upper", {}).get("name", ""),
+            main_gua.get("lower", {}).get("name", ""),
+            data.get("dong_yao"),  # int 1-6 or None
+            changed_gua.get("name") if changed_gua else None,
+        )
+
+    def render(self, tables: Dict[str, Dict[Any, str]], features: Tuple) -> Dict[str, Any]:
+        items = []
+        gua_name, upper_gua, lower_gua, dong_yao, changed_name = features
         
         # --- 1. 本卦大象分析 ---
-        gua_desc = self.get_rule([f"yijing:theory:gua:{gua_name}"])
+        gua_desc = tables["gua"].get(gua_name)
         if gua_desc:
             items.append(AnalyticItem(
                 content=f"**【本卦】{gua_name}**\n{gua_desc}",
@@ -504,17 +650,17 @@ class YijingAnalyst(BaseAnalyst):
             ))
         
         # --- 2. 上下卦象分析 ---
-        trigram_items = self._analyze_trigrams(upper_gua, lower_gua)
+        trigram_items = self._analyze_trigrams(tables, upper_gua, lower_gua)
         items.extend(trigram_items)
         
         # --- 3. 体用生克分析 ---
         if dong_yao and upper_gua and lower_gua:
-            relation_items = self._analyze_relation(upper_gua, lower_gua, dong_yao)
+            relation_items = self._analyze_relation(tables, upper_gua, lower_gua, dong_yao)
             items.extend(relation_items)
         
         # --- 4. 动爻详解 ---
         if dong_yao:
-            yao_items = self._analyze_moving_yao(dong_yao, gua_name)
+            yao_items = self._analyze_moving_yao(tables, dong_yao, gua_name)
             items.extend(yao_items)
         else:
             items.append(AnalyticItem(
@@ -524,8 +670,8 @@ class YijingAnalyst(BaseAnalyst):
             ))
         
         # --- 5. 变卦趋势分析 ---
-        if changed_gua and changed_gua.get("name"):
-            change_items = self._analyze_change(changed_gua, gua_name)
+        if changed_name:
+            change_items = self._analyze_change(tables, changed_name, gua_name)
             items.extend(change_items)
         
         # --- 6. 综合建议 ---
@@ -538,13 +684,13 @@ class YijingAnalyst(BaseAnalyst):
             "structured": self.generate_structured(items)
         }
     
-    def _analyze_trigrams(self, upper: str, lower: str) -> List[AnalyticItem]:
+    def _analyze_trigrams(self, tables: Dict[str, Dict[Any, str]], upper: str, lower: str) -> List[AnalyticItem]:
         """分析上下卦象"""
         items = []
         
         # 上卦分析
         if upper:
-            upper_desc = self.get_rule([f"yijing:theory:bagua:{upper}"])
+            upper_desc = tables["bagua"].get(upper)
             if upper_desc:
                 items.append(AnalyticItem(
                     content=f"**【上卦·外象】{upper}卦**\n上卦代表外在环境、他人态度或事情的表象。\n{upper_desc}",
@@ -554,7 +700,7 @@ class YijingAnalyst(BaseAnalyst):
         
         # 下卦分析
         if lower:
-            lower_desc = self.get_rule([f"yijing:theory:bagua:{lower}"])
+            lower_desc = tables["bagua"].get(lower)
             if lower_desc:
                 items.append(AnalyticItem(
                     content=f"**【下卦·内象】{lower}卦**\n下卦代表内在状态、自身处境或事情的本质。\n{lower_desc}",
@@ -564,7 +710,8 @@ class YijingAnalyst(BaseAnalyst):
         
         return items
     
-    def _analyze_relation(self, upper: str, lower: str, dong_yao: int) -> List[AnalyticItem]:
+    def _analyze_relation(self, tables: Dict[str, Dict[Any, str]], upper: str, lower: str,
+                          dong_yao: int) -> List[AnalyticItem]:
         """
         分析体用生克关系
         梅花易数：动爻所在卦为用卦，不动的卦为体卦
@@ -607,7 +754,7 @@ class YijingAnalyst(BaseAnalyst):
             relation_key = "用生体"
         
         if relation:
-            relation_desc = self.get_rule([f"yijing:theory:relation:{relation_key}"])
+            relation_desc = tables["relation"].get(relation_key)
             content = f"**【体用关系】**\n- 体卦：{ti_gua}（{ti_name}，五行{ti_wx}）\n- 用卦：{yong_gua}（{yong_name}，五行{yong_wx}）\n- 关系：{relation}\n"
             if relation_desc:
                 content += f"\n{relation_desc}"
@@ -620,12 +767,13 @@ class YijingAnalyst(BaseAnalyst):
         
         return items
     
-    def _analyze_moving_yao(self, dong_yao: int, gua_name: str) -> List[AnalyticItem]:
+    def _analyze_moving_yao(self, tables: Dict[str, Dict[Any, str]], dong_yao: int,
+                            gua_name: str) -> List[AnalyticItem]:
         """分析动爻"""
         items = []
         
         # 通用爻位解读
-        yao_theory = self.get_rule([f"yijing:theory:yao:{dong_yao}"])
+        yao_theory = tables["yao"].get(dong_yao)
         if yao_theory:
             items.append(AnalyticItem(
                 content=f"**【动爻·第{dong_yao}爻】**\n变爻在第{dong_yao}爻，这是事情发展的关键转折点。\n{yao_theory}",
@@ -641,16 +789,16 @@ class YijingAnalyst(BaseAnalyst):
         
         return items
     
-    def _analyze_change(self, changed_gua: Dict, original_name: str) -> List[AnalyticItem]:
+    def _analyze_change(self, tables: Dict[str, Dict[Any, str]], changed_name: str,
+                        original_name: str) -> List[AnalyticItem]:
         """分析变卦趋势"""
         items = []
         
-        changed_name = changed_gua.get("name", "")
         if not changed_name:
             return items
         
         # 变卦解读
-        changed_desc = self.get_rule([f"yijing:theory:gua:{changed_name}"])
+        changed_desc = tables["gua"].get(changed_name)
         content = f"**【变卦·{changed_name}】**\n由{original_name}变为{changed_name}，代表事情的发展趋势和最终走向。\n"
         
         if changed_desc:
@@ -716,11 +864,15 @@ class AnalysisService:
         self._yijing = YijingAnalyst()
         
         # Inject dependencies
-        provider = rule_engine_instance.match
-        self._bazi.set_rule_provider(provider)
-        self._ziwei.set_rule_provider(provider)
-        self._yijing.set_rule_provider(provider)
+        self._bazi.set_rule_source(rule_engine_instance)
+        self._ziwei.set_rule_source(rule_engine_instance)
+        self._yijing.set_rule_source(rule_engine_instance)
         
+    def compile(self):
+        """预先编译各分析器的查找表"""
+        for analyst in (self._bazi, self._ziwei, self._yijing):
+            analyst.lookup_tables()
+
     def analyze_bazi(self, data: Dict[str, Any]) -> Dict[str, Any]:
         return self._bazi.analyze(data)
         
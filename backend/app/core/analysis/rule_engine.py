@@ -1,22 +1,89 @@
 
+import hashlib
 import json
 import os
-from typing import Dict, List, Optional
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
 import logging
 
+from .corpus import CompiledCorpus, CORPUS_FILENAME
+from .search import CorpusIndex, SearchHit
+
 logger = logging.getLogger(__name__)
 
+# 检查编译规则库是否被替换的最短间隔（秒）
+RELOAD_CHECK_INTERVAL = float(os.getenv("RULE_RELOAD_INTERVAL", "2"))
+
+DEFAULT_RULES_DIR = "app/data/rules"
+
+
+def resolve_rules_dir(rules_dir: str = DEFAULT_RULES_DIR) -> str:
+    """规则目录的绝对路径"""
+    # 绝对路径处理 (Handle absolute paths)
+    base_dir = os.getcwd()
+    # If running from root but backend logic expects backend/app/data...
+    if "backend" not in base_dir and os.path.exists("backend"):
+        return os.path.join(base_dir, "backend", rules_dir)
+    return os.path.join(base_dir, rules_dir)
+
+
+# 上次计算摘要时的规则目录、各规则文件的 (文件名, 大小, 修改时间) 及摘要
+_fingerprint: Tuple[str, tuple, str] = ("", (), "")
+# 下次检查规则文件的时间（与规则库热替换共用 RELOAD_CHECK_INTERVAL）
+_fingerprint_next_check = 0.0
+
+
+def rules_fingerprint(rules_dir: str = DEFAULT_RULES_DIR) -> str:
+    """
+    规则文件（编译库与 JSON）的内容摘要
+    
+    每 RELOAD_CHECK_INTERVAL 秒最多检查一次规则文件；大小与修改时间都未变时
+    沿用上次结果，只在规则更新后重新读取。
+    """
+    global _fingerprint, _fingerprint_next_check
+    abs_rules_dir = resolve_rules_dir(rules_dir)
+    now = time.monotonic()
+    if abs_rules_dir == _fingerprint[0] and _fingerprint[2] and now < _fingerprint_next_check:
+        return _fingerprint[2]
+    _fingerprint_next_check = now + RELOAD_CHECK_INTERVAL
+    try:
+        names = sorted(n for n in os.listdir(abs_rules_dir) if n == CORPUS_FILENAME or n.endswith(".json"))
+    except OSError:
+        names = []
+    signature = []
+    for name in names:
+        st = os.stat(os.path.join(abs_rules_dir, name))
+        signature.append((name, st.st_size, st.st_mtime_ns))
+    signature = tuple(signature)
+    if (abs_rules_dir, signature) != _fingerprint[:2] or not _fingerprint[2]:
+        digest = hashlib.sha1()
+        for name in names:
+            digest.update(name.encode("utf-8"))
+            with open(os.path.join(abs_rules_dir, name), "rb") as f:
+                digest.update(f.read())
+        _fingerprint = (abs_rules_dir, signature, digest.hexdigest()[:12])
+    return _fingerprint[2]
+
+
 class RuleEngine:
     _instance = None
     _rules: Dict[str, str] = {}
     _is_loaded = False
+    # 编译后的规则库（存在 corpus.bin 时优先使用）
+    _corpus: Optional[CompiledCorpus] = None
+    _next_check = 0.0
+    # 规则内容每次变化（加载、热替换）递增，供下游缓存判断是否失效
+    _generation = 0
+    # 全文检索索引及其对应的规则来源（规则库重载后重建）
+    _index: Optional[CorpusIndex] = None
+    _index_source = None
     
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(RuleEngine, cls).__new__(cls)
         return cls._instance
 
-    def load_rules(self, rules_dir: str = "app/data/rules"):
+    def load_rules(self, rules_dir: str = DEFAULT_RULES_DIR):
         """
         加载规则库
         Load the rules from the JSON files into the _rules dictionary.
@@ -26,18 +93,24 @@ class RuleEngine:
 
         logger.info(f"Loading rules from {rules_dir}...")
         
-        # 绝对路径处理 (Handle absolute paths)
-        base_dir = os.getcwd()
-        # If running from root but backend logic expects backend/app/data...
-        if "backend" not in base_dir and os.path.exists("backend"):
-            abs_rules_dir = os.path.join(base_dir, "backend", rules_dir)
-        else:
-            abs_rules_dir = os.path.join(base_dir, rules_dir)
+        abs_rules_dir = resolve_rules_dir(rules_dir)
 
         if not os.path.exists(abs_rules_dir):
             logger.warning(f"Rules directory not found: {abs_rules_dir}")
             return
 
+        # 优先 mmap 编译后的规则库，无需解析
+        corpus_path = os.path.join(abs_rules_dir, CORPUS_FILENAME)
+        if os.path.exists(corpus_path):
+            try:
+                RuleEngine._corpus = CompiledCorpus(corpus_path)
+                RuleEngine._generation += 1
+                self._is_loaded = True
+                logger.info(f"Mapped {len(self._corpus)} rules from {corpus_path}.")
+                return
+            except Exception as e:
+                logger.error(f"Failed to map {corpus_path}, falling back to JSON: {e}")
+
         total_rules = 0
         for filename in os.listdir(abs_rules_dir):
             if filename.endswith(".json"):
@@ -51,28 +124,81 @@ class RuleEngine:
                 except Exception as e:
                     logger.error(f"Failed to load {filename}: {e}")
 
+        RuleEngine._generation += 1
         self._is_loaded = True
         logger.info(f"Loaded {total_rules} rules.")
 
+    def _refresh(self) -> Optional[CompiledCorpus]:
+        """
+        规则库文件被原子替换后切换到新文件
+        旧映射仍被在途查询引用时由其自行释放，不影响正在进行的请求。
+        """
+        corpus = self._corpus
+        if corpus is None:
+            return None
+        now = time.monotonic()
+        if now >= RuleEngine._next_check:
+            RuleEngine._next_check = now + RELOAD_CHECK_INTERVAL
+            if corpus.is_stale():
+                try:
+                    corpus = RuleEngine._corpus = CompiledCorpus(corpus.path)
+                    RuleEngine._generation += 1
+                    logger.info(f"Reloaded {len(corpus)} rules from {corpus.path}.")
+                except Exception as e:
+                    logger.error(f"Failed to reload {corpus.path}: {e}")
+        return corpus
+
     def match(self, key: str) -> Optional[str]:
         """
         精确匹配规则
         Exact match for rule key.
         """
+        corpus = self._refresh()
+        if corpus is not None:
+            return corpus.get(key)
         return self._rules.get(key)
     
+    @property
+    def generation(self) -> int:
+        """规则内容版本号"""
+        self._refresh()
+        return RuleEngine._generation
+
+    def scan(self, prefix: str) -> Iterator[Tuple[str, str]]:
+        """
+        按键前缀遍历规则
+        Iterate rules whose key starts with prefix.
+        """
+        corpus = self._refresh()
+        if corpus is not None:
+            return corpus.prefix_items(prefix)
+        return ((key, value) for key, value in list(self._rules.items()) if key.startswith(prefix))
+
+    def search_index(self) -> CorpusIndex:
+        """当前规则库的倒排索引（惰性构建）"""
+        corpus = self._refresh()
+        source = corpus if corpus is not None else self._rules
+        signature = (id(source), len(source))
+        if RuleEngine._index is None or RuleEngine._index_source != signature:
+            items = corpus.items() if corpus is not None else self._rules.items()
+            RuleEngine._index = CorpusIndex(items)
+            RuleEngine._index_source = signature
+        return RuleEngine._index
+
+    def search_hits(self, query: str = "", prefix: Optional[str] = None,
+                    limit: int = 10) -> List[SearchHit]:
+        """
+        全文检索（BM25排序，可按键前缀过滤）
+        Ranked full-text search over keys and values.
+        """
+        return self.search_index().search(query, prefix=prefix, limit=limit)
+
     def search(self, keyword: str, limit: int = 5) -> List[str]:
         """
         模糊搜索规则
         Fuzzy search for debugging or broad reference.
         """
-        results = []
-        for k, v in self._rules.items():
-            if keyword in k:
-                results.append(v)
-                if len(results) >= limit:
-                    break
-        return results
+        return [hit.content for hit in self.search_hits(keyword, limit=limit)]
 
 # Global instance
 engine = RuleEngine()
@@ -0,0 +1,119 @@
+"""
+玄心理命 - 规则库全文检索
+
+中文没有词边界，按字切 n-gram 建倒排索引：连续汉字取单字和相邻二字，
+字母数字按词切分（键中的 ":" "_" 均视为分隔）。查询按同样规则切分，
+多字查询只用二字组以提高区分度，结果按 BM25 排序。
+
+文档按键排序编号，键前缀（如 "bazi:theory:"）对应一段连续编号，
+前缀过滤只需两次二分。
+"""
+
+import math
+import re
+from bisect import bisect_left
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_CJK_RUN = re.compile(r"[㐀-鿿豈-﫿]+")
+_WORD = re.compile(r"[0-9a-z]+")
+
+
+def tokenize(text: str, query: bool = False) -> List[str]:
+    """
+    切分为检索词
+
+    Args:
+        text: 文本
+        query: 是否为查询；查询中的多字片段只取二字组
+    """
+    text = text.lower()
+    tokens = _WORD.findall(text)
+    for run in _CJK_RUN.findall(text):
+        if not query or len(run) == 1:
+            tokens.extend(run)
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+@dataclass
+class SearchHit:
+    """检索结果"""
+    key: str
+    score: float
+    content: str
+
+
+class CorpusIndex:
+    """规则库倒排索引"""
+
+    def __init__(self, items: Iterable[Tuple[str, str]]):
+        docs = sorted(items)
+        self.keys: List[str] = [key for key, _ in docs]
+        self.values: List[str] = [value for _, value in docs]
+        self.lengths: List[int] = []
+        postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        for doc_id, (key, value) in enumerate(docs):
+            tokens = tokenize(key) + tokenize(value)
+            self.lengths.append(len(tokens))
+            for token in tokens:
+                tf = postings[token]
+                tf[doc_id] = tf.get(doc_id, 0) + 1
+        self.postings: Dict[str, List[Tuple[int, int]]] = {
+            token: sorted(tf.items()) for token, tf in postings.items()
+        }
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+        # BM25 长度归一项按文档预先算好
+        self._norms = [
+            BM25_K1 * (1 - BM25_B + BM25_B * length / self.avg_length) if self.avg_length else BM25_K1
+            for length in self.lengths
+        ]
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def prefix_range(self, prefix: str) -> Tuple[int, int]:
+        """键前缀对应的文档编号区间 [lo, hi)"""
+        lo = bisect_left(self.keys, prefix)
+        hi = bisect_left(self.keys, prefix + "\U0010ffff", lo)
+        return lo, hi
+
+    def _idf(self, df: int) -> float:
+        n = len(self.keys)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str = "", prefix: Optional[str] = None,
+               limit: int = 10) -> List[SearchHit]:
+        """
+        检索
+
+        Args:
+            query: 查询文本；为空时按键序列出前缀下的条目
+            prefix: 键前缀过滤
+            limit: 返回条数
+        """
+        lo, hi = self.prefix_range(prefix) if prefix else (0, len(self.keys))
+        tokens = tokenize(query, query=True)
+        if not tokens:
+            return [SearchHit(self.keys[i], 0.0, self.values[i]) for i in range(lo, min(hi, lo + limit))]
+
+        scores: Dict[int, float] = defaultdict(float)
+        for token in set(tokens):
+            postings = self.postings.get(token)
+            if not postings:
+                continue
+            idf = self._idf(len(postings))
+            weight = tokens.count(token)
+            boost = weight * idf * (BM25_K1 + 1)
+            norms = self._norms
+            for doc_id, tf in postings:
+                if lo <= doc_id < hi:
+                    scores[doc_id] += boost * tf / (tf + norms[doc_id])
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        return [SearchHit(self.keys[i], round(score, 4), self.values[i]) for i, score in ranked]
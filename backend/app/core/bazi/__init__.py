@@ -2,16 +2,24 @@
 玄心理命 - 八字核心算法模块
 """
 
+from datetime import date
+
 from .calendar import (
     TIAN_GAN, DI_ZHI, SHENGXIAO,
     TIAN_GAN_WUXING, DI_ZHI_WUXING, DI_ZHI_CANG_GAN,
     TIAN_GAN_YINYANG, DI_ZHI_YINYANG,
+    GAN_INDEX, ZHI_INDEX, GAN_WUXING, ZHI_WUXING, GAN_YINYANG, ZHI_YINYANG, ZHI_CANG_GAN,
     GanZhi, SiZhu,
     get_year_ganzhi, get_month_ganzhi, get_day_ganzhi, get_hour_ganzhi,
     get_shengxiao, calculate_sizhu,
     solar_to_lunar, lunar_to_solar
 )
 
+from .jieqi import (
+    JIEQI_NAMES, JieQiTable,
+    calculate_jieqi_time, load_jieqi_table, get_jieqi_table, get_jieqi
+)
+
 from .wuxing import (
     WuXing, WuXingScore,
     WUXING_SHENG, WUXING_KE, WUXING_BEI_KE, WUXING_BEI_SHENG,
@@ -25,7 +33,11 @@ from .wuxing import (
 
 from .shishen import (
     SHISHEN_NAMES, SHISHEN_SHORT, SHISHEN_TRAITS,
+    SHISHEN_LIST, SHISHEN_TABLE, CANG_GAN_SHISHEN_TABLE,
+    SHISHEN_ARRAY, CANG_GAN_SHISHEN_ARRAY,
     get_shishen, analyze_shishen,
+    shishen_code, cang_gan_shishen_codes,
+    shishen_codes_array, cang_gan_shishen_array,
     count_shishen, get_dominant_shishen,
     get_shishen_personality,
     analyze_geju
@@ -34,7 +46,8 @@ from .shishen import (
 from .dayun import (
     Gender, DaYun, LiuNian,
     calculate_qiyun_age, calculate_dayun, calculate_liunian,
-    get_current_dayun, analyze_dayun_liunian
+    get_current_dayun, analyze_dayun_liunian,
+    LIFETIME_YEARS, iter_lifetime_timeline
 )
 
 from .shensha import (
@@ -43,6 +56,13 @@ from .shensha import (
     analyze_dizhi_relations
 )
 
+from .context import BaziContext
+from .layers import (
+    LIUNIAN_OFFSET, LIUNIAN_COUNT, to_gender, locate,
+    chart_core, analyze_core, dayun_layer, liunian_layer, dayun_rows, liunian_rows, compose
+)
+from .batch import SiZhuBatch, calculate_sizhu_batch
+
 
 def analyze_bazi(year: int, month: int, day: int, hour: int, 
                  gender: str = "男", target_year: int = None) -> dict:
@@ -60,75 +80,40 @@ def analyze_bazi(year: int, month: int, day: int, hour: int,
     Returns:
         完整的八字分析结果
     """
-    # 1. 计算四柱
-    sizhu = calculate_sizhu(year, month, day, hour)
-    
-    # 2. 五行分析
-    wuxing_score = calculate_wuxing_score(sizhu)
-    day_master_strength = get_day_master_strength(sizhu)
-    xi_yong = get_xi_yong_shen(sizhu)
-    suggestions = get_wuxing_suggestions(xi_yong)
-    
-    # 3. 十神分析
-    shishen = analyze_shishen(sizhu)
-    shishen_counts = count_shishen(sizhu)
-    personality = get_shishen_personality(sizhu)
-    geju = analyze_geju(sizhu)
-    
-    # 4. 大运流年
-    gender_enum = Gender.MALE if gender == "男" else Gender.FEMALE
-    dayun_liunian = analyze_dayun_liunian(sizhu, gender_enum, year, month, day, target_year)
+    # 1. 计算四柱，构建共享上下文（各项派生结果只计算一次）
+    ctx = BaziContext.from_datetime(year, month, day, hour)
+    sizhu = ctx.sizhu
+    if target_year is None:
+        target_year = date.today().year
     
-    # 5. 神煞分析
-    shensha = analyze_shensha(sizhu)
-    dizhi_relations = analyze_dizhi_relations(sizhu)
+    # 2. 大运流年
+    dayun_list = calculate_dayun(sizhu, to_gender(gender), year, month, day, birth_hour=hour)
+    liunian_list = calculate_liunian(sizhu, year, target_year - LIUNIAN_OFFSET, LIUNIAN_COUNT,
+                                     xi_yong=ctx.xi_yong)
     
-    return {
-        "basic_info": {
-            "birth_datetime": f"{year}年{month}月{day}日 {hour}时",
-            "gender": gender,
-            "shengxiao": get_shengxiao(year),
-            "bazi": sizhu.bazi,
-            "sizhu": {
-                "year": str(sizhu.year),
-                "month": str(sizhu.month),
-                "day": str(sizhu.day),
-                "hour": str(sizhu.hour)
-            },
-            "day_master": sizhu.day_master,
-            "day_master_wuxing": day_master_strength["day_master_wuxing"]
-        },
-        "wuxing": {
-            "scores": wuxing_score.to_dict(),
-            "percentages": wuxing_score.percentages(),
-            "balance": wuxing_score.balance_analysis(),
-            "strongest": wuxing_score.strongest(),
-            "weakest": wuxing_score.weakest()
-        },
-        "day_master_analysis": day_master_strength,
-        "xi_yong_shen": xi_yong,
-        "suggestions": suggestions,
-        "shishen": shishen,
-        "shishen_counts": shishen_counts,
-        "personality": personality,
-        "geju": geju,
-        "dayun_liunian": dayun_liunian,
-        "shensha": shensha,
-        "dizhi_relations": dizhi_relations
-    }
+    # 3. 与分层缓存共用同一拼装（见 layers）
+    return compose(chart_core(ctx), dayun_rows(dayun_list), liunian_rows(liunian_list),
+                   year, month, day, hour, gender, target_year)
 
 
 __all__ = [
     # 基础常量
     "TIAN_GAN", "DI_ZHI", "SHENGXIAO",
-    "TIAN_GAN_WUXING", "DI_ZHI_WUXING", "DI_ZHI_CANG_GAN",
+    "TIAN_GAN_WUXING", "DI_ZHI_WUXING", "DI_ZHI_CANG_GAN", "JIEQI_NAMES",
+    # 下标化查表
+    "GAN_INDEX", "ZHI_INDEX", "GAN_WUXING", "ZHI_WUXING", "GAN_YINYANG", "ZHI_YINYANG", "ZHI_CANG_GAN",
     # 数据类
     "GanZhi", "SiZhu", "WuXing", "WuXingScore", "Gender", "DaYun", "LiuNian",
-    "ShenShaType", "ShenSha",
+    "ShenShaType", "ShenSha", "BaziContext", "JieQiTable", "SiZhuBatch",
     # 核心函数
-    "calculate_sizhu", "analyze_bazi",
+    "calculate_sizhu", "calculate_sizhu_batch", "analyze_bazi",
+    "get_jieqi_table", "get_jieqi",
     "calculate_wuxing_score", "get_day_master_strength", "get_xi_yong_shen",
     "analyze_shishen", "get_shishen_personality", "analyze_geju",
-    "calculate_dayun", "calculate_liunian", "analyze_dayun_liunian",
-    "analyze_shensha", "analyze_dizhi_relations"
+    "SHISHEN_LIST", "SHISHEN_TABLE", "CANG_GAN_SHISHEN_TABLE",
+    "shishen_code", "cang_gan_shishen_codes", "shishen_codes_array", "cang_gan_shishen_array",
+    "calculate_dayun", "calculate_liunian", "analyze_dayun_liunian", "iter_lifetime_timeline",
+    "analyze_shensha", "analyze_dizhi_relations",
+    # 分层结果
+    "locate", "analyze_core", "dayun_layer", "liunian_layer", "compose"
 ]
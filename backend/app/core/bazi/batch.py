@@ -0,0 +1,146 @@
+"""
+玄心理命 - 批量排盘
+一次计算多条出生时间的四柱，供批量导入、B2B报表等场景使用
+
+四柱全部用 NumPy 下标运算完成：日柱为取模，时干查五鼠遁起始表，
+年柱、月柱在节气表上 searchsorted。未安装 NumPy 时退化为逐条计算。
+"""
+
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, List, Sequence
+
+from .calendar import TIAN_GAN, DI_ZHI, HOUR_GAN_START, calculate_sizhu
+from .jieqi import get_jieqi_table
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - 可选依赖
+    np = None
+
+
+# 日柱基准：1900年1月1日为甲戌日
+_DAY_BASE = date(1900, 1, 1)
+_DAY_BASE_ZHI = 10
+
+_PILLARS = ("year", "month", "day", "hour")
+
+
+@dataclass
+class SiZhuBatch:
+    """
+    批量四柱结果
+
+    各柱以天干、地支下标数组保存（天干0-9，地支0-11），
+    仅在输出时转换为文字。
+    """
+    year_gan: Sequence[int]
+    year_zhi: Sequence[int]
+    month_gan: Sequence[int]
+    month_zhi: Sequence[int]
+    day_gan: Sequence[int]
+    day_zhi: Sequence[int]
+    hour_gan: Sequence[int]
+    hour_zhi: Sequence[int]
+
+    def __len__(self) -> int:
+        return len(self.year_gan)
+
+    def pillar_strings(self, pillar: str) -> List[str]:
+        """某一柱的干支文字列表"""
+        gans = getattr(self, f"{pillar}_gan")
+        zhis = getattr(self, f"{pillar}_zhi")
+        return [TIAN_GAN[g] + DI_ZHI[z] for g, z in zip(gans, zhis)]
+
+    def to_records(self) -> List[Dict[str, str]]:
+        """转换为与单条排盘一致的字典列表"""
+        columns = {pillar: self.pillar_strings(pillar) for pillar in _PILLARS}
+        day_masters = [TIAN_GAN[g] for g in self.day_gan]
+        return [
+            {
+                "bazi": f"{y} {m} {d} {h}",
+                "year": y,
+                "month": m,
+                "day": d,
+                "hour": h,
+                "day_master": dm
+            }
+            for y, m, d, h, dm in zip(columns["year"], columns["month"],
+                                      columns["day"], columns["hour"], day_masters)
+        ]
+
+
+def calculate_sizhu_batch(years: Sequence[int], months: Sequence[int],
+                          days: Sequence[int], hours: Sequence[int]) -> SiZhuBatch:
+    """
+    批量计算四柱八字
+
+    Args:
+        years: 公历年份数组
+        months: 公历月份数组
+        days: 公历日数组
+        hours: 24小时制小时数数组
+
+    Returns:
+        批量四柱结果
+
+    Raises:
+        ValueError: 数组长度不一致、日期非法或超出节气表范围
+    """
+    if not (len(years) == len(months) == len(days) == len(hours)):
+        raise ValueError("年、月、日、时数组长度必须一致")
+
+    if np is None:
+        return _calculate_sizhu_batch_scalar(years, months, days, hours)
+
+    y = np.asarray(years, dtype=np.int64)
+    m = np.asarray(months, dtype=np.int64)
+    d = np.asarray(days, dtype=np.int64)
+    h = np.asarray(hours, dtype=np.int64)
+
+    if np.any((m < 1) | (m > 12) | (d < 1) | (d > 31) | (h < 0) | (h > 23)):
+        raise ValueError("月、日或小时超出范围")
+
+    # 公历日期 → datetime64[D]，并校验日是否超出当月天数
+    month_start = (y - 1970).astype("datetime64[Y]").astype("datetime64[M]") + (m - 1).astype("timedelta64[M]")
+    dates = month_start.astype("datetime64[D]") + (d - 1).astype("timedelta64[D]")
+    if np.any(dates.astype("datetime64[M]") != month_start):
+        raise ValueError("存在非法日期")
+
+    # 日柱：距基准日天数取模
+    delta = (dates - np.datetime64(_DAY_BASE, "D")).astype(np.int64)
+    day_gan = delta % 10
+    day_zhi = (_DAY_BASE_ZHI + delta) % 12
+
+    # 时柱：23点起子时，时干按五鼠遁起始表
+    hour_zhi = ((h + 1) // 2) % 12
+    hour_gan = (np.asarray(HOUR_GAN_START, dtype=np.int64)[day_gan] + hour_zhi) % 10
+
+    # 年柱、月柱：出生时刻在节序列上 searchsorted，年柱以立春分界
+    table = get_jieqi_table()
+    jie = np.asarray(table.jie, dtype=np.int64)
+    moments = (dates.astype("datetime64[s]").astype(np.int64) + h * 3600)
+    pos = np.searchsorted(jie, moments, side="right") - 1
+    if np.any((pos < 0) | (pos >= len(jie) - 1)):
+        raise ValueError(f"存在超出节气表范围({table.first_year}-{table.last_year})的日期")
+    year_gan, year_zhi = table.position_to_year_ganzhi(pos)
+    month_gan, month_zhi = table.position_to_month_ganzhi(pos)
+
+    return SiZhuBatch(
+        year_gan=year_gan, year_zhi=year_zhi,
+        month_gan=month_gan, month_zhi=month_zhi,
+        day_gan=day_gan, day_zhi=day_zhi,
+        hour_gan=hour_gan, hour_zhi=hour_zhi
+    )
+
+
+def _calculate_sizhu_batch_scalar(years, months, days, hours) -> SiZhuBatch:
+    """逐条计算（无 NumPy 时的退化实现）"""
+    columns = {f"{pillar}_{part}": [] for pillar in _PILLARS for part in ("gan", "zhi")}
+    for year, month, day, hour in zip(years, months, days, hours):
+        sizhu = calculate_sizhu(year, month, day, hour)
+        for pillar in _PILLARS:
+            ganzhi = getattr(sizhu, pillar)
+            columns[f"{pillar}_gan"].append(ganzhi.gan_index)
+            columns[f"{pillar}_zhi"].append(ganzhi.zhi_index)
+    return SiZhuBatch(**columns)
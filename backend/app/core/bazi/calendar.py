@@ -9,6 +9,8 @@ from dataclasses import dataclass
 from enum import Enum
 from functools import lru_cache
 
+from .jieqi import get_jieqi_table, birth_moment
+
 # 天干
 TIAN_GAN = ["甲", "乙", "丙", "丁", "戊", "己", "庚", "辛", "壬", "癸"]
 
@@ -66,6 +68,23 @@ DI_ZHI_YINYANG = {
     "申": "阳", "酉": "阴", "戌": "阳", "亥": "阴"
 }
 
+# ==================== 下标化查表 ====================
+# 天干 0-9、地支 0-11 的整数下标直接取属性，热路径不再做字符串查找
+
+GAN_INDEX = {gan: i for i, gan in enumerate(TIAN_GAN)}
+ZHI_INDEX = {zhi: i for i, zhi in enumerate(DI_ZHI)}
+
+GAN_WUXING = tuple(TIAN_GAN_WUXING[gan] for gan in TIAN_GAN)
+ZHI_WUXING = tuple(DI_ZHI_WUXING[zhi] for zhi in DI_ZHI)
+GAN_YINYANG = tuple(TIAN_GAN_YINYANG[gan] for gan in TIAN_GAN)
+ZHI_YINYANG = tuple(DI_ZHI_YINYANG[zhi] for zhi in DI_ZHI)
+
+# 地支藏干（天干下标，本气在前）
+ZHI_CANG_GAN = tuple(tuple(GAN_INDEX[gan] for gan in DI_ZHI_CANG_GAN[zhi]) for zhi in DI_ZHI)
+
+# 五鼠遁：日干下标 → 子时天干下标（甲己还加甲，乙庚丙作初……）
+HOUR_GAN_START = (0, 2, 4, 6, 8, 0, 2, 4, 6, 8)
+
 # 节气数据 (月份, 日期范围)
 # 每月两个节气，前一个为节，后一个为气
 JIE_QI = {
@@ -101,24 +120,57 @@ class WuXing(Enum):
     SHUI = "水"
 
 
-@dataclass
 class GanZhi:
-    """干支组合"""
-    gan: str  # 天干
-    zhi: str  # 地支
-    
+    """
+    干支组合
+
+    内部只保存天干、地支下标，文字在访问 gan/zhi 时才取出。
+    由 from_index 取得的实例全局共享，不应修改。
+    """
+    __slots__ = ("gan_index", "zhi_index")
+
+    def __init__(self, gan, zhi):
+        self.gan_index = gan if isinstance(gan, int) else GAN_INDEX[gan]
+        self.zhi_index = zhi if isinstance(zhi, int) else ZHI_INDEX[zhi]
+
+    @classmethod
+    def from_index(cls, gan_index: int, zhi_index: int) -> "GanZhi":
+        """按下标取共享的干支实例"""
+        return _GANZHI_POOL[gan_index * 12 + zhi_index]
+
+    @property
+    def gan(self) -> str:
+        """天干"""
+        return TIAN_GAN[self.gan_index]
+
+    @property
+    def zhi(self) -> str:
+        """地支"""
+        return DI_ZHI[self.zhi_index]
+
     def __str__(self) -> str:
         return f"{self.gan}{self.zhi}"
-    
+
+    def __repr__(self) -> str:
+        return f"GanZhi(gan={self.gan!r}, zhi={self.zhi!r})"
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, GanZhi):
+            return NotImplemented
+        return self.gan_index == other.gan_index and self.zhi_index == other.zhi_index
+
+    def __hash__(self) -> int:
+        return self.gan_index * 12 + self.zhi_index
+
     @property
     def wuxing_gan(self) -> str:
         """天干五行"""
-        return TIAN_GAN_WUXING[self.gan]
+        return GAN_WUXING[self.gan_index]
     
     @property
     def wuxing_zhi(self) -> str:
         """地支五行"""
-        return DI_ZHI_WUXING[self.zhi]
+        return ZHI_WUXING[self.zhi_index]
     
     @property
     def cang_gan(self) -> list:
@@ -131,6 +183,9 @@ class GanZhi:
         return get_nayin(self.gan, self.zhi)
 
 
+_GANZHI_POOL = tuple(GanZhi(g, z) for g in range(10) for z in range(12))
+
+
 # 六十甲子纳音表
 NAYIN_TABLE = {
     ("甲子", "乙丑"): "海中金", ("丙寅", "丁卯"): "炉中火",
@@ -151,106 +206,64 @@ NAYIN_TABLE = {
 }
 
 
+_NAYIN_LOOKUP = {ganzhi: nayin for pair, nayin in NAYIN_TABLE.items() for ganzhi in pair}
+
+
 def get_nayin(gan: str, zhi: str) -> str:
     """获取纳音五行"""
-    ganzhi = f"{gan}{zhi}"
-    for pair, nayin in NAYIN_TABLE.items():
-        if ganzhi in pair:
-            return nayin
-    return ""
+    return _NAYIN_LOOKUP.get(f"{gan}{zhi}", "")
 
 
 @lru_cache(maxsize=128)
-def get_year_ganzhi(year: int) -> GanZhi:
+def get_year_ganzhi(year: int, month: Optional[int] = None, day: Optional[int] = None,
+                    hour: Optional[int] = None) -> GanZhi:
     """
     计算年柱干支
-    以立春为年的分界点
+    给出月日时按节气表以立春为年的分界点（交节时刻精确到分钟）；
+    只给年份时为该公历年所对应的干支年（流年等按整年论）
     
     Args:
         year: 公历年份
+        month: 公历月份（可选）
+        day: 公历日（可选）
+        hour: 24小时制的小时数（可选，不提供时当日交节即按新年论）
     
     Returns:
         年柱干支
     """
+    if month is not None:
+        moment = birth_moment(year, month, day, hour)
+        return GanZhi.from_index(*get_jieqi_table().year_ganzhi_index(moment))
+    
     # 天干：(年份-4) % 10
     gan_index = (year - 4) % 10
     # 地支：(年份-4) % 12
     zhi_index = (year - 4) % 12
     
-    return GanZhi(TIAN_GAN[gan_index], DI_ZHI[zhi_index])
+    return GanZhi.from_index(gan_index, zhi_index)
 
 
 @lru_cache(maxsize=128)
-def get_month_ganzhi(year: int, month: int, day: int) -> GanZhi:
+def get_month_ganzhi(year: int, month: int, day: int, hour: Optional[int] = None) -> GanZhi:
     """
     计算月柱干支
-    根据节气确定月份
+    根据节气表确定月令（交节时刻精确到分钟）
     
     Args:
         year: 公历年份
         month: 公历月份
         day: 公历日
+        hour: 24小时制的小时数（可选，不提供时当日交节即按新月论）
     
     Returns:
         月柱干支
     """
-    # 确定节气月份
-    jie_qi_month = _get_jieqi_month(month, day)
-    
-    # 确定年干
-    year_gan = get_year_ganzhi(year).gan
-    year_gan_index = TIAN_GAN.index(year_gan)
-    
-    # 月干计算规则（五虎遁）:
-    # 甲己之年丙作首，乙庚之岁戊为头
-    # 丙辛必定寻庚起，丁壬壬位顺行流
-    # 戊癸之年何方发，甲寅之上好追求
-    month_gan_start = {
-        0: 2,  # 甲年起丙寅
-        5: 2,  # 己年起丙寅
-        1: 4,  # 乙年起戊寅
-        6: 4,  # 庚年起戊寅
-        2: 6,  # 丙年起庚寅
-        7: 6,  # 辛年起庚寅
-        3: 8,  # 丁年起壬寅
-        8: 8,  # 壬年起壬寅
-        4: 0,  # 戊年起甲寅
-        9: 0   # 癸年起甲寅
-    }
-    
-    start_gan = month_gan_start[year_gan_index]
-    # 月份从寅月(1)开始，到丑月(12)
-    gan_index = (start_gan + jie_qi_month - 1) % 10
-    zhi_index = (jie_qi_month + 1) % 12  # 寅月为index 2
-    
-    return GanZhi(TIAN_GAN[gan_index], DI_ZHI[zhi_index])
-
-
-def _get_jieqi_month(month: int, day: int) -> int:
-    """根据节气确定农历月份(1-12，1为寅月)"""
-    # 简化版：使用固定节气日期
-    jie_dates = {
-        1: 6, 2: 4, 3: 6, 4: 5, 5: 6, 6: 6,
-        7: 7, 8: 8, 9: 8, 10: 8, 11: 7, 12: 7
-    }
-    
-    if month == 1:
-        if day < jie_dates[1]:
-            return 12  # 丑月
-        else:
-            return 12  # 还是丑月（小寒后）
-    elif month == 2:
-        if day < jie_dates[2]:
-            return 12  # 丑月
-        else:
-            return 1   # 寅月（立春后）
-    else:
-        if day < jie_dates[month]:
-            return month - 1
-        else:
-            return month
-    
-    return month
+    # 月干按五虎遁推算（甲己之年丙作首……），六十甲子逐月连续，
+    # 节气表以此直接给出月柱下标
+    moment = birth_moment(year, month, day, hour)
+    gan_index, zhi_index = get_jieqi_table().month_ganzhi_index(moment)
+    
+    return GanZhi.from_index(gan_index, zhi_index)
 
 
 @lru_cache(maxsize=128)
@@ -280,7 +293,7 @@ def get_day_ganzhi(year: int, month: int, day: int) -> GanZhi:
     gan_index = (base_gan + delta) % 10
     zhi_index = (base_zhi + delta) % 12
     
-    return GanZhi(TIAN_GAN[gan_index], DI_ZHI[zhi_index])
+    return GanZhi.from_index(gan_index, zhi_index)
 
 
 def get_hour_ganzhi(day_gan: str, hour: int) -> GanZhi:
@@ -294,61 +307,26 @@ def get_hour_ganzhi(day_gan: str, hour: int) -> GanZhi:
     Returns:
         时柱干支
     """
-    # 地支时辰对应（23-1点为子时）
-    hour_zhi_map = {
-        (23, 24): 0, (0, 1): 0,    # 子时
-        (1, 3): 1,                  # 丑时
-        (3, 5): 2,                  # 寅时
-        (5, 7): 3,                  # 卯时
-        (7, 9): 4,                  # 辰时
-        (9, 11): 5,                 # 巳时
-        (11, 13): 6,                # 午时
-        (13, 15): 7,                # 未时
-        (15, 17): 8,                # 申时
-        (17, 19): 9,                # 酉时
-        (19, 21): 10,               # 戌时
-        (21, 23): 11                # 亥时
-    }
-    
-    # 确定时辰地支
-    zhi_index = 0
-    for (start, end), idx in hour_zhi_map.items():
-        if start <= hour < end or (start == 23 and hour >= 23):
-            zhi_index = idx
-            break
+    # 确定时辰地支（23-1点为子时，之后每两小时一个时辰）
+    zhi_index = ((hour + 1) // 2) % 12
     
     # 时干计算规则（五鼠遁）:
     # 甲己还加甲，乙庚丙作初
     # 丙辛从戊起，丁壬庚子居
     # 戊癸何方发，壬子是真途
-    day_gan_index = TIAN_GAN.index(day_gan)
-    hour_gan_start = {
-        0: 0,  # 甲日起甲子
-        5: 0,  # 己日起甲子
-        1: 2,  # 乙日起丙子
-        6: 2,  # 庚日起丙子
-        2: 4,  # 丙日起戊子
-        7: 4,  # 辛日起戊子
-        3: 6,  # 丁日起庚子
-        8: 6,  # 壬日起庚子
-        4: 8,  # 戊日起壬子
-        9: 8   # 癸日起壬子
-    }
-    
-    start_gan = hour_gan_start[day_gan_index]
+    start_gan = HOUR_GAN_START[GAN_INDEX[day_gan]]
     gan_index = (start_gan + zhi_index) % 10
     
-    return GanZhi(TIAN_GAN[gan_index], DI_ZHI[zhi_index])
+    return GanZhi.from_index(gan_index, zhi_index)
 
 
-def get_shengxiao(year: int) -> str:
-    """获取生肖"""
-    year_zhi = get_year_ganzhi(year).zhi
-    zhi_index = DI_ZHI.index(year_zhi)
-    return SHENGXIAO[zhi_index]
+def get_shengxiao(year: int, month: Optional[int] = None, day: Optional[int] = None,
+                  hour: Optional[int] = None) -> str:
+    """获取生肖（给出月日时按立春分界，与年柱一致）"""
+    return SHENGXIAO[get_year_ganzhi(year, month, day, hour).zhi_index]
 
 
-@dataclass
+@dataclass(slots=True)
 class SiZhu:
     """四柱八字"""
     year: GanZhi    # 年柱
@@ -374,6 +352,14 @@ class SiZhu:
         """获取四柱所有地支"""
         return [self.year.zhi, self.month.zhi, self.day.zhi, self.hour.zhi]
     
+    def get_all_gan_index(self) -> tuple:
+        """获取四柱所有天干下标"""
+        return (self.year.gan_index, self.month.gan_index, self.day.gan_index, self.hour.gan_index)
+    
+    def get_all_zhi_index(self) -> tuple:
+        """获取四柱所有地支下标"""
+        return (self.year.zhi_index, self.month.zhi_index, self.day.zhi_index, self.hour.zhi_index)
+    
     def get_all_cang_gan(self) -> dict:
         """获取所有地支藏干"""
         return {
@@ -397,8 +383,8 @@ def calculate_sizhu(year: int, month: int, day: int, hour: int) -> SiZhu:
     Returns:
         四柱八字对象
     """
-    year_gz = get_year_ganzhi(year)
-    month_gz = get_month_ganzhi(year, month, day)
+    year_gz = get_year_ganzhi(year, month, day, hour)
+    month_gz = get_month_ganzhi(year, month, day, hour)
     day_gz = get_day_ganzhi(year, month, day)
     hour_gz = get_hour_ganzhi(day_gz.gan, hour)
     
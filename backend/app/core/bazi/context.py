@@ -0,0 +1,97 @@
+"""
+玄心理命 - 八字命盘上下文
+一次排盘内共享的派生结果，保证每项分析只计算一次
+"""
+
+from functools import cached_property
+from typing import Dict, List, Tuple
+
+from .calendar import SiZhu, calculate_sizhu
+from .wuxing import (
+    WuXingScore, calculate_wuxing_score,
+    get_day_master_strength, get_xi_yong_shen, get_wuxing_suggestions
+)
+from .shishen import (
+    analyze_shishen, count_shishen, get_dominant_shishen,
+    get_shishen_personality, analyze_geju
+)
+from .shensha import analyze_shensha, analyze_dizhi_relations
+
+
+class BaziContext:
+    """
+    八字命盘上下文
+
+    由四柱构建，各项派生结果按依赖链惰性计算并缓存：
+    五行得分 → 日主强弱 → 喜用神；十神 → 十神统计 → 主导十神/格局。
+    同一请求内的所有子分析都从这里读取，避免重复计算。
+    """
+
+    def __init__(self, sizhu: SiZhu):
+        self.sizhu = sizhu
+
+    @classmethod
+    def from_datetime(cls, year: int, month: int, day: int, hour: int) -> "BaziContext":
+        """由公历出生时间构建上下文"""
+        return cls(calculate_sizhu(year, month, day, hour))
+
+    # ==================== 五行 ====================
+
+    @cached_property
+    def wuxing_score(self) -> WuXingScore:
+        """五行得分"""
+        return calculate_wuxing_score(self.sizhu)
+
+    @cached_property
+    def day_master_strength(self) -> Dict:
+        """日主强弱"""
+        return get_day_master_strength(self.sizhu, score=self.wuxing_score)
+
+    @cached_property
+    def xi_yong(self) -> Dict:
+        """喜用神"""
+        return get_xi_yong_shen(self.sizhu, strength=self.day_master_strength)
+
+    @cached_property
+    def suggestions(self) -> Dict:
+        """喜用神建议"""
+        return get_wuxing_suggestions(self.xi_yong)
+
+    # ==================== 十神 ====================
+
+    @cached_property
+    def shishen(self) -> Dict:
+        """四柱十神"""
+        return analyze_shishen(self.sizhu)
+
+    @cached_property
+    def shishen_counts(self) -> Dict[str, int]:
+        """十神统计"""
+        return count_shishen(self.sizhu)
+
+    @cached_property
+    def dominant_shishen(self) -> List[Tuple[str, int]]:
+        """主导十神"""
+        return get_dominant_shishen(self.sizhu, counts=self.shishen_counts)
+
+    @cached_property
+    def personality(self) -> Dict:
+        """十神性格"""
+        return get_shishen_personality(self.sizhu, dominant=self.dominant_shishen)
+
+    @cached_property
+    def geju(self) -> Dict:
+        """格局"""
+        return analyze_geju(self.sizhu, counts=self.shishen_counts)
+
+    # ==================== 神煞 ====================
+
+    @cached_property
+    def shensha(self) -> Dict:
+        """神煞"""
+        return analyze_shensha(self.sizhu)
+
+    @cached_property
+    def dizhi_relations(self) -> Dict:
+        """地支关系"""
+        return analyze_dizhi_relations(self.sizhu)
@@ -3,13 +3,13 @@
 大运计算、流年分析、运势预测
 """
 
-from typing import Dict, List, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 from dataclasses import dataclass
 from datetime import date
 from enum import Enum
 
 from .calendar import (
-    SiZhu, GanZhi, TIAN_GAN, DI_ZHI,
+    SiZhu, GanZhi,
     TIAN_GAN_WUXING, DI_ZHI_WUXING,
     TIAN_GAN_YINYANG, get_year_ganzhi
 )
@@ -17,7 +17,11 @@ from .wuxing import (
     calculate_wuxing_score, get_xi_yong_shen,
     WUXING_SHENG, WUXING_KE
 )
-from .shishen import get_shishen, SHISHEN_TRAITS
+from .shishen import (
+    shishen_code, SHISHEN_LIST, CANG_GAN_SHISHEN_TABLE, SHISHEN_TRAITS
+)
+from .shensha import get_shensha_for_liunian
+from .jieqi import count_days_to_jie
 
 
 class Gender(Enum):
@@ -54,7 +58,15 @@ class LiuNian:
         return f"{self.year}年({self.age}岁): {self.ganzhi} [{self.rating}]"
 
 
-def calculate_qiyun_age(sizhu: SiZhu, gender: Gender, birth_year: int, birth_month: int, birth_day: int) -> int:
+def is_dayun_forward(sizhu: SiZhu, gender: Gender) -> bool:
+    """大运顺逆：阳年男命、阴年女命顺行，其余逆行"""
+    year_yinyang = TIAN_GAN_YINYANG[sizhu.year.gan]
+    return (year_yinyang == "阳" and gender == Gender.MALE) or \
+           (year_yinyang == "阴" and gender == Gender.FEMALE)
+
+
+def calculate_qiyun_age(sizhu: SiZhu, gender: Gender, birth_year: int, birth_month: int, birth_day: int,
+                        birth_hour: int = None) -> int:
     """
     计算起运年龄
     
@@ -67,49 +79,15 @@ def calculate_qiyun_age(sizhu: SiZhu, gender: Gender, birth_year: int, birth_mon
         sizhu: 四柱八字
         gender: 性别
         birth_year, birth_month, birth_day: 出生日期
+        birth_hour: 出生小时（可选，提供时精确到交节时刻）
     
     Returns:
         起运年龄
     """
-    year_gan = sizhu.year.gan
-    year_yinyang = TIAN_GAN_YINYANG[year_gan]
-    
-    # 判断顺逆
-    if (year_yinyang == "阳" and gender == Gender.MALE) or \
-       (year_yinyang == "阴" and gender == Gender.FEMALE):
-        is_forward = True   # 顺行
-    else:
-        is_forward = False  # 逆行
-    
-    # 简化计算：使用固定节气日期估算
-    # 实际应精确计算到下一个/上一个节气的天数
-    jie_dates = {
-        1: 6, 2: 4, 3: 6, 4: 5, 5: 6, 6: 6,
-        7: 7, 8: 8, 9: 8, 10: 8, 11: 7, 12: 7
-    }
+    is_forward = is_dayun_forward(sizhu, gender)
     
-    if is_forward:
-        # 顺行：数到下一个节气
-        if birth_month == 12:
-            next_jie_day = jie_dates[1]
-            days_to_jie = (31 - birth_day) + next_jie_day
-        else:
-            next_jie_day = jie_dates[birth_month + 1]
-            days_in_month = [0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
-            days_to_jie = (days_in_month[birth_month] - birth_day) + next_jie_day
-    else:
-        # 逆行：数到上一个节气
-        current_jie_day = jie_dates[birth_month]
-        if birth_day >= current_jie_day:
-            days_to_jie = birth_day - current_jie_day
-        else:
-            if birth_month == 1:
-                prev_jie_day = jie_dates[12]
-                days_to_jie = birth_day + (31 - prev_jie_day)
-            else:
-                prev_jie_day = jie_dates[birth_month - 1]
-                days_in_prev = [0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
-                days_to_jie = birth_day + (days_in_prev[birth_month - 1] - prev_jie_day)
+    # 顺行数到下一个节，逆行数到上一个节（查节气表）
+    days_to_jie = count_days_to_jie(birth_year, birth_month, birth_day, birth_hour, forward=is_forward)
     
     # 三天为一岁，不足三天按四舍五入
     qiyun_age = round(days_to_jie / 3)
@@ -121,7 +99,8 @@ def calculate_qiyun_age(sizhu: SiZhu, gender: Gender, birth_year: int, birth_mon
     return qiyun_age, is_forward
 
 
-def calculate_dayun(sizhu: SiZhu, gender: Gender, birth_year: int, birth_month: int, birth_day: int, count: int = 8) -> List[DaYun]:
+def calculate_dayun(sizhu: SiZhu, gender: Gender, birth_year: int, birth_month: int, birth_day: int, count: int = 8,
+                    birth_hour: int = None) -> List[DaYun]:
     """
     计算大运
     
@@ -130,52 +109,42 @@ def calculate_dayun(sizhu: SiZhu, gender: Gender, birth_year: int, birth_month:
         gender: 性别
         birth_year, birth_month, birth_day: 出生日期
         count: 计算多少步大运
+        birth_hour: 出生小时（可选，用于精确起运）
     
     Returns:
         大运列表
     """
-    qiyun_age, is_forward = calculate_qiyun_age(sizhu, gender, birth_year, birth_month, birth_day)
-    
-    day_master = sizhu.day_master
-    month_gan_idx = TIAN_GAN.index(sizhu.month.gan)
-    month_zhi_idx = DI_ZHI.index(sizhu.month.zhi)
-    
-    dayun_list = []
-    
-    for i in range(count):
-        if is_forward:
-            # 顺行：月柱往后推
-            gan_idx = (month_gan_idx + i + 1) % 10
-            zhi_idx = (month_zhi_idx + i + 1) % 12
-        else:
-            # 逆行：月柱往前推
-            gan_idx = (month_gan_idx - i - 1) % 10
-            zhi_idx = (month_zhi_idx - i - 1) % 12
-        
-        ganzhi = GanZhi(TIAN_GAN[gan_idx], DI_ZHI[zhi_idx])
-        
-        # 计算十神
-        shishen_gan = get_shishen(day_master, ganzhi.gan)
-        from .calendar import DI_ZHI_CANG_GAN
-        main_canggan = DI_ZHI_CANG_GAN[ganzhi.zhi][0]
-        shishen_zhi = get_shishen(day_master, main_canggan)
-        
-        start_age = qiyun_age + i * 10
-        end_age = start_age + 9
-        
-        dayun_list.append(DaYun(
-            order=i + 1,
-            start_age=start_age,
-            end_age=end_age,
-            ganzhi=ganzhi,
-            shishen_gan=shishen_gan,
-            shishen_zhi=shishen_zhi
-        ))
+    qiyun_age, is_forward = calculate_qiyun_age(sizhu, gender, birth_year, birth_month, birth_day, birth_hour)
     
-    return dayun_list
+    return [_make_dayun(sizhu, qiyun_age, is_forward, i) for i in range(count)]
 
 
-def calculate_liunian(sizhu: SiZhu, birth_year: int, start_year: int, count: int = 10) -> List[LiuNian]:
+def _make_dayun(sizhu: SiZhu, qiyun_age: int, is_forward: bool, i: int) -> DaYun:
+    """第 i 步大运（从0起）"""
+    day_gan = sizhu.day.gan_index
+    step = i + 1 if is_forward else -i - 1
+    
+    # 顺行月柱往后推，逆行月柱往前推
+    ganzhi = GanZhi.from_index((sizhu.month.gan_index + step) % 10, (sizhu.month.zhi_index + step) % 12)
+    
+    # 计算十神
+    shishen_gan = SHISHEN_LIST[shishen_code(day_gan, ganzhi.gan_index)]
+    shishen_zhi = SHISHEN_LIST[CANG_GAN_SHISHEN_TABLE[(day_gan * 12 + ganzhi.zhi_index) * 3]]
+    
+    start_age = qiyun_age + i * 10
+    
+    return DaYun(
+        order=i + 1,
+        start_age=start_age,
+        end_age=start_age + 9,
+        ganzhi=ganzhi,
+        shishen_gan=shishen_gan,
+        shishen_zhi=shishen_zhi
+    )
+
+
+def calculate_liunian(sizhu: SiZhu, birth_year: int, start_year: int, count: int = 10,
+                      xi_yong: Dict = None) -> List[LiuNian]:
     """
     计算流年
     
@@ -184,43 +153,38 @@ def calculate_liunian(sizhu: SiZhu, birth_year: int, start_year: int, count: int
         birth_year: 出生年份
         start_year: 起始年份
         count: 计算多少年
+        xi_yong: 已计算的喜用神结果（可选，避免重复计算）
     
     Returns:
         流年列表
     """
-    day_master = sizhu.day_master
-    xi_yong = get_xi_yong_shen(sizhu)
-    yong_shen = xi_yong.get("yong_shen", [])
-    xi_shen = xi_yong.get("xi_shen", [])
-    ji_shen = xi_yong.get("ji_shen", [])
-    
-    liunian_list = []
+    if xi_yong is None:
+        xi_yong = get_xi_yong_shen(sizhu)
     
-    for i in range(count):
-        year = start_year + i
-        age = year - birth_year + 1  # 虚岁
-        
-        ganzhi = get_year_ganzhi(year)
-        
-        # 计算十神
-        shishen_gan = get_shishen(day_master, ganzhi.gan)
-        from .calendar import DI_ZHI_CANG_GAN
-        main_canggan = DI_ZHI_CANG_GAN[ganzhi.zhi][0]
-        shishen_zhi = get_shishen(day_master, main_canggan)
-        
-        # 评估流年运势
-        rating = _rate_liunian(ganzhi, yong_shen, xi_shen, ji_shen)
-        
-        liunian_list.append(LiuNian(
-            year=year,
-            age=age,
-            ganzhi=ganzhi,
-            shishen_gan=shishen_gan,
-            shishen_zhi=shishen_zhi,
-            rating=rating
-        ))
-    
-    return liunian_list
+    return [_make_liunian(sizhu, birth_year, start_year + i, xi_yong) for i in range(count)]
+
+
+def _make_liunian(sizhu: SiZhu, birth_year: int, year: int, xi_yong: Dict) -> LiuNian:
+    """某一年的流年"""
+    day_gan = sizhu.day.gan_index
+    ganzhi = get_year_ganzhi(year)
+    
+    # 计算十神
+    shishen_gan = SHISHEN_LIST[shishen_code(day_gan, ganzhi.gan_index)]
+    shishen_zhi = SHISHEN_LIST[CANG_GAN_SHISHEN_TABLE[(day_gan * 12 + ganzhi.zhi_index) * 3]]
+    
+    # 评估流年运势
+    rating = _rate_liunian(ganzhi, xi_yong.get("yong_shen", []),
+                           xi_yong.get("xi_shen", []), xi_yong.get("ji_shen", []))
+    
+    return LiuNian(
+        year=year,
+        age=year - birth_year + 1,  # 虚岁
+        ganzhi=ganzhi,
+        shishen_gan=shishen_gan,
+        shishen_zhi=shishen_zhi,
+        rating=rating
+    )
 
 
 def _rate_liunian(ganzhi: GanZhi, yong_shen: List[str], xi_shen: List[str], ji_shen: List[str]) -> str:
@@ -266,9 +230,81 @@ def get_current_dayun(dayun_list: List[DaYun], current_age: int) -> DaYun:
     return dayun_list[-1] if dayun_list else None
 
 
+# 终身时间线默认跨度（年）
+LIFETIME_YEARS = 100
+
+
+def iter_lifetime_timeline(sizhu: SiZhu, gender: Gender,
+                           birth_year: int, birth_month: int, birth_day: int,
+                           birth_hour: int = None, start_year: int = None,
+                           end_year: int = None, xi_yong: Dict = None) -> Iterator[Dict]:
+    """
+    逐年生成终身大运流年时间线
+    
+    喜用神、起运只计算一次，之后每年按需推算，内存占用与跨度无关。
+    
+    Args:
+        sizhu: 四柱八字
+        gender: 性别
+        birth_year, birth_month, birth_day: 出生日期
+        birth_hour: 出生小时（可选，用于精确起运）
+        start_year: 起始年份（默认出生年）
+        end_year: 结束年份（含，默认出生后 LIFETIME_YEARS 年）
+        xi_yong: 已计算的喜用神结果（可选，避免重复计算）
+    
+    Yields:
+        每年一条记录：流年干支、十神、评级、所在大运、流年神煞
+    """
+    if start_year is None:
+        start_year = birth_year
+    if end_year is None:
+        end_year = birth_year + LIFETIME_YEARS - 1
+    if xi_yong is None:
+        xi_yong = get_xi_yong_shen(sizhu)
+    
+    qiyun_age, is_forward = calculate_qiyun_age(sizhu, gender, birth_year, birth_month, birth_day, birth_hour)
+    
+    dayun: Optional[Dict] = None
+    dayun_index = None
+    shensha_by_zhi: Dict[int, List[Dict]] = {}
+    
+    for year in range(start_year, end_year + 1):
+        ln = _make_liunian(sizhu, birth_year, year, xi_yong)
+        
+        # 起运前不行大运；之后每十年换一步
+        index = (ln.age - qiyun_age) // 10 if ln.age >= qiyun_age else None
+        if index != dayun_index:
+            dayun_index = index
+            dayun = None
+            if index is not None:
+                dy = _make_dayun(sizhu, qiyun_age, is_forward, index)
+                dayun = {
+                    "order": dy.order,
+                    "range": f"{dy.start_age}-{dy.end_age}岁",
+                    "ganzhi": str(dy.ganzhi),
+                    "shishen": f"{dy.shishen_gan}/{dy.shishen_zhi}"
+                }
+        
+        # 流年神煞只取决于流年地支
+        zhi = ln.ganzhi.zhi_index
+        if zhi not in shensha_by_zhi:
+            shensha_by_zhi[zhi] = get_shensha_for_liunian(sizhu, ln.ganzhi.zhi)
+        
+        yield {
+            "year": ln.year,
+            "age": ln.age,
+            "ganzhi": str(ln.ganzhi),
+            "shishen": f"{ln.shishen_gan}/{ln.shishen_zhi}",
+            "rating": ln.rating,
+            "dayun": dayun,
+            "shensha": shensha_by_zhi[zhi]
+        }
+
+
 def analyze_dayun_liunian(sizhu: SiZhu, gender: Gender, 
                           birth_year: int, birth_month: int, birth_day: int,
-                          target_year: int = None) -> Dict:
+                          target_year: int = None, xi_yong: Dict = None,
+                          birth_hour: int = None) -> Dict:
     """
     综合分析大运流年
     
@@ -277,6 +313,8 @@ def analyze_dayun_liunian(sizhu: SiZhu, gender: Gender,
         gender: 性别
         birth_year, birth_month, birth_day: 出生日期
         target_year: 目标年份（默认当年）
+        xi_yong: 已计算的喜用神结果（可选，避免重复计算）
+        birth_hour: 出生小时（可选，用于精确起运）
     
     Returns:
         大运流年分析结果
@@ -284,14 +322,36 @@ def analyze_dayun_liunian(sizhu: SiZhu, gender: Gender,
     if target_year is None:
         target_year = date.today().year
     
-    current_age = target_year - birth_year + 1
-    
     # 计算大运
-    dayun_list = calculate_dayun(sizhu, gender, birth_year, birth_month, birth_day)
-    current_dayun = get_current_dayun(dayun_list, current_age)
+    dayun_list = calculate_dayun(sizhu, gender, birth_year, birth_month, birth_day,
+                                 birth_hour=birth_hour)
     
     # 计算流年（前后5年）
-    liunian_list = calculate_liunian(sizhu, birth_year, target_year - 2, 10)
+    liunian_list = calculate_liunian(sizhu, birth_year, target_year - 2, 10, xi_yong=xi_yong)
+    
+    return summarize_dayun_liunian(sizhu, gender, birth_year, birth_month, birth_day,
+                                   target_year, dayun_list, liunian_list)
+
+
+def summarize_dayun_liunian(sizhu: SiZhu, gender: Gender,
+                            birth_year: int, birth_month: int, birth_day: int, target_year: int,
+                            dayun_list: List[DaYun], liunian_list: List[LiuNian]) -> Dict:
+    """
+    由已算好的大运、流年列表汇总分析结果（定位当前大运流年并做组合分析）
+    
+    Args:
+        sizhu: 四柱八字
+        gender: 性别
+        birth_year, birth_month, birth_day: 出生日期
+        target_year: 目标年份
+        dayun_list: 大运列表
+        liunian_list: 以 target_year - 2 起的流年列表
+    
+    Returns:
+        大运流年分析结果
+    """
+    current_age = target_year - birth_year + 1
+    current_dayun = get_current_dayun(dayun_list, current_age)
     current_liunian = next((ln for ln in liunian_list if ln.year == target_year), None)
     
     # 大运流年组合分析
@@ -0,0 +1,416 @@
+"""
+玄心理命 - 节气引擎
+精确计算二十四节气交节时刻，预先生成节气表并缓存到磁盘（可mmap）
+
+太阳视黄经采用 VSOP87 截断级数（Meeus《天文算法》第32章）加章动、光行差修正，
+交节时刻精度约1分钟。节气表在首次使用时按年份范围一次性生成，之后月柱、起运
+查询只需在表上二分查找，不再做任何天文计算。
+"""
+
+import math
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_right
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+
+# 二十四节气（按公历年内顺序，从小寒开始）
+# 偶数下标为"节"（定月令），奇数下标为"气"
+JIEQI_NAMES = [
+    "小寒", "大寒", "立春", "雨水", "惊蛰", "春分",
+    "清明", "谷雨", "立夏", "小满", "芒种", "夏至",
+    "小暑", "大暑", "立秋", "处暑", "白露", "秋分",
+    "寒露", "霜降", "立冬", "小雪", "大雪", "冬至"
+]
+
+# 小寒对应的太阳视黄经（度），之后每个节气递增15度
+_XIAOHAN_LONGITUDE = 285.0
+
+# 节气表默认覆盖范围（可通过环境变量调整）
+DEFAULT_START_YEAR = int(os.getenv("JIEQI_START_YEAR", "1900"))
+DEFAULT_END_YEAR = int(os.getenv("JIEQI_END_YEAR", "2100"))
+
+# 节气表磁盘缓存目录
+JIEQI_CACHE_DIR = os.getenv(
+    "JIEQI_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "data", "jieqi")
+)
+
+# 北京时间相对UTC的偏移
+_CST_OFFSET = timedelta(hours=8)
+
+# 时间戳基准：表中存储的是北京时间自该时刻起的秒数
+_EPOCH = datetime(1970, 1, 1)
+
+# J2000.0 对应的儒略日及UTC时刻
+_J2000 = 2451545.0
+_J2000_DATETIME = datetime(2000, 1, 1, 12)
+
+# 缓存文件头：魔数、版本、字节序、起始年、年数
+_CACHE_MAGIC = b"YTJQ"
+_CACHE_VERSION = 1
+_CACHE_HEADER = struct.Struct("<4sHBxhH4x")
+
+
+# ==================== 天文计算 ====================
+
+# VSOP87 地球日心黄经截断级数 (A, B, C)：A·cos(B + C·τ)
+_VSOP87_L0 = (
+    (175347046, 0, 0), (3341656, 4.6692568, 6283.07585), (34894, 4.6261, 12566.1517),
+    (3497, 2.7441, 5753.3849), (3418, 2.8289, 3.5231), (3136, 3.6277, 77713.7715),
+    (2676, 4.4181, 7860.4194), (2343, 6.1352, 3930.2097), (1324, 0.7425, 11506.7698),
+    (1273, 2.0371, 529.691), (1199, 1.1096, 1577.3435), (990, 5.233, 5884.927),
+    (902, 2.045, 26.298), (857, 3.508, 398.149), (780, 1.179, 5223.694),
+    (753, 2.533, 5507.553), (505, 4.583, 18849.228), (492, 4.205, 775.523),
+    (357, 2.92, 0.067), (317, 5.849, 11790.629), (284, 1.899, 796.298),
+    (271, 0.315, 10977.079), (243, 0.345, 5486.778), (206, 4.806, 2544.314),
+    (205, 1.869, 5573.143), (202, 2.458, 6069.777), (156, 0.833, 213.299),
+    (132, 3.411, 2942.463), (126, 1.083, 20.775), (115, 0.645, 0.98),
+    (103, 0.636, 4694.003), (102, 0.976, 15720.839), (102, 4.267, 7.114),
+    (99, 6.21, 2146.17), (98, 0.68, 155.42), (86, 5.98, 161000.69),
+    (85, 1.3, 6275.96), (85, 3.67, 71430.7), (80, 1.81, 17260.15),
+    (79, 3.04, 12036.46), (75, 1.76, 5088.63), (74, 3.5, 3154.69),
+    (74, 4.68, 801.82), (70, 0.83, 9437.76), (62, 3.98, 8827.39),
+    (61, 1.82, 7084.9), (57, 2.78, 6286.6), (56, 4.39, 14143.5),
+    (56, 3.47, 6279.55), (52, 0.19, 12139.55), (52, 1.33, 1748.02),
+    (51, 0.28, 5856.48), (49, 0.49, 1194.45), (41, 5.37, 8429.24),
+    (41, 2.4, 19651.05), (39, 6.17, 10447.39), (37, 6.04, 10213.29),
+    (37, 2.57, 1059.38), (36, 1.71, 2352.87), (36, 1.78, 6812.77),
+    (33, 0.59, 17789.85), (30, 0.44, 83996.85), (30, 2.74, 1349.87),
+    (25, 3.16, 4690.48)
+)
+_VSOP87_L1 = (
+    (628331966747, 0, 0), (206059, 2.678235, 6283.07585), (4303, 2.6351, 12566.1517),
+    (425, 1.59, 3.523), (119, 5.796, 26.298), (109, 2.966, 1577.344),
+    (93, 2.59, 18849.23), (72, 1.14, 529.69), (68, 1.87, 398.15),
+    (67, 4.41, 5507.55), (59, 2.89, 5223.69), (56, 2.17, 155.42),
+    (45, 0.4, 796.3), (36, 0.47, 775.52), (29, 2.65, 7.11),
+    (21, 5.34, 0.98), (19, 1.85, 5486.78), (19, 4.97, 213.3),
+    (17, 2.99, 6275.96), (16, 0.03, 2544.31), (16, 1.43, 2146.17),
+    (15, 1.21, 10977.08), (12, 2.83, 1748.02), (12, 3.26, 5088.63),
+    (12, 5.27, 1194.45), (12, 2.08, 4694.0), (11, 0.77, 553.57),
+    (10, 1.3, 6286.6), (10, 4.24, 1349.87), (9, 2.7, 242.73),
+    (9, 5.64, 951.72), (8, 5.3, 2352.87), (6, 2.65, 9437.76),
+    (6, 4.67, 4690.48)
+)
+_VSOP87_L2 = (
+    (52919, 0, 0), (8720, 1.0721, 6283.0758), (309, 0.867, 12566.152),
+    (27, 0.05, 3.52), (16, 5.19, 26.3), (16, 3.68, 155.42),
+    (10, 0.76, 18849.23), (9, 2.06, 77713.77), (7, 0.83, 775.52),
+    (5, 4.66, 1577.34), (4, 1.03, 7.11), (4, 3.44, 5573.14),
+    (3, 5.14, 796.3), (3, 6.05, 5507.55), (3, 1.19, 242.73),
+    (3, 6.12, 529.69), (3, 0.31, 398.15), (3, 2.28, 553.57),
+    (2, 4.38, 5223.69), (2, 3.75, 0.98)
+)
+_VSOP87_L3 = (
+    (289, 5.844, 6283.076), (35, 0, 0), (17, 5.49, 12566.15),
+    (3, 5.2, 155.42), (1, 4.72, 3.52), (1, 5.3, 18849.23),
+    (1, 5.97, 242.73)
+)
+_VSOP87_L4 = ((114, 3.142, 0), (8, 4.13, 6283.08), (1, 3.84, 12566.15))
+_VSOP87_L5 = ((1, 3.14, 0),)
+
+_VSOP87_L = (_VSOP87_L0, _VSOP87_L1, _VSOP87_L2, _VSOP87_L3, _VSOP87_L4, _VSOP87_L5)
+
+
+def solar_longitude(jde: float) -> float:
+    """
+    计算太阳视黄经
+
+    Args:
+        jde: 力学时儒略日
+
+    Returns:
+        太阳视黄经（度，0-360）
+    """
+    tau = (jde - _J2000) / 365250.0
+    heliocentric = 0.0
+    for power, series in enumerate(_VSOP87_L):
+        heliocentric += sum(a * math.cos(b + c * tau) for a, b, c in series) * tau ** power
+    longitude = math.degrees(heliocentric / 1e8) + 180.0
+
+    # 章动（黄经章动主要项）、FK5修正、光行差，单位角秒
+    t = tau * 10
+    omega = math.radians(125.04452 - 1934.136261 * t)
+    sun_mean = math.radians(280.4665 + 36000.7698 * t)
+    moon_mean = math.radians(218.3165 + 481267.8813 * t)
+    nutation = (-17.20 * math.sin(omega) - 1.32 * math.sin(2 * sun_mean)
+                - 0.23 * math.sin(2 * moon_mean) + 0.21 * math.sin(2 * omega))
+    longitude += (nutation - 0.09033 - 20.4898) / 3600.0
+
+    return longitude % 360.0
+
+
+def _delta_t(year: float) -> float:
+    """力学时与世界时之差ΔT（秒），Espenak-Meeus 多项式"""
+    if year < 1900:
+        t = year - 1860
+        return (7.62 + 0.5737 * t - 0.251754 * t ** 2 + 0.01680668 * t ** 3
+                - 0.0004473624 * t ** 4 + t ** 5 / 233174)
+    if year < 1920:
+        t = year - 1900
+        return -2.79 + 1.494119 * t - 0.0598939 * t ** 2 + 0.0061966 * t ** 3 - 0.000197 * t ** 4
+    if year < 1941:
+        t = year - 1920
+        return 21.20 + 0.84493 * t - 0.076100 * t ** 2 + 0.0020936 * t ** 3
+    if year < 1961:
+        t = year - 1950
+        return 29.07 + 0.407 * t - t ** 2 / 233 + t ** 3 / 2547
+    if year < 1986:
+        t = year - 1975
+        return 45.45 + 1.067 * t - t ** 2 / 260 - t ** 3 / 718
+    if year < 2005:
+        t = year - 2000
+        return (63.86 + 0.3345 * t - 0.060374 * t ** 2 + 0.0017275 * t ** 3
+                + 0.000651814 * t ** 4 + 0.00002373599 * t ** 5)
+    if year < 2050:
+        t = year - 2000
+        return 62.92 + 0.32217 * t + 0.005589 * t ** 2
+    if year < 2150:
+        return -20 + 32 * ((year - 1820) / 100) ** 2 - 0.5628 * (2150 - year)
+    return -20 + 32 * ((year - 1820) / 100) ** 2
+
+
+def calculate_jieqi_time(year: int, index: int) -> datetime:
+    """
+    计算某年第 index 个节气的交节时刻（北京时间）
+
+    Args:
+        year: 公历年份
+        index: 节气序号（0为小寒，23为冬至）
+
+    Returns:
+        交节时刻
+    """
+    target = (_XIAOHAN_LONGITUDE + 15.0 * index) % 360.0
+    # 初值：按平均回归年估算，再用牛顿迭代逼近
+    jde = _J2000 + (year - 2000) * 365.2422 + (5.0 + 15.2 * index) - 0.5
+    for _ in range(10):
+        diff = (target - solar_longitude(jde) + 180.0) % 360.0 - 180.0
+        jde += diff * 365.2422 / 360.0
+        if abs(diff) < 1e-7:
+            break
+    utc = _J2000_DATETIME + timedelta(days=jde - _J2000, seconds=-_delta_t(year + index / 24.0))
+    return utc + _CST_OFFSET
+
+
+def build_jieqi_table(start_year: int, end_year: int) -> array:
+    """
+    生成节气表
+
+    覆盖 start_year-1 至 end_year+1，保证范围首尾的月柱、起运都能找到相邻节气。
+    每年24项，按时间顺序排列，值为北京时间相对1970-01-01的秒数。
+    """
+    table = array("q")
+    for year in range(start_year - 1, end_year + 2):
+        for index in range(24):
+            moment = calculate_jieqi_time(year, index)
+            table.append(round((moment - _EPOCH).total_seconds()))
+    return table
+
+
+# ==================== 节气表 ====================
+
+def _to_seconds(moment: datetime) -> int:
+    return int((moment - _EPOCH).total_seconds())
+
+
+def _from_seconds(seconds: int) -> datetime:
+    return _EPOCH + timedelta(seconds=seconds)
+
+
+class JieQiTable:
+    """
+    节气表
+
+    以紧凑的 int64 数组（或 mmap 的只读内存视图）保存交节时刻，
+    查询均为二分查找，O(log n)。
+    """
+
+    def __init__(self, data, first_year: int):
+        self._data = data
+        # 只取"节"（偶数下标）用于月令与起运
+        self._jie = data[::2]
+        self.first_year = first_year
+        self.last_year = first_year + len(data) // 24 - 1
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get_jieqi(self, year: int) -> List[Tuple[str, datetime]]:
+        """获取某年二十四节气及交节时刻"""
+        if not self.first_year <= year <= self.last_year:
+            raise ValueError(f"年份{year}超出节气表范围({self.first_year}-{self.last_year})")
+        offset = (year - self.first_year) * 24
+        return [(JIEQI_NAMES[i], _from_seconds(self._data[offset + i])) for i in range(24)]
+
+    def _jie_position(self, moment: datetime) -> int:
+        """最近一个已交节（<= moment）在节序列中的下标"""
+        pos = bisect_right(self._jie, _to_seconds(moment)) - 1
+        if pos < 0 or pos >= len(self._jie) - 1:
+            raise ValueError(f"{moment}超出节气表范围({self.first_year}-{self.last_year})")
+        return pos
+
+    def prev_jie(self, moment: datetime) -> Tuple[str, datetime]:
+        """moment 之前（含）最近的节"""
+        pos = self._jie_position(moment)
+        return JIEQI_NAMES[(pos % 12) * 2], _from_seconds(self._jie[pos])
+
+    def next_jie(self, moment: datetime) -> Tuple[str, datetime]:
+        """moment 之后最近的节"""
+        pos = self._jie_position(moment) + 1
+        return JIEQI_NAMES[(pos % 12) * 2], _from_seconds(self._jie[pos])
+
+    @property
+    def jie(self):
+        """各"节"的交节时刻序列（秒），供批量查询使用"""
+        return self._jie
+
+    def month_ganzhi_index(self, moment: datetime) -> Tuple[int, int]:
+        """
+        按节气确定月柱
+
+        Returns:
+            (天干下标, 地支下标)
+        """
+        return self.position_to_month_ganzhi(self._jie_position(moment))
+
+    def year_ganzhi_index(self, moment: datetime) -> Tuple[int, int]:
+        """
+        按立春确定年柱
+
+        Returns:
+            (天干下标, 地支下标)
+        """
+        return self.position_to_year_ganzhi(self._jie_position(moment))
+
+    def position_to_year_ganzhi(self, pos):
+        """
+        节序列下标 → 年柱干支下标
+
+        每年的节从小寒开始，立春为第2个；小寒至立春前（以及上年大雪之后）
+        仍属上一干支年。仅用整数运算，标量与 NumPy 数组均适用。
+        """
+        year = self.first_year + (pos - 1) // 12
+        return (year - 4) % 10, (year - 4) % 12
+
+    def position_to_month_ganzhi(self, pos):
+        """
+        节序列下标 → 月柱干支下标
+
+        月柱干支六十甲子连续循环：以1984年立春（丙寅月）为基准推算，
+        年初丑月自然落在上一干支年的五虎遁序列中。
+        仅用整数运算，标量与 NumPy 数组均适用。
+        """
+        year = self.first_year + pos // 12
+        months = (year - 1984) * 12 + pos % 12 - 1
+        sexagenary = (2 + months) % 60
+        return sexagenary % 10, sexagenary % 12
+
+
+def _cache_path(start_year: int, end_year: int) -> str:
+    return os.path.join(JIEQI_CACHE_DIR, f"jieqi_{start_year}_{end_year}.bin")
+
+
+def _byteorder_flag() -> int:
+    return 0 if sys.byteorder == "little" else 1
+
+
+def _load_cache(path: str, start_year: int, end_year: int) -> Optional[JieQiTable]:
+    """以 mmap 方式加载磁盘缓存，格式不符时返回 None"""
+    try:
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    if len(mm) < _CACHE_HEADER.size:
+        mm.close()
+        return None
+    magic, version, byteorder, first_year, years = _CACHE_HEADER.unpack_from(mm)
+    expected_years = end_year - start_year + 3
+    if (magic != _CACHE_MAGIC or version != _CACHE_VERSION or byteorder != _byteorder_flag()
+            or first_year != start_year - 1 or years != expected_years
+            or len(mm) != _CACHE_HEADER.size + years * 24 * 8):
+        mm.close()
+        return None
+
+    data = memoryview(mm)[_CACHE_HEADER.size:].cast("q")
+    return JieQiTable(data, first_year)
+
+
+def _write_cache(path: str, table: array, first_year: int) -> None:
+    """原子写入磁盘缓存（先写临时文件再替换）"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_CACHE_HEADER.pack(_CACHE_MAGIC, _CACHE_VERSION, _byteorder_flag(),
+                                   first_year, len(table) // 24))
+        table.tofile(f)
+    os.replace(tmp_path, path)
+
+
+def load_jieqi_table(start_year: int = DEFAULT_START_YEAR, end_year: int = DEFAULT_END_YEAR,
+                     use_cache: bool = True) -> JieQiTable:
+    """
+    加载节气表
+
+    优先 mmap 磁盘缓存；缓存不存在或损坏时重新计算并写回缓存。
+    缓存目录不可写时仅保留在内存中。
+    """
+    path = _cache_path(start_year, end_year)
+    if use_cache:
+        table = _load_cache(path, start_year, end_year)
+        if table is not None:
+            return table
+
+    data = build_jieqi_table(start_year, end_year)
+    if use_cache:
+        try:
+            _write_cache(path, data, start_year - 1)
+        except OSError:
+            pass
+    return JieQiTable(memoryview(data), start_year - 1)
+
+
+@lru_cache()
+def get_jieqi_table() -> JieQiTable:
+    """获取默认范围的节气表单例"""
+    return load_jieqi_table()
+
+
+def get_jieqi(year: int) -> List[Tuple[str, datetime]]:
+    """获取某年二十四节气及交节时刻（北京时间）"""
+    return get_jieqi_table().get_jieqi(year)
+
+
+def birth_moment(year: int, month: int, day: int, hour: Optional[int] = None) -> datetime:
+    """
+    出生时刻
+
+    未提供小时时按整日处理：当日交节即视为已入新月。
+    """
+    if hour is None:
+        return datetime(year, month, day, 23, 59, 59)
+    return datetime(year, month, day, hour)
+
+
+def count_days_to_jie(year: int, month: int, day: int, hour: Optional[int] = None,
+                      forward: bool = True) -> float:
+    """
+    出生时刻距下一个（顺行）或上一个（逆行）节的天数
+
+    未提供小时时按日期计整天数。
+    """
+    table = get_jieqi_table()
+    moment = birth_moment(year, month, day, hour)
+    _, jie_time = table.next_jie(moment) if forward else table.prev_jie(moment)
+    if hour is None:
+        return abs((jie_time.date() - date(year, month, day)).days)
+    return abs((jie_time - moment).total_seconds()) / 86400.0
+
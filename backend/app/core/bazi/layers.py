@@ -0,0 +1,160 @@
+"""
+玄心理命 - 八字分层结果
+
+analyze_bazi 的结果按依赖拆成三层，可各自缓存：
+- 命盘层：四柱、五行、十神、格局、神煞等，只取决于四柱；
+  同一时辰、乃至不同日期排出相同四柱的出生时间共用一份
+- 大运层：取决于四柱、性别与起运岁数（起运岁数由出生时刻到节气的距离决定，
+  四柱相同的两个出生时间起运岁数可能不同）
+- 流年层：取决于四柱、出生年与目标年
+
+出生时间、性别等请求字段不进入任何一层，由 compose 拼装时放回。
+层内的大运、流年以行（dict）保存，拼装时还原为 DaYun/LiuNian。
+"""
+
+from typing import Any, Dict, List, Tuple
+
+from .calendar import SiZhu, GanZhi, GAN_INDEX, ZHI_INDEX, get_shengxiao, calculate_sizhu
+from .context import BaziContext
+from .dayun import (
+    Gender, DaYun, LiuNian,
+    calculate_qiyun_age, calculate_liunian, is_dayun_forward, summarize_dayun_liunian, _make_dayun
+)
+
+
+# 大运步数（与 calculate_dayun 默认一致）
+DAYUN_COUNT = 8
+
+# 流年层覆盖目标年前2年起的10年
+LIUNIAN_OFFSET = 2
+LIUNIAN_COUNT = 10
+
+
+def to_gender(gender: str) -> Gender:
+    """性别参数：非"男"一律按女命（与 analyze_bazi 一致）"""
+    return Gender.MALE if gender == "男" else Gender.FEMALE
+
+
+def parse_ganzhi(text: str) -> GanZhi:
+    """由两字干支还原共享的干支实例"""
+    return GanZhi.from_index(GAN_INDEX[text[0]], ZHI_INDEX[text[1]])
+
+
+def parse_sizhu(bazi: str) -> SiZhu:
+    """由八字字符串（如"庚午 辛巳 庚辰 辛巳"）还原四柱"""
+    return SiZhu(*(parse_ganzhi(p) for p in bazi.split()))
+
+
+def locate(year: int, month: int, day: int, hour: int, gender: str) -> Tuple[SiZhu, int]:
+    """
+    四柱与起运岁数：确定各层缓存键所需的全部取值
+
+    只查节气表，不做任何分析，可在请求进程内直接调用。
+    """
+    sizhu = calculate_sizhu(year, month, day, hour)
+    qiyun_age, _ = calculate_qiyun_age(sizhu, to_gender(gender), year, month, day, hour)
+    return sizhu, qiyun_age
+
+
+# ==================== 各层计算 ====================
+
+def chart_core(ctx: BaziContext) -> Dict[str, Any]:
+    """命盘层：只取决于四柱的各项分析"""
+    sizhu = ctx.sizhu
+    wuxing_score = ctx.wuxing_score
+    day_master_strength = ctx.day_master_strength
+    return {
+        "bazi": sizhu.bazi,
+        "sizhu": {
+            "year": str(sizhu.year),
+            "month": str(sizhu.month),
+            "day": str(sizhu.day),
+            "hour": str(sizhu.hour)
+        },
+        "day_master": sizhu.day_master,
+        "day_master_wuxing": day_master_strength["day_master_wuxing"],
+        "wuxing": {
+            "scores": wuxing_score.to_dict(),
+            "percentages": wuxing_score.percentages(),
+            "balance": wuxing_score.balance_analysis(),
+            "strongest": wuxing_score.strongest(),
+            "weakest": wuxing_score.weakest()
+        },
+        "day_master_analysis": day_master_strength,
+        "xi_yong_shen": ctx.xi_yong,
+        "suggestions": ctx.suggestions,
+        "shishen": ctx.shishen,
+        "shishen_counts": ctx.shishen_counts,
+        "personality": ctx.personality,
+        "geju": ctx.geju,
+        "shensha": ctx.shensha,
+        "dizhi_relations": ctx.dizhi_relations
+    }
+
+
+def analyze_core(bazi: str) -> Dict[str, Any]:
+    """命盘层（按八字字符串计算，供计算执行器调用）"""
+    return chart_core(BaziContext(parse_sizhu(bazi)))
+
+
+def dayun_rows(dayun_list: List[DaYun]) -> List[Dict[str, Any]]:
+    """大运 → 可缓存的行"""
+    return [{**vars(dy), "ganzhi": str(dy.ganzhi)} for dy in dayun_list]
+
+
+def liunian_rows(liunian_list: List[LiuNian]) -> List[Dict[str, Any]]:
+    """流年 → 可缓存的行"""
+    return [{**vars(ln), "ganzhi": str(ln.ganzhi)} for ln in liunian_list]
+
+
+def dayun_layer(bazi: str, gender: str, qiyun_age: int) -> List[Dict[str, Any]]:
+    """大运层"""
+    sizhu = parse_sizhu(bazi)
+    is_forward = is_dayun_forward(sizhu, to_gender(gender))
+    return dayun_rows([_make_dayun(sizhu, qiyun_age, is_forward, i) for i in range(DAYUN_COUNT)])
+
+
+def liunian_layer(bazi: str, birth_year: int, target_year: int,
+                  xi_yong: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """流年层；xi_yong 取自命盘层"""
+    return liunian_rows(calculate_liunian(parse_sizhu(bazi), birth_year, target_year - LIUNIAN_OFFSET,
+                                          LIUNIAN_COUNT, xi_yong=xi_yong))
+
+
+# ==================== 拼装 ====================
+
+def compose(core: Dict[str, Any], dayun: List[Dict[str, Any]], liunian: List[Dict[str, Any]],
+            year: int, month: int, day: int, hour: int, gender: str, target_year: int) -> Dict[str, Any]:
+    """
+    由三层与请求字段拼出完整结果（与 analyze_bazi 相同）
+
+    不修改传入的各层，结果中的子对象与各层共享。
+    """
+    sizhu = parse_sizhu(core["bazi"])
+    dayun_liunian = summarize_dayun_liunian(
+        sizhu, to_gender(gender), year, month, day, target_year,
+        [DaYun(**{**row, "ganzhi": parse_ganzhi(row["ganzhi"])}) for row in dayun],
+        [LiuNian(**{**row, "ganzhi": parse_ganzhi(row["ganzhi"])}) for row in liunian]
+    )
+    return {
+        "basic_info": {
+            "birth_datetime": f"{year}年{month}月{day}日 {hour}时",
+            "gender": gender,
+            "shengxiao": get_shengxiao(year, month, day, hour),
+            "bazi": core["bazi"],
+            "sizhu": core["sizhu"],
+            "day_master": core["day_master"],
+            "day_master_wuxing": core["day_master_wuxing"]
+        },
+        "wuxing": core["wuxing"],
+        "day_master_analysis": core["day_master_analysis"],
+        "xi_yong_shen": core["xi_yong_shen"],
+        "suggestions": core["suggestions"],
+        "shishen": core["shishen"],
+        "shishen_counts": core["shishen_counts"],
+        "personality": core["personality"],
+        "geju": core["geju"],
+        "dayun_liunian": dayun_liunian,
+        "shensha": core["shensha"],
+        "dizhi_relations": core["dizhi_relations"]
+    }
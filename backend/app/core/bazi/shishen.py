@@ -9,10 +9,15 @@ from dataclasses import dataclass
 from .calendar import (
     SiZhu, GanZhi, TIAN_GAN, DI_ZHI,
     TIAN_GAN_WUXING, DI_ZHI_WUXING, DI_ZHI_CANG_GAN,
-    TIAN_GAN_YINYANG
+    TIAN_GAN_YINYANG, GAN_INDEX, ZHI_CANG_GAN
 )
 from .wuxing import WUXING_SHENG, WUXING_KE
 
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - 可选依赖
+    np = None
+
 
 # 十神名称
 SHISHEN_NAMES = {
@@ -102,17 +107,8 @@ SHISHEN_TRAITS = {
 }
 
 
-def get_shishen(day_master: str, other_gan: str) -> str:
-    """
-    计算十神关系
-    
-    Args:
-        day_master: 日主（日干）
-        other_gan: 其他天干
-    
-    Returns:
-        十神名称
-    """
+def _derive_shishen(day_master: str, other_gan: str) -> str:
+    """由五行生克与阴阳推导十神（仅用于生成十神表）"""
     dm_wuxing = TIAN_GAN_WUXING[day_master]
     other_wuxing = TIAN_GAN_WUXING[other_gan]
     dm_yinyang = TIAN_GAN_YINYANG[day_master]
@@ -140,6 +136,85 @@ def get_shishen(day_master: str, other_gan: str) -> str:
     return "未知"
 
 
+# ==================== 十神表 ====================
+# 十神编号 0-9（按 SHISHEN_NAMES 顺序），导入时一次生成：
+#   SHISHEN_TABLE[日干 * 10 + 他干]                    → 十神编号（10×10）
+#   CANG_GAN_SHISHEN_TABLE[(日干 * 12 + 地支) * 3 + k] → 第k个藏干的十神编号，无藏干为 -1（10×12×3）
+
+SHISHEN_LIST = tuple(SHISHEN_NAMES)
+SHISHEN_CODES = {name: i for i, name in enumerate(SHISHEN_LIST)}
+SHISHEN_SHORT_LIST = tuple(SHISHEN_SHORT[name] for name in SHISHEN_LIST)
+
+SHISHEN_TABLE = tuple(
+    SHISHEN_CODES[_derive_shishen(dm, other)] for dm in TIAN_GAN for other in TIAN_GAN
+)
+
+CANG_GAN_SHISHEN_TABLE = tuple(
+    SHISHEN_TABLE[dm * 10 + cang[k]] if k < len(cang) else -1
+    for dm in range(10) for cang in ZHI_CANG_GAN for k in range(3)
+)
+
+if np is not None:
+    SHISHEN_ARRAY = np.array(SHISHEN_TABLE, dtype=np.int8).reshape(10, 10)
+    CANG_GAN_SHISHEN_ARRAY = np.array(CANG_GAN_SHISHEN_TABLE, dtype=np.int8).reshape(10, 12, 3)
+else:  # pragma: no cover - 可选依赖
+    SHISHEN_ARRAY = None
+    CANG_GAN_SHISHEN_ARRAY = None
+
+
+def shishen_code(day_gan: int, other_gan: int) -> int:
+    """按天干下标取十神编号"""
+    return SHISHEN_TABLE[day_gan * 10 + other_gan]
+
+
+def cang_gan_shishen_codes(day_gan: int, zhi: int) -> Tuple[int, ...]:
+    """按日干、地支下标取该地支各藏干的十神编号（本气在前）"""
+    offset = (day_gan * 12 + zhi) * 3
+    return tuple(code for code in CANG_GAN_SHISHEN_TABLE[offset:offset + 3] if code >= 0)
+
+
+def shishen_codes_array(day_gans, other_gans):
+    """
+    批量取十神编号
+
+    Args:
+        day_gans: 日干下标数组
+        other_gans: 他干下标数组（可与 day_gans 广播）
+
+    Returns:
+        十神编号数组（int8）
+    """
+    if np is None:
+        raise RuntimeError("批量十神查询需要安装 numpy")
+    return SHISHEN_ARRAY[np.asarray(day_gans), np.asarray(other_gans)]
+
+
+def cang_gan_shishen_array(day_gans, zhis):
+    """
+    批量取地支藏干十神编号
+
+    Returns:
+        形状为 (..., 3) 的十神编号数组，无藏干处为 -1
+    """
+    if np is None:
+        raise RuntimeError("批量十神查询需要安装 numpy")
+    return CANG_GAN_SHISHEN_ARRAY[np.asarray(day_gans), np.asarray(zhis)]
+
+
+def get_shishen(day_master: str, other_gan: str) -> str:
+    """
+    计算十神关系
+    
+    Args:
+        day_master: 日主（日干）
+        other_gan: 其他天干
+    
+    Returns:
+        十神名称
+    """
+    return SHISHEN_LIST[SHISHEN_TABLE[GAN_INDEX[day_master] * 10 + GAN_INDEX[other_gan]]]
+
+
 @dataclass
 class ShiShenResult:
     """十神分析结果"""
@@ -160,37 +235,33 @@ def analyze_shishen(sizhu: SiZhu) -> Dict:
         十神分析结果
     """
     day_master = sizhu.day_master
+    dm = sizhu.day.gan_index
     
-    results = []
-    
-    # 年柱天干
-    year_shishen = get_shishen(day_master, sizhu.year.gan)
-    results.append(ShiShenResult("年干", sizhu.year.gan, year_shishen, SHISHEN_SHORT[year_shishen]))
-    
-    # 月柱天干
-    month_shishen = get_shishen(day_master, sizhu.month.gan)
-    results.append(ShiShenResult("月干", sizhu.month.gan, month_shishen, SHISHEN_SHORT[month_shishen]))
+    def gan_result(position: str, ganzhi: GanZhi) -> ShiShenResult:
+        code = SHISHEN_TABLE[dm * 10 + ganzhi.gan_index]
+        return ShiShenResult(position, ganzhi.gan, SHISHEN_LIST[code], SHISHEN_SHORT_LIST[code])
     
-    # 日柱天干（日主本身）
-    results.append(ShiShenResult("日干", sizhu.day.gan, "日主", "主"))
-    
-    # 时柱天干
-    hour_shishen = get_shishen(day_master, sizhu.hour.gan)
-    results.append(ShiShenResult("时干", sizhu.hour.gan, hour_shishen, SHISHEN_SHORT[hour_shishen]))
+    results = [
+        gan_result("年干", sizhu.year),
+        gan_result("月干", sizhu.month),
+        ShiShenResult("日干", sizhu.day.gan, "日主", "主"),  # 日柱天干（日主本身）
+        gan_result("时干", sizhu.hour)
+    ]
     
     # 分析地支藏干的十神
     zhi_shishen = {}
-    for name, zhi in [("年支", sizhu.year.zhi), ("月支", sizhu.month.zhi), 
-                       ("日支", sizhu.day.zhi), ("时支", sizhu.hour.zhi)]:
-        cang_gan = DI_ZHI_CANG_GAN[zhi]
-        zhi_shishen[name] = []
-        for gan in cang_gan:
-            ss = get_shishen(day_master, gan)
-            zhi_shishen[name].append({
-                "gan": gan,
-                "shishen": ss,
-                "shishen_short": SHISHEN_SHORT[ss]
-            })
+    for name, ganzhi in (("年支", sizhu.year), ("月支", sizhu.month),
+                         ("日支", sizhu.day), ("时支", sizhu.hour)):
+        cang_gan = ZHI_CANG_GAN[ganzhi.zhi_index]
+        codes = cang_gan_shishen_codes(dm, ganzhi.zhi_index)
+        zhi_shishen[name] = [
+            {
+                "gan": TIAN_GAN[gan],
+                "shishen": SHISHEN_LIST[code],
+                "shishen_short": SHISHEN_SHORT_LIST[code]
+            }
+            for gan, code in zip(cang_gan, codes)
+        ]
     
     return {
         "day_master": day_master,
@@ -212,49 +283,47 @@ def count_shishen(sizhu: SiZhu) -> Dict[str, int]:
     Returns:
         各十神出现次数
     """
-    counts = {name: 0 for name in SHISHEN_NAMES.keys()}
-    analysis = analyze_shishen(sizhu)
-    
-    # 统计天干十神
-    for item in analysis["gan_shishen"]:
-        if item["shishen"] != "日主":
-            counts[item["shishen"]] += 1
-    
-    # 统计地支藏干十神
-    for zhi_name, gan_list in analysis["zhi_shishen"].items():
-        for gan_info in gan_list:
-            if gan_info["shishen"] != "日主":
-                counts[gan_info["shishen"]] += 1
-    
-    return counts
+    # 天干（除日主）与地支藏干直接按下标查表
+    dm = sizhu.day.gan_index
+    tally = [0] * len(SHISHEN_LIST)
+    for ganzhi in (sizhu.year, sizhu.month, sizhu.hour):
+        tally[SHISHEN_TABLE[dm * 10 + ganzhi.gan_index]] += 1
+    for zhi in sizhu.get_all_zhi_index():
+        for code in cang_gan_shishen_codes(dm, zhi):
+            tally[code] += 1
+    return dict(zip(SHISHEN_LIST, tally))
 
 
-def get_dominant_shishen(sizhu: SiZhu) -> List[Tuple[str, int]]:
+def get_dominant_shishen(sizhu: SiZhu, counts: Dict[str, int] = None) -> List[Tuple[str, int]]:
     """
     获取主导十神（数量最多的十神）
     
     Args:
         sizhu: 四柱八字
+        counts: 已统计的十神数量（可选，避免重复计算）
     
     Returns:
         主导十神列表，按数量排序
     """
-    counts = count_shishen(sizhu)
+    if counts is None:
+        counts = count_shishen(sizhu)
     sorted_counts = sorted(counts.items(), key=lambda x: x[1], reverse=True)
     return [(name, count) for name, count in sorted_counts if count > 0]
 
 
-def get_shishen_personality(sizhu: SiZhu) -> Dict:
+def get_shishen_personality(sizhu: SiZhu, dominant: List[Tuple[str, int]] = None) -> Dict:
     """
     根据十神分析性格特征
     
     Args:
         sizhu: 四柱八字
+        dominant: 已计算的主导十神列表（可选，避免重复计算）
     
     Returns:
         性格分析结果
     """
-    dominant = get_dominant_shishen(sizhu)
+    if dominant is None:
+        dominant = get_dominant_shishen(sizhu)
     if not dominant:
         return {"error": "无法分析"}
     
@@ -335,17 +404,19 @@ GEJU_DESCRIPTIONS = {
 }
 
 
-def analyze_geju(sizhu: SiZhu) -> Dict:
+def analyze_geju(sizhu: SiZhu, counts: Dict[str, int] = None) -> Dict:
     """
     分析命局格局
     
     Args:
         sizhu: 四柱八字
+        counts: 已统计的十神数量（可选，避免重复计算）
     
     Returns:
         格局分析结果
     """
-    counts = count_shishen(sizhu)
+    if counts is None:
+        counts = count_shishen(sizhu)
     
     # 获取月令（月支藏干透出为格）
     month_zhi = sizhu.month.zhi
@@ -10,7 +10,8 @@ from enum import Enum
 from .calendar import (
     SiZhu, GanZhi, TIAN_GAN, DI_ZHI,
     TIAN_GAN_WUXING, DI_ZHI_WUXING, DI_ZHI_CANG_GAN,
-    TIAN_GAN_YINYANG, DI_ZHI_YINYANG
+    TIAN_GAN_YINYANG, DI_ZHI_YINYANG,
+    GAN_WUXING, ZHI_CANG_GAN
 )
 
 
@@ -172,17 +173,17 @@ def calculate_wuxing_score(sizhu: SiZhu) -> WuXingScore:
     seasonal_factor = WUXING_SEASONAL_STRENGTH.get(month_zhi, {})
     
     # 计算天干五行得分
-    for gan in sizhu.get_all_gan():
-        wuxing = TIAN_GAN_WUXING[gan]
+    for gan in sizhu.get_all_gan_index():
+        wuxing = GAN_WUXING[gan]
         strength = GAN_BASE_STRENGTH * seasonal_factor.get(wuxing, 1.0)
         score.add(wuxing, strength)
     
     # 计算地支藏干五行得分
-    for zhi in sizhu.get_all_zhi():
-        cang_gan = DI_ZHI_CANG_GAN[zhi]
+    for zhi in sizhu.get_all_zhi_index():
+        cang_gan = ZHI_CANG_GAN[zhi]
         
         for i, gan in enumerate(cang_gan):
-            wuxing = TIAN_GAN_WUXING[gan]
+            wuxing = GAN_WUXING[gan]
             
             # 根据藏干位置确定力量
             if i == 0:  # 正气（本气）
@@ -198,12 +199,13 @@ def calculate_wuxing_score(sizhu: SiZhu) -> WuXingScore:
     return score
 
 
-def get_day_master_strength(sizhu: SiZhu) -> Dict:
+def get_day_master_strength(sizhu: SiZhu, score: WuXingScore = None) -> Dict:
     """
     分析日主强弱
     
     Args:
         sizhu: 四柱八字
+        score: 已计算的五行得分（可选，避免重复计算）
     
     Returns:
         日主强弱分析结果
@@ -211,7 +213,8 @@ def get_day_master_strength(sizhu: SiZhu) -> Dict:
     day_master = sizhu.day_master
     day_master_wuxing = TIAN_GAN_WUXING[day_master]
     
-    score = calculate_wuxing_score(sizhu)
+    if score is None:
+        score = calculate_wuxing_score(sizhu)
     day_master_score = score.get(day_master_wuxing)
     
     # 计算同类五行力量（生我和同我）
@@ -249,20 +252,21 @@ def get_day_master_strength(sizhu: SiZhu) -> Dict:
     }
 
 
-def get_xi_yong_shen(sizhu: SiZhu) -> Dict:
+def get_xi_yong_shen(sizhu: SiZhu, strength: Dict = None) -> Dict:
     """
     分析喜用神
     
     Args:
         sizhu: 四柱八字
+        strength: 已计算的日主强弱结果（可选，避免重复计算）
     
     Returns:
         喜用神分析结果
     """
     day_master = sizhu.day_master
     day_master_wuxing = TIAN_GAN_WUXING[day_master]
-    strength = get_day_master_strength(sizhu)
-    score = calculate_wuxing_score(sizhu)
+    if strength is None:
+        strength = get_day_master_strength(sizhu)
     
     xi_shen = []   # 喜神
     yong_shen = []  # 用神
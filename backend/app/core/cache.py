@@ -1,36 +1,353 @@
 """
-玄心理命 - Redis缓存层
+玄心理命 - 缓存层
+
+两级缓存：进程内 LRU（一级，按字节计容量、带TTL）在前，Redis（二级）在后。
+一级缓存保存反序列化后的对象，命中时既省网络往返又省 JSON 解析；
+各进程之间通过 Redis pub/sub 广播失效的键。
+
+get_or_compute 防缓存击穿：同一进程内同键的并发未命中合并为一次计算，
+跨进程用 Redis 短锁保证只有一个 worker 重算；临近过期时按 XFetch
+概率提前刷新，热点键不会在 TTL 边界集中失效。
 """
 
+import asyncio
+import inspect
 import json
-import os
-from typing import Optional, Any
+import math
+import random
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Any, Awaitable, Callable, Dict, Tuple, Union
 from datetime import timedelta
-import redis.asyncio as redis
 
+from .codec import CacheCodec, CodecError
+from .config import settings
+from .executor import engine_version
+from .logging import logger
+from .redis_client import RedisUnavailable, redis_client, redis_binary_client
+
+
+# 本进程标识，用于忽略自己发出的失效广播
+NODE_ID = uuid.uuid4().hex[:12]
+
+
+# ==================== 进程内缓存 ====================
+
+class LocalCache:
+    """
+    进程内 LRU 缓存
+
+    按序列化后的字节数计容量，超出 max_bytes 时从最久未用的一端淘汰。
+    返回的是缓存中的同一个对象，调用方不得原地修改。
+    """
+
+    def __init__(self, max_bytes: int, max_item_bytes: int, ttl: int):
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes
+        self.ttl = ttl
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # key -> (value, 过期时刻, 字节数)
+        self._data: "OrderedDict[str, Tuple[Any, float, int]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> Optional[Any]:
+        """取值，未命中或已过期返回 None"""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        value, expires_at, _ = entry
+        if expires_at <= time.monotonic():
+            self.discard(key)
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, nbytes: int, expire: Optional[int] = None) -> bool:
+        """写入，单条超过 max_item_bytes 时不缓存"""
+        self.discard(key)
+        if nbytes > self.max_item_bytes:
+            return False
+        ttl = self.ttl if expire is None else min(expire, self.ttl)
+        if ttl <= 0:
+            return False
+        self._data[key] = (value, time.monotonic() + ttl, nbytes)
+        self.size += nbytes
+        while self.size > self.max_bytes:
+            _, (_, _, evicted) = self._data.popitem(last=False)
+            self.size -= evicted
+            self.evictions += 1
+        return True
+
+    def discard(self, key: str) -> None:
+        """移除一个键（不存在时忽略）"""
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self.size -= entry[2]
+
+    def clear(self) -> None:
+        """清空"""
+        self._data.clear()
+        self.size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """命中率等统计"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+            "items": len(self._data),
+            "bytes": self.size
+        }
+
+
+local_cache = LocalCache(
+    max_bytes=settings.CACHE_LOCAL_MAX_BYTES,
+    max_item_bytes=settings.CACHE_LOCAL_MAX_ITEM_BYTES,
+    ttl=settings.CACHE_LOCAL_TTL
+)
 
-# Redis配置
-REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 
-# 创建Redis连接池
-redis_pool = redis.ConnectionPool.from_url(REDIS_URL, decode_responses=True)
+# ==================== 请求合并 ====================
+
+class SingleFlight:
+    """同键并发调用合并：同一时刻只有一个协程真正执行，其余等待其结果"""
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Future] = {}
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._calls
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """执行 fn，同键已有调用在途时直接等待其结果"""
+        future = self._calls.get(key)
+        if future is not None:
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # 执行者被取消而自身未被取消时，重新发起
+                if future.cancelled() and not asyncio.current_task().cancelling():
+                    return await self.do(key, fn)
+                raise
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # 标记已读取，无人等待时不告警
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
+
+
+def xfetch_due(ttl_ms: int, cost: float, beta: float) -> bool:
+    """
+    XFetch 提前刷新判定
+
+    剩余寿命小于 -cost·beta·ln(U) 时返回 True，U 为 (0,1] 上的均匀随机数。
+    重算越慢、越临近过期，提前刷新的概率越高。
+    """
+    if ttl_ms <= 0 or cost <= 0:
+        return False
+    return -cost * beta * math.log(1.0 - random.random()) * 1000 >= ttl_ms
+
+
+async def _call(compute: Callable[[], Union[Any, Awaitable[Any]]]) -> Any:
+    result = compute()
+    if inspect.isawaitable(result):
+        result = await result
+    return result
+
+
+# 释放锁时校验令牌，避免删掉已超时后被他人持有的锁
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+# ==================== 缓存命名空间 ====================
+
+# 键前缀 → 引擎族。这些键的值由确定性引擎算出，写入 Redis 时带上引擎版本与代数
+CACHE_NAMESPACES: Dict[str, str] = {
+    "bazi": "bazi",
+    "ziwei": "ziwei",
+    "yijing": "yijing",
+    "psychology": "psychology",
+    "fusion": "fusion",
+    "narrative": "analysis",
+}
+
+# 各命名空间的代数（Redis 哈希：前缀 → 代数）
+GENERATIONS_KEY = "cache:generations"
+
+
+class CacheNamespaces:
+    """
+    缓存命名空间
+
+    登记过的前缀改写为 {前缀}:{版本}.{代数}:{其余}。版本取自引擎版本（规则库
+    含内容摘要），引擎或数据更新后旧键不再命中；bump 递增代数即让整个命名空间
+    失效，不必扫描删除，旧键按 TTL 自行过期。因此这些键可以长期缓存。
+
+    代数每 refresh_interval 秒重读一次，bump 时经失效频道通知各进程立即重读。
+
+    Args:
+        client: Redis 客户端（文本）
+        prefixes: 键前缀 → 引擎族
+        refresh_interval: 重读代数的间隔（秒）
+    """
+
+    def __init__(self, client: Any, prefixes: Dict[str, str], refresh_interval: float = 5.0):
+        self.client = client
+        self.prefixes = dict(prefixes)
+        self.refresh_interval = refresh_interval
+        self._stamps: Dict[str, str] = {}
+        self._next_refresh = 0.0
+
+    def stamp(self, prefix: str, generation: int = 0) -> str:
+        """命名空间标记：引擎版本.代数"""
+        return f"{engine_version(self.prefixes[prefix])}.{generation}"
+
+    async def refresh(self) -> None:
+        """重读各命名空间的代数与引擎版本；Redis 不可用时沿用上次结果"""
+        self._next_refresh = time.monotonic() + self.refresh_interval
+        try:
+            generations = await self.client.hgetall(GENERATIONS_KEY)
+        except Exception as e:
+            logger.warning(f"Cache generations unavailable: {e}")
+            if self._stamps:
+                return
+            generations = {}
+        self._stamps = {p: self.stamp(p, int(generations.get(p, 0))) for p in self.prefixes}
+
+    def expire(self) -> None:
+        """下次使用时重读代数"""
+        self._next_refresh = 0.0
+
+    async def resolve(self, key: str) -> str:
+        """逻辑键 → Redis 键；未登记的前缀原样返回"""
+        prefix, sep, rest = key.partition(":")
+        if prefix not in self.prefixes or not sep:
+            return key
+        if time.monotonic() >= self._next_refresh:
+            await self.refresh()
+        return f"{prefix}:{self._stamps[prefix]}:{rest}"
+
+    async def bump(self, prefix: str) -> int:
+        """递增代数，使该命名空间下的缓存全部失效"""
+        if prefix not in self.prefixes:
+            raise ValueError(f"未登记的缓存命名空间: {prefix}")
+        generation = await self.client.hincrby(GENERATIONS_KEY, prefix, 1)
+        self._stamps[prefix] = self.stamp(prefix, generation)
+        logger.info(f"Cache namespace {prefix} bumped to generation {generation}")
+        return generation
+
+    def stats(self) -> Dict[str, str]:
+        """各命名空间当前标记"""
+        return dict(self._stamps)
+
+
+cache_namespaces = CacheNamespaces(
+    redis_client,
+    CACHE_NAMESPACES,
+    refresh_interval=settings.CACHE_GENERATION_REFRESH
+)
+
+
+def _loads(raw: str) -> Any:
+    try:
+        return json.loads(raw)
+    except json.JSONDecodeError:
+        return raw
 
 
 class CacheService:
-    """缓存服务"""
+    """
+    缓存服务
+
+    Args:
+        local: 一级进程内缓存；默认不启用，仅用于可重复计算的分析结果，
+               验证码、会话等需要强一致的数据应直连 Redis
+        codec: 值编解码器；默认不启用，按 JSON 文本读写
+        namespaces: 键命名空间；默认使用全局命名空间（只改写登记过的前缀）
+    """
     
-    def __init__(self):
-        self.client = redis.Redis(connection_pool=redis_pool)
+    def __init__(self, local: Optional[LocalCache] = None, codec: Optional[CacheCodec] = None,
+                 namespaces: Optional[CacheNamespaces] = None):
+        # 共用进程级连接池与熔断器（见 redis_client）
+        self.client = redis_client
+        self.local = local
+        self.codec = codec
+        self.namespaces = namespaces or cache_namespaces
+        # 读写缓存值所用的客户端：启用编解码时为二进制连接
+        self.values = redis_binary_client if codec is not None else self.client
+        self.redis_hits = 0
+        self.redis_misses = 0
+        self.single_flight = SingleFlight()
+        # 各类计算的耗时（秒，指数滑动平均），供 XFetch 使用
+        self._compute_costs: Dict[str, float] = {}
     
     async def get(self, key: str) -> Optional[Any]:
-        """获取缓存值"""
-        value = await self.client.get(key)
-        if value:
-            try:
-                return json.loads(value)
-            except json.JSONDecodeError:
+        """获取缓存值（先查进程内缓存，再查Redis）"""
+        key = await self.namespaces.resolve(key)
+        if self.local is not None:
+            value = self.local.get(key)
+            if value is not None:
                 return value
-        return None
+        raw = await self.values.get(key)
+        return self._accept(key, raw)
+    
+    def _accept(self, key: str, raw: Any, count: bool = True) -> Optional[Any]:
+        """解码从Redis读到的值并放入一级缓存；不存在或无法解码时为 None"""
+        value = None
+        if raw and self.codec is not None:
+            try:
+                value, nbytes = self.codec.decode_with_size(raw)
+            except CodecError as e:
+                logger.debug(f"Cache decode skipped for {key}: {e}")
+        elif raw:
+            value, nbytes = _loads(raw), len(raw.encode("utf-8"))
+        if count:
+            if value is None:
+                self.redis_misses += 1
+            else:
+                self.redis_hits += 1
+        if value is not None and self.local is not None:
+            self.local.set(key, value, nbytes)
+        return value
+    
+    def _encode(self, value: Any) -> Tuple[Any, int, Any]:
+        """编码待写入的值：(Redis 值, 字节数, 一级缓存中保存的对象)"""
+        if self.codec is not None:
+            raw, nbytes = self.codec.encode_with_size(value)
+            return raw, nbytes, value
+        raw = json.dumps(value, ensure_ascii=False, default=str) if isinstance(value, (dict, list)) else value
+        nbytes = len(str(raw).encode("utf-8"))
+        # 与从Redis读回的结果保持一致
+        return raw, nbytes, value if isinstance(value, (dict, list)) else _loads(str(raw))
     
     async def set(self, key: str, value: Any, expire: int = 3600) -> bool:
         """
@@ -38,40 +355,244 @@ class CacheService:
         
         Args:
             key: 缓存键
-            value: 缓存值（自动JSON序列化）
+            value: 缓存值（按编解码器序列化；未启用时dict/list转JSON）
             expire: 过期时间（秒），默认1小时
         
         Returns:
             是否设置成功
         """
-        if isinstance(value, (dict, list)):
-            value = json.dumps(value, ensure_ascii=False)
-        return await self.client.setex(key, expire, value)
+        return await self._set_resolved(await self.namespaces.resolve(key), value, expire)
+    
+    async def _set_resolved(self, key: str, value: Any, expire: int) -> bool:
+        """写入已解析命名空间的键"""
+        raw, nbytes, local_value = self._encode(value)
+        ok = await self.values.setex(key, expire, raw)
+        if self.local is not None:
+            self.local.set(key, local_value, nbytes, expire)
+            await self._publish_invalidation(key)
+        return ok
     
     async def delete(self, key: str) -> int:
         """删除缓存"""
+        key = await self.namespaces.resolve(key)
+        if self.local is not None:
+            self.local.discard(key)
+            await self._publish_invalidation(key)
         return await self.client.delete(key)
     
     async def exists(self, key: str) -> bool:
         """检查缓存是否存在"""
-        return await self.client.exists(key) > 0
+        return await self.client.exists(await self.namespaces.resolve(key)) > 0
     
     async def expire(self, key: str, seconds: int) -> bool:
         """设置过期时间"""
-        return await self.client.expire(key, seconds)
+        return await self.client.expire(await self.namespaces.resolve(key), seconds)
     
     async def ttl(self, key: str) -> int:
         """获取剩余过期时间"""
-        return await self.client.ttl(key)
+        return await self.client.ttl(await self.namespaces.resolve(key))
     
     async def incr(self, key: str) -> int:
         """自增"""
+        key = await self.namespaces.resolve(key)
+        if self.local is not None:
+            self.local.discard(key)
         return await self.client.incr(key)
     
     async def decr(self, key: str) -> int:
         """自减"""
+        key = await self.namespaces.resolve(key)
+        if self.local is not None:
+            self.local.discard(key)
         return await self.client.decr(key)
     
+    # ==================== 防击穿读取 ====================
+    
+    async def get_or_compute(self, key: str, compute: Callable[[], Any],
+                             expire: int = 3600) -> Any:
+        """
+        读取缓存，未命中时计算并写入
+        
+        同键并发只计算一次；跨 worker 由 Redis 短锁协调，未抢到锁的一方
+        等待结果写入。命中但临近过期时按 XFetch 概率由一个请求提前重算，
+        其余请求继续使用旧值。Redis 不可用时退化为直接计算。
+        
+        Args:
+            key: 缓存键
+            compute: 计算函数（同步或异步，无参数）
+            expire: 过期时间（秒）
+        """
+        key = await self.namespaces.resolve(key)
+        try:
+            value, ttl_ms = await self._get_with_ttl(key)
+        except Exception as e:
+            if not isinstance(e, RedisUnavailable):
+                logger.warning(f"Cache error: {e}")
+            return await self.single_flight.do(
+                key, lambda: self._compute_local(key, compute, expire)
+            )
+        
+        if value is None:
+            return await self.single_flight.do(
+                key, lambda: self._fill(key, compute, expire)
+            )
+        if ttl_ms is not None and key not in self.single_flight and xfetch_due(
+            ttl_ms, self._compute_costs.get(self._cost_key(key), 0.0), settings.CACHE_XFETCH_BETA
+        ):
+            return await self.single_flight.do(
+                key, lambda: self._fill(key, compute, expire, stale=value)
+            )
+        return value
+    
+    async def _compute_local(self, key: str, compute: Callable[[], Any], expire: int) -> Any:
+        """Redis 不可用时直接计算，结果只放入一级缓存"""
+        value = await _call(compute)
+        if self.local is not None and value is not None:
+            _, nbytes, local_value = self._encode(value)
+            self.local.set(key, local_value, nbytes, expire)
+        return value
+    
+    async def _get_with_ttl(self, key: str) -> Tuple[Optional[Any], Optional[int]]:
+        """取值及Redis剩余寿命（毫秒）；一级缓存命中时寿命为 None"""
+        if self.local is not None:
+            value = self.local.get(key)
+            if value is not None:
+                return value, None
+        pipe = self.values.pipeline(transaction=False)
+        pipe.get(key)
+        pipe.pttl(key)
+        raw, ttl_ms = await pipe.execute()
+        value = self._accept(key, raw)
+        return value, (ttl_ms if value is not None else None)
+    
+    async def _fill(self, key: str, compute: Callable[[], Any], expire: int,
+                    stale: Any = None) -> Any:
+        """持锁计算并写入；抢不到锁时返回旧值或等待他人写入"""
+        lock_key = f"lock:{key}"
+        token = uuid.uuid4().hex
+        lock_ms = settings.CACHE_LOCK_TIMEOUT_MS
+        try:
+            acquired = await self.client.set(lock_key, token, nx=True, px=lock_ms)
+        except Exception as e:
+            logger.warning(f"Cache lock error: {e}")
+            acquired = True
+            token = None
+        
+        if not acquired:
+            if stale is not None:
+                return stale
+            try:
+                value = await self._wait_for(key, lock_key, lock_ms)
+            except Exception as e:
+                logger.warning(f"Cache error: {e}")
+                value = None
+            if value is not None:
+                return value
+        
+        try:
+            started = time.perf_counter()
+            result = await _call(compute)
+            self._record_cost(key, time.perf_counter() - started)
+            if result is not None:
+                try:
+                    await self._set_resolved(key, result, expire)
+                except Exception as e:
+                    logger.warning(f"Cache error: {e}")
+            return result
+        finally:
+            if acquired and token is not None:
+                try:
+                    await self.client.eval(_RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+                except Exception:
+                    pass
+    
+    async def _wait_for(self, key: str, lock_key: str, timeout_ms: int) -> Optional[Any]:
+        """等待持锁方写入结果，锁释放或超时后返回（仍未写入时为 None）"""
+        deadline = time.monotonic() + timeout_ms / 1000
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+            pipe = self.values.pipeline(transaction=False)
+            pipe.get(key)
+            pipe.exists(lock_key)
+            raw, locked = await pipe.execute()
+            value = self._accept(key, raw, count=False)
+            if value is not None:
+                return value
+            if not locked:
+                break
+        return None
+    
+    @staticmethod
+    def _cost_key(key: str) -> str:
+        return key.split(":", 1)[0]
+    
+    def _record_cost(self, key: str, seconds: float) -> None:
+        cost_key = self._cost_key(key)
+        previous = self._compute_costs.get(cost_key)
+        self._compute_costs[cost_key] = seconds if previous is None else previous * 0.8 + seconds * 0.2
+    
+    # ==================== 跨进程失效 ====================
+    
+    async def _publish_invalidation(self, key: str) -> None:
+        """广播某个键已变更，其他进程据此丢弃一级缓存"""
+        try:
+            await self.client.publish(settings.CACHE_INVALIDATION_CHANNEL, f"{NODE_ID}|{key}")
+        except Exception as e:
+            logger.warning(f"Cache invalidation publish failed: {e}")
+    
+    def handle_invalidation(self, message: str) -> None:
+        """处理一条失效广播（忽略本进程发出的）"""
+        node, _, key = message.partition("|")
+        if node == NODE_ID or not key:
+            return
+        if key == GENERATIONS_KEY:
+            self.namespaces.expire()
+        elif self.local is not None:
+            self.local.discard(key)
+    
+    async def listen_invalidations(self) -> None:
+        """订阅失效频道，断线后重连；重连前清空一级缓存以免漏收"""
+        while True:
+            pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(settings.CACHE_INVALIDATION_CHANNEL)
+                while True:
+                    # 显式超时读取：连接池的读写超时很短，不能用于阻塞等待
+                    message = await pubsub.get_message(timeout=1.0)
+                    if message is not None and message.get("type") == "message":
+                        self.handle_invalidation(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Cache invalidation listener error: {e}")
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+            if self.local is not None:
+                self.local.clear()
+            await asyncio.sleep(5)
+    
+    async def bump_namespace(self, prefix: str) -> int:
+        """使整个命名空间失效（递增代数并通知各进程）"""
+        generation = await self.namespaces.bump(prefix)
+        await self._publish_invalidation(GENERATIONS_KEY)
+        return generation
+    
+    def stats(self) -> Dict[str, Any]:
+        """各级缓存命中统计"""
+        total = self.redis_hits + self.redis_misses
+        return {
+            "namespaces": self.namespaces.stats(),
+            "local": self.local.stats() if self.local is not None else None,
+            "redis": {
+                "hits": self.redis_hits,
+                "misses": self.redis_misses,
+                "hit_rate": round(self.redis_hits / total, 4) if total else 0.0
+            }
+        }
+    
     # ==================== 业务缓存键 ====================
     
     @staticmethod
@@ -80,9 +601,19 @@ class CacheService:
         return f"user:{user_id}"
     
     @staticmethod
-    def bazi_key(year: int, month: int, day: int, hour: int) -> str:
-        """八字分析缓存键"""
-        return f"bazi:{year}:{month}:{day}:{hour}"
+    def bazi_core_key(bazi: str) -> str:
+        """八字命盘层缓存键（按四柱）"""
+        return f"bazi:core:{bazi.replace(' ', '')}"
+    
+    @staticmethod
+    def bazi_dayun_key(bazi: str, gender: str, qiyun_age: int) -> str:
+        """八字大运层缓存键（按四柱、性别、起运岁数）"""
+        return f"bazi:dayun:{bazi.replace(' ', '')}:{gender}:{qiyun_age}"
+    
+    @staticmethod
+    def bazi_liunian_key(bazi: str, birth_year: int, target_year: int) -> str:
+        """八字流年层缓存键（按四柱、出生年、目标年）"""
+        return f"bazi:liunian:{bazi.replace(' ', '')}:{birth_year}:{target_year}"
     
     @staticmethod
     def ziwei_key(year_gan: str, year_zhi: str, month: int, day: int, hour_zhi: str) -> str:
@@ -90,7 +621,17 @@ class CacheService:
         return f"ziwei:{year_gan}{year_zhi}:{month}:{day}:{hour_zhi}"
     
     @staticmethod
-    def rate_limit_key(user_id: int, action: str) -> str:
+    def narrative_key(kind: str, digest: str) -> str:
+        """断语缓存键（按特征摘要）"""
+        return f"narrative:{kind}:{digest}"
+    
+    @staticmethod
+    def result_key(digest: str) -> str:
+        """结果库条目缓存键（内容不可变）"""
+        return f"result:{digest}"
+    
+    @staticmethod
+    def rate_limit_key(user_id: Union[int, str], action: str) -> str:
         """速率限制缓存键"""
         return f"ratelimit:{user_id}:{action}"
     
@@ -104,7 +645,7 @@ class CacheService:
 
 def cached(prefix: str, expire: int = 3600):
     """
-    缓存装饰器
+    缓存装饰器（使用全局两级缓存，返回值请勿原地修改）
     
     用法：
         @cached("bazi", expire=7200)
@@ -116,21 +657,10 @@ def cached(prefix: str, expire: int = 3600):
             # 生成缓存键
             cache_key = f"{prefix}:{':'.join(str(a) for a in args)}:{':'.join(f'{k}={v}' for k,v in sorted(kwargs.items()))}"
             
-            cache = CacheService()
-            
-            # 尝试从缓存获取
-            cached_value = await cache.get(cache_key)
-            if cached_value is not None:
-                return cached_value
-            
-            # 执行函数
-            result = await func(*args, **kwargs)
-            
-            # 存入缓存
-            if result is not None:
-                await cache.set(cache_key, result, expire)
-            
-            return result
+            # 读取缓存，未命中时合并并发请求只计算一次
+            return await cache.get_or_compute(
+                cache_key, lambda: func(*args, **kwargs), expire
+            )
         
         return wrapper
     return decorator
@@ -138,11 +668,134 @@ def cached(prefix: str, expire: int = 3600):
 
 # ==================== 速率限制 ====================
 
+# GCRA：每个键只存理论到达时间（TAT，毫秒），一次调用完成判定与更新。
+# ARGV[1] 请求间隔（毫秒）= 窗口 / 请求数；ARGV[2] 允许的突发请求数。
+# 返回 {是否放行, 需等待的毫秒数}；时间取 Redis 服务器时钟，各进程一致。
+_GCRA_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local interval = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2]) * interval
+local tat = tonumber(redis.call('GET', KEYS[1])) or now
+if tat < now then
+    tat = now
+end
+local new_tat = tat + interval
+if new_tat - now > capacity then
+    return {0, new_tat - now - capacity}
+end
+redis.call('SET', KEYS[1], new_tat, 'PX', new_tat - now)
+return {1, 0}
+"""
+
+
+@dataclass
+class RateLimitResult:
+    """限流判定"""
+    allowed: bool
+    retry_after: float = 0.0    # 被拒绝时建议等待的秒数
+
+
+def gcra_interval_ms(max_requests: int, window_seconds: float) -> int:
+    """GCRA 两次请求的最小间隔（毫秒）"""
+    return max(1, int(window_seconds * 1000 / max_requests))
+
+
+class LocalRateCounter:
+    """
+    进程内限流预判
+    
+    与 Redis 脚本相同的 GCRA 运算（同样的间隔与突发量），只计本进程见到的请求。
+    本进程的请求是全局请求的子集，其理论到达时间（TAT）不晚于全局的 TAT，
+    因此本地判定超限时 Redis 必然也判定超限，可直接拒绝；Redis 拒绝的请求
+    由 block 撤回本地计数并在建议的等待时间内直接拒绝。都不访问 Redis。
+    
+    Args:
+        max_keys: 最多保留的键数，超出时淘汰最久未用的
+    """
+    
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        # 键 → [TAT（毫秒）, 冷却截止（秒）, 间隔（毫秒）]
+        self._entries: "OrderedDict[str, list]" = OrderedDict()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def hit(self, key: str, limit: int, window: float, burst: Optional[int] = None) -> float:
+        """记一次请求，返回应拒绝的剩余秒数（0 表示交由 Redis 判定）"""
+        now = time.monotonic()
+        now_ms = int(now * 1000)
+        interval = gcra_interval_ms(limit, window)
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = [now_ms, 0.0, interval]
+            while len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+        else:
+            self._entries.move_to_end(key)
+        if entry[1] > now:
+            return entry[1] - now
+        tat = max(entry[0], now_ms) + interval
+        excess = tat - now_ms - (burst or limit) * interval
+        if excess > 0:
+            return excess / 1000
+        entry[0], entry[2] = tat, interval
+        return 0.0
+    
+    def block(self, key: str, seconds: float) -> None:
+        """Redis 判定超限：撤回本次计数，并在 seconds 秒内直接拒绝"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry[0] -= entry[2]
+            entry[1] = time.monotonic() + seconds
+
+
 class RateLimiter:
-    """速率限制器"""
+    """
+    速率限制器（GCRA，一次 Redis 往返，每个键 O(1) 内存）
     
-    def __init__(self, cache: CacheService = None):
+    先经进程内计数预判，明显超限的请求不访问 Redis；
+    Redis 不可用时只按进程内计数判定。
+    """
+    
+    def __init__(self, cache: CacheService = None, local_keys: int = 100000):
         self.cache = cache or CacheService()
+        self.local = LocalRateCounter(local_keys)
+        self._gcra = self.cache.client.register_script(_GCRA_SCRIPT)
+        self.checked = 0
+        self.rejected = 0
+        self.local_rejected = 0
+    
+    async def acquire(self, key: str, max_requests: int, window_seconds: float,
+                      burst: Optional[int] = None) -> RateLimitResult:
+        """
+        判定一次请求
+        
+        Args:
+            key: 限制键
+            max_requests: 窗口内最大请求数
+            window_seconds: 时间窗口（秒）
+            burst: 允许的突发请求数，默认等于 max_requests
+        """
+        self.checked += 1
+        wait = self.local.hit(key, max_requests, window_seconds, burst)
+        if wait > 0:
+            self.local_rejected += 1
+            return RateLimitResult(False, wait)
+        
+        interval_ms = gcra_interval_ms(max_requests, window_seconds)
+        try:
+            allowed, retry_ms = await self._gcra(keys=[key], args=[interval_ms, burst or max_requests])
+        except Exception as e:
+            if not isinstance(e, RedisUnavailable):
+                logger.warning(f"Rate limit check error: {e}")
+            return RateLimitResult(True)
+        if allowed:
+            return RateLimitResult(True)
+        self.rejected += 1
+        self.local.block(key, retry_ms / 1000)
+        return RateLimitResult(False, retry_ms / 1000)
     
     async def is_allowed(self, key: str, max_requests: int, window_seconds: int) -> bool:
         """
@@ -156,12 +809,7 @@ class RateLimiter:
         Returns:
             是否允许
         """
-        current = await self.cache.incr(key)
-        
-        if current == 1:
-            await self.cache.expire(key, window_seconds)
-        
-        return current <= max_requests
+        return (await self.acquire(key, max_requests, window_seconds)).allowed
     
     async def check_user_limit(self, user_id: int, action: str,
                                 max_requests: int = 100,
@@ -169,8 +817,25 @@ class RateLimiter:
         """检查用户操作限制"""
         key = CacheService.rate_limit_key(user_id, action)
         return await self.is_allowed(key, max_requests, window_seconds)
+    
+    def stats(self) -> Dict[str, Any]:
+        """限流统计"""
+        return {
+            "checked": self.checked,
+            "rejected": self.rejected,
+            "local_rejected": self.local_rejected,
+            "local_keys": len(self.local)
+        }
 
 
-# 全局缓存实例
-cache = CacheService()
-rate_limiter = RateLimiter(cache)
+# 全局缓存实例（分析结果缓存，带进程内一级缓存及二进制编解码）
+cache_codec = CacheCodec(
+    serializer=settings.CACHE_SERIALIZER,
+    compression=settings.CACHE_COMPRESSION,
+    compress_min_bytes=settings.CACHE_COMPRESS_MIN_BYTES
+)
+cache = CacheService(
+    local=local_cache if settings.CACHE_LOCAL_ENABLED else None,
+    codec=cache_codec
+)
+rate_limiter = RateLimiter(cache, local_keys=settings.RATE_LIMIT_LOCAL_KEYS)
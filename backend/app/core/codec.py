@@ -0,0 +1,168 @@
+"""
+玄心理命 - 缓存序列化编解码
+
+缓存值以一个头字节开头，随后是（可能经过压缩的）载荷：
+
+    bit 0-2  序列化方式：1=JSON 2=msgpack 3=原始字节（如预序列化的HTTP响应体）
+    bit 3-4  压缩方式：0=不压缩 1=zstd 2=lz4 3=zlib
+
+头字节总小于 0x20，与旧版直接写入的 JSON 文本（首字节为可打印字符）可区分；
+无法识别的头字节按未命中处理，新格式上线时旧进程不会误读。
+msgpack、zstandard、lz4 均为可选依赖，缺失时分别退化为 JSON、不压缩；
+zlib 为标准库，用于需长期保存、任何节点都须能解开的数据（如结果库）。
+"""
+
+import json
+import zlib
+from typing import Any, Tuple
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - 可选依赖
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - 可选依赖
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # pragma: no cover - 可选依赖
+    lz4_frame = None
+
+
+SERIALIZER_JSON = 1
+SERIALIZER_MSGPACK = 2
+SERIALIZER_RAW = 3
+
+COMPRESSION_NONE = 0
+COMPRESSION_ZSTD = 1
+COMPRESSION_LZ4 = 2
+COMPRESSION_ZLIB = 3
+
+_SERIALIZER_NAMES = {"json": SERIALIZER_JSON, "msgpack": SERIALIZER_MSGPACK}
+_COMPRESSION_NAMES = {"none": COMPRESSION_NONE, "zstd": COMPRESSION_ZSTD, "lz4": COMPRESSION_LZ4,
+                      "zlib": COMPRESSION_ZLIB}
+
+_HEADER_LIMIT = 0x20
+
+
+class CodecError(ValueError):
+    """无法解码的缓存值"""
+
+
+def _compressor_available(compression: int) -> bool:
+    if compression == COMPRESSION_ZSTD:
+        return zstandard is not None
+    if compression == COMPRESSION_LZ4:
+        return lz4_frame is not None
+    return True
+
+
+class CacheCodec:
+    """
+    缓存编解码器
+
+    Args:
+        serializer: "msgpack" 或 "json"；msgpack 未安装时使用 JSON
+        compression: "zstd"、"lz4"、"zlib" 或 "none"；对应库未安装时不压缩
+        compress_min_bytes: 载荷达到该字节数才压缩
+    """
+
+    def __init__(self, serializer: str = "msgpack", compression: str = "zstd",
+                 compress_min_bytes: int = 4096):
+        if serializer not in _SERIALIZER_NAMES:
+            raise ValueError(f"未知的序列化方式: {serializer}")
+        if compression not in _COMPRESSION_NAMES:
+            raise ValueError(f"未知的压缩方式: {compression}")
+
+        self.serializer = _SERIALIZER_NAMES[serializer]
+        if self.serializer == SERIALIZER_MSGPACK and msgpack is None:
+            self.serializer = SERIALIZER_JSON
+
+        self.compression = _COMPRESSION_NAMES[compression]
+        if not _compressor_available(self.compression):
+            self.compression = COMPRESSION_NONE
+        self.compress_min_bytes = compress_min_bytes
+
+        self._zstd_c = zstandard.ZstdCompressor(level=3) if self.compression == COMPRESSION_ZSTD else None
+        self._zstd_d = zstandard.ZstdDecompressor() if zstandard is not None else None
+
+    # ==================== 编码 ====================
+
+    def encode(self, value: Any) -> bytes:
+        """编码为带头字节的二进制"""
+        return self.encode_with_size(value)[0]
+
+    def encode_with_size(self, value: Any) -> Tuple[bytes, int]:
+        """编码，同时返回未压缩的载荷字节数（用于一级缓存容量计量）"""
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            serializer, payload = SERIALIZER_RAW, bytes(value)
+        elif self.serializer == SERIALIZER_MSGPACK:
+            serializer, payload = SERIALIZER_MSGPACK, msgpack.packb(value, use_bin_type=True, default=str)
+        else:
+            serializer = SERIALIZER_JSON
+            payload = json.dumps(value, ensure_ascii=False, default=str).encode("utf-8")
+
+        size = len(payload)
+        compression = COMPRESSION_NONE
+        if self.compression != COMPRESSION_NONE and size >= self.compress_min_bytes:
+            compression = self.compression
+            payload = self._compress(compression, payload)
+        return bytes((serializer | compression << 3,)) + payload, size
+
+    def _compress(self, compression: int, payload: bytes) -> bytes:
+        if compression == COMPRESSION_ZSTD:
+            return self._zstd_c.compress(payload)
+        if compression == COMPRESSION_ZLIB:
+            return zlib.compress(payload, 6)
+        return lz4_frame.compress(payload)
+
+    # ==================== 解码 ====================
+
+    def decode(self, data: bytes) -> Any:
+        """解码；无法识别时抛出 CodecError"""
+        return self.decode_with_size(data)[0]
+
+    def decode_with_size(self, data: bytes) -> Tuple[Any, int]:
+        """解码，同时返回未压缩的载荷字节数"""
+        if not data:
+            raise CodecError("空的缓存值")
+        header = data[0]
+        serializer, compression = header & 0x07, header >> 3
+        try:
+            if header >= _HEADER_LIMIT:
+                return self._decode_legacy(data), len(data)
+            payload = self._decompress(compression, memoryview(data)[1:])
+            if serializer == SERIALIZER_RAW:
+                return bytes(payload), len(payload)
+            if serializer == SERIALIZER_MSGPACK and msgpack is not None:
+                return msgpack.unpackb(payload, raw=False, strict_map_key=False), len(payload)
+            if serializer == SERIALIZER_JSON:
+                return json.loads(bytes(payload)), len(payload)
+        except CodecError:
+            raise
+        except Exception as e:
+            raise CodecError(f"缓存值解码失败: {e}") from e
+        raise CodecError(f"不支持的序列化方式: {serializer}")
+
+    def _decompress(self, compression: int, payload: memoryview) -> bytes:
+        if compression == COMPRESSION_NONE:
+            return payload
+        if compression == COMPRESSION_ZSTD and self._zstd_d is not None:
+            return self._zstd_d.decompress(payload)
+        if compression == COMPRESSION_LZ4 and lz4_frame is not None:
+            return lz4_frame.decompress(payload)
+        if compression == COMPRESSION_ZLIB:
+            return zlib.decompress(payload)
+        raise CodecError(f"不支持的压缩方式: {compression}")
+
+    @staticmethod
+    def _decode_legacy(data: bytes) -> Any:
+        """旧版无头字节的 JSON 文本"""
+        text = data.decode("utf-8")
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError:
+            return text
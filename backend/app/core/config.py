@@ -4,7 +4,7 @@
 
 import os
 from pydantic_settings import BaseSettings
-from typing import Optional, List
+from typing import Optional, List, Dict
 from functools import lru_cache
 
 
@@ -29,7 +29,78 @@ class Settings(BaseSettings):
     
     # Redis配置
     REDIS_URL: str = "redis://localhost:6379/0"
+    REDIS_MAX_CONNECTIONS: int = 100        # 每个连接池的连接数上限
+    REDIS_SOCKET_TIMEOUT: float = 0.5       # 读写超时（秒）
+    REDIS_CONNECT_TIMEOUT: float = 0.5      # 建连超时（秒）
+    REDIS_HEALTH_CHECK_INTERVAL: int = 30   # 连接空闲超过该秒数后使用前先 PING
+    REDIS_BREAKER_FAILURES: int = 5         # 连续失败多少次后熔断
+    REDIS_BREAKER_RESET: float = 5.0        # 熔断多久后放行试探（秒）
     CACHE_DEFAULT_EXPIRE: int = 3600  # 默认缓存1小时
+    # 引擎结果的缓存键带引擎版本与命名空间代数（见 cache.CacheNamespaces），可长期缓存
+    CACHE_ENGINE_EXPIRE: int = 30 * 86400   # 30天
+    CACHE_GENERATION_REFRESH: float = 5.0   # 各进程重读命名空间代数的间隔（秒）
+    CACHE_SCAN_BATCH: int = 500             # 按模式批量删除时每批 SCAN/UNLINK 的键数
+    
+    # 进程内缓存（Redis前的一级缓存）
+    CACHE_LOCAL_ENABLED: bool = True
+    CACHE_LOCAL_MAX_BYTES: int = 64 * 1024 * 1024   # 总容量64MB
+    CACHE_LOCAL_MAX_ITEM_BYTES: int = 1024 * 1024   # 单条超过1MB不进本地缓存
+    CACHE_LOCAL_TTL: int = 60                       # 本地最长保留60秒
+    CACHE_INVALIDATION_CHANNEL: str = "cache:invalidate"
+    
+    # 防缓存击穿
+    CACHE_LOCK_TIMEOUT_MS: int = 5000  # 跨进程重算锁的持有上限
+    CACHE_XFETCH_BETA: float = 1.0     # 提前刷新力度，越大越早刷新
+    
+    # 缓存编解码
+    CACHE_SERIALIZER: str = "msgpack"        # msgpack / json
+    CACHE_COMPRESSION: str = "zstd"          # zstd / lz4 / none
+    CACHE_COMPRESS_MIN_BYTES: int = 4096     # 载荷达到该大小才压缩
+    
+    # 计算执行器（CPU密集的排盘/分析引擎）
+    COMPUTE_EXECUTOR: str = "process"   # process / thread / inline
+    COMPUTE_WORKERS: int = 0            # 0 表示CPU核数
+    COMPUTE_TIMEOUT: float = 10.0       # 默认超时（秒）
+    COMPUTE_ENGINE_TIMEOUTS: Dict[str, float] = {"fusion.report": 20.0}
+    
+    # 计算准入控制（见 admission.AdmissionController）
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_SLOTS: int = 0                 # 同时在途的计算请求数，0 表示计算 worker 数的2倍
+    ADMISSION_QUEUE_LIMIT: int = 64          # 等待队列上限
+    ADMISSION_LOW_QUEUE_LIMIT: int = 8       # 低优先级（断语后台生成）等待上限
+    ADMISSION_TARGET_DELAY: float = 0.1      # 目标排队时延（秒）
+    ADMISSION_INTERVAL: float = 0.5          # 时延持续超标多久开始拒绝（秒）
+    ADMISSION_MAX_WAIT: float = 2.0          # 预计等待超过该值直接拒绝（秒）
+    ADMISSION_FREE_COST: float = 0.0002      # 平均引擎 CPU 时间低于该值的端点不受限（秒）
+    ADMISSION_DEFAULT_COST: float = 0.05     # 尚未测得代价的端点按该值计（秒）
+    
+    # 断语后台生成
+    NARRATIVE_CACHE_EXPIRE: int = 30 * 86400  # 断语键带规则库摘要，缓存30天
+    NARRATIVE_STREAM_TIMEOUT: float = 30.0  # SSE 最长等待（秒）
+    NARRATIVE_POLL_INTERVAL: float = 0.5    # 等待其他 worker 的任务时的轮询间隔（秒）
+    
+    # 历史记录写后队列
+    HISTORY_WRITE_BEHIND: bool = True
+    HISTORY_BATCH_SIZE: int = 200            # 单批最多写入条数
+    HISTORY_FLUSH_INTERVAL: float = 0.5      # 攒批最长等待（秒）
+    HISTORY_QUEUE_MAX: int = 10000           # 队列上限，满时提交方等待
+    HISTORY_ENQUEUE_TIMEOUT: float = 1.0     # 等待空位超时后直接落盘（秒）
+    HISTORY_SPILL_DIR: str = "data/history_spill"  # 写库失败时的落盘目录
+    HISTORY_SPILL_RETRY: float = 30.0        # 重放落盘记录的间隔（秒）
+    HISTORY_SUMMARY_BACKFILL: bool = True    # 启动时为旧记录补齐列表摘要
+    HISTORY_SUMMARY_BACKFILL_BATCH: int = 500
+    
+    # 分析结果内容寻址存储
+    RESULT_STORE_ENABLED: bool = True
+    RESULT_STORE_COMPRESSION: str = "zlib"   # zlib / zstd / lz4 / none，长期保存建议 zlib
+    RESULT_CACHE_EXPIRE: int = 86400         # 结果内容不可变，热缓存1天
+    RESULT_KNOWN_DIGESTS: int = 100000       # 进程内记住的已入库摘要数，命中时不再重复发送结果体
+    
+    # 用户统计计数（Redis 增量维护，定期按聚合查询校准）
+    STATS_COUNTERS_ENABLED: bool = True
+    STATS_COUNTER_EXPIRE: int = 86400        # 计数哈希过期后按聚合查询重建
+    STATS_RECONCILE_INTERVAL: float = 300.0  # 校准间隔（秒）
+    STATS_RECONCILE_BATCH: int = 200         # 每轮校准用户数
     
     # JWT配置
     SECRET_KEY: str = "your-secret-key-change-in-production-玄心理命-2024"
@@ -46,9 +117,24 @@ class Settings(BaseSettings):
     LOG_LEVEL: str = "INFO"
     LOG_DIR: str = "logs"
     
-    # 限流配置
-    RATE_LIMIT_REQUESTS: int = 100  # 每分钟最大请求数
+    # 限流配置（按客户端 IP，GCRA 算法，见 cache.RateLimiter）
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_REQUESTS: int = 100  # 每个窗口最大请求数（未单独配置的路由）
     RATE_LIMIT_WINDOW: int = 60     # 限流窗口（秒）
+    # 按路径前缀单独限流（最长前缀优先）：前缀 → 每个窗口最大请求数
+    RATE_LIMIT_ROUTES: Dict[str, int] = {
+        "/api/auth/send-code": 5,
+        "/api/auth/login": 20,
+        "/api/auth/register": 10,
+        "/api/bazi/analyze": 30,
+        "/api/bazi/paipan/batch": 10,
+        "/api/ziwei/analyze": 30,
+        "/api/fusion": 30,
+    }
+    RATE_LIMIT_EXEMPT: List[str] = ["/health", "/docs", "/redoc", "/openapi.json"]
+    RATE_LIMIT_LOCAL_KEYS: int = 100000  # 进程内预判计数最多保留的键数
+    # 可信反向代理（IP 或网段）：只有来自这些地址的请求才采信 X-Forwarded-For
+    TRUSTED_PROXIES: List[str] = []
     
     # 文件上传配置
     UPLOAD_DIR: str = "uploads"
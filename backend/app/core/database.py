@@ -4,7 +4,7 @@
 
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
-from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, Float, JSON, text
+from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, Float, JSON, LargeBinary, Index, text
 from sqlalchemy.engine.url import make_url
 from datetime import datetime, timedelta
 import os
@@ -65,7 +65,14 @@ class User(Base):
 class BirthInfo(Base):
     """用户出生信息表"""
     __tablename__ = "birth_info"
-    __table_args__ = {'comment': '用户生辰八字基础信息表'}
+    __table_args__ = (
+        # 同一用户同一生辰只存一条，resolve_birth_info 据此单条 upsert
+        Index(
+            "uq_birth_info_user_birth", "user_id", "birth_year", "birth_month", "birth_day",
+            "birth_hour", "is_lunar", "gender", unique=True
+        ),
+        {'comment': '用户生辰八字基础信息表'}
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True, comment="记录ID")
     user_id = Column(Integer, index=True, nullable=False, comment="关联用户ID")
@@ -84,46 +91,77 @@ class BirthInfo(Base):
 class AnalysisRecord(Base):
     """分析记录表"""
     __tablename__ = "analysis_records"
-    __table_args__ = {'comment': '八字/紫微分析记录表'}
+    __table_args__ = (
+        # 历史列表：按用户、类型过滤，按 (created_at, id) 倒序翻页
+        Index("ix_analysis_records_user_type_created", "user_id", "analysis_type", "created_at", "id"),
+        {'comment': '八字/紫微分析记录表'}
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True, comment="记录ID")
     user_id = Column(Integer, index=True, comment="关联用户ID")
     birth_info_id = Column(Integer, index=True, comment="关联出生信息ID")
     analysis_type = Column(String(20), nullable=False, comment="分析类型(bazi/ziwei)")
-    result_data = Column(JSON, comment="分析结果JSON")
+    result_data = Column(JSON, comment="分析结果JSON（旧记录；新记录见 result_digest）")
+    result_digest = Column(String(64), index=True, nullable=True, comment="结果库摘要")
+    summary = Column(String(200), comment="列表摘要（写入时提取）")
     created_at = Column(DateTime, default=get_beijing_time, comment="创建时间")
 
 
 class DivinationRecord(Base):
     """占卜记录表"""
     __tablename__ = "divination_records"
-    __table_args__ = {'comment': '占卜记录表'}
+    __table_args__ = (
+        Index("ix_divination_records_user_method_created", "user_id", "method", "created_at", "id"),
+        {'comment': '占卜记录表'}
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True, comment="记录ID")
     user_id = Column(Integer, index=True, comment="关联用户ID")
     method = Column(String(20), nullable=False, comment="占卜方式(meihua/liuyao)")
     question = Column(Text, comment="求测问题")
-    result_data = Column(JSON, comment="占卜结果JSON")
+    result_data = Column(JSON, comment="占卜结果JSON（旧记录；新记录见 result_digest）")
+    result_digest = Column(String(64), index=True, nullable=True, comment="结果库摘要")
+    summary = Column(String(200), comment="列表摘要（写入时提取）")
+    created_at = Column(DateTime, default=get_beijing_time, comment="创建时间")
+
+
+class ResultBlob(Base):
+    """分析结果内容寻址存储表"""
+    __tablename__ = "result_blobs"
+    __table_args__ = {'comment': '排盘/占卜结果按内容摘要去重存储'}
+    
+    digest = Column(String(64), primary_key=True, comment="sha256(类型, 引擎版本, 规范化结果)")
+    kind = Column(String(20), nullable=False, comment="结果类型(bazi/ziwei/yijing)")
+    engine_version = Column(String(20), nullable=False, comment="引擎版本")
+    body = Column(LargeBinary, nullable=False, comment="压缩后的结果体")
+    size = Column(Integer, comment="未压缩字节数")
     created_at = Column(DateTime, default=get_beijing_time, comment="创建时间")
 
 
 class PsychologyTest(Base):
     """心理测试记录表"""
     __tablename__ = "psychology_tests"
-    __table_args__ = {'comment': '心理测试记录表'}
+    __table_args__ = (
+        Index("ix_psychology_tests_user_type_created", "user_id", "test_type", "created_at", "id"),
+        {'comment': '心理测试记录表'}
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True, comment="记录ID")
     user_id = Column(Integer, index=True, comment="关联用户ID")
     test_type = Column(String(20), nullable=False, comment="测试类型(mbti/big5/archetype/enneagram)")
     answers = Column(JSON, comment="用户答案JSON")
     result_data = Column(JSON, comment="测试结果JSON")
+    summary = Column(String(200), comment="列表摘要（写入时提取）")
     created_at = Column(DateTime, default=get_beijing_time, comment="创建时间")
 
 
 class FusionRecord(Base):
     """融合分析记录表"""
     __tablename__ = "fusion_records"
-    __table_args__ = {'comment': '融合分析记录表'}
+    __table_args__ = (
+        Index("ix_fusion_records_user_created", "user_id", "created_at", "id"),
+        {'comment': '融合分析记录表'}
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True, comment="记录ID")
     user_id = Column(Integer, index=True, nullable=False, comment="关联用户ID")
@@ -141,7 +179,11 @@ class FusionRecord(Base):
 class Favorite(Base):
     """用户收藏表"""
     __tablename__ = "favorites"
-    __table_args__ = {'comment': '用户收藏表'}
+    __table_args__ = (
+        # 同一用户同一条目只收藏一次，add_favorite 据此单条 upsert
+        Index("uq_favorites_user_item", "user_id", "item_type", "item_id", unique=True),
+        {'comment': '用户收藏表'}
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True, comment="记录ID")
     user_id = Column(Integer, index=True, nullable=False, comment="关联用户ID")
@@ -183,6 +225,15 @@ class ExportHistory(Base):
 
 # ==================== 数据库操作 ====================
 
+def insert_ignore(model, *index_elements: str):
+    """INSERT ... ON CONFLICT DO NOTHING（按当前数据库方言）"""
+    if engine.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    return dialect_insert(model).on_conflict_do_nothing(index_elements=list(index_elements))
+
+
 async def create_database_if_not_exists():
     """如果数据库不存在则创建"""
     url = make_url(parse_db_url(DATABASE_URL))
@@ -240,6 +291,40 @@ def parse_db_url(url):
         return url.render_as_string(hide_password=False)
     return str(url)
 
+# 已有表的增量结构变更（幂等）
+SCHEMA_UPGRADES = [
+    "ALTER TABLE analysis_records ADD COLUMN IF NOT EXISTS result_digest VARCHAR(64)",
+    "CREATE INDEX IF NOT EXISTS ix_analysis_records_result_digest ON analysis_records (result_digest)",
+    "ALTER TABLE divination_records ADD COLUMN IF NOT EXISTS result_digest VARCHAR(64)",
+    "CREATE INDEX IF NOT EXISTS ix_divination_records_result_digest ON divination_records (result_digest)",
+    "ALTER TABLE analysis_records ADD COLUMN IF NOT EXISTS summary VARCHAR(200)",
+    "ALTER TABLE divination_records ADD COLUMN IF NOT EXISTS summary VARCHAR(200)",
+    "ALTER TABLE psychology_tests ADD COLUMN IF NOT EXISTS summary VARCHAR(200)",
+    "CREATE INDEX IF NOT EXISTS ix_analysis_records_user_type_created"
+    " ON analysis_records (user_id, analysis_type, created_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_divination_records_user_method_created"
+    " ON divination_records (user_id, method, created_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_psychology_tests_user_type_created"
+    " ON psychology_tests (user_id, test_type, created_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_fusion_records_user_created"
+    " ON fusion_records (user_id, created_at, id)",
+    # 建唯一索引前清掉重复收藏（保留最早一条）
+    "DELETE FROM favorites a USING favorites b WHERE a.user_id = b.user_id"
+    " AND a.item_type = b.item_type AND a.item_id = b.item_id AND a.id > b.id",
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_favorites_user_item ON favorites (user_id, item_type, item_id)",
+    # 建唯一索引前合并重复出生信息：分析记录改指最早一条，再删其余
+    "UPDATE analysis_records r SET birth_info_id = k.keep_id FROM ("
+    " SELECT id, MIN(id) OVER (PARTITION BY user_id, birth_year, birth_month, birth_day,"
+    " birth_hour, is_lunar, gender) AS keep_id FROM birth_info"
+    ") k WHERE r.birth_info_id = k.id AND k.id <> k.keep_id",
+    "DELETE FROM birth_info a USING birth_info b WHERE a.user_id = b.user_id"
+    " AND a.birth_year = b.birth_year AND a.birth_month = b.birth_month AND a.birth_day = b.birth_day"
+    " AND a.birth_hour = b.birth_hour AND a.is_lunar = b.is_lunar AND a.gender = b.gender AND a.id > b.id",
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_birth_info_user_birth"
+    " ON birth_info (user_id, birth_year, birth_month, birth_day, birth_hour, is_lunar, gender)",
+]
+
+
 async def init_db():
     """初始化数据库表"""
     # 先尝试创建数据库
@@ -248,6 +333,10 @@ async def init_db():
     # 再创建表
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        # create_all 不修改已存在的表，新增列与索引在此补齐
+        if conn.dialect.name == "postgresql":
+            for statement in SCHEMA_UPGRADES:
+                await conn.execute(text(statement))
 
 
 async def get_db() -> AsyncSession:
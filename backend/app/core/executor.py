@@ -0,0 +1,210 @@
+"""
+玄心理命 - 计算执行器
+
+排盘、断语等引擎都是同步的 CPU 密集计算，直接在 async 路由中调用会阻塞
+整个事件循环。run_engine 把调用交给常驻进程池，worker 启动时预加载
+节气表、紫微命盘表和规则库；每个引擎有独立的超时，超时或请求取消时
+尚未开始的任务会被撤销。
+每次调用在 worker 内计量 CPU 时间，计入准入控制的端点代价（见 admission）。
+
+执行方式由 Settings.COMPUTE_EXECUTOR 决定：process（默认）、thread、inline。
+"""
+
+import asyncio
+import importlib
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .admission import charge
+from .config import settings
+from .logging import logger
+
+
+# 引擎名 → "模块:属性路径"，worker 内按名解析，避免跨进程传递函数对象
+ENGINES: Dict[str, str] = {
+    "bazi": "app.core.bazi:analyze_bazi",
+    "bazi.core": "app.core.bazi:analyze_core",
+    "ziwei": "app.core.ziwei:analyze_ziwei",
+    "yijing": "app.core.yijing:analyze_hexagram",
+    "yijing.liuyao": "app.core.yijing:divine_liuyao",
+    "fusion": "app.fusion:analyze_fusion",
+    "fusion.quick": "app.fusion:quick_fusion_analysis",
+    "fusion.report": "app.fusion:generate_report",
+    "analysis.bazi": "app.core.analysis.intelligent_analyst:analysis_service.analyze_bazi",
+    "analysis.ziwei": "app.core.analysis.intelligent_analyst:analysis_service.analyze_ziwei",
+    "analysis.yijing": "app.core.analysis.intelligent_analyst:analysis_service.analyze_yijing",
+}
+
+
+# 引擎算法版本：输出格式或算法变化时递增，按引擎族（名称第一段）区分，
+# 结果库、缓存命名空间等按版本隔离新旧结果
+ENGINE_VERSIONS: Dict[str, str] = {
+    "bazi": "2",
+    "ziwei": "1",
+    "yijing": "1",
+    "psychology": "1",
+    "fusion": "1",
+    "analysis": "1",
+}
+
+# 输出还取决于数据文件的引擎族：版本附上数据内容摘要，数据更新后版本随之变化
+ENGINE_DATA_FINGERPRINTS: Dict[str, str] = {
+    "analysis": "app.core.analysis.rule_engine:rules_fingerprint",
+}
+
+
+def engine_version(name: str) -> str:
+    """引擎族版本；未登记的按应用版本"""
+    family = name.split(".")[0]
+    version = ENGINE_VERSIONS.get(family, settings.APP_VERSION)
+    fingerprint = ENGINE_DATA_FINGERPRINTS.get(family)
+    if fingerprint is not None:
+        version = f"{version}-{_resolve(fingerprint)()}"
+    return version
+
+
+class EngineTimeoutError(TimeoutError):
+    """引擎计算超时"""
+
+
+@lru_cache(maxsize=None)
+def _resolve(spec: str) -> Any:
+    """按 "模块:属性路径" 取得对象"""
+    module_name, _, attr_path = spec.partition(":")
+    target: Any = importlib.import_module(module_name)
+    for attr in attr_path.split("."):
+        target = getattr(target, attr)
+    return target
+
+
+def resolve_engine(name: str) -> Callable[..., Any]:
+    """按引擎名取得可调用对象"""
+    return _resolve(ENGINES[name])
+
+
+def _invoke(name: str, args: tuple, kwargs: dict) -> Tuple[Any, float]:
+    """执行引擎，返回 (结果, 本线程消耗的 CPU 秒数)"""
+    start = time.thread_time()
+    result = resolve_engine(name)(*args, **kwargs)
+    return result, time.thread_time() - start
+
+
+def warm_up() -> None:
+    """预加载各引擎及其数据表（worker 初始化时调用）"""
+    from app.core.bazi.jieqi import get_jieqi_table
+    from app.core.ziwei.table import get_ziwei_table
+    from app.core.analysis.rule_engine import engine
+    from app.core.analysis.intelligent_analyst import analysis_service
+
+    get_jieqi_table()
+    get_ziwei_table()
+    engine.load_rules()
+    for name in ENGINES:
+        resolve_engine(name)
+    analysis_service.compile()
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+class ComputeExecutor:
+    """
+    计算执行器
+
+    Args:
+        mode: process / thread / inline（inline 直接在事件循环中执行，仅用于调试）
+        workers: 并发数，0 表示 CPU 核数
+        timeout: 默认超时（秒）
+        engine_timeouts: 按引擎名覆盖超时
+    """
+
+    def __init__(self, mode: str = "process", workers: int = 0, timeout: float = 10.0,
+                 engine_timeouts: Optional[Dict[str, float]] = None):
+        if mode not in ("process", "thread", "inline"):
+            raise ValueError(f"未知的执行方式: {mode}")
+        self.mode = mode
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.engine_timeouts = dict(engine_timeouts or {})
+        self._pool: Optional[Executor] = None
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            if self.mode == "process":
+                # spawn 启动：不继承父进程的事件循环和 Redis/数据库连接
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=warm_up
+                )
+            else:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="engine"
+                )
+        return self._pool
+
+    async def start(self) -> None:
+        """创建并预热进程池，使首个请求不必等待 worker 启动"""
+        if self.mode == "inline":
+            return
+        if self.mode == "thread":
+            warm_up()
+        pool = self._get_pool()
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(pool, _ping) for _ in range(self.workers)))
+        logger.info(f"计算执行器已就绪: {self.mode} x {self.workers}")
+
+    def shutdown(self) -> None:
+        """关闭执行器，撤销排队中的任务"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def run(self, name: str, *args, **kwargs) -> Any:
+        """
+        执行引擎
+
+        Raises:
+            KeyError: 未注册的引擎
+            EngineTimeoutError: 超时
+        """
+        if name not in ENGINES:
+            raise KeyError(f"未注册的引擎: {name}")
+        if self.mode == "inline":
+            result, cpu = _invoke(name, args, kwargs)
+            charge(cpu)
+            return result
+
+        timeout = self.engine_timeouts.get(name, self.timeout)
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._get_pool(), _invoke, name, args, kwargs)
+        try:
+            result, cpu = await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise EngineTimeoutError(f"引擎 {name} 计算超时（{timeout}秒）") from None
+        except BrokenProcessPool:
+            # worker 异常退出后进程池不可再用，下次调用时重建
+            logger.error(f"计算进程池已损坏，将重建（引擎 {name}）")
+            self.shutdown()
+            raise
+        charge(cpu)
+        return result
+
+
+compute_executor = ComputeExecutor(
+    mode=settings.COMPUTE_EXECUTOR,
+    workers=settings.COMPUTE_WORKERS,
+    timeout=settings.COMPUTE_TIMEOUT,
+    engine_timeouts=settings.COMPUTE_ENGINE_TIMEOUTS
+)
+
+
+async def run_engine(name: str, *args, **kwargs) -> Any:
+    """在计算执行器中运行引擎，用法：await run_engine("bazi", year=1990, ...)"""
+    return await compute_executor.run(name, *args, **kwargs)
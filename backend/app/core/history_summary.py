@@ -0,0 +1,78 @@
+"""
+玄心理命 - 历史记录摘要
+
+写入历史记录时从结果中提取一行摘要存入 summary 列；历史列表只读该列，
+完整结果只在详情接口读取。
+"""
+
+from typing import Any, Callable, Dict, Optional
+
+from .logging import logger
+
+
+SUMMARY_MAX_LENGTH = 200
+
+
+def bazi_summary(result: Dict[str, Any]) -> str:
+    """四柱 · 格局"""
+    basic = result.get("basic_info", {})
+    return " · ".join(p for p in (basic.get("bazi"), result.get("geju", {}).get("main_geju")) if p)
+
+
+def ziwei_summary(result: Dict[str, Any]) -> str:
+    """五行局 · 命宫主星"""
+    chart = result.get("chart_data", result)
+    parts = [chart.get("wuxing_ju")]
+    for palace in chart.get("palaces", []):
+        if palace.get("name") == "命宫":
+            stars = [s.get("name") if isinstance(s, dict) else s for s in palace.get("stars", {}).get("main", [])]
+            parts.append("命宫" + ("、".join(stars) if stars else "无主星"))
+            break
+    return " · ".join(p for p in parts if p)
+
+
+def yijing_summary(result: Dict[str, Any]) -> str:
+    """本卦 → 变卦"""
+    main = result.get("main_gua", {}).get("name", "")
+    changed = result.get("changed_gua", {}).get("name", "")
+    return f"{main} → {changed}" if changed and changed != main else main
+
+
+def mbti_summary(result: Dict[str, Any]) -> str:
+    return result.get("type_code", "")
+
+
+def big5_summary(result: Dict[str, Any]) -> str:
+    scores = result.get("scores", {})
+    return f"O:{scores.get('O', 0)} C:{scores.get('C', 0)} E:{scores.get('E', 0)}"
+
+
+def archetype_summary(result: Dict[str, Any]) -> str:
+    return result.get("primary", {}).get("name", "")
+
+
+def enneagram_summary(result: Dict[str, Any]) -> str:
+    return f"{result.get('primary_type', '')}号"
+
+
+SUMMARIZERS: Dict[str, Callable[[Dict[str, Any]], str]] = {
+    "bazi": bazi_summary,
+    "ziwei": ziwei_summary,
+    "yijing": yijing_summary,
+    "mbti": mbti_summary,
+    "big5": big5_summary,
+    "archetype": archetype_summary,
+    "enneagram": enneagram_summary,
+}
+
+
+def summarize(kind: str, result: Optional[Dict[str, Any]]) -> Optional[str]:
+    """结果摘要；未知类型或提取失败时为 None"""
+    summarizer = SUMMARIZERS.get(kind)
+    if summarizer is None or not result:
+        return None
+    try:
+        return summarizer(result)[:SUMMARY_MAX_LENGTH] or None
+    except Exception as e:
+        logger.debug(f"{kind} summary skipped: {e}")
+        return None
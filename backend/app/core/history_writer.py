@@ -0,0 +1,283 @@
+"""
+玄心理命 - 历史记录写后队列
+
+分析、占卜、心理测试、融合记录不影响当次响应，请求只把记录放入进程内队列
+即返回；后台任务攒够 HISTORY_BATCH_SIZE 条或等满 HISTORY_FLUSH_INTERVAL 秒后，
+按表分组在一个事务内批量 INSERT。
+
+- 背压：队列达到 HISTORY_QUEUE_MAX 时提交方等待，超过 HISTORY_ENQUEUE_TIMEOUT
+  仍无空位则直接落盘
+- 落盘：写库失败的批次追加到 HISTORY_SPILL_DIR 下的 JSON Lines 文件（fsync），
+  每隔 HISTORY_SPILL_RETRY 秒重放；重放中途崩溃可能重复写入，不会丢失
+- 关闭：应用退出时写完队列中的记录，写不进库的落盘
+- 结果库：result_blobs 行随记录一同入队，批内按摘要去重，已存在的跳过
+"""
+
+import asyncio
+import base64
+import glob
+import json
+import os
+import time
+from collections import defaultdict, deque
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from sqlalchemy import insert
+
+from .config import settings
+from .database import (
+    AnalysisRecord, DivinationRecord, PsychologyTest, FusionRecord, ResultBlob,
+    async_session, get_beijing_time, insert_ignore
+)
+from .logging import logger
+
+
+# 可写后的表
+MODELS = {model.__tablename__: model for model in (
+    AnalysisRecord, DivinationRecord, PsychologyTest, FusionRecord, ResultBlob
+)}
+
+SPILL_FILENAME = "history.jsonl"
+
+Item = Tuple[Any, Dict[str, Any]]
+
+
+class HistoryWriter:
+    """
+    历史记录写后队列
+
+    Args:
+        session_factory: 数据库会话工厂
+        batch_size: 单批最大条数
+        flush_interval: 攒批最长等待（秒）
+        max_pending: 队列上限
+        enqueue_timeout: 队列满时提交方最长等待（秒）
+        spill_dir: 落盘目录
+        spill_retry: 重放落盘记录的间隔（秒）
+    """
+
+    def __init__(self, session_factory: Callable[[], Any], batch_size: int = 200,
+                 flush_interval: float = 0.5, max_pending: int = 10000,
+                 enqueue_timeout: float = 1.0, spill_dir: str = "data/history_spill",
+                 spill_retry: float = 30.0):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.enqueue_timeout = enqueue_timeout
+        self.spill_dir = spill_dir
+        self.spill_retry = spill_retry
+
+        self._pending: Deque[Item] = deque()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self._wakeup: Optional[asyncio.Event] = None
+        self._full: Optional[asyncio.Event] = None
+        self._space: Optional[asyncio.Event] = None
+
+        self.written = 0
+        self.batches = 0
+        self.spilled = 0
+        self.replayed = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done() and not self._closing
+
+    def start(self) -> None:
+        """启动后台写入任务（需在事件循环中调用）"""
+        if self.running:
+            return
+        self._closing = False
+        self._wakeup = asyncio.Event()
+        self._full = asyncio.Event()
+        self._space = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """写完队列中的记录后停止；超时未写完的落盘"""
+        if self._task is None:
+            return
+        self._closing = True
+        self._wakeup.set()
+        self._full.set()
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            logger.warning("History writer did not drain in time, spilling the rest")
+        except Exception as e:
+            logger.error(f"History writer stopped with error: {e}")
+        finally:
+            self._task = None
+        if self._pending:
+            self._spill(list(self._pending))
+            self._pending.clear()
+
+    async def submit(self, model: Any, values: Dict[str, Any]) -> None:
+        """
+        提交一条记录
+
+        created_at 取提交时刻；队列满时等待空位，超时则直接落盘。
+        """
+        values.setdefault("created_at", get_beijing_time())
+        item = (model, values)
+        if not self.running:
+            self._spill([item])
+            return
+
+        if len(self._pending) >= self.max_pending:
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + self.enqueue_timeout
+            while len(self._pending) >= self.max_pending:
+                remaining = deadline - loop.time()
+                if remaining <= 0 or not self.running:
+                    self._spill([item])
+                    return
+                self._space.clear()
+                try:
+                    await asyncio.wait_for(self._space.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+
+        self._pending.append(item)
+        self._wakeup.set()
+        if len(self._pending) >= self.batch_size:
+            self._full.set()
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        next_replay = 0.0
+        while True:
+            if not self._pending and not self._closing:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.spill_retry)
+                except asyncio.TimeoutError:
+                    pass
+
+            # 攒批：批满或到达刷新间隔即写
+            if self._pending and len(self._pending) < self.batch_size and not self._closing:
+                self._full.clear()
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+            written = True
+            if self._pending:
+                batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+                self._space.set()
+                written = await self._write(batch)
+                if not written:
+                    self._spill(batch)
+
+            if written and loop.time() >= next_replay:
+                next_replay = loop.time() + self.spill_retry
+                await self._replay()
+            if self._closing and not self._pending:
+                return
+
+    async def _write(self, batch: List[Item]) -> bool:
+        """按表分组在一个事务内批量写入（结果体随所属记录入队，先于记录写入）"""
+        groups: Dict[Any, List[Dict[str, Any]]] = defaultdict(list)
+        for model, values in batch:
+            groups[model].append(values)
+        try:
+            async with self.session_factory() as session:
+                async with session.begin():
+                    for model, rows in groups.items():
+                        if model is ResultBlob:
+                            rows = list({row["digest"]: row for row in rows}.values())
+                            await session.execute(insert_ignore(ResultBlob, "digest"), rows)
+                        else:
+                            await session.execute(insert(model), rows)
+        except Exception as e:
+            logger.warning(f"History batch of {len(batch)} failed: {e}")
+            return False
+        self.written += len(batch)
+        self.batches += 1
+        return True
+
+    # ==================== 落盘与重放 ====================
+
+    def _spill(self, items: List[Item]) -> None:
+        """追加到落盘文件并 fsync"""
+        lines = []
+        for model, values in items:
+            row = dict(values)
+            if isinstance(row.get("created_at"), datetime):
+                row["created_at"] = row["created_at"].isoformat()
+            binary = [k for k, v in row.items() if isinstance(v, bytes)]
+            for k in binary:
+                row[k] = base64.b64encode(row[k]).decode("ascii")
+            entry = {"table": model.__tablename__, "values": row}
+            if binary:
+                entry["binary"] = binary
+            lines.append(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+        try:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            with open(os.path.join(self.spill_dir, SPILL_FILENAME), "a", encoding="utf-8") as f:
+                f.writelines(lines)
+                f.flush()
+                os.fsync(f.fileno())
+        except OSError as e:
+            logger.error(f"Failed to spill {len(items)} history records: {e}")
+            return
+        self.spilled += len(items)
+
+    @staticmethod
+    def _load(line: str) -> Item:
+        data = json.loads(line)
+        values = data["values"]
+        if isinstance(values.get("created_at"), str):
+            values["created_at"] = datetime.fromisoformat(values["created_at"])
+        for k in data.get("binary", ()):
+            values[k] = base64.b64decode(values[k])
+        return MODELS[data["table"]], values
+
+    async def _replay(self) -> None:
+        """
+        重放落盘记录
+        先把落盘文件改名再读，重放期间新落盘的记录写入新文件；
+        上次崩溃遗留的改名文件一并重放。
+        """
+        spill_path = os.path.join(self.spill_dir, SPILL_FILENAME)
+        if os.path.exists(spill_path):
+            os.replace(spill_path, f"{spill_path}.{time.time_ns()}.replay")
+        for path in sorted(glob.glob(f"{spill_path}.*.replay")):
+            with open(path, "r", encoding="utf-8") as f:
+                items = [self._load(line) for line in f if line.strip()]
+            failed = False
+            for i in range(0, len(items), self.batch_size):
+                if not await self._write(items[i:i + self.batch_size]):
+                    self._spill(items[i:])
+                    failed = True
+                    break
+                self.replayed += min(self.batch_size, len(items) - i)
+            os.remove(path)
+            if failed:
+                # 库仍不可用，余下的留待下次
+                return
+
+    def stats(self) -> Dict[str, Any]:
+        """队列状态"""
+        return {
+            "running": self.running,
+            "pending": len(self._pending),
+            "written": self.written,
+            "batches": self.batches,
+            "spilled": self.spilled,
+            "replayed": self.replayed
+        }
+
+
+history_writer = HistoryWriter(
+    async_session,
+    batch_size=settings.HISTORY_BATCH_SIZE,
+    flush_interval=settings.HISTORY_FLUSH_INTERVAL,
+    max_pending=settings.HISTORY_QUEUE_MAX,
+    enqueue_timeout=settings.HISTORY_ENQUEUE_TIMEOUT,
+    spill_dir=settings.HISTORY_SPILL_DIR,
+    spill_retry=settings.HISTORY_SPILL_RETRY
+)
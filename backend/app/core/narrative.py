@@ -0,0 +1,263 @@
+"""
+玄心理命 - 断语后台生成
+
+排盘结果先行返回，规则引擎断语（extra_info.ai_analysis）作为后台任务生成并
+写入缓存；缓存已有时直接附在结果中。未命中时结果带 extra_info.ai_analysis_job，
+客户端按其中的地址轮询，或以 Server-Sent Events 订阅。
+
+任务编号由分析类型与特征摘要组成，相同特征的请求共享同一任务与缓存；
+生成中的占位记录也写入缓存，其他 worker 据此等待而不重复提交。
+后台任务以低优先级经过准入控制，计算资源紧张时最先被舍弃。
+"""
+
+import asyncio
+import hashlib
+import json
+import re
+from typing import Any, Callable, Dict, Optional
+
+from .admission import admission, PRIORITY_LOW
+from .cache import CacheService, cache_codec
+from .config import settings
+from .executor import run_engine
+from .logging import logger
+
+
+STATUS_PENDING = "pending"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+# 占位与失败记录的保留时间（秒）
+PENDING_EXPIRE = 60
+FAILED_EXPIRE = 60
+
+_JOB_ID = re.compile(r"^(bazi|ziwei|yijing)-[0-9a-f]{40}$")
+
+
+# ==================== 特征提取 ====================
+
+def bazi_features(result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """从八字排盘结果提取断语所需特征；缺少日主时返回 None"""
+    features: Dict[str, Any] = {}
+    # 1. Basic Info
+    if "basic_info" in result:
+        features["day_master"] = result["basic_info"].get("day_master")
+        # sizhu.month is like "壬午", take 2nd char
+        m_str = result["basic_info"].get("sizhu", {}).get("month", "")
+        if m_str and len(m_str) >= 2:
+            features["month"] = {"zhi": m_str[1]}
+
+    # 2. Wuxing
+    if "wuxing" in result:
+        features["wuxing_scores"] = result["wuxing"].get("scores", {})
+
+    # 3. Shishen (Personality) — dominant_shishen is list of [name, count]
+    if "personality" in result:
+        dom = result["personality"].get("dominant_shishen", [])
+        features["shishen_profile"] = {"dominant": [x[0] for x in dom]}
+
+    # 4. Geju
+    if "geju" in result:
+        features["geju"] = result["geju"].get("main_geju")
+
+    # 5. Dayun
+    if "dayun_liunian" in result:
+        dy_gz = result["dayun_liunian"].get("current_dayun", {}).get("ganzhi", "")
+        if dy_gz and len(dy_gz) >= 2:
+            from app.core.bazi.shishen import get_shishen
+            features["current_dayun"] = {
+                "gan": dy_gz[0],
+                "zhi": dy_gz[1],
+                # 大运天干十神
+                "shishen": get_shishen(result["basic_info"]["day_master"], dy_gz[0])
+            }
+
+    # 6. Shensha
+    if "shensha" in result:
+        all_ss = result["shensha"].get("all_shensha", [])
+        features["shensha"] = [s.get("name") for s in all_ss]
+
+    return features if features.get("day_master") else None
+
+
+def ziwei_features(result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """从紫微命盘提取各宫主星"""
+    if "chart_data" in result and "palaces" in result["chart_data"]:
+        palaces = result["chart_data"]["palaces"]
+    else:
+        palaces = result.get("palaces", [])
+
+    features = []
+    for palace in palaces:
+        # stars.main is a list of dicts or names
+        for star in palace.get("stars", {}).get("main", []):
+            name = star.get("name") if isinstance(star, dict) else star
+            features.append({"star": name, "palace": palace.get("name")})
+    return {"features": features}
+
+
+def yijing_features(result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """从卦象结果提取本卦、动爻与变卦"""
+    return {
+        "main_gua": result.get("main_gua", result.get("original_hexagram", {})),
+        "dong_yao": result.get("dong_yao"),
+        "changed_gua": result.get("changed_gua", {})
+    }
+
+
+EXTRACTORS: Dict[str, Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]] = {
+    "bazi": bazi_features,
+    "ziwei": ziwei_features,
+    "yijing": yijing_features,
+}
+
+
+# ==================== 后台任务 ====================
+
+class NarrativeJobs:
+    """
+    断语后台任务
+
+    Args:
+        store: 断语缓存；不经进程内缓存，保证各 worker 看到的状态一致
+        expire: 断语缓存时间（秒）
+    """
+
+    def __init__(self, store: CacheService, expire: int = 3600):
+        self.store = store
+        self.expire = expire
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    @staticmethod
+    def job_id(kind: str, features: Dict[str, Any]) -> str:
+        """任务编号：分析类型 + 特征摘要"""
+        payload = json.dumps(features, ensure_ascii=False, sort_keys=True, default=str)
+        return f"{kind}-{hashlib.sha1(payload.encode('utf-8')).hexdigest()}"
+
+    @staticmethod
+    def _key(job_id: str) -> str:
+        kind, _, digest = job_id.partition("-")
+        return CacheService.narrative_key(kind, digest)
+
+    @staticmethod
+    def _links(job_id: str) -> Dict[str, str]:
+        return {
+            "poll_url": f"/api/analysis/narrative/{job_id}",
+            "stream_url": f"/api/analysis/narrative/{job_id}/stream"
+        }
+
+    async def attach(self, kind: str, result: Dict[str, Any]) -> None:
+        """
+        为排盘结果附加断语
+
+        已缓存时直接写入 extra_info.ai_analysis(_structured)；否则提交后台任务，
+        在 extra_info.ai_analysis_job 中给出任务编号与轮询/订阅地址。
+        缓存不可用时退化为同步生成。失败不影响排盘结果。
+        """
+        try:
+            features = EXTRACTORS[kind](result)
+            if features is None:
+                return
+            job_id = self.job_id(kind, features)
+            extra = result.setdefault("extra_info", {})
+            try:
+                state = await self.store.get(self._key(job_id))
+            except Exception as e:
+                logger.warning(f"Narrative cache unavailable, generating inline: {e}")
+                report = await run_engine(f"analysis.{kind}", features)
+                extra["ai_analysis"] = report.get("content", "")
+                extra["ai_analysis_structured"] = report.get("structured", {})
+                return
+
+            if state and state.get("status") == STATUS_DONE:
+                extra["ai_analysis"] = state["content"]
+                extra["ai_analysis_structured"] = state["structured"]
+                return
+            if not state or state.get("status") == STATUS_FAILED:
+                await self.submit(job_id, kind, features)
+            extra["ai_analysis_job"] = {"id": job_id, "status": STATUS_PENDING, **self._links(job_id)}
+        except Exception as e:
+            logger.warning(f"{kind} narrative failed: {e}")
+
+    async def submit(self, job_id: str, kind: str, features: Dict[str, Any]) -> None:
+        """提交任务（本进程同编号任务在途时忽略）"""
+        if job_id in self._tasks:
+            return
+        # 先写占位再启动任务，避免占位覆盖很快写入的完成/失败状态
+        try:
+            await self.store.set(self._key(job_id), {"status": STATUS_PENDING}, PENDING_EXPIRE)
+        except Exception as e:
+            logger.warning(f"Failed to mark narrative {job_id} pending: {e}")
+        if job_id in self._tasks:
+            return
+        task = asyncio.create_task(self._run(job_id, kind, features))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+
+    async def _run(self, job_id: str, kind: str, features: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            # 低优先级：过载时先于请求被舍弃，记为失败，下次查看排盘结果时重新提交
+            async with admission.admit(f"narrative {kind}", PRIORITY_LOW):
+                report = await run_engine(f"analysis.{kind}", features)
+            state = {
+                "status": STATUS_DONE,
+                "content": report.get("content", ""),
+                "structured": report.get("structured", {})
+            }
+            expire = self.expire
+        except Exception as e:
+            logger.warning(f"Narrative job {job_id} failed: {e}")
+            state = {"status": STATUS_FAILED, "error": str(e)}
+            expire = FAILED_EXPIRE
+        try:
+            await self.store.set(self._key(job_id), state, expire)
+        except Exception as e:
+            logger.warning(f"Failed to store narrative {job_id}: {e}")
+        return state
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """任务状态；编号无效或已过期时为 None"""
+        if not _JOB_ID.match(job_id):
+            return None
+        task = self._tasks.get(job_id)
+        if task is not None and task.done() and not task.cancelled():
+            return task.result()
+        state = await self.store.get(self._key(job_id))
+        if state is None and task is not None:
+            return {"status": STATUS_PENDING}
+        return state
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        等待任务结束，最多 timeout 秒
+
+        本进程的任务直接等待其完成；其他 worker 的任务按
+        NARRATIVE_POLL_INTERVAL 轮询缓存。超时返回当前状态。
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            task = self._tasks.get(job_id) if _JOB_ID.match(job_id) else None
+            if task is not None:
+                try:
+                    return await asyncio.wait_for(asyncio.shield(task), max(deadline - loop.time(), 0))
+                except asyncio.TimeoutError:
+                    return {"status": STATUS_PENDING}
+            state = await self.get(job_id)
+            remaining = deadline - loop.time()
+            if state is None or state.get("status") != STATUS_PENDING or remaining <= 0:
+                return state
+            await asyncio.sleep(min(settings.NARRATIVE_POLL_INTERVAL, remaining))
+
+    async def shutdown(self) -> None:
+        """取消在途任务"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+narrative_jobs = NarrativeJobs(
+    CacheService(codec=cache_codec),
+    expire=settings.NARRATIVE_CACHE_EXPIRE
+)
@@ -5,31 +5,26 @@
 
 import time
 import hashlib
+import ipaddress
 import json
+import math
 from functools import wraps
-from typing import Optional, Callable, Any
+from typing import Optional, Callable, Any, Dict, List, Tuple
 from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
 from starlette.middleware.base import BaseHTTPMiddleware
 import redis.asyncio as redis
 
 from .config import settings
 from .logging import logger
-
-
-# Redis客户端
-_redis_client: Optional[redis.Redis] = None
+from .cache import cache, rate_limiter, CacheService, RateLimiter
+from .admission import admission, endpoint_key, AdmissionController, ComputeOverloaded
+from .redis_client import redis_client
 
 
 async def get_redis() -> redis.Redis:
-    """获取Redis客户端"""
-    global _redis_client
-    if _redis_client is None:
-        _redis_client = redis.from_url(
-            settings.REDIS_URL,
-            encoding="utf-8",
-            decode_responses=True
-        )
-    return _redis_client
+    """获取Redis客户端（进程共用的连接池与熔断器）"""
+    return redis_client
 
 
 # ==================== 缓存装饰器 ====================
@@ -37,7 +32,8 @@ async def get_redis() -> redis.Redis:
 def cache_response(
     expire: int = 300,
     key_prefix: str = "",
-    key_builder: Optional[Callable] = None
+    key_builder: Optional[Callable] = None,
+    raw_response: bool = False
 ):
     """
     缓存响应装饰器
@@ -46,6 +42,8 @@ def cache_response(
         expire: 过期时间(秒)
         key_prefix: 缓存键前缀
         key_builder: 自定义键生成函数
+        raw_response: 缓存序列化好的JSON响应体，命中时直接返回字节，
+                      跳过 FastAPI 的响应序列化（仅用于返回普通JSON数据的路由）
     """
     def decorator(func: Callable) -> Callable:
         @wraps(func)
@@ -59,117 +57,170 @@ def cache_response(
                 param_hash = hashlib.md5(param_str.encode()).hexdigest()[:8]
                 cache_key = f"{key_prefix}:{func.__name__}:{param_hash}"
             
-            try:
-                redis_client = await get_redis()
-                
-                # 尝试获取缓存
-                cached = await redis_client.get(cache_key)
-                if cached:
-                    logger.debug(f"Cache hit: {cache_key}")
-                    return json.loads(cached)
-                
-                # 执行函数
-                result = await func(*args, **kwargs)
-                
-                # 存入缓存
-                await redis_client.setex(
-                    cache_key,
-                    expire,
-                    json.dumps(result, default=str)
+            # 并发未命中合并为一次计算，临近过期时提前刷新；
+            # 缓存不可用时 get_or_compute 自行退化为直接执行
+            if not raw_response:
+                return await cache.get_or_compute(
+                    cache_key, lambda: func(*args, **kwargs), expire
                 )
-                
-                return result
-                
-            except Exception as e:
-                logger.warning(f"Cache error: {e}")
-                # 缓存失败时直接执行函数
-                return await func(*args, **kwargs)
+            
+            async def render() -> bytes:
+                result = await func(*args, **kwargs)
+                return json.dumps(
+                    jsonable_encoder(result), ensure_ascii=False,
+                    allow_nan=False, separators=(",", ":")
+                ).encode("utf-8")
+            
+            body = await cache.get_or_compute(f"{cache_key}:raw", render, expire)
+            return Response(content=body, media_type="application/json")
         
         return wrapper
     return decorator
 
 
-async def invalidate_cache(pattern: str):
+async def invalidate_cache(pattern: str) -> int:
     """
-    使缓存失效
+    按模式删除缓存键
+    
+    以 SCAN 分批遍历、UNLINK 分批删除，不阻塞 Redis。
+    引擎结果的缓存应改用 cache.bump_namespace 整体失效，无需遍历。
     
     Args:
         pattern: 缓存键模式(支持通配符)
+    
+    Returns:
+        删除的键数
     """
+    deleted = 0
     try:
         redis_client = await get_redis()
-        keys = await redis_client.keys(pattern)
-        if keys:
-            await redis_client.delete(*keys)
-            logger.info(f"Invalidated {len(keys)} cache keys")
+        batch = []
+        async for key in redis_client.scan_iter(match=pattern, count=settings.CACHE_SCAN_BATCH):
+            batch.append(key)
+            if len(batch) >= settings.CACHE_SCAN_BATCH:
+                deleted += await redis_client.unlink(*batch)
+                batch = []
+        if batch:
+            deleted += await redis_client.unlink(*batch)
+        if deleted:
+            logger.info(f"Invalidated {deleted} cache keys")
     except Exception as e:
         logger.warning(f"Cache invalidation error: {e}")
+    return deleted
 
 
 # ==================== 限流中间件 ====================
 
 class RateLimitMiddleware(BaseHTTPMiddleware):
-    """请求限流中间件"""
+    """
+    请求限流中间件
+    
+    按客户端 IP 与路由限流：RATE_LIMIT_ROUTES 中配置的路径前缀各自计数
+    （最长前缀优先），其余路由共用 RATE_LIMIT_REQUESTS。
+    每个请求最多一次 Redis 往返，明显超限的由进程内计数直接拒绝。
+    """
     
     def __init__(
         self,
         app,
-        requests_per_minute: int = 60,
-        burst_size: int = 10
+        limiter: Optional[RateLimiter] = None,
+        requests: Optional[int] = None,
+        window: Optional[int] = None,
+        routes: Optional[Dict[str, int]] = None,
+        exempt: Optional[List[str]] = None,
+        trusted_proxies: Optional[List[str]] = None
     ):
         super().__init__(app)
-        self.requests_per_minute = requests_per_minute
-        self.burst_size = burst_size
+        self.limiter = limiter or rate_limiter
+        self.requests = requests or settings.RATE_LIMIT_REQUESTS
+        self.window = window or settings.RATE_LIMIT_WINDOW
+        routes = settings.RATE_LIMIT_ROUTES if routes is None else routes
+        self.routes = sorted(routes.items(), key=lambda item: len(item[0]), reverse=True)
+        self.exempt = tuple(settings.RATE_LIMIT_EXEMPT if exempt is None else exempt)
+        proxies = settings.TRUSTED_PROXIES if trusted_proxies is None else trusted_proxies
+        self.trusted_proxies = [ipaddress.ip_network(p, strict=False) for p in proxies]
     
     async def dispatch(self, request: Request, call_next):
-        # 获取客户端标识
-        client_id = self._get_client_id(request)
+        path = request.url.path
+        if path.startswith(self.exempt):
+            return await call_next(request)
         
-        # 检查限流
-        is_allowed = await self._check_rate_limit(client_id)
+        route, limit = self._route_limit(path)
+        key = CacheService.rate_limit_key(self._get_client_id(request), route)
+        result = await self.limiter.acquire(key, limit, self.window)
         
-        if not is_allowed:
+        if not result.allowed:
             return Response(
-                content='{"error": "Rate limit exceeded"}',
+                content='{"success": false, "error": "请求过于频繁，请稍后重试"}',
                 status_code=429,
-                media_type="application/json"
+                media_type="application/json",
+                headers={"Retry-After": str(max(1, math.ceil(result.retry_after)))}
             )
         
-        response = await call_next(request)
-        return response
+        return await call_next(request)
+    
+    def _route_limit(self, path: str) -> Tuple[str, int]:
+        """路径所属的限流路由及其上限"""
+        for prefix, limit in self.routes:
+            if path.startswith(prefix):
+                return prefix, limit
+        return "*", self.requests
+    
+    def _is_trusted(self, host: str) -> bool:
+        try:
+            address = ipaddress.ip_address(host)
+        except ValueError:
+            return False
+        return any(address in network for network in self.trusted_proxies)
     
     def _get_client_id(self, request: Request) -> str:
-        """获取客户端标识"""
-        # 优先使用X-Forwarded-For
+        """
+        获取客户端标识
+        
+        直连地址是可信代理时，取 X-Forwarded-For 中从右往左第一个非可信代理的地址；
+        否则该头可由客户端任意伪造，直接使用连接地址。
+        """
+        host = request.client.host if request.client else "unknown"
         forwarded = request.headers.get("X-Forwarded-For")
-        if forwarded:
-            return forwarded.split(",")[0].strip()
-        return request.client.host if request.client else "unknown"
+        if not forwarded or not self._is_trusted(host):
+            return host
+        for hop in reversed([h.strip() for h in forwarded.split(",") if h.strip()]):
+            if not self._is_trusted(hop):
+                return hop
+            host = hop
+        return host
+
+
+# ==================== 计算准入中间件 ====================
+
+class AdmissionMiddleware(BaseHTTPMiddleware):
+    """
+    计算准入中间件
+    
+    /api 下的请求按端点代价经准入控制器放行；过载时返回 503 与 Retry-After，
+    不进入路由。流式响应在开始返回时即归还名额。
+    """
+    
+    def __init__(self, app, controller: Optional[AdmissionController] = None, prefix: str = "/api/"):
+        super().__init__(app)
+        self.controller = controller or admission
+        self.prefix = prefix
     
-    async def _check_rate_limit(self, client_id: str) -> bool:
-        """检查限流"""
+    async def dispatch(self, request: Request, call_next):
+        path = request.url.path
+        if not path.startswith(self.prefix):
+            return await call_next(request)
+        
         try:
-            redis_client = await get_redis()
-            key = f"rate_limit:{client_id}"
-            
-            # 使用滑动窗口算法
-            now = time.time()
-            window_start = now - 60  # 1分钟窗口
-            
-            # 原子操作
-            pipe = redis_client.pipeline()
-            pipe.zremrangebyscore(key, 0, window_start)
-            pipe.zadd(key, {str(now): now})
-            pipe.zcard(key)
-            pipe.expire(key, 60)
-            results = await pipe.execute()
-            
-            request_count = results[2]
-            return request_count <= self.requests_per_minute
-            
-        except Exception as e:
-            logger.warning(f"Rate limit check error: {e}")
-            return True  # 出错时放行
+            async with self.controller.admit(endpoint_key(request.method, path)):
+                return await call_next(request)
+        except ComputeOverloaded as e:
+            return Response(
+                content='{"success": false, "error": "服务繁忙，请稍后重试"}',
+                status_code=503,
+                media_type="application/json",
+                headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))}
+            )
 
 
 # ==================== 响应时间监控中间件 ====================
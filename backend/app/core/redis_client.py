@@ -0,0 +1,187 @@
+"""
+玄心理命 - Redis 连接
+
+进程内所有 Redis 客户端（缓存、命名空间代数、用户计数、限流）共用这里的
+连接池：连接/读写超时、健康检查与连接数上限取自 Settings.REDIS_*。
+redis-py 按连接决定是否解码响应，因此文本与二进制值各一个连接池，
+两者配置相同，并共用同一个熔断器。
+
+熔断器：连续 REDIS_BREAKER_FAILURES 次连接或超时错误后断开，
+REDIS_BREAKER_RESET 秒内的命令直接抛出 RedisUnavailable，不再等待超时；
+到期后放行一个试探命令，成功即恢复。调用方原有的降级逻辑
+（直接计算、进程内缓存、聚合查询）照常生效，Redis 故障不再拖慢每个请求。
+"""
+
+import asyncio
+import time
+from typing import Any, Dict
+
+import redis.asyncio as redis
+from redis.asyncio.client import Pipeline
+from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+
+from .config import settings
+from .logging import logger
+
+
+# 计入熔断的错误：连接失败与超时（命令本身的错误不算）
+FAILURES = (RedisConnectionError, RedisTimeoutError, asyncio.TimeoutError, OSError)
+
+
+class RedisUnavailable(RedisConnectionError):
+    """熔断期间跳过 Redis"""
+
+
+class CircuitBreaker:
+    """
+    熔断器
+
+    Args:
+        failure_threshold: 连续失败多少次后断开
+        reset_timeout: 断开后多久放行试探（秒）
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 5.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self._since = 0.0
+        self.opened = 0
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        """是否放行；断开期满后放行一个试探，试探未返回前其余请求仍被拒绝"""
+        if self.state == self.CLOSED:
+            return True
+        now = time.monotonic()
+        if now - self._since < self.reset_timeout:
+            self.rejected += 1
+            return False
+        # 进入半开，或上一个试探迟迟未返回时再放行一个
+        self.state = self.HALF_OPEN
+        self._since = now
+        return True
+
+    def check(self) -> None:
+        """不放行时抛出 RedisUnavailable"""
+        if not self.allow():
+            raise RedisUnavailable("Redis circuit open")
+
+    def record_success(self) -> None:
+        if self.state != self.CLOSED:
+            logger.info("Redis circuit closed")
+        self.state = self.CLOSED
+        self.failures = 0
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == self.HALF_OPEN or (
+            self.state == self.CLOSED and self.failures >= self.failure_threshold
+        ):
+            if self.state == self.CLOSED:
+                logger.warning(f"Redis circuit opened after {self.failures} failures")
+            self.state = self.OPEN
+            self._since = time.monotonic()
+            self.opened += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """熔断状态"""
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "opened": self.opened,
+            "rejected": self.rejected
+        }
+
+
+class ResilientPipeline(Pipeline):
+    """经熔断器执行的管道"""
+
+    breaker: CircuitBreaker
+
+    async def execute(self, raise_on_error: bool = True):
+        self.breaker.check()
+        try:
+            result = await super().execute(raise_on_error)
+        except FAILURES:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        return result
+
+
+class ResilientRedis(redis.Redis):
+    """经熔断器执行命令的客户端"""
+
+    def __init__(self, *args, breaker: CircuitBreaker, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.breaker = breaker
+
+    async def execute_command(self, *args, **options):
+        self.breaker.check()
+        try:
+            result = await super().execute_command(*args, **options)
+        except FAILURES:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        return result
+
+    def pipeline(self, transaction: bool = True, shard_hint=None) -> ResilientPipeline:
+        pipe = ResilientPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+        pipe.breaker = self.breaker
+        return pipe
+
+
+def _pool(decode_responses: bool) -> redis.ConnectionPool:
+    return redis.ConnectionPool.from_url(
+        settings.REDIS_URL,
+        decode_responses=decode_responses,
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=settings.REDIS_CONNECT_TIMEOUT,
+        health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+        retry_on_timeout=False
+    )
+
+
+# 文本值连接池；编解码后的二进制值走 redis_binary_pool
+redis_pool = _pool(decode_responses=True)
+redis_binary_pool = _pool(decode_responses=False)
+
+redis_breaker = CircuitBreaker(
+    failure_threshold=settings.REDIS_BREAKER_FAILURES,
+    reset_timeout=settings.REDIS_BREAKER_RESET
+)
+
+# 共享客户端
+redis_client = ResilientRedis(connection_pool=redis_pool, breaker=redis_breaker)
+redis_binary_client = ResilientRedis(connection_pool=redis_binary_pool, breaker=redis_breaker)
+
+
+def _pool_stats(pool: redis.ConnectionPool) -> Dict[str, Any]:
+    return {
+        "max": pool.max_connections,
+        "in_use": len(getattr(pool, "_in_use_connections", ())),
+        "idle": len(getattr(pool, "_available_connections", ()))
+    }
+
+
+def redis_stats() -> Dict[str, Any]:
+    """连接池与熔断统计"""
+    return {
+        "breaker": redis_breaker.stats(),
+        "pools": {"text": _pool_stats(redis_pool), "binary": _pool_stats(redis_binary_pool)}
+    }
+
+
+async def close_redis() -> None:
+    """关闭连接池（应用关闭时调用）"""
+    for pool in (redis_pool, redis_binary_pool):
+        await pool.disconnect()
+
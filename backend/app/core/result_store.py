@@ -0,0 +1,199 @@
+"""
+玄心理命 - 分析结果内容寻址存储
+
+排盘/占卜结果按 sha256(类型, 引擎版本, 规范化结果体) 存入 result_blobs，
+历史记录只保存摘要（result_digest）。相同命盘、梅花易数的 384 种卦象在表中
+各只存一份；结果体为排序键的紧凑 JSON，经 RESULT_STORE_COMPRESSION 压缩。
+
+入库前剥离每次请求都不同的字段：
+- 占卜结果的 question：记录表已有，读取时放回
+- extra_info 中的断语：读取时按当前规则重新附加（见 narrative）
+
+摘要取自结果体而非引擎入参：八字结果含随当前日期变化的大运流年，
+同一命盘不同日期的结果不同，按入参取摘要会把它们混为一份。
+条目不可变，读取经热缓存 result:{digest}，无需失效。
+"""
+
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import select
+
+from .cache import CacheService, cache
+from .codec import CacheCodec
+from .config import settings
+from .database import ResultBlob
+from .executor import engine_version
+from .logging import logger
+from .narrative import narrative_jobs
+
+
+# 各类型结果中随请求变化、不参与去重的顶层字段
+VOLATILE_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "yijing": ("question",),
+}
+
+# extra_info 中的断语字段
+NARRATIVE_FIELDS = ("ai_analysis", "ai_analysis_structured", "ai_analysis_job")
+
+
+def canonical(body: Dict[str, Any]) -> bytes:
+    """规范化 JSON：排序键、无多余空白"""
+    return json.dumps(body, ensure_ascii=False, sort_keys=True,
+                      separators=(",", ":"), default=str).encode("utf-8")
+
+
+class ResultStore:
+    """
+    结果库
+
+    Args:
+        cache: 热缓存
+        codec: 结果体压缩编码
+        expire: 热缓存时间（秒）
+        known_size: 进程内记住的已入库摘要数
+    """
+
+    def __init__(self, cache: CacheService, codec: CacheCodec,
+                 expire: int = 86400, known_size: int = 100000):
+        self.cache = cache
+        self.codec = codec
+        self.expire = expire
+        self.known_size = known_size
+        self._known: "OrderedDict[str, None]" = OrderedDict()
+        self.packed = 0
+        self.deduplicated = 0
+
+    # ==================== 写入 ====================
+
+    @staticmethod
+    def strip(kind: str, result: Dict[str, Any]) -> Dict[str, Any]:
+        """剥离随请求变化的字段（不修改原结果）"""
+        body = dict(result)
+        for field in VOLATILE_FIELDS.get(kind, ()):
+            body.pop(field, None)
+        extra = body.get("extra_info")
+        if isinstance(extra, dict):
+            body["extra_info"] = {k: v for k, v in extra.items() if k not in NARRATIVE_FIELDS}
+        return body
+
+    @staticmethod
+    def digest(kind: str, payload: bytes) -> str:
+        """内容摘要"""
+        prefix = f"{kind}:{engine_version(kind)}:".encode("utf-8")
+        return hashlib.sha256(prefix + payload).hexdigest()
+
+    def pack(self, kind: str, result: Dict[str, Any]) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """
+        计算摘要并编码结果体
+
+        Returns:
+            (摘要, result_blobs 行)；本进程已写入过的摘要不再返回行
+        """
+        payload = canonical(self.strip(kind, result))
+        digest = self.digest(kind, payload)
+        self.packed += 1
+        if digest in self._known:
+            self._known.move_to_end(digest)
+            self.deduplicated += 1
+            return digest, None
+        return digest, {
+            "digest": digest,
+            "kind": kind,
+            "engine_version": engine_version(kind),
+            "body": self.codec.encode(payload),
+            "size": len(payload)
+        }
+
+    def remember(self, digest: str) -> None:
+        """记下已入库（或已进入写后队列）的摘要"""
+        self._known[digest] = None
+        self._known.move_to_end(digest)
+        while len(self._known) > self.known_size:
+            self._known.popitem(last=False)
+
+    # ==================== 读取 ====================
+
+    def _decode(self, body: bytes) -> Dict[str, Any]:
+        return json.loads(self.codec.decode(body))
+
+    async def _cached(self, digest: str) -> Optional[Dict[str, Any]]:
+        try:
+            return await self.cache.get(CacheService.result_key(digest))
+        except Exception as e:
+            logger.warning(f"Result cache unavailable: {e}")
+            return None
+
+    async def _fill(self, digest: str, body: Dict[str, Any]) -> None:
+        self.remember(digest)
+        try:
+            await self.cache.set(CacheService.result_key(digest), body, self.expire)
+        except Exception as e:
+            logger.warning(f"Failed to cache result {digest}: {e}")
+
+    async def load_many(self, db, digests: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        批量取结果体：先查热缓存，未命中的一次查库并回填缓存
+
+        返回的结果体与缓存共享，修改前须经 restore 复制。
+        """
+        wanted = list(dict.fromkeys(d for d in digests if d))
+        found: Dict[str, Dict[str, Any]] = {}
+        for digest in wanted:
+            body = await self._cached(digest)
+            if body is not None:
+                found[digest] = body
+        missing = [d for d in wanted if d not in found]
+        if missing:
+            rows = await db.execute(
+                select(ResultBlob.digest, ResultBlob.body).where(ResultBlob.digest.in_(missing))
+            )
+            for digest, raw in rows.all():
+                found[digest] = self._decode(raw)
+                await self._fill(digest, found[digest])
+        return found
+
+    @staticmethod
+    def restore(body: Dict[str, Any], **fields) -> Dict[str, Any]:
+        """复制结果体并放回剥离的字段"""
+        result = dict(body)
+        if isinstance(result.get("extra_info"), dict):
+            result["extra_info"] = dict(result["extra_info"])
+        result.update(fields)
+        return result
+
+    async def resolve(self, db, kind: str, record: Any, **fields) -> Optional[Dict[str, Any]]:
+        """
+        历史记录的完整结果
+
+        引用结果库的记录取回结果体，放回 fields 并重新附加断语；
+        旧记录直接返回 result_data。
+        """
+        digest = getattr(record, "result_digest", None)
+        if not digest:
+            return record.result_data
+        body = (await self.load_many(db, [digest])).get(digest)
+        if body is None:
+            logger.error(f"Result {digest} referenced by {kind} record {record.id} is missing")
+            return None
+        result = self.restore(body, **fields)
+        await narrative_jobs.attach(kind, result)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """去重统计"""
+        return {
+            "packed": self.packed,
+            "deduplicated": self.deduplicated,
+            "known": len(self._known)
+        }
+
+
+result_store = ResultStore(
+    cache,
+    CacheCodec(serializer="json", compression=settings.RESULT_STORE_COMPRESSION, compress_min_bytes=0),
+    expire=settings.RESULT_CACHE_EXPIRE,
+    known_size=settings.RESULT_KNOWN_DIGESTS
+)
@@ -3,15 +3,23 @@
 用户管理、历史记录、收藏等功能
 """
 
-from typing import List, Optional, Dict, Any
-from sqlalchemy import select, update, delete, func
+import base64
+from typing import List, Optional, Dict, Any, Tuple
+from sqlalchemy import select, update, delete, tuple_, literal, null
 from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
 
 from .database import (
     User, BirthInfo, AnalysisRecord, DivinationRecord, 
-    PsychologyTest, FusionRecord, Favorite, UserSettings, ExportHistory
+    PsychologyTest, FusionRecord, Favorite, UserSettings, ExportHistory, ResultBlob,
+    async_session, insert_ignore
 )
+from .config import settings
+from .logging import logger
+from .history_summary import summarize
+from .history_writer import history_writer
+from .result_store import result_store
+from .user_stats import user_stats, stat_field
 
 
 class UserService:
@@ -47,103 +55,204 @@ class UserService:
         return await self.get_user_by_id(user_id)
     
     async def get_user_stats(self, user_id: int) -> Dict:
-        """获取用户统计数据"""
-        # 各类型记录数
-        bazi_count = await self.db.execute(
-            select(func.count()).select_from(AnalysisRecord).where(
-                AnalysisRecord.user_id == user_id,
-                AnalysisRecord.analysis_type == 'bazi'
-            )
-        )
-        
-        ziwei_count = await self.db.execute(
-            select(func.count()).select_from(AnalysisRecord).where(
-                AnalysisRecord.user_id == user_id,
-                AnalysisRecord.analysis_type == 'ziwei'
-            )
-        )
-        
-        divination_count = await self.db.execute(
-            select(func.count()).select_from(DivinationRecord).where(
-                DivinationRecord.user_id == user_id
-            )
-        )
-        
-        psychology_count = await self.db.execute(
-            select(func.count()).select_from(PsychologyTest).where(
-                PsychologyTest.user_id == user_id
-            )
-        )
-        
-        fusion_count = await self.db.execute(
-            select(func.count()).select_from(FusionRecord).where(
-                FusionRecord.user_id == user_id
-            )
-        )
-        
-        favorite_count = await self.db.execute(
-            select(func.count()).select_from(Favorite).where(
-                Favorite.user_id == user_id
-            )
-        )
-        
-        return {
-            "bazi_analyses": bazi_count.scalar() or 0,
-            "ziwei_analyses": ziwei_count.scalar() or 0,
-            "divinations": divination_count.scalar() or 0,
-            "psychology_tests": psychology_count.scalar() or 0,
-            "fusion_analyses": fusion_count.scalar() or 0,
-            "favorites": favorite_count.scalar() or 0
-        }
+        """获取用户统计数据（Redis 计数，缺失时一次聚合查询）"""
+        return await user_stats.get(self.db, user_id)
+
+
+# ==================== 键集分页 ====================
+
+def encode_cursor(created_at: datetime, record_id: int) -> str:
+    """翻页游标：上一页最后一条的 (created_at, id)"""
+    raw = f"{created_at.isoformat()}|{record_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """解析翻页游标；格式错误时抛出 ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        created_at, _, record_id = raw.partition("|")
+        return datetime.fromisoformat(created_at), int(record_id)
+    except Exception:
+        raise ValueError("无效的翻页游标")
+
+
+async def _page(db: AsyncSession, query, model, limit: int,
+                cursor: Optional[str], offset: int) -> Tuple[List[Any], Optional[str]]:
+    """
+    按 (created_at, id) 倒序取一页
+
+    有游标时从游标之后取（走 (user_id, 类型, created_at, id) 复合索引，与页码无关）；
+    否则按 offset 兼容旧客户端。多取一条判断是否还有下一页。
+    """
+    if cursor:
+        created_at, record_id = decode_cursor(cursor)
+        query = query.where(tuple_(model.created_at, model.id) < tuple_(created_at, record_id))
+    elif offset:
+        query = query.offset(offset)
+    query = query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1)
+
+    rows = (await db.execute(query)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return rows, next_cursor
+
+
+# 个人中心展示最新结果的心理测试类型
+LATEST_PSYCHOLOGY_TYPES = ('mbti', 'big5', 'archetype', 'enneagram')
+
+# 批量检查收藏的单次上限
+FAVORITE_CHECK_LIMIT = 200
 
 
 class HistoryService:
-    """历史记录服务类"""
+    """
+    历史记录服务类
+    写后队列运行时 save_* 只入队即返回（返回 None），由 history_writer 批量落库
+    """
     
     def __init__(self, db: AsyncSession):
         self.db = db
     
-    # ==================== 命理分析记录 ====================
+    async def _save(self, model, result_kind: Optional[str] = None, **values):
+        """
+        入写后队列；队列未运行时同步写入并返回记录
+
+        指定 result_kind 时 result_data 存入结果库，记录只保存摘要。
+        """
+        digest, blob = None, None
+        if result_kind and settings.RESULT_STORE_ENABLED and values.get("result_data") is not None:
+            digest, blob = result_store.pack(result_kind, values.pop("result_data"))
+            values["result_digest"] = digest
+
+        if history_writer.running:
+            if blob is not None:
+                await history_writer.submit(ResultBlob, blob)
+            await history_writer.submit(model, values)
+            if digest:
+                result_store.remember(digest)
+            await user_stats.bump(values.get("user_id"), stat_field(model, values))
+            return None
+
+        if blob is not None:
+            await self.db.execute(insert_ignore(ResultBlob, "digest"), [blob])
+        record = model(**values)
+        self.db.add(record)
+        await self.db.commit()
+        await self.db.refresh(record)
+        if digest:
+            result_store.remember(digest)
+        await user_stats.bump(values.get("user_id"), stat_field(model, values))
+        return record
     
+    # ==================== 命理分析记录 ====================
+
+    BIRTH_KEY = ("user_id", "birth_year", "birth_month", "birth_day", "birth_hour", "is_lunar", "gender")
+
+    async def resolve_birth_info(self, **values) -> int:
+        """
+        查找或创建出生信息，返回记录ID
+
+        按唯一索引 INSERT ... ON CONFLICT DO NOTHING RETURNING id，
+        与按生辰查已有记录合并为一条语句；随请求会话提交。
+        两条语句都看不到的（并发请求刚提交的同一生辰）再查一次。
+        """
+        keys = [getattr(BirthInfo, key) == values[key] for key in self.BIRTH_KEY]
+        inserted = (
+            insert_ignore(BirthInfo, *self.BIRTH_KEY)
+            .values(**values)
+            .returning(BirthInfo.id)
+            .cte("inserted")
+        )
+        result = await self.db.execute(
+            select(inserted.c.id).union_all(select(BirthInfo.id).where(*keys)).limit(1)
+        )
+        birth_info_id = result.scalar()
+        if birth_info_id is None:
+            result = await self.db.execute(select(BirthInfo.id).where(*keys))
+            birth_info_id = result.scalar_one()
+        return birth_info_id
+
     async def save_analysis(
         self,
         user_id: int,
         analysis_type: str,
         birth_info_id: int,
         result_data: Dict
-    ) -> AnalysisRecord:
+    ) -> Optional[AnalysisRecord]:
         """保存分析记录"""
-        record = AnalysisRecord(
+        return await self._save(
+            AnalysisRecord,
+            result_kind=analysis_type,
             user_id=user_id,
             birth_info_id=birth_info_id,
             analysis_type=analysis_type,
+            summary=summarize(analysis_type, result_data),
             result_data=result_data
         )
-        self.db.add(record)
-        await self.db.commit()
-        await self.db.refresh(record)
-        return record
+    
+    async def backfill_summaries(self, batch_size: int = 500) -> int:
+        """
+        为摘要列上线前写入的记录补齐 summary（幂等）
+        
+        按主键分批扫描 summary 为空的行，从 result_data 或结果库取回结果体
+        提取摘要，每批一次批量 UPDATE 并提交。无法提取摘要的行保持为空。
+        
+        Returns:
+            补齐的行数
+        """
+        filled = 0
+        for model, kind in (
+            (AnalysisRecord, AnalysisRecord.analysis_type),
+            (DivinationRecord, literal("yijing")),
+            (PsychologyTest, PsychologyTest.test_type),
+        ):
+            digest = getattr(model, "result_digest", null())
+            last_id = 0
+            while True:
+                rows = (await self.db.execute(
+                    select(model.id, kind.label("kind"), model.result_data, digest.label("digest"))
+                    .where(model.summary.is_(None), model.id > last_id)
+                    .order_by(model.id)
+                    .limit(batch_size)
+                )).all()
+                if not rows:
+                    break
+                last_id = rows[-1].id
+                bodies = await result_store.load_many(
+                    self.db, [row.digest for row in rows if not row.result_data and row.digest]
+                )
+                updates = []
+                for row in rows:
+                    summary = summarize(row.kind, row.result_data or bodies.get(row.digest))
+                    if summary:
+                        updates.append({"id": row.id, "summary": summary})
+                if updates:
+                    await self.db.execute(update(model), updates)
+                await self.db.commit()
+                filled += len(updates)
+        return filled
     
     async def get_user_analyses(
         self,
         user_id: int,
         analysis_type: Optional[str] = None,
         limit: int = 20,
-        offset: int = 0
-    ) -> List[AnalysisRecord]:
-        """获取用户分析历史"""
-        query = select(AnalysisRecord).where(
-            AnalysisRecord.user_id == user_id
-        )
+        offset: int = 0,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Any], Optional[str]]:
+        """获取用户分析历史（仅列表列），返回 (记录, 下一页游标)"""
+        query = select(
+            AnalysisRecord.id, AnalysisRecord.analysis_type, AnalysisRecord.birth_info_id,
+            AnalysisRecord.summary, AnalysisRecord.created_at
+        ).where(AnalysisRecord.user_id == user_id)
         
         if analysis_type:
             query = query.where(AnalysisRecord.analysis_type == analysis_type)
         
-        query = query.order_by(AnalysisRecord.created_at.desc())
-        query = query.limit(limit).offset(offset)
-        
-        result = await self.db.execute(query)
-        return result.scalars().all()
+        return await _page(self.db, query, AnalysisRecord, limit, cursor, offset)
     
     async def get_analysis_by_id(
         self, 
@@ -165,10 +274,14 @@ class HistoryService:
             delete(AnalysisRecord).where(
                 AnalysisRecord.id == record_id,
                 AnalysisRecord.user_id == user_id
-            )
+            ).returning(AnalysisRecord.analysis_type)
         )
+        analysis_type = result.scalar_one_or_none()
         await self.db.commit()
-        return result.rowcount > 0
+        if analysis_type is None:
+            return False
+        await user_stats.bump(user_id, stat_field(AnalysisRecord, {"analysis_type": analysis_type}), -1)
+        return True
     
     # ==================== 占卜记录 ====================
     
@@ -178,39 +291,36 @@ class HistoryService:
         method: str,
         question: str,
         result_data: Dict
-    ) -> DivinationRecord:
+    ) -> Optional[DivinationRecord]:
         """保存占卜记录"""
-        record = DivinationRecord(
+        return await self._save(
+            DivinationRecord,
+            result_kind="yijing",
             user_id=user_id,
             method=method,
             question=question,
+            summary=summarize("yijing", result_data),
             result_data=result_data
         )
-        self.db.add(record)
-        await self.db.commit()
-        await self.db.refresh(record)
-        return record
     
     async def get_user_divinations(
         self,
         user_id: int,
         method: Optional[str] = None,
         limit: int = 20,
-        offset: int = 0
-    ) -> List[DivinationRecord]:
-        """获取用户占卜历史"""
-        query = select(DivinationRecord).where(
-            DivinationRecord.user_id == user_id
-        )
+        offset: int = 0,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Any], Optional[str]]:
+        """获取用户占卜历史（仅列表列），返回 (记录, 下一页游标)"""
+        query = select(
+            DivinationRecord.id, DivinationRecord.method, DivinationRecord.question,
+            DivinationRecord.summary, DivinationRecord.created_at
+        ).where(DivinationRecord.user_id == user_id)
         
         if method:
             query = query.where(DivinationRecord.method == method)
         
-        query = query.order_by(DivinationRecord.created_at.desc())
-        query = query.limit(limit).offset(offset)
-        
-        result = await self.db.execute(query)
-        return result.scalars().all()
+        return await _page(self.db, query, DivinationRecord, limit, cursor, offset)
 
     async def get_divination_by_id(
         self,
@@ -248,39 +358,35 @@ class HistoryService:
         test_type: str,
         answers: List[Dict],
         result_data: Dict
-    ) -> PsychologyTest:
+    ) -> Optional[PsychologyTest]:
         """保存心理测试记录"""
-        record = PsychologyTest(
+        return await self._save(
+            PsychologyTest,
             user_id=user_id,
             test_type=test_type,
             answers=answers,
+            summary=summarize(test_type, result_data),
             result_data=result_data
         )
-        self.db.add(record)
-        await self.db.commit()
-        await self.db.refresh(record)
-        return record
     
     async def get_user_psychology_tests(
         self,
         user_id: int,
         test_type: Optional[str] = None,
         limit: int = 20,
-        offset: int = 0
-    ) -> List[PsychologyTest]:
-        """获取用户心理测试历史"""
-        query = select(PsychologyTest).where(
-            PsychologyTest.user_id == user_id
-        )
+        offset: int = 0,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Any], Optional[str]]:
+        """获取用户心理测试历史（仅列表列），返回 (记录, 下一页游标)"""
+        query = select(
+            PsychologyTest.id, PsychologyTest.test_type,
+            PsychologyTest.summary, PsychologyTest.created_at
+        ).where(PsychologyTest.user_id == user_id)
         
         if test_type:
             query = query.where(PsychologyTest.test_type == test_type)
         
-        query = query.order_by(PsychologyTest.created_at.desc())
-        query = query.limit(limit).offset(offset)
-        
-        result = await self.db.execute(query)
-        return result.scalars().all()
+        return await _page(self.db, query, PsychologyTest, limit, cursor, offset)
 
     async def get_psychology_test_by_id(
         self,
@@ -297,22 +403,16 @@ class HistoryService:
         return result.scalar_one_or_none()
     
     async def get_latest_psychology_results(self, user_id: int) -> Dict:
-        """获取用户最新的各类心理测试结果"""
-        results = {}
-        
-        for test_type in ['mbti', 'big5', 'archetype', 'enneagram']:
-            query = select(PsychologyTest).where(
-                PsychologyTest.user_id == user_id,
-                PsychologyTest.test_type == test_type
-            ).order_by(PsychologyTest.created_at.desc()).limit(1)
-            
-            result = await self.db.execute(query)
-            record = result.scalar_one_or_none()
-            
-            if record:
-                results[test_type] = record.result_data
+        """获取用户最新的各类心理测试结果（DISTINCT ON 一次查询）"""
+        query = select(PsychologyTest.test_type, PsychologyTest.result_data).where(
+            PsychologyTest.user_id == user_id,
+            PsychologyTest.test_type.in_(LATEST_PSYCHOLOGY_TYPES)
+        ).distinct(PsychologyTest.test_type).order_by(
+            PsychologyTest.test_type, PsychologyTest.created_at.desc(), PsychologyTest.id.desc()
+        )
         
-        return results
+        result = await self.db.execute(query)
+        return {test_type: result_data for test_type, result_data in result.all()}
     
     # ==================== 融合分析记录 ====================
     
@@ -326,9 +426,10 @@ class HistoryService:
         bazi_record_id: Optional[int] = None,
         ziwei_record_id: Optional[int] = None,
         psychology_test_ids: Optional[List[int]] = None
-    ) -> FusionRecord:
+    ) -> Optional[FusionRecord]:
         """保存融合分析记录"""
-        record = FusionRecord(
+        return await self._save(
+            FusionRecord,
             user_id=user_id,
             title=title,
             bazi_record_id=bazi_record_id,
@@ -338,26 +439,20 @@ class HistoryService:
             report_markdown=report_markdown,
             confidence=confidence
         )
-        self.db.add(record)
-        await self.db.commit()
-        await self.db.refresh(record)
-        return record
     
     async def get_user_fusions(
         self,
         user_id: int,
         limit: int = 20,
-        offset: int = 0
-    ) -> List[FusionRecord]:
-        """获取用户融合分析历史"""
-        query = select(FusionRecord).where(
-            FusionRecord.user_id == user_id
-        ).order_by(FusionRecord.created_at.desc())
+        offset: int = 0,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Any], Optional[str]]:
+        """获取用户融合分析历史（仅列表列），返回 (记录, 下一页游标)"""
+        query = select(
+            FusionRecord.id, FusionRecord.title, FusionRecord.confidence, FusionRecord.created_at
+        ).where(FusionRecord.user_id == user_id)
         
-        query = query.limit(limit).offset(offset)
-        
-        result = await self.db.execute(query)
-        return result.scalars().all()
+        return await _page(self.db, query, FusionRecord, limit, cursor, offset)
 
     async def get_fusion_by_id(
         self,
@@ -374,6 +469,22 @@ class HistoryService:
         return result.scalar_one_or_none()
 
 
+async def backfill_history_summaries() -> None:
+    """
+    补齐旧记录的列表摘要（启动时后台运行）
+    
+    幂等：只处理 summary 为空的行，多个 worker 同时运行只是重复写入相同的值。
+    失败只记日志，下次启动继续。
+    """
+    try:
+        async with async_session() as db:
+            filled = await HistoryService(db).backfill_summaries(settings.HISTORY_SUMMARY_BACKFILL_BATCH)
+        if filled:
+            logger.info(f"Backfilled {filled} history summaries")
+    except Exception as e:
+        logger.warning(f"History summary backfill failed: {e}")
+
+
 class FavoriteService:
     """收藏服务类"""
     
@@ -387,27 +498,20 @@ class FavoriteService:
         item_id: int,
         note: Optional[str] = None
     ) -> Favorite:
-        """添加收藏"""
-        # 检查是否已收藏
-        existing = await self.db.execute(
-            select(Favorite).where(
-                Favorite.user_id == user_id,
-                Favorite.item_type == item_type,
-                Favorite.item_id == item_id
-            )
-        )
-        if existing.scalar_one_or_none():
-            raise ValueError("已收藏")
-        
-        favorite = Favorite(
-            user_id=user_id,
-            item_type=item_type,
-            item_id=item_id,
-            note=note
+        """添加收藏（按唯一索引单条 upsert，已收藏时抛出 ValueError）"""
+        result = await self.db.execute(
+            insert_ignore(Favorite, "user_id", "item_type", "item_id").values(
+                user_id=user_id,
+                item_type=item_type,
+                item_id=item_id,
+                note=note
+            ).returning(Favorite)
         )
-        self.db.add(favorite)
+        favorite = result.scalar_one_or_none()
         await self.db.commit()
-        await self.db.refresh(favorite)
+        if favorite is None:
+            raise ValueError("已收藏")
+        await user_stats.bump(user_id, stat_field(Favorite))
         return favorite
     
     async def remove_favorite(
@@ -425,7 +529,10 @@ class FavoriteService:
             )
         )
         await self.db.commit()
-        return result.rowcount > 0
+        if result.rowcount > 0:
+            await user_stats.bump(user_id, stat_field(Favorite), -result.rowcount)
+            return True
+        return False
     
     async def get_user_favorites(
         self,
@@ -453,14 +560,26 @@ class FavoriteService:
         item_id: int
     ) -> bool:
         """检查是否已收藏"""
+        return (await self.check_favorites(user_id, [(item_type, item_id)]))[0]
+    
+    async def check_favorites(
+        self,
+        user_id: int,
+        items: List[Tuple[str, int]]
+    ) -> List[bool]:
+        """批量检查是否已收藏（一次查询，走唯一索引），按 items 顺序返回"""
+        if not items:
+            return []
+        if len(items) > FAVORITE_CHECK_LIMIT:
+            raise ValueError(f"单次最多检查 {FAVORITE_CHECK_LIMIT} 项")
         result = await self.db.execute(
-            select(Favorite).where(
+            select(Favorite.item_type, Favorite.item_id).where(
                 Favorite.user_id == user_id,
-                Favorite.item_type == item_type,
-                Favorite.item_id == item_id
+                tuple_(Favorite.item_type, Favorite.item_id).in_(list(set(items)))
             )
         )
-        return result.scalar_one_or_none() is not None
+        favorited = set(result.all())
+        return [(item_type, item_id) in favorited for item_type, item_id in items]
 
 
 class SettingsService:
@@ -0,0 +1,201 @@
+"""
+玄心理命 - 用户统计计数
+
+/user/stats 每次访问个人中心都会读取。计数保存在 Redis 哈希 stats:{user_id}，
+HistoryService、FavoriteService 保存/删除时增减，读取只需一次 HGETALL。
+
+- 哈希不存在时不增减（避免只含部分字段的计数），读取时以一条 UNION ALL
+  聚合查询重建
+- 增减过的用户记入 stats:dirty，后台任务每隔 STATS_RECONCILE_INTERVAL 秒
+  按聚合查询校准；哈希另有 STATS_COUNTER_EXPIRE 过期，漂移有上限
+- Redis 不可用时直接走聚合查询
+"""
+
+import asyncio
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import func, literal, select, union_all
+
+from .cache import cache
+from .config import settings
+from .database import (
+    AnalysisRecord, DivinationRecord, PsychologyTest, FusionRecord, Favorite, async_session
+)
+from .logging import logger
+
+
+STAT_FIELDS = (
+    "bazi_analyses", "ziwei_analyses", "divinations",
+    "psychology_tests", "fusion_analyses", "favorites"
+)
+
+DIRTY_KEY = "stats:dirty"
+
+# 哈希存在时才增减，并记下待校准的用户
+_BUMP_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    redis.call('HINCRBY', KEYS[1], ARGV[1], ARGV[2])
+end
+redis.call('SADD', KEYS[2], ARGV[3])
+return 1
+"""
+
+# 表 → 计数字段
+_FIELDS: Dict[str, Callable[[Dict[str, Any]], str]] = {
+    AnalysisRecord.__tablename__: lambda values: f"{values.get('analysis_type')}_analyses",
+    DivinationRecord.__tablename__: lambda values: "divinations",
+    PsychologyTest.__tablename__: lambda values: "psychology_tests",
+    FusionRecord.__tablename__: lambda values: "fusion_analyses",
+    Favorite.__tablename__: lambda values: "favorites",
+}
+
+
+def stat_field(model: Any, values: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    """记录对应的计数字段；不计数的表或类型为 None"""
+    field = _FIELDS.get(model.__tablename__, lambda _: None)(values or {})
+    return field if field in STAT_FIELDS else None
+
+
+def stats_key(user_id: int) -> str:
+    """用户计数哈希键"""
+    return f"stats:{user_id}"
+
+
+def aggregate_query(user_id: int):
+    """一次查询统计各类记录数：(计数字段, 数量)"""
+    return union_all(
+        select((AnalysisRecord.analysis_type + literal("_analyses")).label("field"),
+               func.count().label("count"))
+        .where(AnalysisRecord.user_id == user_id)
+        .group_by(AnalysisRecord.analysis_type),
+        select(literal("divinations"), func.count())
+        .select_from(DivinationRecord).where(DivinationRecord.user_id == user_id),
+        select(literal("psychology_tests"), func.count())
+        .select_from(PsychologyTest).where(PsychologyTest.user_id == user_id),
+        select(literal("fusion_analyses"), func.count())
+        .select_from(FusionRecord).where(FusionRecord.user_id == user_id),
+        select(literal("favorites"), func.count())
+        .select_from(Favorite).where(Favorite.user_id == user_id),
+    )
+
+
+class UserStats:
+    """
+    用户统计计数
+
+    Args:
+        client: Redis 客户端（文本）
+        session_factory: 校准任务使用的数据库会话工厂
+        expire: 计数哈希过期时间（秒）
+        reconcile_interval: 校准间隔（秒）
+        reconcile_batch: 每轮最多校准的用户数
+    """
+
+    def __init__(self, client: Any, session_factory: Callable[[], Any], expire: int = 86400,
+                 reconcile_interval: float = 300.0, reconcile_batch: int = 200):
+        self.client = client
+        self.session_factory = session_factory
+        self.expire = expire
+        self.reconcile_interval = reconcile_interval
+        self.reconcile_batch = reconcile_batch
+        self._bump = client.register_script(_BUMP_SCRIPT)
+        self._task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.rebuilds = 0
+        self.reconciled = 0
+
+    async def get(self, db, user_id: int) -> Dict[str, int]:
+        """读取计数；缺失或 Redis 不可用时聚合查询（并回填）"""
+        if not settings.STATS_COUNTERS_ENABLED:
+            return await self.aggregate(db, user_id)
+        try:
+            values = await self.client.hgetall(stats_key(user_id))
+        except Exception as e:
+            logger.warning(f"Stats counters unavailable: {e}")
+            return await self.aggregate(db, user_id)
+        if values:
+            self.hits += 1
+            return {field: int(values.get(field, 0)) for field in STAT_FIELDS}
+        stats = await self.aggregate(db, user_id)
+        self.rebuilds += 1
+        await self.fill(user_id, stats)
+        return stats
+
+    @staticmethod
+    async def aggregate(db, user_id: int) -> Dict[str, int]:
+        """按数据库聚合"""
+        stats = dict.fromkeys(STAT_FIELDS, 0)
+        for field, count in (await db.execute(aggregate_query(user_id))).all():
+            if field in stats:
+                stats[field] = count
+        return stats
+
+    async def fill(self, user_id: int, stats: Dict[str, int]) -> None:
+        """写入完整计数哈希"""
+        try:
+            async with self.client.pipeline(transaction=True) as pipe:
+                pipe.hset(stats_key(user_id), mapping=stats)
+                pipe.expire(stats_key(user_id), self.expire)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to store stats for user {user_id}: {e}")
+
+    async def bump(self, user_id: Optional[int], field: Optional[str], delta: int = 1) -> None:
+        """增减计数；失败只记录日志，由校准兜底"""
+        if not settings.STATS_COUNTERS_ENABLED or user_id is None or field is None:
+            return
+        try:
+            await self._bump(keys=[stats_key(user_id), DIRTY_KEY], args=[field, delta, user_id])
+        except Exception as e:
+            logger.warning(f"Failed to bump {field} for user {user_id}: {e}")
+
+    # ==================== 校准 ====================
+
+    async def reconcile(self) -> int:
+        """按聚合查询校准近期有增减的用户，返回校准人数"""
+        user_ids = await self.client.spop(DIRTY_KEY, self.reconcile_batch)
+        if not user_ids:
+            return 0
+        async with self.session_factory() as db:
+            for user_id in user_ids:
+                await self.fill(int(user_id), await self.aggregate(db, int(user_id)))
+        self.reconciled += len(user_ids)
+        return len(user_ids)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.reconcile_interval)
+            try:
+                while await self.reconcile() >= self.reconcile_batch:
+                    pass
+            except Exception as e:
+                logger.warning(f"Stats reconciliation failed: {e}")
+
+    def start(self) -> None:
+        """启动校准任务（需在事件循环中调用）"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止校准任务"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        """读取命中与校准统计"""
+        return {"hits": self.hits, "rebuilds": self.rebuilds, "reconciled": self.reconciled}
+
+
+user_stats = UserStats(
+    cache.client,
+    async_session,
+    expire=settings.STATS_COUNTER_EXPIRE,
+    reconcile_interval=settings.STATS_RECONCILE_INTERVAL,
+    reconcile_batch=settings.STATS_RECONCILE_BATCH
+)
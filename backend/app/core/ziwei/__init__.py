@@ -8,8 +8,10 @@ from .palace import (
     FOURTEEN_MAIN_STARS, MAIN_STAR_TRAITS,
     AUXILIARY_STARS, SHA_STARS,
     
+    STAR_NAMES, STAR_IDS,
+    
     # 枚举类
-    StarType,
+    StarType, StarId,
     
     # 数据类
     Star, Palace, ZiWeiChart,
@@ -57,6 +59,14 @@ from .advanced import (
     calculate_palace_score
 )
 
+from .table import (
+    ZiweiChartTable,
+    chart_index,
+    build_ziwei_table,
+    load_ziwei_table,
+    get_ziwei_table
+)
+
 from .analysis import analyze_ziwei
 
 
@@ -68,7 +78,8 @@ __all__ = [
     "STAR_BRIGHTNESS",
     
     # 类型
-    "StarType", "Star", "Palace", "ZiWeiChart",
+    "StarType", "StarId", "Star", "Palace", "ZiWeiChart",
+    "STAR_NAMES", "STAR_IDS",
     
     # 函数
     "create_ziwei_chart", "analyze_ziwei_chart", "analyze_ziwei",
@@ -77,5 +88,9 @@ __all__ = [
     "arrange_sihua", "arrange_lucun_tianma", 
     "arrange_qingyang_tuoluo", "arrange_tiankui_tianyue",
     "set_star_brightness", "get_star_brightness",
-    "analyze_advanced_patterns", "calculate_palace_score"
+    "analyze_advanced_patterns", "calculate_palace_score",
+    
+    # 命盘预计算表
+    "ZiweiChartTable", "chart_index",
+    "build_ziwei_table", "load_ziwei_table", "get_ziwei_table"
 ]
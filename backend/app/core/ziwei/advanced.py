@@ -1,6 +1,6 @@
 
 from typing import Dict, List, Tuple, Optional
-from .palace import Palace, Star, StarType, ZiWeiChart
+from .palace import Palace, Star, StarType, ZiWeiChart, DI_ZHI, ZHI_INDEX, STAR_NAMES
 
 # ==================== 四化星表 ====================
 SIHUA_TABLE = {
@@ -172,6 +172,13 @@ for star, levels in STAR_BRIGHTNESS_GROUPS.items():
             STAR_BRIGHTNESS_INDEX[(star, pos)] = level
 
 
+# 按 StarId × 地支下标的亮度表（仅十四主星）
+STAR_BRIGHTNESS_BY_ID = tuple(
+    tuple(STAR_BRIGHTNESS_INDEX.get((name, zhi), "平和") for zhi in DI_ZHI)
+    for name in STAR_NAMES[:14]
+)
+
+
 def get_star_brightness(star_name: str, dizhi: str) -> str:
     """获取星曜在某宫位的亮度 (O(1) Optimized)"""
     return STAR_BRIGHTNESS_INDEX.get((star_name, dizhi), "平和")
@@ -244,7 +251,11 @@ def analyze_advanced_patterns(chart: 'ZiWeiChart') -> List[Dict]:
     # Pre-compute sets for O(1) checking
     main_star_set = {s.name for s in ming_gong.get_main_stars()}
     sha_star_set = {s.name for s in ming_gong.get_sha_stars()}
-    
+    return match_advanced_patterns(main_star_set, sha_star_set)
+
+
+def match_advanced_patterns(main_star_set: set, sha_star_set: set) -> List[Dict]:
+    """按命宫主星、煞星名称集合匹配高级格局"""
     patterns = []
     
     for pattern_name, pattern_info in ADVANCED_PATTERNS.items():
@@ -285,35 +296,35 @@ def arrange_sihua(palaces: List[Palace], year_gan: str) -> None:
                     star.hua = hua_type
 
 def arrange_lucun_tianma(palaces: List[Palace], year_gan: str, year_zhi: str) -> None:
-    palace_map = {p.dizhi: p for p in palaces}
+    palace_map = {p.zhi_index: p for p in palaces}
     if year_gan in LUCUN_TABLE:
-        lucun_zhi = LUCUN_TABLE[year_gan]
+        lucun_zhi = ZHI_INDEX[LUCUN_TABLE[year_gan]]
         if lucun_zhi in palace_map:
             palace_map[lucun_zhi].stars.append(Star(name="禄存", star_type=StarType.JIXING, description="财禄之星，主稳定财运"))
     if year_zhi in TIANMA_TABLE:
-        tianma_zhi = TIANMA_TABLE[year_zhi]
+        tianma_zhi = ZHI_INDEX[TIANMA_TABLE[year_zhi]]
         if tianma_zhi in palace_map:
             palace_map[tianma_zhi].stars.append(Star(name="天马", star_type=StarType.JIXING, description="奔波走动，利外出发展"))
 
 def arrange_qingyang_tuoluo(palaces: List[Palace], year_gan: str) -> None:
-    palace_map = {p.dizhi: p for p in palaces}
+    palace_map = {p.zhi_index: p for p in palaces}
     if year_gan in QINGYANG_TABLE:
-        qy_zhi = QINGYANG_TABLE[year_gan]
+        qy_zhi = ZHI_INDEX[QINGYANG_TABLE[year_gan]]
         if qy_zhi in palace_map:
             palace_map[qy_zhi].stars.append(Star(name="擎羊", star_type=StarType.SHAXING, description="刚烈冲动，易有意外"))
     if year_gan in TUOLUO_TABLE:
-        tl_zhi = TUOLUO_TABLE[year_gan]
+        tl_zhi = ZHI_INDEX[TUOLUO_TABLE[year_gan]]
         if tl_zhi in palace_map:
             palace_map[tl_zhi].stars.append(Star(name="陀罗", star_type=StarType.SHAXING, description="拖延纠缠，做事反复"))
 
 def arrange_tiankui_tianyue(palaces: List[Palace], year_gan: str) -> None:
-    palace_map = {p.dizhi: p for p in palaces}
+    palace_map = {p.zhi_index: p for p in palaces}
     if year_gan in TIANKUI_TABLE:
-        tk_zhi = TIANKUI_TABLE[year_gan]
+        tk_zhi = ZHI_INDEX[TIANKUI_TABLE[year_gan]]
         if tk_zhi in palace_map:
             palace_map[tk_zhi].stars.append(Star(name="天魁", star_type=StarType.JIXING, description="阳贵人，主贵人相助"))
     if year_gan in TIANYUE_TABLE:
-        ty_zhi = TIANYUE_TABLE[year_gan]
+        ty_zhi = ZHI_INDEX[TIANYUE_TABLE[year_gan]]
         if ty_zhi in palace_map:
             palace_map[ty_zhi].stars.append(Star(name="天钺", star_type=StarType.JIXING, description="阴贵人，主贵人相助"))
 
@@ -321,38 +332,54 @@ def set_star_brightness(palaces: List[Palace]) -> None:
     for palace in palaces:
         for star in palace.stars:
             if star.star_type == StarType.ZHUXING:
-                star.brightness = get_star_brightness(star.name, palace.dizhi)
+                star.brightness = STAR_BRIGHTNESS_BY_ID[star.star_id][palace.zhi_index]
+
+def apply_advanced_stars(chart: ZiWeiChart, year_gan: str, year_zhi: str) -> None:
+    """在基础命盘上安四化、禄存天马、擎羊陀罗、天魁天钺并定主星亮度"""
+    arrange_sihua(chart.palaces, year_gan)
+    arrange_lucun_tianma(chart.palaces, year_gan, year_zhi)
+    arrange_qingyang_tuoluo(chart.palaces, year_gan)
+    arrange_tiankui_tianyue(chart.palaces, year_gan)
+    set_star_brightness(chart.palaces)
 
 def calculate_palace_score(palace: Palace) -> Dict:
+    main_stars = [(s.name, s.brightness, s.hua) for s in palace.get_main_stars()]
+    aux_names = [s.name for s in palace.get_auxiliary_stars()]
+    sha_names = [s.name for s in palace.get_sha_stars()]
+    score, positive_factors, negative_factors = score_palace_stars(main_stars, aux_names, sha_names)
+    return {"score": score, "level": palace_score_level(score), "positive_factors": positive_factors, "negative_factors": negative_factors}
+
+def score_palace_stars(main_stars: List[Tuple[str, str, str]], aux_names: List[str],
+                       sha_names: List[str]) -> Tuple[int, List[str], List[str]]:
+    """按 (星名, 亮度, 四化) 主星列表及辅星、煞星名称计算宫位得分与吉凶因素"""
     score = 50
     positive_factors = []
     negative_factors = []
-    main_stars = palace.get_main_stars()
-    for star in main_stars:
-        if star.brightness == "庙": score += 20; positive_factors.append(f"{star.name}入庙")
-        elif star.brightness == "旺": score += 15; positive_factors.append(f"{star.name}旺")
-        elif star.brightness == "得地": score += 10
-        elif star.brightness == "落陷": score -= 15; negative_factors.append(f"{star.name}落陷")
-        if star.hua == "禄": score += 15; positive_factors.append(f"{star.name}化禄")
-        elif star.hua == "权": score += 12; positive_factors.append(f"{star.name}化权")
-        elif star.hua == "科": score += 10; positive_factors.append(f"{star.name}化科")
-        elif star.hua == "忌": score -= 15; negative_factors.append(f"{star.name}化忌")
-    aux_stars = palace.get_auxiliary_stars()
-    for star in aux_stars:
-        if star.name in ["左辅", "右弼"]: score += 8; positive_factors.append(star.name)
-        elif star.name in ["文昌", "文曲"]: score += 6; positive_factors.append(star.name)
-        elif star.name in ["天魁", "天钺"]: score += 10; positive_factors.append(star.name)
-        elif star.name in ["禄存"]: score += 12; positive_factors.append(star.name)
-        elif star.name in ["天马"]: score += 5
-    sha_stars = palace.get_sha_stars()
-    for star in sha_stars:
-        if star.name in ["擎羊", "陀罗"]: score -= 10; negative_factors.append(star.name)
-        elif star.name in ["火星", "铃星"]: score -= 8; negative_factors.append(star.name)
-        elif star.name in ["地空", "地劫"]: score -= 12; negative_factors.append(star.name)
+    for name, brightness, hua in main_stars:
+        if brightness == "庙": score += 20; positive_factors.append(f"{name}入庙")
+        elif brightness == "旺": score += 15; positive_factors.append(f"{name}旺")
+        elif brightness == "得地": score += 10
+        elif brightness == "落陷": score -= 15; negative_factors.append(f"{name}落陷")
+        if hua == "禄": score += 15; positive_factors.append(f"{name}化禄")
+        elif hua == "权": score += 12; positive_factors.append(f"{name}化权")
+        elif hua == "科": score += 10; positive_factors.append(f"{name}化科")
+        elif hua == "忌": score -= 15; negative_factors.append(f"{name}化忌")
+    for name in aux_names:
+        if name in ["左辅", "右弼"]: score += 8; positive_factors.append(name)
+        elif name in ["文昌", "文曲"]: score += 6; positive_factors.append(name)
+        elif name in ["天魁", "天钺"]: score += 10; positive_factors.append(name)
+        elif name in ["禄存"]: score += 12; positive_factors.append(name)
+        elif name in ["天马"]: score += 5
+    for name in sha_names:
+        if name in ["擎羊", "陀罗"]: score -= 10; negative_factors.append(name)
+        elif name in ["火星", "铃星"]: score -= 8; negative_factors.append(name)
+        elif name in ["地空", "地劫"]: score -= 12; negative_factors.append(name)
     score = max(0, min(100, score))
-    if score >= 80: level = "极佳"
-    elif score >= 65: level = "良好"
-    elif score >= 50: level = "中等"
-    elif score >= 35: level = "偏弱"
-    else: level = "不佳"
-    return {"score": score, "level": level, "positive_factors": positive_factors, "negative_factors": negative_factors}
+    return score, positive_factors, negative_factors
+
+def palace_score_level(score: int) -> str:
+    if score >= 80: return "极佳"
+    elif score >= 65: return "良好"
+    elif score >= 50: return "中等"
+    elif score >= 35: return "偏弱"
+    return "不佳"
@@ -6,18 +6,25 @@ from .palace import (
     DI_ZHI
 )
 from .advanced import (
-    arrange_sihua, arrange_lucun_tianma,
-    arrange_qingyang_tuoluo, arrange_tiankui_tianyue,
-    set_star_brightness,
+    apply_advanced_stars,
     analyze_advanced_patterns, calculate_palace_score
 )
+from .table import get_ziwei_table
 
 def analyze_ziwei(year_gan: str, year_zhi: str,
                   lunar_month: int, lunar_day: int,
                   birth_hour_zhi: str, advanced: bool = True) -> dict:
     """
     紫微斗数完整分析
+
+    已生成命盘预计算表时直接查表解码，否则逐盘计算。
     """
+    table = get_ziwei_table()
+    if table is not None:
+        result = table.lookup(year_gan, year_zhi, lunar_month, lunar_day, birth_hour_zhi, advanced)
+        if result is not None:
+            return result
+
     # 创建命盘
     chart = create_ziwei_chart(
         year_gan=year_gan,
@@ -29,11 +36,7 @@ def analyze_ziwei(year_gan: str, year_zhi: str,
     
     if advanced:
         # 应用高级算法
-        arrange_sihua(chart.palaces, year_gan)
-        arrange_lucun_tianma(chart.palaces, year_gan, year_zhi)
-        arrange_qingyang_tuoluo(chart.palaces, year_gan)
-        arrange_tiankui_tianyue(chart.palaces, year_gan)
-        set_star_brightness(chart.palaces)
+        apply_advanced_stars(chart, year_gan, year_zhi)
     
     # 分析命盘
     analysis = analyze_ziwei_chart(chart)
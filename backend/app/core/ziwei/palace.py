@@ -4,8 +4,8 @@
 """
 
 from typing import Dict, List, Tuple, Optional
-from dataclasses import dataclass, field
-from enum import Enum
+from dataclasses import dataclass
+from enum import Enum, IntEnum
 
 
 # 十二宫位名称
@@ -20,6 +20,9 @@ DI_ZHI = ["子", "丑", "寅", "卯", "辰", "巳", "午", "未", "申", "酉",
 # 天干
 TIAN_GAN = ["甲", "乙", "丙", "丁", "戊", "己", "庚", "辛", "壬", "癸"]
 
+# 地支 → 下标
+ZHI_INDEX = {zhi: i for i, zhi in enumerate(DI_ZHI)}
+
 
 class StarType(Enum):
     """星曜类型"""
@@ -31,15 +34,67 @@ class StarType(Enum):
     ZAXING = "杂曜"       # 杂曜
 
 
-@dataclass
+class StarId(IntEnum):
+    """
+    星曜编号
+
+    编号即排盘时入宫的先后顺序：十四主星、基础盘辅煞、高级盘附加星。
+    """
+    ZIWEI = 0
+    TIANJI = 1
+    TAIYANG = 2
+    WUQU = 3
+    TIANTONG = 4
+    LIANZHEN = 5
+    TIANFU = 6
+    TAIYIN = 7
+    TANLANG = 8
+    JUMEN = 9
+    TIANXIANG = 10
+    TIANLIANG = 11
+    QISHA = 12
+    POJUN = 13
+    ZUOFU = 14
+    YOUBI = 15
+    WENCHANG = 16
+    WENQU = 17
+    HUOXING = 18
+    LINGXING = 19
+    LUCUN = 20
+    TIANMA = 21
+    QINGYANG = 22
+    TUOLUO = 23
+    TIANKUI = 24
+    TIANYUE = 25
+
+
+# 星名（按 StarId 下标）
+STAR_NAMES = (
+    "紫微", "天机", "太阳", "武曲", "天同", "廉贞", "天府",
+    "太阴", "贪狼", "巨门", "天相", "天梁", "七杀", "破军",
+    "左辅", "右弼", "文昌", "文曲", "火星", "铃星",
+    "禄存", "天马", "擎羊", "陀罗", "天魁", "天钺",
+)
+STAR_IDS = {name: StarId(i) for i, name in enumerate(STAR_NAMES)}
+
+
 class Star:
-    """星曜"""
-    name: str                   # 星名
-    star_type: StarType         # 星曜类型
-    brightness: str = ""        # 亮度（庙旺得利平闲陷）
-    hua: str = ""               # 四化（禄权科忌）
-    description: str = ""       # 描述
-    
+    """星曜（内部以 StarId 保存，星名在访问 name 时取出）"""
+    __slots__ = ("star_id", "star_type", "brightness", "hua", "description")
+
+    def __init__(self, name, star_type: StarType, brightness: str = "",
+                 hua: str = "", description: str = ""):
+        self.star_id = name if isinstance(name, StarId) else STAR_IDS[name]
+        self.star_type = star_type      # 星曜类型
+        self.brightness = brightness    # 亮度（庙旺得利平闲陷）
+        self.hua = hua                  # 四化（禄权科忌）
+        self.description = description  # 描述
+
+    @property
+    def name(self) -> str:
+        """星名"""
+        return STAR_NAMES[self.star_id]
+
     def __str__(self) -> str:
         result = self.name
         if self.brightness:
@@ -48,17 +103,31 @@ class Star:
             result += f"化{self.hua}"
         return result
 
+    def __repr__(self) -> str:
+        return (f"Star(name={self.name!r}, star_type={self.star_type}, "
+                f"brightness={self.brightness!r}, hua={self.hua!r})")
+
 
-@dataclass
 class Palace:
-    """宫位"""
-    name: str                           # 宫位名称
-    dizhi: str                          # 所在地支
-    tiangan: str = ""                   # 宫干
-    stars: List[Star] = field(default_factory=list)  # 宫内星曜
-    
+    """宫位（内部以地支下标保存）"""
+    __slots__ = ("name", "zhi_index", "tiangan", "stars")
+
+    def __init__(self, name: str, dizhi, tiangan: str = "", stars: Optional[List[Star]] = None):
+        self.name = name                                    # 宫位名称
+        self.zhi_index = dizhi if isinstance(dizhi, int) else ZHI_INDEX[dizhi]
+        self.tiangan = tiangan                              # 宫干
+        self.stars = stars if stars is not None else []     # 宫内星曜
+
+    @property
+    def dizhi(self) -> str:
+        """所在地支"""
+        return DI_ZHI[self.zhi_index]
+
     def __str__(self) -> str:
         return f"{self.name}({self.dizhi})"
+
+    def __repr__(self) -> str:
+        return f"Palace(name={self.name!r}, dizhi={self.dizhi!r}, tiangan={self.tiangan!r}, stars={self.stars!r})"
     
     def get_main_stars(self) -> List[Star]:
         """获取主星"""
@@ -285,7 +354,7 @@ def arrange_twelve_palaces(ming_gong_index: int) -> List[Palace]:
         dizhi_index = (ming_gong_index - i) % 12
         palace = Palace(
             name=palace_name,
-            dizhi=DI_ZHI[dizhi_index]
+            dizhi=dizhi_index
         )
         palaces.append(palace)
     
@@ -325,7 +394,7 @@ def set_palace_tiangan(palaces: List[Palace], year_gan: str) -> None:
     yin_gan_index = calculate_wuhu_index(year_gan)
     
     for palace in palaces:
-        dizhi_index = DI_ZHI.index(palace.dizhi)
+        dizhi_index = palace.zhi_index
         # 从寅宫起始天干，顺数到该宫位置
         gan_offset = (dizhi_index - 2) % 12  # 寅是索引2
         gan_index = (yin_gan_index + gan_offset) % 10
@@ -388,7 +457,7 @@ def calculate_wuxing_ju(ming_gong_dizhi: str, year_gan: str) -> Tuple[str, int]:
     
     # 先计算命宫天干
     yin_gan_index = calculate_wuhu_index(year_gan)
-    ming_gong_dizhi_index = DI_ZHI.index(ming_gong_dizhi)
+    ming_gong_dizhi_index = ZHI_INDEX[ming_gong_dizhi]
     gan_offset = (ming_gong_dizhi_index - 2) % 12
     ming_gong_gan_index = (yin_gan_index + gan_offset) % 10
     ming_gong_gan = TIAN_GAN[ming_gong_gan_index]
@@ -433,7 +502,7 @@ def arrange_main_stars(palaces: List[Palace], ziwei_position: int) -> None:
         ziwei_position: 紫微星地支索引
     """
     # Create O(1) lookup map
-    palace_map = {DI_ZHI.index(p.dizhi): p for p in palaces}
+    palace_map = {p.zhi_index: p for p in palaces}
 
     # 主星相对紫微的位置关系（简化版）
     # 紫微星系列
@@ -497,7 +566,7 @@ def arrange_auxiliary_stars(palaces: List[Palace], year_gan: str, year_zhi: str,
         birth_hour_zhi_index: 出生时辰地支索引
     """
     # Create O(1) lookup map
-    palace_map = {DI_ZHI.index(p.dizhi): p for p in palaces}
+    palace_map = {p.zhi_index: p for p in palaces}
 
     # 左辅：辰上起正月，顺数至生月
     zuofu_position = (4 + lunar_month - 1) % 12  # 辰=4
@@ -539,7 +608,7 @@ def arrange_sha_stars(palaces: List[Palace], year_zhi: str, birth_hour_zhi_index
         birth_hour_zhi_index: 出生时辰地支索引
     """
     # Create O(1) lookup map
-    palace_map = {DI_ZHI.index(p.dizhi): p for p in palaces}
+    palace_map = {p.zhi_index: p for p in palaces}
     
     # 擎羊、陀罗：安星在 Advanced 模块处理 (LUCUN关联)
     # 火星、铃星：以年支定位
@@ -582,7 +651,7 @@ def arrange_sha_stars(palaces: List[Palace], year_zhi: str, birth_hour_zhi_index
             palace.stars.append(star)
 
 
-@dataclass
+@dataclass(slots=True)
 class ZiWeiChart:
     """紫微斗数命盘"""
     palaces: List[Palace]               # 十二宫
@@ -632,7 +701,7 @@ def create_ziwei_chart(year_gan: str, year_zhi: str,
     Returns:
         紫微斗数命盘
     """
-    birth_hour_zhi_index = DI_ZHI.index(birth_hour_zhi)
+    birth_hour_zhi_index = ZHI_INDEX[birth_hour_zhi]
     
     # 1. 计算命宫位置
     ming_gong_index = calculate_ming_gong(lunar_month, birth_hour_zhi_index)
@@ -739,7 +808,12 @@ def analyze_ziwei_chart(chart: ZiWeiChart) -> Dict:
 
 def _analyze_palace_stars(stars: List[Star], palace_name: str) -> Dict:
     """分析宫位星曜"""
-    if not stars:
+    return _analyze_main_star(stars[0].name if stars else None, palace_name)
+
+
+def _analyze_main_star(main_star: Optional[str], palace_name: str) -> Dict:
+    """按宫内第一颗主星分析宫位"""
+    if not main_star:
         return {
             "main_star": None,
             "description": f"{palace_name}无主星，需看对宫借星",
@@ -747,11 +821,10 @@ def _analyze_palace_stars(stars: List[Star], palace_name: str) -> Dict:
             "career_hint": ""
         }
     
-    main_star = stars[0]
-    traits = MAIN_STAR_TRAITS.get(main_star.name, {})
+    traits = MAIN_STAR_TRAITS.get(main_star, {})
     
     return {
-        "main_star": main_star.name,
+        "main_star": main_star,
         "description": traits.get("positive", ""),
         "keywords": traits.get("keywords", []),
         "career_hint": traits.get("career", ""),
@@ -765,13 +838,13 @@ def _analyze_pattern(chart: ZiWeiChart) -> Dict:
     if not ming_gong:
         return {"name": "普通格局", "description": ""}
     
-    main_stars = ming_gong.get_main_stars()
-    aux_stars = ming_gong.get_auxiliary_stars()
-    sha_stars = ming_gong.get_sha_stars()
-    
-    star_names = [s.name for s in main_stars]
-    aux_names = [s.name for s in aux_stars]
-    
+    star_names = [s.name for s in ming_gong.get_main_stars()]
+    aux_names = [s.name for s in ming_gong.get_auxiliary_stars()]
+    return _match_pattern(star_names, aux_names)
+
+
+def _match_pattern(star_names: List[str], aux_names: List[str]) -> Dict:
+    """按命宫主星、辅星名称判断格局"""
     patterns = []
     
     # 紫府同宫
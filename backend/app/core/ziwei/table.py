@@ -0,0 +1,344 @@
+"""
+玄心理命 - 紫微斗数命盘预计算表
+离线生成全部命盘的星曜落宫、亮度、四化与宫位评分，运行时 mmap 加载后按下标直接解码
+
+命盘只取决于 (年干支, 农历月, 农历日, 时辰)，共 60×12×30×12 = 259200 种组合。
+每个命盘编码为一条定长记录，星曜、宫位、亮度均为整数编码：
+
+    命宫地支 | 身宫地支 | 局数 | 26颗星所在地支 | 14主星亮度 | 四化星号 | 十二宫评分
+
+生成表：python scripts/build_ziwei_table.py [输出路径]
+表文件不存在或格式不符时，analyze_ziwei 退回到逐盘计算。
+"""
+
+import mmap
+import os
+import struct
+from functools import lru_cache
+from typing import List, Optional
+
+from .palace import (
+    TWELVE_PALACES, DI_ZHI, TIAN_GAN, ZHI_INDEX, STAR_NAMES,
+    create_ziwei_chart, calculate_wuhu_index,
+    _analyze_main_star, _match_pattern
+)
+from .advanced import (
+    apply_advanced_stars, calculate_palace_score,
+    match_advanced_patterns, score_palace_stars, palace_score_level
+)
+
+
+MAIN_STAR_COUNT = 14
+BASIC_STAR_COUNT = 20
+
+# 星曜类别（按 StarId）：0=主星 1=辅星 2=煞星
+STAR_KINDS = (0,) * 14 + (1, 1, 1, 1, 2, 2) + (1, 1, 2, 2, 1, 1)
+
+# 亮度编码（0 表示未定亮度）
+BRIGHTNESS_LEVELS = ("", "庙", "旺", "得地", "平和", "落陷")
+BRIGHTNESS_CODES = {level: i for i, level in enumerate(BRIGHTNESS_LEVELS)}
+
+HUA_TYPES = ("禄", "权", "科", "忌")
+
+WUXING_JU_NAMES = {2: "水二局", 3: "木三局", 4: "金四局", 5: "土五局", 6: "火六局"}
+
+NONE_CODE = 0xFF
+
+# 表维度
+LUNAR_MONTHS = 12
+LUNAR_DAYS = 30
+CHART_COUNT = 60 * LUNAR_MONTHS * LUNAR_DAYS * 12
+
+# 表文件路径
+ZIWEI_TABLE_PATH = os.getenv(
+    "ZIWEI_TABLE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                 "data", "ziwei", "ziwei_charts.bin")
+)
+
+# 文件头：魔数、版本、记录长度、记录数
+_TABLE_MAGIC = b"YTZW"
+_TABLE_VERSION = 1
+_TABLE_HEADER = struct.Struct("<4sHHI4x")
+
+# 记录：命宫、身宫、局数、星曜落宫、主星亮度、四化、宫位评分
+_RECORD = struct.Struct(f"<3B{len(STAR_NAMES)}s{MAIN_STAR_COUNT}s4s12s5x")
+
+_PALACE_INDEX = {name: i for i, name in enumerate(TWELVE_PALACES)}
+_GAN_INDEX = {g: i for i, g in enumerate(TIAN_GAN)}
+
+# 宫干：寅宫起干下标 × 地支 → 天干
+_PALACE_GAN = {
+    start: tuple(TIAN_GAN[(start + (zhi - 2) % 12) % 10] for zhi in range(12))
+    for start in range(0, 10, 2)
+}
+
+
+def chart_index(year_gan: str, year_zhi: str, lunar_month: int, lunar_day: int,
+                birth_hour_zhi: str) -> Optional[int]:
+    """
+    命盘在表中的下标
+
+    干支阴阳不配、月日越界等不在表内的输入返回 None。
+    """
+    gan = _GAN_INDEX.get(year_gan)
+    zhi = ZHI_INDEX.get(year_zhi)
+    hour = ZHI_INDEX.get(birth_hour_zhi)
+    if gan is None or zhi is None or hour is None or gan % 2 != zhi % 2:
+        return None
+    if not (1 <= lunar_month <= LUNAR_MONTHS and 1 <= lunar_day <= LUNAR_DAYS):
+        return None
+    # 六十甲子序号：n ≡ gan (mod 10)，n ≡ zhi (mod 12)
+    sexagenary = (6 * gan - 5 * zhi) % 60
+    return ((sexagenary * LUNAR_MONTHS + lunar_month - 1) * LUNAR_DAYS + lunar_day - 1) * 12 + hour
+
+
+def encode_chart(year_gan: str, year_zhi: str, lunar_month: int, lunar_day: int,
+                 birth_hour_zhi: str) -> bytes:
+    """逐盘计算高级命盘并编码为一条记录"""
+    chart = create_ziwei_chart(year_gan, year_zhi, lunar_month, lunar_day, birth_hour_zhi)
+    apply_advanced_stars(chart, year_gan, year_zhi)
+
+    positions = bytearray([NONE_CODE]) * len(STAR_NAMES)
+    brightness = bytearray(MAIN_STAR_COUNT)
+    hua = bytearray([NONE_CODE]) * len(HUA_TYPES)
+    for palace in chart.palaces:
+        zhi = palace.zhi_index
+        for star in palace.stars:
+            star_id = star.star_id
+            positions[star_id] = zhi
+            if star_id < MAIN_STAR_COUNT:
+                brightness[star_id] = BRIGHTNESS_CODES[star.brightness]
+            if star.hua:
+                hua[HUA_TYPES.index(star.hua)] = star_id
+    scores = bytes(calculate_palace_score(p)["score"] for p in chart.palaces)
+
+    return _RECORD.pack(chart.ming_gong_index, chart.shen_gong_index, chart.ju_number,
+                        bytes(positions), bytes(brightness), bytes(hua), scores)
+
+
+def _star_str(name: str, brightness: str, hua: str) -> str:
+    """与 Star.__str__ 一致的星曜文字"""
+    result = name
+    if brightness:
+        result += f"({brightness})"
+    if hua:
+        result += f"化{hua}"
+    return result
+
+
+def _build_star_views():
+    """
+    预生成每颗星在各亮度、四化组合下的解码视图
+
+    视图为 (类别, 星名, 亮度, 四化, 显示文字, 吉因素, 凶因素)，
+    吉凶因素复用 score_palace_stars 单星计算，与逐盘评分保持一致。
+    """
+    views = []
+    for star_id, name in enumerate(STAR_NAMES):
+        kind = STAR_KINDS[star_id]
+        by_brightness = []
+        for brightness in BRIGHTNESS_LEVELS:
+            by_hua = []
+            for hua in ("",) + HUA_TYPES:
+                if kind == 0:
+                    _, positive, negative = score_palace_stars([(name, brightness, hua)], [], [])
+                elif kind == 1:
+                    _, positive, negative = score_palace_stars([], [name], [])
+                else:
+                    _, positive, negative = score_palace_stars([], [], [name])
+                shown_brightness = brightness if kind == 0 else ""
+                by_hua.append((kind, name, shown_brightness, hua,
+                               _star_str(name, shown_brightness, hua),
+                               tuple(positive), tuple(negative)))
+            by_brightness.append(tuple(by_hua))
+        views.append(tuple(by_brightness))
+    return tuple(views)
+
+
+_STAR_VIEWS = _build_star_views()
+
+
+def decode_chart(record, year_gan: str, advanced: bool = True) -> dict:
+    """
+    将一条记录解码为 analyze_ziwei 的返回结构
+
+    Args:
+        record: 定长记录（bytes 或 mmap 切片）
+        year_gan: 年干（用于排宫干）
+        advanced: 是否包含高级盘附加星、四化、亮度、格局与评分
+    """
+    ming, shen, ju, positions, brightness, hua, scores = _RECORD.unpack(record)
+
+    # 按地支归集星曜视图，保持入宫顺序
+    by_zhi: List[List[tuple]] = [[] for _ in range(12)]
+    if advanced:
+        hua_codes = bytearray(len(STAR_NAMES))
+        for code, star_id in enumerate(hua, 1):
+            if star_id != NONE_CODE:
+                hua_codes[star_id] = code
+        for star_id, views in enumerate(_STAR_VIEWS):
+            zhi = positions[star_id]
+            if zhi != NONE_CODE:
+                level = brightness[star_id] if star_id < MAIN_STAR_COUNT else 0
+                by_zhi[zhi].append(views[level][hua_codes[star_id]])
+    else:
+        for star_id in range(BASIC_STAR_COUNT):
+            zhi = positions[star_id]
+            if zhi != NONE_CODE:
+                by_zhi[zhi].append(_STAR_VIEWS[star_id][0][0])
+
+    palace_gan = _PALACE_GAN[calculate_wuhu_index(year_gan)]
+    wuxing_ju = WUXING_JU_NAMES[ju]
+
+    chart_palaces = []
+    palaces_detail = []
+    palace_scores = {}
+    first_main_stars = []
+    ming_main = ming_aux = ming_sha = ()
+
+    for i, palace_name in enumerate(TWELVE_PALACES):
+        zhi = (ming - i) % 12
+        dizhi = DI_ZHI[zhi]
+        tiangan = palace_gan[zhi]
+
+        main, aux, sha = [], [], []
+        for view in by_zhi[zhi]:
+            (main, aux, sha)[view[0]].append(view)
+        first_main_stars.append(main[0][1] if main else None)
+        if i == 0:
+            ming_main, ming_aux, ming_sha = main, aux, sha
+
+        chart_palaces.append({
+            "name": palace_name,
+            "position": f"{tiangan}{dizhi}",
+            "stars": {
+                "main": [{"name": v[1], "brightness": v[2], "hua": v[3]} for v in main],
+                "auxiliary": [v[1] for v in aux],
+                "sha": [v[1] for v in sha]
+            }
+        })
+        palaces_detail.append({
+            "name": palace_name,
+            "dizhi": dizhi,
+            "tiangan": tiangan,
+            "main_stars": [v[4] for v in main],
+            "aux_stars": [v[4] for v in aux],
+            "sha_stars": [v[4] for v in sha]
+        })
+        if advanced:
+            score = scores[i]
+            positive, negative = [], []
+            for view in main + aux + sha:
+                positive += view[5]
+                negative += view[6]
+            palace_scores[palace_name] = {
+                "score": score, "level": palace_score_level(score),
+                "positive_factors": positive, "negative_factors": negative
+            }
+
+    ming_main_names = [v[1] for v in ming_main]
+    analysis = {
+        "basic_info": {
+            "ming_gong": f"{DI_ZHI[ming]}宫",
+            "shen_gong": f"{DI_ZHI[shen]}宫",
+            "wuxing_ju": wuxing_ju
+        },
+        "ming_analysis": _analyze_main_star(first_main_stars[_PALACE_INDEX["命宫"]], "命宫"),
+        "career_analysis": _analyze_main_star(first_main_stars[_PALACE_INDEX["官禄宫"]], "官禄宫"),
+        "wealth_analysis": _analyze_main_star(first_main_stars[_PALACE_INDEX["财帛宫"]], "财帛宫"),
+        "marriage_analysis": _analyze_main_star(first_main_stars[_PALACE_INDEX["夫妻宫"]], "夫妻宫"),
+        "pattern": _match_pattern(ming_main_names, [v[1] for v in ming_aux]),
+        "palaces_detail": palaces_detail
+    }
+    if advanced:
+        analysis["advanced_patterns"] = match_advanced_patterns(
+            set(ming_main_names), {v[1] for v in ming_sha}
+        )
+        analysis["palace_scores"] = palace_scores
+
+    return {
+        "chart_data": {
+            "wuxing_ju": wuxing_ju,
+            "ming_gong": DI_ZHI[ming],
+            "shen_gong": DI_ZHI[shen],
+            "palaces": chart_palaces
+        },
+        "analysis": analysis
+    }
+
+
+class ZiweiChartTable:
+    """
+    紫微命盘预计算表
+
+    data 为去掉文件头后的记录区（通常是 mmap 的 memoryview），
+    按 chart_index 定位记录后解码。
+    """
+
+    def __init__(self, data):
+        self._data = data
+
+    def __len__(self) -> int:
+        return len(self._data) // _RECORD.size
+
+    def record(self, index: int):
+        offset = index * _RECORD.size
+        return self._data[offset:offset + _RECORD.size]
+
+    def lookup(self, year_gan: str, year_zhi: str, lunar_month: int, lunar_day: int,
+               birth_hour_zhi: str, advanced: bool = True) -> Optional[dict]:
+        """查表解码命盘，输入不在表内时返回 None"""
+        index = chart_index(year_gan, year_zhi, lunar_month, lunar_day, birth_hour_zhi)
+        if index is None:
+            return None
+        return decode_chart(self.record(index), year_gan, advanced)
+
+
+def _iter_chart_inputs():
+    """按表下标顺序遍历全部输入"""
+    for sexagenary in range(60):
+        year_gan = TIAN_GAN[sexagenary % 10]
+        year_zhi = DI_ZHI[sexagenary % 12]
+        for lunar_month in range(1, LUNAR_MONTHS + 1):
+            for lunar_day in range(1, LUNAR_DAYS + 1):
+                for hour_zhi in DI_ZHI:
+                    yield year_gan, year_zhi, lunar_month, lunar_day, hour_zhi
+
+
+def build_ziwei_table(path: str = ZIWEI_TABLE_PATH) -> None:
+    """离线生成命盘表并原子写入 path"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_TABLE_HEADER.pack(_TABLE_MAGIC, _TABLE_VERSION, _RECORD.size, CHART_COUNT))
+        for inputs in _iter_chart_inputs():
+            f.write(encode_chart(*inputs))
+    os.replace(tmp_path, path)
+
+
+def load_ziwei_table(path: str = ZIWEI_TABLE_PATH) -> Optional[ZiweiChartTable]:
+    """以 mmap 方式加载命盘表，文件不存在或格式不符时返回 None"""
+    try:
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    if len(mm) < _TABLE_HEADER.size:
+        mm.close()
+        return None
+    magic, version, record_size, count = _TABLE_HEADER.unpack_from(mm)
+    if (magic != _TABLE_MAGIC or version != _TABLE_VERSION or record_size != _RECORD.size
+            or count != CHART_COUNT or len(mm) != _TABLE_HEADER.size + count * record_size):
+        mm.close()
+        return None
+
+    return ZiweiChartTable(memoryview(mm)[_TABLE_HEADER.size:])
+
+
+@lru_cache()
+def get_ziwei_table() -> Optional[ZiweiChartTable]:
+    """获取命盘表单例（未生成时为 None）"""
+    return load_ziwei_table()
+
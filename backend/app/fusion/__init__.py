@@ -23,6 +23,7 @@ from .mapper import (
 from .analyzer import (
     FusionResult,
     FusionAnalyzer,
+    analyze_fusion,
     quick_fusion_analysis
 )
 
@@ -52,6 +53,7 @@ __all__ = [
     # 分析器
     "FusionResult",
     "FusionAnalyzer",
+    "analyze_fusion",
     "quick_fusion_analysis",
     
     # 报告
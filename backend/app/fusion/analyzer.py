@@ -462,6 +462,11 @@ class FusionAnalyzer:
 
 
 # 快捷分析函数
+def analyze_fusion(**kwargs) -> FusionResult:
+    """完整融合分析，参数同 FusionAnalyzer.analyze"""
+    return FusionAnalyzer().analyze(**kwargs)
+
+
 def quick_fusion_analysis(
     mbti_type: str = None,
     wuxing_scores: Dict[str, float] = None,
@@ -2,6 +2,7 @@
 玄心理命 - 后端API主入口
 """
 
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
@@ -10,6 +11,16 @@ import time
 
 from app.core.config import settings
 from app.core.database import init_db, close_db
+from app.core.cache import cache, rate_limiter
+from app.core.optimization import RateLimitMiddleware, AdmissionMiddleware
+from app.core.admission import admission
+from app.core.executor import compute_executor
+from app.core.narrative import narrative_jobs
+from app.core.history_writer import history_writer
+from app.core.result_store import result_store
+from app.core.user_stats import user_stats
+from app.core.user_service import backfill_history_summaries
+from app.core.redis_client import close_redis, redis_stats
 from app.core.logging import logger, log_request
 from app.api import bazi, ziwei, yijing, auth, psychology, fusion, user, analysis
 
@@ -28,15 +39,53 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.warning(f"⚠️ 数据库连接失败，将在请求时重试: {e}")
     
+    # 历史记录写后队列
+    if settings.HISTORY_WRITE_BEHIND:
+        history_writer.start()
+    
+    # 用户统计计数校准
+    if settings.STATS_COUNTERS_ENABLED:
+        user_stats.start()
+    
+    # 旧历史记录的列表摘要
+    backfill_task = None
+    if settings.HISTORY_SUMMARY_BACKFILL:
+        backfill_task = asyncio.create_task(backfill_history_summaries())
+    
+    # 预热计算进程池
+    try:
+        await compute_executor.start()
+    except Exception as e:
+        logger.warning(f"⚠️ 计算执行器预热失败，将在首次请求时创建: {e}")
+    
+    # 订阅缓存失效广播（进程内一级缓存启用时）
+    invalidation_task = None
+    if cache.local is not None:
+        invalidation_task = asyncio.create_task(cache.listen_invalidations())
+    
     yield
     
     # 关闭时
     logger.info("🛑 应用正在关闭...")
+    for task in (invalidation_task, backfill_task):
+        if task is None:
+            continue
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    await narrative_jobs.shutdown()
+    await user_stats.stop()
+    compute_executor.shutdown()
+    # 写完队列中的历史记录（写不进库的落盘）
+    await history_writer.stop()
     try:
         await close_db()
         logger.info("✅ 数据库连接已关闭")
     except Exception:
         pass
+    await close_redis()
 
 
 app = FastAPI(
@@ -52,6 +101,14 @@ app = FastAPI(
 
 # ==================== 中间件 ====================
 
+# 计算准入（最内层：被限流拒绝的请求不占名额）
+if settings.ADMISSION_ENABLED:
+    app.add_middleware(AdmissionMiddleware)
+
+# 限流（先于 CORS 注册，位于其内层，429 响应同样带 CORS 头）
+if settings.RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware)
+
 # CORS中间件
 app.add_middleware(
     CORSMiddleware,
@@ -132,7 +189,17 @@ async def root():
 @app.get("/health", summary="健康检查")
 async def health_check():
     """健康检查接口"""
-    return {"status": "healthy", "version": settings.APP_VERSION}
+    return {
+        "status": "healthy",
+        "version": settings.APP_VERSION,
+        "cache": cache.stats(),
+        "redis": redis_stats(),
+        "rate_limit": rate_limiter.stats(),
+        "admission": admission.stats(),
+        "history": history_writer.stats(),
+        "results": result_store.stats(),
+        "stats": user_stats.stats()
+    }
 
 
 @app.get("/api/info", summary="API信息")
@@ -151,7 +218,9 @@ async def api_info():
                 },
                 "bazi": {
                     "analyze": "POST /api/bazi/analyze",
-                    "paipan": "POST /api/bazi/paipan"
+                    "paipan": "POST /api/bazi/paipan",
+                    "paipan_batch": "POST /api/bazi/paipan/batch",
+                    "timeline_stream": "POST /api/bazi/timeline/stream"
                 },
                 "ziwei": {
                     "analyze": "POST /api/ziwei/analyze"
@@ -0,0 +1,113 @@
+"""
+玄心理命 - 计算准入控制单元测试
+"""
+
+import asyncio
+
+import pytest
+
+from app.core import admission as admission_module
+from app.core.admission import (
+    AdmissionController, ComputeOverloaded, PRIORITY_LOW, charge, endpoint_key
+)
+
+
+class TestAdmissionController:
+    """准入控制器测试"""
+
+    def test_cost_model(self):
+        """测试按实测代价归类端点，编号段归并为同一端点"""
+        controller = AdmissionController(slots=1, free_cost=0.001, default_cost=0.05)
+        key = endpoint_key("GET", "/api/user/history/analysis/42")
+        assert key == "GET /api/user/history/analysis/{}"
+        assert not controller.is_free(key)
+
+        async def run():
+            async with controller.admit(key):
+                pass
+            async with controller.admit("POST /api/bazi/analyze"):
+                charge(0.2)
+
+        asyncio.run(run())
+        assert controller.is_free(key)
+        assert controller.cost("POST /api/bazi/analyze") == pytest.approx(0.2)
+        assert controller.in_flight == 0
+
+    def test_cache_hits_keep_endpoint_costed(self):
+        """测试命中缓存的完成不拉低代价，未命中的突发仍排队并被拒绝"""
+        controller = AdmissionController(slots=1, queue_limit=1, free_cost=0.001, max_wait=10)
+        key = "POST /api/bazi/analyze"
+
+        async def request(cpu):
+            async with controller.admit(key):
+                await asyncio.sleep(0)
+                charge(cpu)
+
+        async def run():
+            await request(0.02)
+            for _ in range(100):
+                await request(0.0)
+            assert not controller.is_free(key)
+            assert controller.cost(key) == pytest.approx(0.02)
+
+            results = await asyncio.gather(*(request(0.02) for _ in range(5)), return_exceptions=True)
+            return results
+
+        results = asyncio.run(run())
+        rejected = [r for r in results if isinstance(r, ComputeOverloaded)]
+        assert len(rejected) == 3
+        assert controller.queued >= 1 and controller.in_flight == 0
+
+    def test_queue_and_shed(self):
+        """测试名额用尽后排队，普通请求先于低优先级出队，队列满时拒绝"""
+        controller = AdmissionController(slots=1, queue_limit=2, low_queue_limit=1, max_wait=10)
+        order = []
+
+        async def worker(name, priority=0):
+            await controller.acquire(0.1, priority)
+            order.append(name)
+
+        async def run():
+            await controller.acquire(0.1)
+            low = asyncio.create_task(worker("low", PRIORITY_LOW))
+            normal = asyncio.create_task(worker("normal"))
+            await asyncio.sleep(0)
+            with pytest.raises(ComputeOverloaded):
+                await controller.acquire(0.1)
+            controller.release()
+            await normal
+            controller.release()
+            await low
+            controller.release()
+
+        asyncio.run(run())
+        assert order == ["normal", "low"]
+        assert controller.rejected == 1 and controller.in_flight == 0
+
+    def test_codel_drops_stale_waiters(self, monkeypatch):
+        """测试排队时延持续超标后进入丢弃状态，回落后恢复"""
+        now = [0.0]
+        monkeypatch.setattr(admission_module.time, "monotonic", lambda: now[0])
+        controller = AdmissionController(slots=1, target_delay=0.1, interval=0.5, max_wait=10)
+
+        async def run():
+            await controller.acquire(0.1)
+            waiters = [asyncio.create_task(controller.acquire(0.1)) for _ in range(3)]
+            await asyncio.sleep(0)
+            now[0] = 0.2
+            controller.release()
+            await waiters[0]
+            assert not controller.dropping
+
+            now[0] = 0.7
+            controller.release()
+            for waiter in waiters[1:]:
+                with pytest.raises(ComputeOverloaded):
+                    await waiter
+            assert controller.dropping and controller.dropped == 2
+
+            await controller.acquire(0.1)
+            assert not controller.dropping
+            controller.release()
+
+        asyncio.run(run())
@@ -0,0 +1,36 @@
+"""
+玄心理命 - 批量排盘单元测试
+"""
+
+import pytest
+
+from app.core.bazi.batch import calculate_sizhu_batch, _calculate_sizhu_batch_scalar
+from app.core.bazi.calendar import calculate_sizhu
+
+
+class TestSiZhuBatch:
+    """批量排盘测试"""
+
+    CASES = [
+        (1990, 5, 15, 10), (2024, 2, 4, 15), (2024, 2, 4, 17),
+        (1985, 11, 22, 23), (2000, 1, 1, 0), (1900, 1, 1, 12), (2100, 12, 31, 22)
+    ]
+
+    def test_matches_single(self):
+        """测试批量结果与逐条排盘一致"""
+        years, months, days, hours = zip(*self.CASES)
+        records = calculate_sizhu_batch(years, months, days, hours).to_records()
+        assert [r["bazi"] for r in records] == [calculate_sizhu(*c).bazi for c in self.CASES]
+
+    def test_scalar_fallback(self):
+        """测试无NumPy退化实现与向量化实现一致"""
+        years, months, days, hours = zip(*self.CASES)
+        assert (_calculate_sizhu_batch_scalar(years, months, days, hours).to_records()
+                == calculate_sizhu_batch(years, months, days, hours).to_records())
+
+    def test_invalid_input(self):
+        """测试非法日期与长度不一致"""
+        with pytest.raises(ValueError):
+            calculate_sizhu_batch([2023], [2], [30], [1])
+        with pytest.raises(ValueError):
+            calculate_sizhu_batch([2023, 2024], [2], [1], [1])
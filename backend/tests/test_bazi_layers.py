@@ -0,0 +1,44 @@
+"""
+玄心理命 - 八字分层结果单元测试
+"""
+
+import json
+
+import pytest
+
+from app.core.bazi import analyze_bazi, locate, analyze_core, dayun_layer, liunian_layer, compose
+from app.core.cache import CacheService
+
+
+def _roundtrip(value):
+    """模拟经缓存读回"""
+    return json.loads(json.dumps(value, ensure_ascii=False))
+
+
+class TestBaziLayers:
+    """分层计算与拼装测试"""
+
+    @pytest.mark.parametrize("birth, gender, target_year", [
+        ((1990, 5, 15, 10), "男", 2024),
+        ((1990, 5, 15, 10), "女", 2024),
+        ((1984, 2, 4, 23), "女", 2050),
+        ((2001, 12, 31, 0), "男", 1999),
+    ])
+    def test_compose_matches_analyze_bazi(self, birth, gender, target_year):
+        """测试由缓存读回的三层拼出与整体分析相同的结果"""
+        year, month, day, hour = birth
+        sizhu, qiyun_age = locate(year, month, day, hour, gender)
+        core = _roundtrip(analyze_core(sizhu.bazi))
+        dayun = _roundtrip(dayun_layer(sizhu.bazi, gender, qiyun_age))
+        liunian = _roundtrip(liunian_layer(sizhu.bazi, year, target_year, core["xi_yong_shen"]))
+
+        result = compose(core, dayun, liunian, year, month, day, hour, gender, target_year)
+        assert _roundtrip(result) == _roundtrip(analyze_bazi(year, month, day, hour, gender, target_year))
+
+    def test_keys_collapse_by_pillars(self):
+        """测试同一时辰共用命盘层，性别只影响大运层"""
+        bazi_a, _ = locate(1990, 5, 15, 9, "男")
+        bazi_b, _ = locate(1990, 5, 15, 10, "女")
+        assert CacheService.bazi_core_key(bazi_a.bazi) == CacheService.bazi_core_key(bazi_b.bazi)
+        assert " " not in CacheService.bazi_core_key(bazi_a.bazi)
+        assert dayun_layer(bazi_a.bazi, "男", 3) != dayun_layer(bazi_a.bazi, "女", 3)
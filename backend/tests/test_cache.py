@@ -0,0 +1,403 @@
+"""
+玄心理命 - 进程内缓存单元测试
+"""
+
+import asyncio
+
+import pytest
+
+from app.core import cache as cache_module
+from app.core.cache import (
+    LocalCache, CacheService, CacheNamespaces, SingleFlight, RateLimiter, LocalRateCounter, xfetch_due
+)
+from app.core.codec import CacheCodec, CodecError, SERIALIZER_JSON, SERIALIZER_RAW
+from app.core.executor import engine_version
+
+
+class TestLocalCache:
+    """进程内 LRU 缓存测试"""
+
+    def test_lru_eviction_by_bytes(self):
+        """测试按字节数从最久未用的一端淘汰"""
+        local = LocalCache(max_bytes=100, max_item_bytes=100, ttl=60)
+        local.set("a", {"v": 1}, 40)
+        local.set("b", {"v": 2}, 40)
+        assert local.get("a") == {"v": 1}
+        local.set("c", {"v": 3}, 40)
+        assert local.get("b") is None
+        assert local.get("a") == {"v": 1}
+        assert local.size == 80
+        assert local.evictions == 1
+
+    def test_ttl_and_item_limit(self, monkeypatch):
+        """测试过期及单条大小上限"""
+        local = LocalCache(max_bytes=1000, max_item_bytes=50, ttl=60)
+        assert local.set("big", "x", 51) is False
+        local.set("k", "v", 10, expire=5)
+        now = cache_module.time.monotonic()
+        monkeypatch.setattr(cache_module.time, "monotonic", lambda: now + 6)
+        assert local.get("k") is None
+        assert local.size == 0
+
+    def test_stats(self):
+        """测试命中率统计"""
+        local = LocalCache(max_bytes=1000, max_item_bytes=1000, ttl=60)
+        local.set("k", "v", 1)
+        local.get("k")
+        local.get("missing")
+        stats = local.stats()
+        assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+    def test_invalidation_message(self):
+        """测试失效广播：忽略本进程消息，丢弃其他进程变更的键"""
+        local = LocalCache(max_bytes=1000, max_item_bytes=1000, ttl=60)
+        service = CacheService(local=local)
+        local.set("bazi:1990:6:15:10", {"v": 1}, 10)
+        service.handle_invalidation(f"{cache_module.NODE_ID}|bazi:1990:6:15:10")
+        assert local.get("bazi:1990:6:15:10") == {"v": 1}
+        service.handle_invalidation("othernode|bazi:1990:6:15:10")
+        assert local.get("bazi:1990:6:15:10") is None
+
+
+class TestSingleFlight:
+    """请求合并测试"""
+
+    def test_concurrent_calls_coalesce(self):
+        """测试同键并发只执行一次，结果共享"""
+        flight = SingleFlight()
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"v": 1}
+
+        async def main():
+            return await asyncio.gather(*(flight.do("k", compute) for _ in range(10)))
+
+        results = asyncio.run(main())
+        assert len(calls) == 1
+        assert all(r is results[0] for r in results)
+        assert "k" not in flight
+
+    def test_exception_propagates(self):
+        """测试执行失败时等待方收到同一异常"""
+        flight = SingleFlight()
+
+        async def compute():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        async def main():
+            return await asyncio.gather(
+                *(flight.do("k", compute) for _ in range(3)), return_exceptions=True
+            )
+
+        results = asyncio.run(main())
+        assert all(isinstance(r, ValueError) for r in results)
+
+
+class TestXFetch:
+    """提前刷新判定测试"""
+
+    def test_boundaries(self):
+        """测试无耗时记录或已过期时不提前刷新，临近过期时必然刷新"""
+        assert xfetch_due(1000, 0.0, 1.0) is False
+        assert xfetch_due(-2, 1.0, 1.0) is False
+        assert xfetch_due(1, 1000.0, 1.0) is True
+
+    def test_probability_grows_near_expiry(self):
+        """测试越临近过期刷新概率越高"""
+        far = sum(xfetch_due(60_000, 0.05, 1.0) for _ in range(2000))
+        near = sum(xfetch_due(10, 0.05, 1.0) for _ in range(2000))
+        assert far == 0
+        assert near > 1000
+
+
+class TestCacheCodec:
+    """缓存编解码测试"""
+
+    def test_json_roundtrip(self):
+        """测试JSON编码带头字节且可还原"""
+        codec = CacheCodec(serializer="json", compression="none")
+        value = {"sizhu": {"day": "甲子"}, "scores": [1, 2.5]}
+        data = codec.encode(value)
+        assert data[0] == SERIALIZER_JSON
+        assert codec.decode(data) == value
+
+    def test_raw_bytes(self):
+        """测试预序列化的字节原样保存"""
+        codec = CacheCodec(serializer="json", compression="none")
+        body = '{"success":true}'.encode("utf-8")
+        data = codec.encode(body)
+        assert data[0] == SERIALIZER_RAW
+        assert codec.decode(data) == body
+
+    def test_legacy_and_unknown_header(self):
+        """测试旧版JSON文本可读，未知格式报错"""
+        codec = CacheCodec(serializer="json", compression="none")
+        assert codec.decode('{"a": 1}'.encode("utf-8")) == {"a": 1}
+        with pytest.raises(CodecError):
+            codec.decode(bytes((0x07,)) + b"payload")
+
+    def test_msgpack_compressed(self):
+        """测试msgpack及超过阈值时压缩"""
+        pytest.importorskip("msgpack")
+        codec = CacheCodec(serializer="msgpack", compression="zstd", compress_min_bytes=64)
+        value = {"palaces": [{"name": "命宫", "stars": ["紫微"] * 20}] * 12}
+        data, size = codec.encode_with_size(value)
+        assert codec.decode_with_size(data) == (value, size)
+        if codec.compression:
+            assert len(data) < size
+
+
+class FakeGenerations:
+    """以字典充当代数哈希"""
+
+    def __init__(self):
+        self.data = {}
+        self.reads = 0
+
+    async def hgetall(self, key):
+        self.reads += 1
+        return {k: str(v) for k, v in self.data.items()}
+
+    async def hincrby(self, key, field, amount):
+        self.data[field] = self.data.get(field, 0) + amount
+        return self.data[field]
+
+
+class TestCacheNamespaces:
+    """缓存命名空间测试"""
+
+    def test_resolve_and_bump(self):
+        """测试登记前缀带版本与代数，递增代数后换用新键，代数按间隔重读"""
+        client = FakeGenerations()
+        namespaces = CacheNamespaces(client, {"bazi": "bazi"}, refresh_interval=60)
+
+        async def main():
+            first = await namespaces.resolve("bazi:core:甲子")
+            assert await namespaces.resolve("session:abc") == "session:abc"
+            await namespaces.bump("bazi")
+            second = await namespaces.resolve("bazi:core:甲子")
+            # 其他进程递增的代数在重读后生效
+            client.data["bazi"] = 5
+            stale = await namespaces.resolve("bazi:core:甲子")
+            namespaces.expire()
+            return first, second, stale, await namespaces.resolve("bazi:core:甲子")
+
+        first, second, stale, fresh = asyncio.run(main())
+        version = engine_version("bazi")
+        assert first == f"bazi:{version}.0:core:甲子"
+        assert second == stale == f"bazi:{version}.1:core:甲子"
+        assert fresh == f"bazi:{version}.5:core:甲子"
+        assert client.reads == 2
+        with pytest.raises(ValueError):
+            asyncio.run(namespaces.bump("session"))
+
+
+class FakeRedis:
+    """以字典充当 Redis：取值、写入、锁与管道"""
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def setex(self, key, expire, value):
+        self.data[key] = value
+        return True
+
+    async def set(self, key, value, nx=False, px=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    async def eval(self, script, numkeys, key, token):
+        return int(self.data.pop(key, None) is not None)
+
+    def pipeline(self, transaction=False):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    def get(self, key):
+        self.calls.append(self.client.data.get(key))
+
+    def pttl(self, key):
+        self.calls.append(60000 if key in self.client.data else -2)
+
+    async def execute(self):
+        return self.calls
+
+
+class TestGetOrCompute:
+    """防击穿读取测试"""
+
+    def test_namespaced_key_hits_after_fill(self):
+        """测试登记前缀的键写入后再次读取命中，不重复计算"""
+        client = FakeRedis()
+        namespaces = CacheNamespaces(FakeGenerations(), {"bazi": "bazi"}, refresh_interval=60)
+        service = CacheService(namespaces=namespaces)
+        service.client = service.values = client
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return {"bazi": "甲子"}
+
+        async def main():
+            first = await service.get_or_compute("bazi:core:甲子", compute, expire=60)
+            second = await service.get_or_compute("bazi:core:甲子", compute, expire=60)
+            return first, second
+
+        first, second = asyncio.run(main())
+        assert first == second == {"bazi": "甲子"}
+        assert len(calls) == 1
+        assert list(client.data) == [f"bazi:{engine_version('bazi')}.0:core:甲子"]
+
+
+class FakeScriptClient:
+    """脚本按给定序列返回 (是否放行, 等待毫秒)，并记录调用次数"""
+
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.calls = 0
+
+    def register_script(self, source):
+        async def run(keys, args):
+            self.calls += 1
+            return self.replies.pop(0)
+        return run
+
+
+class FakeLimiterCache:
+    def __init__(self, client):
+        self.client = client
+
+
+class TestRateLimiter:
+    """限流测试"""
+
+    def test_local_counter_rejects_without_redis(self, monkeypatch):
+        """测试本进程突发用尽后直接拒绝，按间隔恢复"""
+        now = [0.0]
+        monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+        counter = LocalRateCounter(max_keys=2)
+        assert [counter.hit("a", 2, 10) for _ in range(3)] == [0.0, 0.0, 5.0]
+        now[0] = 5.0
+        assert counter.hit("a", 2, 10) == 0.0
+        counter.hit("b", 2, 10)
+        counter.hit("c", 2, 10)
+        assert len(counter) == 2
+
+    def test_local_never_rejects_what_gcra_allows(self, monkeypatch):
+        """测试本地预判是 GCRA 的超集：本地拒绝的请求 GCRA 必然拒绝"""
+        import random
+
+        now = [0.0]
+        monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+
+        def gcra(state, now_ms, interval, burst):
+            """与 Redis 脚本相同的运算"""
+            tat = max(state.get("tat", now_ms), now_ms) + interval
+            if tat - now_ms > burst * interval:
+                return False
+            state["tat"] = tat
+            return True
+
+        rng = random.Random(7)
+        for limit, window in ((30, 60), (5, 60), (100, 1)):
+            counter = LocalRateCounter()
+            state = {}
+            interval = cache_module.gcra_interval_ms(limit, window)
+            for _ in range(2000):
+                now[0] += rng.choice((0, 0, 0.001, 0.05, window / limit, window / 2))
+                now_ms = int(now[0] * 1000)
+                # 本进程只见到部分请求
+                if rng.random() < 0.5:
+                    gcra(state, now_ms, interval, limit)
+                    continue
+                local_wait = counter.hit("k", limit, window)
+                allowed = local_wait == 0 and gcra(state, now_ms, interval, limit)
+                if local_wait > 0:
+                    assert not gcra(dict(state), now_ms, interval, limit)
+                elif not allowed:
+                    counter.block("k", 0)
+
+        # 评审给出的例子：突发用尽 30 秒后的请求 GCRA 放行，本地也放行
+        now[0] = 1000.0
+        counter = LocalRateCounter()
+        assert all(counter.hit("k", 30, 60) == 0.0 for _ in range(30))
+        now[0] = 1030.0
+        assert counter.hit("k", 30, 60) == 0.0
+
+    def test_redis_denial_cools_down_locally(self):
+        """测试 Redis 判定超限后冷却期内不再访问 Redis"""
+        client = FakeScriptClient([[1, 0], [0, 5000]])
+        limiter = RateLimiter(FakeLimiterCache(client))
+
+        async def main():
+            return [await limiter.acquire("k", 100, 60) for _ in range(3)]
+
+        results = asyncio.run(main())
+        assert [r.allowed for r in results] == [True, False, False]
+        assert results[1].retry_after == 5.0 and 0 < results[2].retry_after <= 5.0
+        assert client.calls == 2
+        assert limiter.stats()["local_rejected"] == 1
+
+    def test_client_id_trusts_forwarded_only_from_proxies(self):
+        """测试只有可信代理转发的 X-Forwarded-For 才被采信"""
+        from types import SimpleNamespace
+        from app.core.optimization import RateLimitMiddleware
+
+        middleware = RateLimitMiddleware(None, trusted_proxies=["10.0.0.0/8"])
+
+        def request(host, forwarded=None):
+            headers = {"X-Forwarded-For": forwarded} if forwarded else {}
+            return SimpleNamespace(client=SimpleNamespace(host=host), headers=headers)
+
+        assert middleware._get_client_id(request("203.0.113.9", "1.2.3.4")) == "203.0.113.9"
+        assert middleware._get_client_id(request("10.0.0.2", "1.2.3.4, 198.51.100.7")) == "198.51.100.7"
+        assert middleware._get_client_id(request("10.0.0.2", "198.51.100.7, 10.0.0.3")) == "198.51.100.7"
+        assert middleware._get_client_id(request("10.0.0.2")) == "10.0.0.2"
+
+    def test_clients_behind_trusted_proxy_get_separate_buckets(self):
+        """测试经可信代理转发的不同客户端各自计数，直连伪造的头不被采信"""
+        from fastapi import FastAPI
+        from starlette.testclient import TestClient
+        from app.core.cache import RateLimitResult
+        from app.core.optimization import RateLimitMiddleware
+
+        class CountingLimiter:
+            def __init__(self):
+                self.counts = {}
+
+            async def acquire(self, key, max_requests, window_seconds, burst=None):
+                self.counts[key] = self.counts.get(key, 0) + 1
+                return RateLimitResult(self.counts[key] <= max_requests, 1.0)
+
+        limiter = CountingLimiter()
+        app = FastAPI()
+        app.add_middleware(RateLimitMiddleware, limiter=limiter, requests=1, window=60,
+                           routes={}, exempt=[], trusted_proxies=["172.28.0.10"])
+
+        @app.get("/api/ping")
+        async def ping():
+            return {"ok": True}
+
+        proxy = TestClient(app, client=("172.28.0.10", 40000))
+        statuses = [proxy.get("/api/ping", headers={"X-Forwarded-For": ip}).status_code
+                    for ip in ("198.51.100.1", "198.51.100.2", "198.51.100.1")]
+        assert statuses == [200, 200, 429]
+
+        direct = TestClient(app, client=("203.0.113.9", 40000))
+        statuses = [direct.get("/api/ping", headers={"X-Forwarded-For": ip}).status_code
+                    for ip in ("198.51.100.3", "198.51.100.4")]
+        assert statuses == [200, 429]
@@ -0,0 +1,48 @@
+"""
+玄心理命 - 计算执行器单元测试
+"""
+
+import asyncio
+
+import pytest
+
+from app.core import executor
+from app.core.bazi import analyze_bazi
+from app.core.executor import ComputeExecutor, EngineTimeoutError
+
+
+def _run(compute: ComputeExecutor, name, *args, **kwargs):
+    async def main():
+        try:
+            return await compute.run(name, *args, **kwargs)
+        finally:
+            compute.shutdown()
+    return asyncio.run(main())
+
+
+class TestComputeExecutor:
+    """计算执行器测试"""
+
+    @pytest.mark.parametrize("mode", ["inline", "thread", "process"])
+    def test_result_matches_direct_call(self, mode):
+        """测试各执行方式结果与直接调用一致"""
+        compute = ComputeExecutor(mode=mode, workers=1)
+        result = _run(compute, "bazi", year=1990, month=6, day=15, hour=10, gender="男")
+        expected = analyze_bazi(1990, 6, 15, 10, "男")
+        # 性格关键词经集合去重，顺序随进程的哈希种子变化
+        for r in (result, expected):
+            r["personality"]["keywords"] = sorted(r["personality"]["keywords"])
+        assert result == expected
+
+    def test_timeout(self, monkeypatch):
+        """测试超过引擎超时抛出 EngineTimeoutError"""
+        monkeypatch.setitem(executor.ENGINES, "test.sleep", "time:sleep")
+        compute = ComputeExecutor(mode="thread", workers=1, timeout=10,
+                                  engine_timeouts={"test.sleep": 0.05})
+        with pytest.raises(EngineTimeoutError):
+            _run(compute, "test.sleep", 0.5)
+
+    def test_unknown_engine(self):
+        """测试未注册的引擎"""
+        with pytest.raises(KeyError):
+            _run(ComputeExecutor(mode="inline"), "nope")
@@ -0,0 +1,148 @@
+"""
+玄心理命 - 历史列表摘要、键集分页与批量查询单元测试
+"""
+
+import asyncio
+from datetime import datetime
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.core.history_summary import summarize
+from app.core.user_service import FavoriteService, HistoryService, decode_cursor, encode_cursor
+
+
+class FakeRow:
+    def __init__(self, id, created_at):
+        self.id = id
+        self.created_at = created_at
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+    def scalar(self):
+        return self.rows[0] if self.rows else None
+
+
+class FakeDB:
+    """记录查询语句，返回预置的行"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.statements = []
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+        return FakeResult(self.rows)
+
+
+class BackfillDB:
+    """按表返回一批 summary 为空的行，记录批量 UPDATE"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.updates = {}
+        self.commits = 0
+
+    async def execute(self, statement, params=None):
+        if params is not None:
+            self.updates.setdefault(statement.table.name, []).extend(params)
+            return None
+        table = statement.get_final_froms()[0].name
+        str(statement.compile(dialect=postgresql.dialect()))
+        return FakeResult(self.rows.pop(table, []))
+
+    async def commit(self):
+        self.commits += 1
+
+
+class TestHistoryListing:
+    """历史列表测试"""
+
+    def test_summaries(self):
+        """测试写入时提取的摘要"""
+        bazi = {"basic_info": {"bazi": "庚午 辛巳 庚辰 辛巳"}, "geju": {"main_geju": "七杀格"}}
+        assert summarize("bazi", bazi) == "庚午 辛巳 庚辰 辛巳 · 七杀格"
+        ziwei = {"chart_data": {"wuxing_ju": "土五局", "palaces": [
+            {"name": "命宫", "stars": {"main": [{"name": "太阳"}]}}]}}
+        assert summarize("ziwei", ziwei) == "土五局 · 命宫太阳"
+        assert summarize("yijing", {"main_gua": {"name": "乾为天"}, "changed_gua": {"name": "天风姤"}}) == "乾为天 → 天风姤"
+        assert summarize("mbti", {"type_code": "INTJ"}) == "INTJ"
+        assert summarize("unknown", {"a": 1}) is None
+
+    def test_cursor_roundtrip(self):
+        """测试游标编解码，非法游标抛出 ValueError"""
+        created_at = datetime(2024, 5, 1, 12, 30, 15, 123456)
+        assert decode_cursor(encode_cursor(created_at, 42)) == (created_at, 42)
+        with pytest.raises(ValueError):
+            decode_cursor("not-a-cursor")
+
+    def test_keyset_page(self):
+        """测试多取一条判断下一页，游标按 (created_at, id) 行值比较"""
+        rows = [FakeRow(i, datetime(2024, 1, 1, 0, 0, i)) for i in (3, 2, 1)]
+        db = FakeDB(rows)
+        service = HistoryService(db)
+
+        records, next_cursor = asyncio.run(service.get_user_analyses(7, "bazi", limit=2))
+        assert [r.id for r in records] == [3, 2]
+        assert decode_cursor(next_cursor) == (rows[1].created_at, 2)
+
+        asyncio.run(service.get_user_analyses(7, "bazi", limit=2, cursor=next_cursor))
+        sql = str(db.statements[-1].compile(dialect=postgresql.dialect()))
+        assert "(analysis_records.created_at, analysis_records.id) <" in sql
+        assert "result_data" not in sql and "OFFSET" not in sql
+
+    def test_latest_psychology_single_query(self):
+        """测试最新心理测试结果用 DISTINCT ON 一次查询"""
+        db = FakeDB([("mbti", {"type_code": "INTJ"}), ("big5", {"scores": {}})])
+        latest = asyncio.run(HistoryService(db).get_latest_psychology_results(7))
+        assert latest == {"mbti": {"type_code": "INTJ"}, "big5": {"scores": {}}}
+        sql = str(db.statements[0].compile(dialect=postgresql.dialect()))
+        assert len(db.statements) == 1 and "DISTINCT ON (psychology_tests.test_type)" in sql
+
+    def test_resolve_birth_info_single_statement(self):
+        """测试出生信息查找或创建合并为一条 upsert 语句"""
+        db = FakeDB([42])
+        birth_info_id = asyncio.run(HistoryService(db).resolve_birth_info(
+            user_id=7, name="八字-19900515", birth_year=1990, birth_month=5, birth_day=15,
+            birth_hour=10, gender="男", is_lunar=False
+        ))
+        assert birth_info_id == 42 and len(db.statements) == 1
+        sql = str(db.statements[0].compile(dialect=postgresql.dialect()))
+        assert "ON CONFLICT (user_id, birth_year, birth_month, birth_day, birth_hour, is_lunar, gender)" in sql
+        assert "RETURNING birth_info.id" in sql and "UNION ALL" in sql
+
+    def test_bulk_favorites_check(self):
+        """测试批量检查收藏为一次查询，按请求顺序返回"""
+        db = FakeDB([("bazi", 1), ("yijing", 3)])
+        items = [("bazi", 1), ("bazi", 2), ("yijing", 3), ("bazi", 1)]
+        flags = asyncio.run(FavoriteService(db).check_favorites(7, items))
+        assert flags == [True, False, True, True]
+        assert len(db.statements) == 1
+        with pytest.raises(ValueError):
+            asyncio.run(FavoriteService(db).check_favorites(7, [("bazi", i) for i in range(201)]))
+
+    def test_backfill_summaries(self):
+        """测试为旧记录补齐摘要，无法提取的保持为空"""
+        from types import SimpleNamespace as Row
+
+        bazi = {"basic_info": {"bazi": "庚午 辛巳 庚辰 辛巳"}, "geju": {"main_geju": "七杀格"}}
+        db = BackfillDB({
+            "analysis_records": [Row(id=1, kind="bazi", result_data=bazi, digest=None),
+                                 Row(id=2, kind="bazi", result_data=None, digest=None)],
+            "divination_records": [Row(id=5, kind="yijing", result_data={"main_gua": {"name": "乾为天"}},
+                                       digest=None)],
+            "psychology_tests": [Row(id=9, kind="mbti", result_data={"type_code": "INTJ"}, digest=None)],
+        })
+        filled = asyncio.run(HistoryService(db).backfill_summaries(batch_size=10))
+        assert filled == 3
+        assert db.updates == {
+            "analysis_records": [{"id": 1, "summary": "庚午 辛巳 庚辰 辛巳 · 七杀格"}],
+            "divination_records": [{"id": 5, "summary": "乾为天"}],
+            "psychology_tests": [{"id": 9, "summary": "INTJ"}],
+        }
@@ -0,0 +1,131 @@
+"""
+玄心理命 - 历史记录写后队列单元测试
+"""
+
+import asyncio
+
+from app.core.database import AnalysisRecord, DivinationRecord, ResultBlob
+from app.core.history_writer import HistoryWriter
+
+
+class FakeSession:
+    """记录批量写入的会话"""
+
+    def __init__(self, db):
+        self.db = db
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def begin(self):
+        return self
+
+    async def execute(self, statement, rows):
+        if self.db.down:
+            raise ConnectionError("database unavailable")
+        self.db.batches.append((statement.table.name, list(rows)))
+
+
+class FakeDB:
+    def __init__(self):
+        self.down = False
+        self.batches = []
+
+    def session(self):
+        return FakeSession(self)
+
+    @property
+    def rows(self):
+        return [row for _, rows in self.batches for row in rows]
+
+
+def _writer(db, tmp_path, **kwargs):
+    options = dict(batch_size=3, flush_interval=0.05, spill_dir=str(tmp_path), spill_retry=60)
+    options.update(kwargs)
+    return HistoryWriter(db.session, **options)
+
+
+class TestHistoryWriter:
+    """写后队列测试"""
+
+    def test_batches_by_size_and_drains_on_stop(self, tmp_path):
+        """测试按批写入、按表分组，停止时写完余量"""
+        db = FakeDB()
+        writer = _writer(db, tmp_path)
+
+        async def main():
+            writer.start()
+            for i in range(4):
+                await writer.submit(AnalysisRecord, {"user_id": i, "analysis_type": "bazi"})
+            await writer.submit(DivinationRecord, {"user_id": 9, "method": "liuyao"})
+            await writer.stop()
+
+        asyncio.run(main())
+        assert sorted(row["user_id"] for row in db.rows) == [0, 1, 2, 3, 9]
+        assert max(len(rows) for _, rows in db.batches) == 3
+        assert all("created_at" in row for row in db.rows)
+        assert writer.stats()["written"] == 5
+
+    def test_spill_and_replay(self, tmp_path):
+        """测试写库失败时落盘，恢复后重放"""
+        db = FakeDB()
+        db.down = True
+        writer = _writer(db, tmp_path)
+
+        async def main():
+            writer.start()
+            await writer.submit(AnalysisRecord, {"user_id": 1, "analysis_type": "ziwei"})
+            await writer.stop()
+            assert writer.spilled == 1 and db.rows == []
+
+            db.down = False
+            writer.start()
+            await writer.submit(AnalysisRecord, {"user_id": 2, "analysis_type": "bazi"})
+            await writer.stop()
+
+        asyncio.run(main())
+        assert sorted(row["user_id"] for row in db.rows) == [1, 2]
+        assert writer.replayed == 1
+        assert list(tmp_path.iterdir()) == []
+
+    def test_backpressure_spills_on_timeout(self, tmp_path):
+        """测试队列满且等待超时后直接落盘"""
+        db = FakeDB()
+        writer = _writer(db, tmp_path, max_pending=1, enqueue_timeout=0.01, flush_interval=10)
+
+        async def main():
+            writer.start()
+            # 写入任务尚未取走时队列已满
+            await writer.submit(AnalysisRecord, {"user_id": 1})
+            await writer.submit(AnalysisRecord, {"user_id": 2})
+            assert writer.spilled == 1
+            await writer.stop()
+
+        asyncio.run(main())
+        # 落盘的记录在库可用时被重放
+        assert sorted(row["user_id"] for row in db.rows) == [1, 2]
+
+    def test_result_blobs_spill_and_dedupe(self, tmp_path):
+        """测试结果体以二进制落盘重放，批内按摘要去重"""
+        db = FakeDB()
+        db.down = True
+        writer = _writer(db, tmp_path)
+        blob = {"digest": "a" * 64, "kind": "yijing", "engine_version": "1", "body": b"\x0b\x00\xff", "size": 3}
+
+        async def main():
+            writer.start()
+            await writer.submit(ResultBlob, dict(blob))
+            await writer.submit(ResultBlob, dict(blob))
+            await writer.submit(DivinationRecord, {"user_id": 1, "result_digest": "a" * 64})
+            await writer.stop()
+
+            db.down = False
+            writer.start()
+            await writer.stop()
+
+        asyncio.run(main())
+        assert [table for table, _ in db.batches] == ["result_blobs", "divination_records"]
+        assert [row["body"] for row in db.batches[0][1]] == [b"\x0b\x00\xff"]
@@ -0,0 +1,63 @@
+"""
+玄心理命 - 智能分析器单元测试
+"""
+
+from app.core.analysis.intelligent_analyst import BaziAnalyst, ZiweiAnalyst
+
+
+class DictSource:
+    """以字典充当规则源"""
+
+    def __init__(self, rules):
+        self.rules = dict(rules)
+        self.generation = 1
+
+    def match(self, key):
+        return self.rules.get(key)
+
+    def scan(self, prefix):
+        return [(k, v) for k, v in self.rules.items() if k.startswith(prefix)]
+
+
+def _analyst(cls, rules):
+    analyst = cls()
+    source = DictSource(rules)
+    analyst.set_rule_source(source)
+    return analyst, source
+
+
+class TestLookupPlans:
+    """查找表与断语缓存测试"""
+
+    def test_fallback_chains(self):
+        """测试回退链：精确月令优先，其次五行季节论；流年十神退回通用描述"""
+        analyst, _ = _analyst(BaziAnalyst, {
+            "bazi:theory:day_master:甲:month:寅": "甲木寅月",
+            "bazi:theory:season:wood_summer": "木生夏月",
+            "bazi:theory:shishen:dominant:正官": "正官守礼\n第二段",
+        })
+        data = {
+            "day_master": "甲",
+            "current_dayun": {"gan": "丙", "zhi": "午"},
+            "current_liunian": {"year": 2024, "gan": "甲", "zhi": "辰", "shishen": "正官"},
+        }
+        core = analyst.analyze({**data, "month": {"zhi": "寅"}})["structured"]["core"]
+        assert "**【当季得失】**\n甲木寅月" in core
+        result = analyst.analyze({**data, "month": {"zhi": "午"}})
+        assert "**【五行季节论】**\n木生夏月" in result["structured"]["core"]
+        luck = result["structured"]["luck"][0]
+        assert "正官守礼\n" in luck and "第二段" not in luck
+
+    def test_cache_hit_and_invalidation(self):
+        """测试相同特征命中缓存，规则版本变化后重新编译"""
+        analyst, source = _analyst(ZiweiAnalyst, {"ziwei:theory:star:紫微": "帝座"})
+        data = {"features": [{"palace": "命宫", "star": "紫微"}, {"palace": "财帛宫"}]}
+        first = analyst.analyze(data)
+        first["structured"]["core"].append("mutated")
+        second = analyst.analyze({"features": [{"palace": "命宫", "star": "紫微"}]})
+        assert analyst.cache_info().hits == 1
+        assert second["structured"]["core"] == ["**【命宫】**\n紫微：帝座"]
+
+        source.rules["ziwei:theory:star:紫微"] = "北斗帝星"
+        source.generation += 1
+        assert "北斗帝星" in analyst.analyze(data)["content"]
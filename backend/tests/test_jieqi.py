@@ -0,0 +1,93 @@
+"""
+玄心理命 - 节气引擎单元测试
+"""
+
+import pytest
+from datetime import datetime
+
+from app.core.bazi.jieqi import (
+    JIEQI_NAMES, calculate_jieqi_time, load_jieqi_table, get_jieqi_table
+)
+from app.core.bazi.calendar import get_month_ganzhi, calculate_sizhu, get_shengxiao
+
+
+class TestJieQiTime:
+    """交节时刻测试"""
+
+    @pytest.mark.parametrize("year,index,expected", [
+        (2024, 2, datetime(2024, 2, 4, 16, 27)),   # 立春
+        (2024, 4, datetime(2024, 3, 5, 10, 23)),   # 惊蛰
+        (2024, 22, datetime(2024, 12, 6, 23, 17)), # 大雪
+        (1990, 2, datetime(1990, 2, 4, 10, 14)),   # 立春
+    ])
+    def test_known_instants(self, year, index, expected):
+        """测试已知交节时刻（误差在2分钟内）"""
+        moment = calculate_jieqi_time(year, index)
+        assert abs((moment - expected).total_seconds()) < 120
+
+    def test_year_has_24_terms(self):
+        """测试每年24个节气且按时间排序"""
+        terms = get_jieqi_table().get_jieqi(2000)
+        assert [name for name, _ in terms] == JIEQI_NAMES
+        moments = [moment for _, moment in terms]
+        assert moments == sorted(moments)
+
+
+class TestJieQiTable:
+    """节气表测试"""
+
+    def test_disk_cache_roundtrip(self, tmp_path, monkeypatch):
+        """测试磁盘缓存写入后可mmap加载且内容一致"""
+        from app.core.bazi import jieqi
+        monkeypatch.setattr(jieqi, "JIEQI_CACHE_DIR", str(tmp_path))
+
+        built = load_jieqi_table(2000, 2002)
+        loaded = load_jieqi_table(2000, 2002)
+        assert len(list(tmp_path.iterdir())) == 1
+        assert built.get_jieqi(2001) == loaded.get_jieqi(2001)
+
+    def test_out_of_range(self):
+        """测试超出范围时报错"""
+        table = load_jieqi_table(2000, 2001, use_cache=False)
+        with pytest.raises(ValueError):
+            table.get_jieqi(1990)
+
+
+class TestMonthPillar:
+    """月柱节气边界测试"""
+
+    def test_lichun_boundary_by_hour(self):
+        """测试立春当日按交节时刻区分月柱"""
+        assert str(get_month_ganzhi(2024, 2, 4, 15)) == "乙丑"
+        assert str(get_month_ganzhi(2024, 2, 4, 17)) == "丙寅"
+
+    def test_before_xiaohan(self):
+        """测试小寒前仍为子月"""
+        assert calculate_sizhu(1990, 1, 3, 10).month.zhi == "子"
+        assert calculate_sizhu(1990, 1, 10, 10).month.zhi == "丑"
+
+    def test_month_index(self):
+        """测试立夏后为巳月（庚年五虎遁起戊寅，第四个月为辛巳）"""
+        assert str(get_month_ganzhi(1990, 5, 15, 10)) == "辛巳"
+
+
+class TestYearPillar:
+    """年柱立春边界测试"""
+
+    @pytest.mark.parametrize("birth,expected", [
+        ((2000, 1, 1, 0), "己卯 丙子"),
+        ((2024, 2, 4, 15), "癸卯 乙丑"),
+        ((2024, 2, 4, 17), "甲辰 丙寅"),
+        ((1990, 2, 4, 9), "己巳 丁丑"),
+        ((1990, 2, 4, 11), "庚午 戊寅"),
+    ])
+    def test_lichun_boundary(self, birth, expected):
+        """测试立春前属上一干支年，年柱与月柱一致"""
+        sizhu = calculate_sizhu(*birth)
+        assert f"{sizhu.year} {sizhu.month}" == expected
+
+    def test_shengxiao_follows_year_pillar(self):
+        """测试给出月日时的生肖按立春分界，只给年份时按整年"""
+        assert get_shengxiao(2024, 2, 4, 15) == "兔"
+        assert get_shengxiao(2024, 2, 4, 17) == "龙"
+        assert get_shengxiao(2024) == "龙"
@@ -0,0 +1,96 @@
+"""
+玄心理命 - 断语后台生成单元测试
+"""
+
+import asyncio
+
+from app.core import narrative
+from app.core.narrative import NarrativeJobs, STATUS_DONE, STATUS_FAILED, STATUS_PENDING
+
+
+class MemoryStore:
+    """以字典充当断语缓存"""
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, expire=3600):
+        self.data[key] = value
+        return True
+
+
+class SlowPendingStore(MemoryStore):
+    """占位写入比状态写入慢（写入到达顺序不定的缓存）"""
+
+    async def set(self, key, value, expire=3600):
+        if value.get("status") == STATUS_PENDING:
+            await asyncio.sleep(0.02)
+        return await super().set(key, value, expire)
+
+
+HEXAGRAM = {"main_gua": {"name": "乾为天"}, "dong_yao": 1, "changed_gua": {"name": "天风姤"}}
+
+
+class TestNarrativeJobs:
+    """断语任务测试"""
+
+    def test_deferred_then_inline(self, monkeypatch):
+        """测试首次返回任务编号、完成后可查询，再次请求直接内联"""
+        calls = []
+
+        async def fake_run_engine(name, data):
+            calls.append(name)
+            await asyncio.sleep(0.01)
+            return {"content": "断语", "structured": {"core": ["断语"]}}
+
+        monkeypatch.setattr(narrative, "run_engine", fake_run_engine)
+        jobs = NarrativeJobs(MemoryStore())
+
+        async def main():
+            first = dict(HEXAGRAM)
+            await jobs.attach("yijing", first)
+            job = first["extra_info"]["ai_analysis_job"]
+            assert job["status"] == STATUS_PENDING
+            assert "ai_analysis" not in first["extra_info"]
+
+            # 同特征的并发请求共享任务
+            await jobs.attach("yijing", dict(HEXAGRAM))
+            state = await jobs.wait(job["id"], timeout=1)
+            assert state["status"] == STATUS_DONE
+            assert (await jobs.get(job["id"]))["content"] == "断语"
+
+            again = dict(HEXAGRAM)
+            await jobs.attach("yijing", again)
+            assert again["extra_info"]["ai_analysis"] == "断语"
+            assert "ai_analysis_job" not in again["extra_info"]
+
+        asyncio.run(main())
+        assert calls == ["analysis.yijing"]
+
+    def test_pending_marker_never_overwrites_result(self, monkeypatch):
+        """测试很快失败的任务，其失败状态不被占位覆盖"""
+        async def failing_run_engine(name, data):
+            raise RuntimeError("boom")
+
+        monkeypatch.setattr(narrative, "run_engine", failing_run_engine)
+        store = SlowPendingStore()
+        jobs = NarrativeJobs(store)
+
+        async def main():
+            result = dict(HEXAGRAM)
+            await jobs.attach("yijing", result)
+            job_id = result["extra_info"]["ai_analysis_job"]["id"]
+            await jobs.wait(job_id, timeout=1)
+            await asyncio.sleep(0.05)
+            return store.data[jobs._key(job_id)]
+
+        assert asyncio.run(main())["status"] == STATUS_FAILED
+
+    def test_unknown_job(self):
+        """测试无效或不存在的任务编号"""
+        jobs = NarrativeJobs(MemoryStore())
+        assert asyncio.run(jobs.get("../etc")) is None
+        assert asyncio.run(jobs.wait("bazi-" + "0" * 40, timeout=0)) is None
@@ -0,0 +1,47 @@
+"""
+玄心理命 - Redis 熔断器单元测试
+"""
+
+import pytest
+
+from app.core import redis_client as redis_module
+from app.core.redis_client import CircuitBreaker, RedisUnavailable
+
+
+class TestCircuitBreaker:
+    """熔断器测试"""
+
+    def test_opens_after_consecutive_failures(self, monkeypatch):
+        """测试连续失败达到阈值后断开，成功会清零计数"""
+        monkeypatch.setattr(redis_module.time, "monotonic", lambda: 100.0)
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=5)
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        breaker.record_failure()
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        with pytest.raises(RedisUnavailable):
+            breaker.check()
+        assert breaker.stats()["rejected"] == 1
+
+    def test_half_open_probe(self, monkeypatch):
+        """测试期满后只放行一个试探，试探成功恢复、失败重新断开"""
+        now = [0.0]
+        monkeypatch.setattr(redis_module.time, "monotonic", lambda: now[0])
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=5)
+        breaker.record_failure()
+
+        now[0] = 6.0
+        assert breaker.allow()
+        assert not breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN and breaker.opened == 2
+
+        now[0] = 12.0
+        assert breaker.allow()
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert breaker.allow()
@@ -0,0 +1,89 @@
+"""
+玄心理命 - 分析结果内容寻址存储单元测试
+"""
+
+import asyncio
+
+from app.core.codec import CacheCodec
+from app.core.result_store import ResultStore
+
+
+class MemoryCache:
+    """以字典充当热缓存"""
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, expire=3600):
+        self.data[key] = value
+        return True
+
+
+class FakeRows:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+
+class FakeDB:
+    """按摘要返回结果体，并记录查询次数"""
+
+    def __init__(self, blobs):
+        self.blobs = blobs
+        self.queries = 0
+
+    async def execute(self, statement):
+        self.queries += 1
+        return FakeRows(list(self.blobs.items()))
+
+
+HEXAGRAM = {
+    "question": "问事业",
+    "main_gua": {"name": "乾为天"},
+    "extra_info": {"ai_analysis": "断语", "source": "meihua"},
+}
+
+
+def _store():
+    return ResultStore(MemoryCache(), CacheCodec(serializer="json", compression="zlib", compress_min_bytes=0))
+
+
+class TestResultStore:
+    """结果库测试"""
+
+    def test_pack_ignores_volatile_fields(self):
+        """测试问题与断语不影响摘要，键顺序不影响摘要"""
+        store = _store()
+        digest, blob = store.pack("yijing", HEXAGRAM)
+        other = {"extra_info": {"source": "meihua"}, "main_gua": {"name": "乾为天"}, "question": "问财运"}
+        assert store.pack("yijing", other)[0] == digest
+        assert store.pack("bazi", other)[0] != digest
+        assert HEXAGRAM["question"] == "问事业" and "ai_analysis" in HEXAGRAM["extra_info"]
+        assert blob["size"] > 0 and blob["body"][0] >> 3 == 3
+
+        store.remember(digest)
+        assert store.pack("yijing", other) == (digest, None)
+        assert store.stats()["deduplicated"] == 1
+
+    def test_load_through_cache(self):
+        """测试未命中时查库并回填缓存，放回剥离字段时不影响缓存"""
+        store = _store()
+        digest, blob = store.pack("yijing", HEXAGRAM)
+        db = FakeDB({digest: blob["body"]})
+
+        async def main():
+            first = await store.load_many(db, [digest, digest])
+            restored = store.restore(first[digest], question="问事业")
+            restored["extra_info"]["ai_analysis"] = "新断语"
+            second = await store.load_many(db, [digest])
+            return restored, second[digest]
+
+        restored, cached = asyncio.run(main())
+        assert db.queries == 1
+        assert restored["question"] == "问事业"
+        assert cached == {"main_gua": {"name": "乾为天"}, "extra_info": {"source": "meihua"}}
@@ -0,0 +1,111 @@
+"""
+玄心理命 - 编译规则库单元测试
+"""
+
+import json
+import os
+
+import pytest
+
+from app.core.analysis import rule_engine
+from app.core.analysis.corpus import (
+    CORPUS_FILENAME, CompiledCorpus, compile_rules_dir, write_corpus
+)
+from app.core.analysis.rule_engine import RuleEngine
+from app.core.analysis.search import CorpusIndex, tokenize
+
+
+RULES = {
+    "bazi:theory:day_master:甲:general": "甲木参天",
+    "ziwei:star:紫微": "帝座",
+    "yijing:gua:乾": "元亨利贞",
+}
+
+
+@pytest.fixture
+def rules_dir(tmp_path):
+    with open(tmp_path / "corpus.json", "w", encoding="utf-8") as f:
+        json.dump(RULES, f, ensure_ascii=False)
+    return tmp_path
+
+
+@pytest.fixture
+def fresh_engine(monkeypatch):
+    """隔离 RuleEngine 的类级状态"""
+    monkeypatch.setattr(RuleEngine, "_rules", {})
+    monkeypatch.setattr(RuleEngine, "_corpus", None)
+    monkeypatch.setattr(RuleEngine, "_next_check", 0.0)
+    monkeypatch.setattr(rule_engine, "RELOAD_CHECK_INTERVAL", 0)
+    engine = RuleEngine()
+    monkeypatch.setattr(engine, "_is_loaded", False)
+    return engine
+
+
+class TestCompiledCorpus:
+    """编译规则库测试"""
+
+    def test_lookup_matches_json(self, rules_dir):
+        """测试查找结果与 JSON 一致"""
+        corpus = CompiledCorpus(compile_rules_dir(str(rules_dir)))
+        assert len(corpus) == len(RULES)
+        for key, value in RULES.items():
+            assert corpus.get(key) == value
+        assert corpus.get("bazi:theory") is None
+        assert corpus.get("zzz") is None
+        assert dict(corpus.items()) == RULES
+        assert list(corpus.prefix_items("bazi:")) == [("bazi:theory:day_master:甲:general", "甲木参天")]
+        assert list(corpus.prefix_items("q")) == []
+
+    def test_engine_hot_reload(self, rules_dir, fresh_engine):
+        """测试规则库被原子替换后自动切换"""
+        compile_rules_dir(str(rules_dir))
+        fresh_engine.load_rules(str(rules_dir))
+        assert fresh_engine.match("ziwei:star:紫微") == "帝座"
+
+        path = os.path.join(str(rules_dir), CORPUS_FILENAME)
+        write_corpus({**RULES, "ziwei:star:紫微": "北斗帝星"}, path)
+        assert fresh_engine.match("ziwei:star:紫微") == "北斗帝星"
+
+    def test_fingerprint_polls_on_interval(self, rules_dir, monkeypatch):
+        """测试规则摘要在检查间隔内沿用缓存，到期后反映规则变化"""
+        now = [100.0]
+        monkeypatch.setattr(rule_engine.time, "monotonic", lambda: now[0])
+        monkeypatch.setattr(rule_engine, "RELOAD_CHECK_INTERVAL", 2)
+        monkeypatch.setattr(rule_engine, "_fingerprint", ("", (), ""))
+        monkeypatch.setattr(rule_engine, "_fingerprint_next_check", 0.0)
+
+        first = rule_engine.rules_fingerprint(str(rules_dir))
+        with open(rules_dir / "extra.json", "w", encoding="utf-8") as f:
+            json.dump({"bazi:extra": "新增"}, f, ensure_ascii=False)
+        assert rule_engine.rules_fingerprint(str(rules_dir)) == first
+
+        now[0] = 102.0
+        assert rule_engine.rules_fingerprint(str(rules_dir)) != first
+
+    def test_engine_json_fallback(self, rules_dir, fresh_engine):
+        """测试无编译文件时读取 JSON"""
+        fresh_engine.load_rules(str(rules_dir))
+        assert RuleEngine._corpus is None
+        assert fresh_engine.match("yijing:gua:乾") == "元亨利贞"
+
+
+class TestCorpusIndex:
+    """全文检索测试"""
+
+    def test_tokenize(self):
+        """测试汉字切单字与二字组，查询只取二字组"""
+        assert tokenize("bazi:day_master:甲木") == ["bazi", "day", "master", "甲", "木", "甲木"]
+        assert tokenize("甲木参", query=True) == ["甲木", "木参"]
+        assert tokenize("甲", query=True) == ["甲"]
+
+    def test_bm25_ranking_and_prefix(self):
+        """测试相关度排序及键前缀过滤"""
+        index = CorpusIndex([
+            ("bazi:a", "七杀攻身，七杀有制"),
+            ("bazi:b", "正官佩印"),
+            ("ziwei:c", "七杀朝斗"),
+        ])
+        assert [h.key for h in index.search("七杀")] == ["bazi:a", "ziwei:c"]
+        assert [h.key for h in index.search("七杀", prefix="ziwei:")] == ["ziwei:c"]
+        assert [h.key for h in index.search(prefix="bazi:")] == ["bazi:a", "bazi:b"]
+        assert index.search("伤官") == []
@@ -0,0 +1,46 @@
+"""
+玄心理命 - 十神表单元测试
+"""
+
+import numpy as np
+
+from app.core.bazi.calendar import TIAN_GAN, DI_ZHI, DI_ZHI_CANG_GAN, calculate_sizhu
+from app.core.bazi.shishen import (
+    _derive_shishen, get_shishen, SHISHEN_LIST, count_shishen,
+    cang_gan_shishen_codes, shishen_codes_array, cang_gan_shishen_array
+)
+
+
+class TestShiShenTable:
+    """十神表测试"""
+
+    def test_matches_derivation(self):
+        """测试十神表与五行生克推导一致"""
+        for dm in TIAN_GAN:
+            for other in TIAN_GAN:
+                assert get_shishen(dm, other) == _derive_shishen(dm, other)
+
+    def test_cang_gan_tensor(self):
+        """测试藏干十神表与逐个查询一致"""
+        for dm_idx, dm in enumerate(TIAN_GAN):
+            for zhi_idx, zhi in enumerate(DI_ZHI):
+                expected = [get_shishen(dm, gan) for gan in DI_ZHI_CANG_GAN[zhi]]
+                assert [SHISHEN_LIST[c] for c in cang_gan_shishen_codes(dm_idx, zhi_idx)] == expected
+
+    def test_array_api(self):
+        """测试批量查询与标量一致"""
+        dms = np.repeat(np.arange(10), 12)
+        zhis = np.tile(np.arange(12), 10)
+        codes = shishen_codes_array(dms[:, None], np.arange(10)[None, :])
+        assert codes.shape == (120, 10)
+        assert SHISHEN_LIST[codes[7, 3]] == get_shishen(TIAN_GAN[0], TIAN_GAN[3])
+
+        hidden = cang_gan_shishen_array(dms, zhis)
+        assert hidden.shape == (120, 3)
+        assert tuple(c for c in hidden[13] if c >= 0) == cang_gan_shishen_codes(1, 1)
+
+    def test_count_shishen(self):
+        """测试十神统计总数为三干加全部藏干"""
+        sizhu = calculate_sizhu(1990, 5, 15, 10)
+        hidden = sum(len(DI_ZHI_CANG_GAN[zhi]) for zhi in sizhu.get_all_zhi())
+        assert sum(count_shishen(sizhu).values()) == 3 + hidden
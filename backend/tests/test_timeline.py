@@ -0,0 +1,45 @@
+"""
+玄心理命 - 终身大运流年时间线单元测试
+"""
+
+import inspect
+
+from app.core.bazi import (
+    calculate_sizhu, calculate_dayun, calculate_liunian, iter_lifetime_timeline, Gender
+)
+
+
+class TestLifetimeTimeline:
+    """时间线生成器测试"""
+
+    BIRTH = (1990, 5, 15, 10)
+
+    def test_default_horizon(self):
+        """测试默认生成出生起一百年"""
+        sizhu = calculate_sizhu(*self.BIRTH)
+        records = list(iter_lifetime_timeline(sizhu, Gender.MALE, *self.BIRTH))
+        assert len(records) == 100
+        assert records[0]["year"] == 1990 and records[0]["age"] == 1
+        assert records[-1]["year"] == 2089
+
+    def test_lazy(self):
+        """测试生成器按需计算"""
+        sizhu = calculate_sizhu(*self.BIRTH)
+        timeline = iter_lifetime_timeline(sizhu, Gender.MALE, *self.BIRTH, end_year=100000)
+        assert inspect.isgenerator(timeline)
+        assert next(timeline)["year"] == 1990
+
+    def test_matches_dayun_and_liunian(self):
+        """测试与大运、流年计算结果一致"""
+        year, month, day, hour = self.BIRTH
+        sizhu = calculate_sizhu(*self.BIRTH)
+        dayun_list = calculate_dayun(sizhu, Gender.FEMALE, year, month, day, birth_hour=hour)
+        liunian = {ln.year: ln for ln in calculate_liunian(sizhu, year, 2020, 20)}
+
+        for record in iter_lifetime_timeline(sizhu, Gender.FEMALE, year, month, day, hour,
+                                             start_year=2020, end_year=2039):
+            ln = liunian[record["year"]]
+            assert record["ganzhi"] == str(ln.ganzhi)
+            assert record["rating"] == ln.rating
+            dayun = next(dy for dy in dayun_list if dy.start_age <= record["age"] <= dy.end_age)
+            assert record["dayun"]["ganzhi"] == str(dayun.ganzhi)
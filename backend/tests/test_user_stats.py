@@ -0,0 +1,130 @@
+"""
+玄心理命 - 用户统计计数单元测试
+"""
+
+import asyncio
+
+from sqlalchemy.dialects import postgresql
+
+from app.core.database import AnalysisRecord, Favorite
+from app.core.user_stats import UserStats, aggregate_query, stat_field
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def hset(self, key, mapping):
+        self.redis.hashes.setdefault(key, {}).update({k: str(v) for k, v in mapping.items()})
+
+    def expire(self, key, seconds):
+        pass
+
+    async def execute(self):
+        return []
+
+
+class FakeRedis:
+    """模拟计数哈希与增减脚本"""
+
+    def __init__(self):
+        self.hashes = {}
+        self.dirty = set()
+
+    def register_script(self, script):
+        async def bump(keys, args):
+            stats_key, _ = keys
+            field, delta, user_id = args
+            if stats_key in self.hashes:
+                h = self.hashes[stats_key]
+                h[field] = str(int(h.get(field, 0)) + delta)
+            self.dirty.add(str(user_id))
+            return 1
+        return bump
+
+    async def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def spop(self, key, count):
+        popped = list(self.dirty)[:count]
+        self.dirty.difference_update(popped)
+        return popped
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+
+class FakeDB:
+    """返回预置的聚合结果，并记录查询次数"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, statement):
+        self.queries += 1
+        return FakeResult(self.rows)
+
+
+class TestUserStats:
+    """用户统计测试"""
+
+    def test_rebuild_then_incremental(self):
+        """测试缺失时聚合重建，之后按增减计数读取，不再查库"""
+        redis = FakeRedis()
+        db = FakeDB([("bazi_analyses", 2), ("divinations", 1), ("favorites", 0)])
+        stats = UserStats(redis, lambda: db)
+
+        async def main():
+            # 哈希不存在时不增减，只记待校准
+            await stats.bump(7, stat_field(AnalysisRecord, {"analysis_type": "bazi"}))
+            assert redis.hashes == {} and redis.dirty == {"7"}
+
+            first = await stats.get(db, 7)
+            await stats.bump(7, stat_field(AnalysisRecord, {"analysis_type": "ziwei"}))
+            await stats.bump(7, stat_field(Favorite))
+            second = await stats.get(db, 7)
+            return first, second
+
+        first, second = asyncio.run(main())
+        assert first["bazi_analyses"] == 2 and first["ziwei_analyses"] == 0
+        assert second["ziwei_analyses"] == 1 and second["favorites"] == 1
+        assert db.queries == 1
+
+    def test_reconcile(self):
+        """测试校准按聚合结果覆盖计数"""
+        redis = FakeRedis()
+        redis.hashes["stats:7"] = {"divinations": "5"}
+        redis.dirty.add("7")
+        db = FakeDB([("divinations", 3)])
+        stats = UserStats(redis, lambda: db)
+
+        assert asyncio.run(stats.reconcile()) == 1
+        assert redis.hashes["stats:7"]["divinations"] == "3"
+        assert redis.dirty == set()
+
+    def test_single_union_query(self):
+        """测试聚合为一条 UNION ALL 查询"""
+        sql = str(aggregate_query(7).compile(dialect=postgresql.dialect()))
+        assert sql.count("UNION ALL") == 4
+        assert stat_field(AnalysisRecord, {"analysis_type": "other"}) is None
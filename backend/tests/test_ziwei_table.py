@@ -0,0 +1,49 @@
+"""
+玄心理命 - 紫微命盘预计算表单元测试
+"""
+
+import pytest
+
+from app.core.ziwei import analysis
+from app.core.ziwei.table import (
+    CHART_COUNT, chart_index, encode_chart, decode_chart, ZiweiChartTable
+)
+
+
+CASES = [
+    ("庚", "午", 5, 15, "巳"), ("甲", "子", 1, 1, "子"), ("癸", "亥", 12, 30, "亥"),
+    ("丙", "寅", 7, 9, "午"), ("辛", "酉", 3, 22, "卯"), ("戊", "辰", 11, 6, "申"),
+]
+
+
+@pytest.fixture
+def live_analyze(monkeypatch):
+    """不查表、逐盘计算的 analyze_ziwei"""
+    monkeypatch.setattr(analysis, "get_ziwei_table", lambda: None)
+    return analysis.analyze_ziwei
+
+
+class TestZiweiChartTable:
+    """命盘表编解码测试"""
+
+    @pytest.mark.parametrize("inputs", CASES)
+    @pytest.mark.parametrize("advanced", [True, False])
+    def test_decode_matches_live(self, live_analyze, inputs, advanced):
+        """测试解码结果与逐盘计算完全一致"""
+        decoded = decode_chart(encode_chart(*inputs), inputs[0], advanced)
+        assert decoded == live_analyze(*inputs, advanced=advanced)
+
+    def test_chart_index(self):
+        """测试下标范围及不在表内的输入"""
+        assert chart_index("甲", "子", 1, 1, "子") == 0
+        assert chart_index("癸", "亥", 12, 30, "亥") == CHART_COUNT - 1
+        assert chart_index("甲", "丑", 1, 1, "子") is None
+        assert chart_index("甲", "子", 1, 31, "子") is None
+
+    def test_lookup(self, live_analyze):
+        """测试按输入查表解码"""
+        inputs = ("甲", "子", 1, 1, "子")
+        table = ZiweiChartTable(memoryview(encode_chart(*inputs)))
+        assert len(table) == 1
+        assert table.lookup(*inputs) == live_analyze(*inputs)
+        assert table.lookup("甲", "丑", 1, 1, "子") is None
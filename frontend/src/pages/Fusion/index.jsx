@@ -87,14 +87,22 @@ const FusionPage = () => {
         }
     };
 
-    // 选择一条历史记录
-    const selectRecord = (record) => {
-        setSelectedRecords(prev => ({
-            ...prev,
-            [modalCategory]: record
-        }));
-        setModalVisible(false);
-        message.success(`已选择 ${CATEGORIES[modalCategory].name} 报告`);
+    // 选择一条历史记录（列表只含摘要，完整结果从详情接口加载）
+    const selectRecord = async (record) => {
+        const category = modalCategory;
+        try {
+            const res = await api.get(`/user/history/${CATEGORIES[category].apiType}/${record.id}`);
+            if (!res.data.success) return;
+            setSelectedRecords(prev => ({
+                ...prev,
+                [category]: { ...record, result_data: res.data.data.result_data }
+            }));
+            setModalVisible(false);
+            message.success(`已选择 ${CATEGORIES[category].name} 报告`);
+        } catch (err) {
+            console.error('加载报告详情失败:', err);
+            message.error('加载报告详情失败');
+        }
     };
 
     // 取消选择
@@ -138,13 +146,13 @@ const FusionPage = () => {
             case 'ziwei':
                 return formatRecordId(category, record);
             case 'mbti':
-                return record.result_data?.type_code || formatRecordId(category, record);
+                return record.summary || record.result_data?.type_code || formatRecordId(category, record);
             case 'big5':
                 return formatRecordId(category, record);
             case 'archetype':
-                return record.result_data?.primary?.name || formatRecordId(category, record);
+                return record.summary || record.result_data?.primary?.name || formatRecordId(category, record);
             case 'enneagram':
-                return record.result_data?.primary_type ? `${record.result_data.primary_type}号` : formatRecordId(category, record);
+                return record.summary || (record.result_data?.primary_type ? `${record.result_data.primary_type}号` : formatRecordId(category, record));
             default:
                 return formatRecordId(category, record);
         }
@@ -515,10 +523,8 @@ const FusionPage = () => {
                                     }
                                     description={
                                         modalCategory === 'bazi' || modalCategory === 'ziwei'
-                                            ? `ID: ${record.id}`
-                                            : (typeof record.result_data?.description === 'string'
-                                                ? record.result_data.description.slice(0, 50)
-                                                : '')
+                                            ? record.summary || `ID: ${record.id}`
+                                            : (modalCategory === 'big5' ? record.summary || '' : '')
                                     }
                                 />
                             </List.Item>
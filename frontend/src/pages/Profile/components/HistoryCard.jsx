@@ -305,9 +305,27 @@ const HistoryCard = ({ record, type, onClick, onDelete }) => {
     };
 
 
+    // 6. Summary Card（列表接口只返回写入时提取的摘要）
+    const renderSummary = () => (
+        <>
+            <div style={{ marginBottom: 12 }}>
+                <Tag color="blue">{record.type || record.method || record.test_type?.toUpperCase()}</Tag>
+            </div>
+            <div style={{ fontSize: 20, fontWeight: 'bold', color: token.colorPrimary, marginBottom: 12 }}>
+                {record.summary || '查看详情'}
+            </div>
+            {record.question && (
+                <Paragraph ellipsis={{ rows: 2 }} type="secondary" style={{ margin: 0 }}>
+                    {record.question}
+                </Paragraph>
+            )}
+        </>
+    );
+
     const renderContent = () => {
         const safeType = type === 'analyses' ? record.type : type;
         if (type === 'fusions') return renderFusion();
+        if (!record.result_data) return renderSummary();
 
         switch (safeType) {
             case 'bazi': return renderBazi();
@@ -0,0 +1,22 @@
+"""
+生成紫微斗数命盘预计算表
+
+用法（在项目根目录执行）：
+    python scripts/build_ziwei_table.py [输出路径]
+"""
+
+import sys
+import os
+import time
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from backend.app.core.ziwei.table import build_ziwei_table, ZIWEI_TABLE_PATH, CHART_COUNT
+
+
+if __name__ == "__main__":
+    output = sys.argv[1] if len(sys.argv) > 1 else ZIWEI_TABLE_PATH
+    start = time.time()
+    build_ziwei_table(output)
+    print(f"紫微命盘表已生成: {output} ({CHART_COUNT} 条, 用时 {time.time() - start:.1f}s)")
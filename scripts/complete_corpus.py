@@ -5,6 +5,12 @@ Sources: 《滴天髓》, 《紫微斗数全书》, 《周易》
 """
 import json
 import os
+import sys
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from backend.app.core.analysis.corpus import compile_rules_dir
 
 CORPUS_PATH = "backend/app/data/rules/large_corpus.json"
 
@@ -215,6 +221,9 @@ def main():
         
     print(f"Build Complete. Total Entries: {len(full_corpus)}")
     print(f"Path: {os.path.abspath(CORPUS_PATH)}")
+    
+    # Emit compiled (mmap-able) corpus for RuleEngine
+    print(f"Compiled: {compile_rules_dir(os.path.dirname(CORPUS_PATH))}")
 
 if __name__ == "__main__":
     main()
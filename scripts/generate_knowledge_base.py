@@ -1,6 +1,12 @@
 
 import json
 import os
+import sys
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from backend.app.core.analysis.corpus import compile_rules_dir
 
 # ==================== 基础数据 ====================
 
@@ -246,6 +252,9 @@ def main():
         json.dump(data, f, ensure_ascii=False, indent=2)
         
     print(f"Done! Saved to {file_path}")
+    
+    # Emit compiled (mmap-able) corpus for RuleEngine
+    print(f"Compiled: {compile_rules_dir(output_dir)}")
 
 if __name__ == "__main__":
     main()
@@ -7,6 +7,12 @@ Sources:
 """
 import json
 import os
+import sys
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from backend.app.core.analysis.corpus import compile_rules_dir
 
 CORPUS_PATH = "backend/app/data/rules/large_corpus.json"
 
@@ -440,6 +446,9 @@ def main():
         json.dump(final_corpus, f, ensure_ascii=False, indent=2)
     
     print(f"Rebuilt corpus with {len(final_corpus)} entries based on classics.")
+    
+    # Emit compiled (mmap-able) corpus for RuleEngine
+    print(f"Compiled: {compile_rules_dir(os.path.dirname(CORPUS_PATH))}")
 
 if __name__ == "__main__":
     main()